@@ -0,0 +1,27 @@
+"""add order client_order_id
+
+Revision ID: a7b8c9d0e1f2
+Revises: f6a7b8c9d0e1
+Create Date: 2026-03-02 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "a7b8c9d0e1f2"
+down_revision: Union[str, None] = "f6a7b8c9d0e1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("orders", sa.Column("client_order_id", sa.String(length=36), nullable=True))
+    op.create_unique_constraint(
+        "uq_order_user_client_order_id", "orders", ["user_id", "client_order_id"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint("uq_order_user_client_order_id", "orders", type_="unique")
+    op.drop_column("orders", "client_order_id")
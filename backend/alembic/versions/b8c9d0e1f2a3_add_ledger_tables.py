@@ -0,0 +1,51 @@
+"""add ledger journal and snapshot tables
+
+Revision ID: b8c9d0e1f2a3
+Revises: a7b8c9d0e1f2
+Create Date: 2026-03-03 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision: str = "b8c9d0e1f2a3"
+down_revision: Union[str, None] = "a7b8c9d0e1f2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "ledger_snapshots",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("last_entry_id", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("entry_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_table(
+        "ledger_entries",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("order_id", sa.Integer(), sa.ForeignKey("orders.id"), nullable=False),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("pair", sa.String(length=20), nullable=False),
+        sa.Column("side", postgresql.ENUM("buy", "sell", name="orderside", create_type=False), nullable=False),
+        sa.Column("price", sa.Numeric(precision=20, scale=8), nullable=False),
+        sa.Column("quantity", sa.Numeric(precision=20, scale=8), nullable=False),
+        sa.Column("base_asset", sa.String(length=20), nullable=False),
+        sa.Column("quote_asset", sa.String(length=20), nullable=False),
+        sa.Column("base_delta", sa.Numeric(precision=20, scale=8), nullable=False),
+        sa.Column("quote_delta", sa.Numeric(precision=20, scale=8), nullable=False),
+        sa.Column("snapshot_id", sa.Integer(), sa.ForeignKey("ledger_snapshots.id"), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index(op.f("ix_ledger_entries_user_id"), "ledger_entries", ["user_id"])
+    op.create_index(op.f("ix_ledger_entries_snapshot_id"), "ledger_entries", ["snapshot_id"])
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_ledger_entries_snapshot_id"), table_name="ledger_entries")
+    op.drop_index(op.f("ix_ledger_entries_user_id"), table_name="ledger_entries")
+    op.drop_table("ledger_entries")
+    op.drop_table("ledger_snapshots")
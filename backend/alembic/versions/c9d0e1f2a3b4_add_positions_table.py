@@ -0,0 +1,38 @@
+"""add positions table
+
+Revision ID: c9d0e1f2a3b4
+Revises: b8c9d0e1f2a3
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision: str = "c9d0e1f2a3b4"
+down_revision: Union[str, None] = "b8c9d0e1f2a3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "positions",
+        sa.Column("bot_id", sa.Integer(), sa.ForeignKey("bots.id"), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), primary_key=True),
+        sa.Column("side", postgresql.ENUM("buy", "sell", name="orderside", create_type=False), nullable=False),
+        sa.Column("entry_price", sa.Float(), nullable=False),
+        sa.Column("stop_loss", sa.Float(), nullable=False),
+        sa.Column("take_profit", sa.Float(), nullable=True),
+        sa.Column("trailing_stop", sa.Float(), nullable=True),
+        sa.Column("trailing_active", sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.Column("trailing_atr_mult", sa.Float(), nullable=True),
+        sa.Column("current_atr", sa.Float(), nullable=True),
+        sa.Column("opened_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("positions")
@@ -0,0 +1,98 @@
+"""
+backtest.py - Strategy backtest CLI
+
+    python -m app.backtest --strategy rsi_trend --data data/BTC_USDT-1h.npz
+                           [--config '{"rsi_buy": 30}'] [--allocated 1000]
+                           [--fee-pct 0.1] [--start 2023-01-01] [--end 2024-01-01]
+                           [--fetch --pair BTC_USDT] [--output result.json]
+
+Replays a kline history file (.npz, Binance .csv dump or .json, see
+``Klines.load``) through one STRATEGIES class with ``run_backtest`` and
+prints the same stats the bot page shows. With ``--fetch`` a missing file is
+downloaded from Binance for --start..--end at the strategy's interval and
+saved as .npz first. Needs no database or Redis.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+from datetime import datetime, timezone
+from decimal import Decimal
+from pathlib import Path
+from typing import Optional
+
+
+def _timestamp(value: Optional[str]) -> Optional[int]:
+    if value is None:
+        return None
+    if value.isdigit():
+        return int(value)
+    return int(datetime.fromisoformat(value).replace(tzinfo=timezone.utc).timestamp())
+
+
+def _interval_seconds(interval: str) -> int:
+    units = {"m": 60, "h": 3600, "d": 86400, "w": 604800}
+    return int(interval[:-1]) * units[interval[-1]]
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--strategy", required=True, help="STRATEGIES key, e.g. rsi_trend")
+    parser.add_argument("--config", default="{}", help="strategy_config as JSON")
+    parser.add_argument("--data", required=True, help="kline history file (.npz, .csv or .json)")
+    parser.add_argument("--pair", default="BTC_USDT", help="pair to download with --fetch")
+    parser.add_argument("--fetch", action="store_true", help="download --data from Binance if it is missing")
+    parser.add_argument("--allocated", default="1000", help="USDT allocated to the simulated subscription")
+    parser.add_argument("--fee-pct", type=float, default=0.0, help="fee per fill in percent")
+    parser.add_argument("--start", help="first bar (ISO date or unix seconds)")
+    parser.add_argument("--end", help="end of the range, exclusive (ISO date or unix seconds)")
+    parser.add_argument("--output", help="write the report as JSON")
+    args = parser.parse_args(argv)
+
+    # Settings are read at import time; the backtest itself touches neither DB nor Redis
+    os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite://")
+    os.environ.setdefault("REDIS_URL", "redis://unused")
+    os.environ.setdefault("SECRET_KEY", "backtest")
+
+    from app.services.backtest import run_backtest
+    from app.services.klines import Klines
+    from app.services.strategies import STRATEGIES
+
+    strategy_cls = STRATEGIES.get(args.strategy)
+    if strategy_cls is None:
+        parser.error(f"unknown strategy '{args.strategy}' (choose from {', '.join(STRATEGIES)})")
+    start, end = _timestamp(args.start), _timestamp(args.end)
+
+    path = Path(args.data)
+    if not path.exists():
+        if not args.fetch:
+            parser.error(f"{path} not found (pass --fetch to download it)")
+        if start is None:
+            parser.error("--fetch needs --start")
+        from app.services.market_data import fetch_klines_range
+
+        klines = asyncio.run(fetch_klines_range(args.pair, strategy_cls.INTERVAL, start, end))
+        path = path.with_suffix(".npz")
+        klines.save(path)
+        print(f"saved {len(klines)} {strategy_cls.INTERVAL} klines to {path}", file=sys.stderr)
+
+    klines = Klines.load(path)
+    if start is not None or end is not None:
+        lo = 0 if start is None else int(klines.time.searchsorted(start))
+        hi = len(klines) if end is None else int(klines.time.searchsorted(end))
+        klines = klines[lo:hi]
+    if len(klines) > 1 and int(klines.time[1] - klines.time[0]) != _interval_seconds(strategy_cls.INTERVAL):
+        print(f"warning: {path} bars are {int(klines.time[1] - klines.time[0])}s apart but "
+              f"{args.strategy} runs on {strategy_cls.INTERVAL} candles", file=sys.stderr)
+
+    report = run_backtest(args.strategy, json.loads(args.config), klines,
+                          allocated=Decimal(args.allocated), fee_pct=args.fee_pct)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -22,6 +22,56 @@ class Settings(BaseSettings):
     # Polygon RPC for payment verification
     POLYGON_RPC_URL: str = "https://polygon-rpc.com"
 
+    # Event-sourced ledger for paper fills. Experimental, and limited to ONE API
+    # process: balances live in that process's memory (app.runner refuses to start with it).
+    # LEDGER_FLUSH_MS: extra wait for a group commit to gather fills (batches form anyway
+    # while a commit is in flight)
+    LEDGER_MODE: bool = False
+    LEDGER_FLUSH_MS: int = 0
+    LEDGER_SNAPSHOT_SEC: int = 30
+
+    # Pre-trade risk limits (per user, resting limit orders)
+    RISK_MAX_OPEN_ORDERS: int = 50
+    RISK_MAX_OPEN_NOTIONAL_USDT: float = 1_000_000.0
+
+    # Bot runner scheduling
+    BOT_CYCLE_SEC: float = 10.0
+    BOT_RUNNER_CONCURRENCY: int = 8
+    BOT_RUN_TIMEOUT_SEC: float = 30.0
+    # "poll" = fixed-cadence loop, "event" = kline-close / price-tick driven
+    BOT_SCHEDULER: str = "poll"
+    EXIT_CHECK_MIN_INTERVAL_SEC: float = 1.0
+    # Tick-level SL/TP/trailing exits in the runner (exit_monitor.py)
+    EXIT_MONITOR_ENABLED: bool = True
+    EXIT_MONITOR_RESYNC_SEC: float = 5.0
+    # Write-behind interval of position changes to the positions table
+    POSITION_FLUSH_SEC: float = 1.0
+    # Trade prices are published to the exit monitor at most this often per pair
+    TRADE_EVENT_MIN_INTERVAL_SEC: float = 0.1
+
+    # >0 runs strategy indicator math in a process pool of this size
+    STRATEGY_POOL_WORKERS: int = 0
+    # Entries in the per-process indicator memo shared by all strategies (0 = off)
+    INDICATOR_CACHE_SIZE: int = 4096
+    # Answer strategy indicators from incremental per-pair streams (indicator_stream.py)
+    INDICATOR_STREAMS: bool = True
+
+    # Serve kline intervals from one 1m series per pair (resampler.py);
+    # requests needing more than this many minutes go to Binance directly
+    KLINES_RESAMPLE: bool = True
+    KLINES_BASE_MAX_MINUTES: int = 30 * 1440
+
+    # Backtests / parameter sweeps. Admin jobs run on a runner with this many
+    # spawned processes; kept small so a sweep can't starve the bots beside it
+    BACKTEST_DATA_DIR: str = "data/backtest"
+    OPTIMIZER_WORKERS: int = 2
+    OPTIMIZER_MAX_CONFIGS: int = 5000
+
+    # Standalone runner sharding (python -m app.runner)
+    RUNNER_PARTITIONS: int = 64
+    RUNNER_HEARTBEAT_SEC: float = 5.0
+    RUNNER_LEASE_SEC: float = 15.0
+
     @field_validator('DATABASE_URL', mode='before')
     @classmethod
     def convert_database_url(cls, v):
@@ -31,12 +81,24 @@ class Settings(BaseSettings):
 
 settings = Settings()
 
+SUPPORTED_PAIRS = [
+    # Market Anchor
+    "BTC_USDT", "ETH_USDT",
+    # High Liquidity Majors
+    "SOL_USDT", "XRP_USDT", "BNB_USDT", "AVAX_USDT", "ADA_USDT",
+    "DOGE_USDT", "DOT_USDT", "LINK_USDT",
+    # L2 / Scaling
+    "ARB_USDT", "OP_USDT", "POL_USDT",
+    # AI / Infra
+    "RENDER_USDT", "FET_USDT", "GRT_USDT",
+    # DeFi / Ecosystem
+    "UNI_USDT", "AAVE_USDT",
+    # High Beta / Rotation
+    "SUI_USDT", "APT_USDT",
+]
+
 
 async def is_live_trading() -> bool:
-    """Check Redis override first, then fall back to env var."""
-    from app.core.redis import get_redis
-    redis = await get_redis()
-    override = await redis.get("system:live_trading")
-    if override is not None:
-        return override == "true"
-    return settings.BINANCE_LIVE_TRADING
+    """Check Redis override first, then fall back to env var (cached in process, see control_flags)."""
+    from app.services.control_flags import control_flags
+    return await control_flags.live_trading()
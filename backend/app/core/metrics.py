@@ -0,0 +1,154 @@
+"""In-process metrics: rolling-window histograms and monotonic counters.
+
+Kept deliberately small — values live in process memory and are exported as a
+plain dict (``snapshot()``) that callers publish to Redis for the admin API.
+
+``stage(name)`` times a block into ``stage.<name>_sec`` and, inside a
+``trace()``, also into that trace's per-stage totals; ``timings(group)``
+keeps those per-key (e.g. per bot) so the slowest keys can be listed.
+"""
+import asyncio
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+_WINDOW = 500
+
+
+class Histogram:
+    def __init__(self, window: int = _WINDOW):
+        self._samples: deque[float] = deque(maxlen=window)
+        self.count = 0
+        self.last: Optional[float] = None
+
+    def observe(self, value: float) -> None:
+        self._samples.append(value)
+        self.count += 1
+        self.last = value
+
+    def summary(self) -> dict:
+        if not self._samples:
+            return {"count": self.count}
+        values = sorted(self._samples)
+
+        def pct(p: float) -> float:
+            return round(values[min(len(values) - 1, int(p / 100 * len(values)))], 4)
+
+        return {
+            "count": self.count,
+            "last": round(self.last, 4),
+            "mean": round(sum(values) / len(values), 4),
+            "p50": pct(50), "p90": pct(90), "p99": pct(99),
+            "max": round(values[-1], 4),
+        }
+
+
+class KeyedTimings:
+    """Run-time histogram per key, plus the stage breakdown of each key's last run."""
+
+    def __init__(self, window: int = 50):
+        self._window = window
+        self._runs: dict[str, Histogram] = {}
+        self._last_stages: dict[str, dict[str, float]] = {}
+
+    def record(self, key, total: float, stages: dict[str, float]) -> None:
+        key = str(key)
+        h = self._runs.get(key)
+        if h is None:
+            h = self._runs[key] = Histogram(self._window)
+        h.observe(total)
+        self._last_stages[key] = {k: round(v, 4) for k, v in stages.items()}
+
+    def top(self, n: int = 10) -> list[dict]:
+        """Keys with the highest p90 run time, slowest first."""
+        rows = [
+            {"key": key, **h.summary(), "last_stages": self._last_stages.get(key, {})}
+            for key, h in self._runs.items()
+        ]
+        rows.sort(key=lambda r: r.get("p90", 0.0), reverse=True)
+        return rows[:n]
+
+
+_histograms: dict[str, Histogram] = {}
+_counters: dict[str, int] = {}
+_timings: dict[str, KeyedTimings] = {}
+_trace: ContextVar[Optional[dict[str, float]]] = ContextVar("metrics_trace", default=None)
+
+
+def histogram(name: str) -> Histogram:
+    h = _histograms.get(name)
+    if h is None:
+        h = _histograms[name] = Histogram()
+    return h
+
+
+def observe(name: str, value: float) -> None:
+    histogram(name).observe(value)
+
+
+def incr(name: str, amount: int = 1) -> None:
+    _counters[name] = _counters.get(name, 0) + amount
+
+
+def counter(name: str) -> int:
+    return _counters.get(name, 0)
+
+
+def timings(group: str) -> KeyedTimings:
+    t = _timings.get(group)
+    if t is None:
+        t = _timings[group] = KeyedTimings()
+    return t
+
+
+@contextmanager
+def trace() -> Iterator[dict[str, float]]:
+    """Collect ``stage()`` totals for this block and any tasks it spawns."""
+    stages: dict[str, float] = {}
+    token = _trace.set(stages)
+    try:
+        yield stages
+    finally:
+        _trace.reset(token)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a block (sync or around an ``await``) as ``stage.<name>_sec``."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        observe(f"stage.{name}_sec", elapsed)
+        stages = _trace.get()
+        if stages is not None:
+            stages[name] = stages.get(name, 0.0) + elapsed
+
+
+def snapshot(top_n: int = 50) -> dict:
+    return {
+        "histograms": {name: h.summary() for name, h in _histograms.items()},
+        "counters": dict(_counters),
+        "slowest": {group: t.top(top_n) for group, t in _timings.items()},
+    }
+
+
+def reset() -> None:
+    _histograms.clear()
+    _counters.clear()
+    _timings.clear()
+
+
+async def loop_lag_monitor(interval: float = 0.5) -> None:
+    """Record how late the event loop wakes a sleeping task (``event_loop.lag_sec``).
+
+    Anything that blocks the loop - e.g. indicator math run inline - shows up
+    here directly as added latency for every request and bot sharing the loop.
+    """
+    while True:
+        start = time.monotonic()
+        await asyncio.sleep(interval)
+        observe("event_loop.lag_sec", max(0.0, time.monotonic() - start - interval))
@@ -0,0 +1,115 @@
+"""Opt-in sampling profiler for runner cycles.
+
+An admin stores a request in ``runner:profile:request``; a runner picks it up
+(``poll_request()``, called from its metrics loop) and the next ``run_cycle``
+is sampled by ``capture()``. The result is written to
+``runner:profile:{id}`` as folded stacks (``frame;frame;frame count`` per
+line), the input format of flamegraph.pl and speedscope.
+
+Sampling reads the event-loop thread's stack from a helper thread, so it
+measures where the loop spends wall time - awaits that are idle show up as
+the loop's selector wait, blocking work shows up under its own frames.
+"""
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from app.core.redis import get_redis
+
+PROFILE_REQUEST_KEY = "runner:profile:request"
+PROFILE_RESULT_KEY = "runner:profile:{id}"
+PROFILE_RESULT_TTL = 3600
+_MAX_DEPTH = 128
+
+
+class SamplingProfiler:
+    def __init__(self, thread_id: Optional[int] = None, interval: float = 0.005):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.samples: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._started = 0.0
+        self.duration = 0.0
+
+    @staticmethod
+    def _frame_name(frame) -> str:
+        code = frame.f_code
+        return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+    def _sample(self) -> None:
+        frame = sys._current_frames().get(self.thread_id)
+        stack = []
+        while frame is not None and len(stack) < _MAX_DEPTH:
+            stack.append(self._frame_name(frame))
+            frame = frame.f_back
+        if stack:
+            self.samples[";".join(reversed(stack))] += 1
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self) -> None:
+        self._started = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.duration = time.monotonic() - self._started
+
+    def folded(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.samples.most_common())
+
+
+_pending: Optional[dict] = None
+
+
+async def poll_request(instance_id: Optional[str] = None) -> None:
+    """Claim a pending profile request (GETDEL, so only one runner takes it)."""
+    global _pending
+    if _pending is not None:
+        return
+    redis = await get_redis()
+    raw = await redis.getdel(PROFILE_REQUEST_KEY)
+    if raw:
+        _pending = {**json.loads(raw), "instance": instance_id}
+        print(f"[Profiler] profile {_pending['id']} requested — sampling next cycle")
+
+
+@asynccontextmanager
+async def capture(label: str):
+    """Sample this block if a profile request is pending, else do nothing."""
+    global _pending
+    request, _pending = _pending, None
+    if request is None:
+        yield
+        return
+    profiler = SamplingProfiler(interval=float(request.get("interval", 0.005)))
+    profiler.start()
+    try:
+        yield
+    finally:
+        profiler.stop()
+        result = {
+            "id": request["id"],
+            "label": label,
+            "instance": request.get("instance"),
+            "duration_sec": round(profiler.duration, 4),
+            "samples": sum(profiler.samples.values()),
+            "folded": profiler.folded(),
+            "captured_at": int(time.time()),
+        }
+        try:
+            redis = await get_redis()
+            await redis.set(PROFILE_RESULT_KEY.format(id=request["id"]), json.dumps(result), ex=PROFILE_RESULT_TTL)
+        except Exception as e:
+            print(f"[Profiler] failed to store profile {request['id']}: {e}")
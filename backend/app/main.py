@@ -7,40 +7,46 @@ from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from app.routers import auth, market, ws, orders, wallet, bots, admin
 from app.routers.ws import _binance_broadcast_cb
 from app.core.redis import get_redis
+from app.core import metrics
 from app.services.market_data import market_data_loop
-from app.services.bot_runner import bot_runner_loop
+from app.services.strategies import STRATEGIES
+from app.services.symbol_registry import refresh_symbol_registry
+from app.services.ledger import ledger
+from app.services.control_flags import control_flags
+from app.services.risk_cache import risk_cache
+from app.config import settings, SUPPORTED_PAIRS
 from app.services.bot_eviction import daily_drawdown_check, monthly_evaluation, daily_performance_update, check_subscription_expiry
 
-SUPPORTED_PAIRS = [
-    # Market Anchor
-    "BTC_USDT", "ETH_USDT",
-    # High Liquidity Majors
-    "SOL_USDT", "XRP_USDT", "BNB_USDT", "AVAX_USDT", "ADA_USDT",
-    "DOGE_USDT", "DOT_USDT", "LINK_USDT",
-    # L2 / Scaling
-    "ARB_USDT", "OP_USDT", "POL_USDT",
-    # AI / Infra
-    "RENDER_USDT", "FET_USDT", "GRT_USDT",
-    # DeFi / Ecosystem
-    "UNI_USDT", "AAVE_USDT",
-    # High Beta / Rotation
-    "SUI_USDT", "APT_USDT",
-]
 scheduler = AsyncIOScheduler()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await get_redis()
+    # Preload LOT_SIZE / NOTIONAL / PRICE_FILTER for every pair before the first order
+    await refresh_symbol_registry(SUPPORTED_PAIRS)
     # Pass broadcast callback - poll every 60 seconds to avoid CoinGecko rate limits
-    asyncio.create_task(market_data_loop(SUPPORTED_PAIRS, broadcast_cb=_binance_broadcast_cb, interval_sec=60))
-    asyncio.create_task(bot_runner_loop())
+    # Kline streams are only needed when candle closes drive the runner's strategy evaluation
+    event_driven = settings.BOT_SCHEDULER == "event"
+    kline_intervals = tuple(sorted({s.INTERVAL for s in STRATEGIES.values()})) if event_driven else ()
+    asyncio.create_task(market_data_loop(
+        SUPPORTED_PAIRS, broadcast_cb=_binance_broadcast_cb, interval_sec=60, kline_intervals=kline_intervals,
+    ))
+    # Bots run in the standalone runner (python -m app.runner), not in API workers
+    asyncio.create_task(risk_cache.run_invalidation_listener())
+    asyncio.create_task(control_flags.run_listener())
+    asyncio.create_task(metrics.loop_lag_monitor())
+    if settings.LEDGER_MODE:
+        asyncio.create_task(ledger.run())
     scheduler.add_job(daily_drawdown_check, "cron", hour=0, minute=0)
     scheduler.add_job(daily_performance_update, "cron", hour=0, minute=5)
     scheduler.add_job(monthly_evaluation, "cron", day="last", hour=23, minute=59)
     scheduler.add_job(check_subscription_expiry, "cron", hour=6, minute=0)
+    scheduler.add_job(refresh_symbol_registry, "interval", minutes=30, args=[SUPPORTED_PAIRS])
     scheduler.start()
     yield
     scheduler.shutdown()
+    if settings.LEDGER_MODE:
+        await ledger.snapshot()
 
 app = FastAPI(title="CryptoExchange API", lifespan=lifespan)
 
@@ -5,3 +5,5 @@ from app.models.bot import Bot, BotSubscription, BotPerformance, BotStatus
 from app.models.notification import Notification
 from app.models.payment import PaymentHistory
 from app.models.withdrawal import Withdrawal, WithdrawalStatus
+from app.models.ledger import LedgerEntry, LedgerSnapshot
+from app.models.position import Position
@@ -0,0 +1,35 @@
+from sqlalchemy import Column, Integer, String, Numeric, DateTime, Enum, ForeignKey
+from sqlalchemy.sql import func
+from app.database import Base
+from app.models.order import OrderSide
+
+class LedgerEntry(Base):
+    """Append-only journal of paper fills (ledger mode).
+
+    ``snapshot_id`` stays NULL until the entry's balance deltas have been
+    folded into the ``wallets`` table by a snapshot.
+    """
+    __tablename__ = "ledger_entries"
+
+    id = Column(Integer, primary_key=True)
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    pair = Column(String(20), nullable=False)
+    side = Column(Enum(OrderSide), nullable=False)
+    price = Column(Numeric(precision=20, scale=8), nullable=False)
+    quantity = Column(Numeric(precision=20, scale=8), nullable=False)
+    base_asset = Column(String(20), nullable=False)
+    quote_asset = Column(String(20), nullable=False)
+    base_delta = Column(Numeric(precision=20, scale=8), nullable=False)
+    quote_delta = Column(Numeric(precision=20, scale=8), nullable=False)
+    snapshot_id = Column(Integer, ForeignKey("ledger_snapshots.id"), nullable=True, index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class LedgerSnapshot(Base):
+    """One periodic fold of journal deltas into wallet balances."""
+    __tablename__ = "ledger_snapshots"
+
+    id = Column(Integer, primary_key=True)
+    last_entry_id = Column(Integer, nullable=False, default=0)
+    entry_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
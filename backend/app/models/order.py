@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Numeric, Boolean, DateTime, Enum, ForeignKey
+from sqlalchemy import Column, Integer, String, Numeric, Boolean, DateTime, Enum, ForeignKey, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
@@ -19,6 +19,9 @@ class OrderStatus(str, enum.Enum):
 
 class Order(Base):
     __tablename__ = "orders"
+    __table_args__ = (
+        UniqueConstraint("user_id", "client_order_id", name="uq_order_user_client_order_id"),
+    )
 
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -31,6 +34,7 @@ class Order(Base):
     status = Column(Enum(OrderStatus), default=OrderStatus.open)
     is_bot_order = Column(Boolean, default=False)
     bot_id = Column(Integer, ForeignKey("bots.id"), nullable=True)
+    client_order_id = Column(String(36), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     user = relationship("User", back_populates="orders")
@@ -0,0 +1,25 @@
+from sqlalchemy import Column, Integer, Float, Boolean, DateTime, Enum, ForeignKey
+from sqlalchemy.sql import func
+from app.database import Base
+from app.models.order import OrderSide
+
+class Position(Base):
+    """Open SL/TP-managed bot position of one subscriber.
+
+    Source of truth for positions; the Redis hash ``pos:{bot_id}`` is the hot
+    copy the runner reads and updates (see ``position_store.py``).
+    """
+    __tablename__ = "positions"
+
+    bot_id = Column(Integer, ForeignKey("bots.id"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    side = Column(Enum(OrderSide), nullable=False)
+    entry_price = Column(Float, nullable=False)
+    stop_loss = Column(Float, nullable=False)
+    take_profit = Column(Float, nullable=True)
+    trailing_stop = Column(Float, nullable=True)
+    trailing_active = Column(Boolean, nullable=False, default=False)
+    trailing_atr_mult = Column(Float, nullable=True)
+    current_atr = Column(Float, nullable=True)
+    opened_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
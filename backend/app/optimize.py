@@ -0,0 +1,73 @@
+"""
+optimize.py - Strategy parameter sweep CLI
+
+    python -m app.optimize --strategy rsi_trend --data data/BTC_USDT-1h.npz
+                           --space '{"rsi_buy": [25, 30, 35], "stop_loss_atr": {"min": 1, "max": 3, "step": 0.5}}'
+                           [--method random --samples 200 --seed 1] [--folds 4]
+                           [--rank-by sharpe] [--workers 8] [--checkpoint sweep.jsonl]
+                           [--top 20] [--output report.json]
+
+Backtests every config of the space (see ``optimizer.py``) over a kline
+history file and prints the ranked report. With --checkpoint, an interrupted
+sweep resumes where it stopped when run again with the same arguments.
+Needs no database or Redis.
+"""
+import argparse
+import json
+import os
+import sys
+from decimal import Decimal
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--strategy", required=True, help="STRATEGIES key, e.g. rsi_trend")
+    parser.add_argument("--data", required=True, help="kline history file (.npz, .csv or .json)")
+    parser.add_argument("--space", required=True, help="config space as JSON: {key: [values] or {min, max, step}}")
+    parser.add_argument("--method", choices=("grid", "random"), default="grid")
+    parser.add_argument("--samples", type=int, default=50, help="configs drawn by --method random")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--folds", type=int, default=0, help="walk-forward folds (0 = one in-sample run)")
+    parser.add_argument("--rank-by", choices=("return", "drawdown", "sharpe"), default="sharpe")
+    parser.add_argument("--allocated", default="1000", help="USDT allocated to the simulated subscription")
+    parser.add_argument("--fee-pct", type=float, default=0.0, help="fee per fill in percent")
+    parser.add_argument("--workers", type=int, help="processes (default one per CPU)")
+    parser.add_argument("--checkpoint", help="JSONL file to record finished configs and resume from")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--output", help="write the report as JSON")
+    args = parser.parse_args(argv)
+
+    # Settings are read at import time; sweeps touch neither DB nor Redis
+    os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite://")
+    os.environ.setdefault("REDIS_URL", "redis://unused")
+    os.environ.setdefault("SECRET_KEY", "optimize")
+
+    from app.services.klines import Klines
+    from app.services.optimizer import Sweep
+
+    try:
+        sweep = Sweep(
+            args.strategy, json.loads(args.space), Klines.load(args.data),
+            method=args.method, samples=args.samples, seed=args.seed, folds=args.folds,
+            allocated=Decimal(args.allocated), fee_pct=args.fee_pct, checkpoint=args.checkpoint,
+        )
+    except ValueError as e:
+        parser.error(str(e))
+    if sweep.results:
+        print(f"resuming: {len(sweep.results)}/{sweep.total} configs already done", file=sys.stderr)
+
+    def progress(done: int, total: int) -> None:
+        print(f"\r{done}/{total} configs", end="", file=sys.stderr, flush=True)
+
+    sweep.run(args.workers or os.cpu_count(), progress)
+    print(file=sys.stderr)
+
+    report = sweep.report(args.rank_by, args.top)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+import json
 from datetime import datetime, date
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -9,8 +10,10 @@ from app.models.bot import Bot, BotStatus, BotSubscription, BotPerformance
 from app.models.payment import PaymentHistory
 from app.models.withdrawal import Withdrawal, WithdrawalStatus
 from app.schemas.bot import CreateBotRequest, UpdateBotRequest
-from app.config import settings, is_live_trading
+from app.config import settings, is_live_trading, SUPPORTED_PAIRS
 from app.core.redis import get_redis
+from app.services.control_flags import KILL_SWITCH_KEY, control_flags
+from app.services.risk_cache import risk_cache
 
 router = APIRouter(prefix="/api/admin", tags=["admin"])
 
@@ -23,6 +26,138 @@ async def system_status(admin: User = Depends(require_admin)):
     }
 
 
+async def _live_runner_metrics() -> dict:
+    """Per-runner metrics snapshots, dropping runners that stopped publishing."""
+    from app.services.bot_runner import METRICS_KEY
+    redis = await get_redis()
+    cutoff = datetime.utcnow().timestamp() - 3 * settings.RUNNER_LEASE_SEC
+    live, stale = {}, []
+    for instance_id, raw in (await redis.hgetall(METRICS_KEY) or {}).items():
+        data = json.loads(raw)
+        if data.get("updated_at", 0) < cutoff:
+            stale.append(instance_id)
+        else:
+            live[instance_id] = data
+    if stale:
+        await redis.hdel(METRICS_KEY, *stale)
+    return live
+
+
+@router.get("/runner-metrics")
+async def runner_metrics(admin: User = Depends(require_admin)):
+    """Latest metrics of each bot runner (cycle duration, stage timings, timeouts)."""
+    return await _live_runner_metrics()
+
+
+@router.get("/runner/slow-bots")
+async def runner_slow_bots(limit: int = 10, admin: User = Depends(require_admin)):
+    """Slowest bots across all runners by p90 run time, with their last stage breakdown."""
+    rows = []
+    for instance_id, data in (await _live_runner_metrics()).items():
+        for row in data.get("slowest", {}).get("bot", []):
+            rows.append({**row, "bot_id": int(row["key"]), "instance": instance_id})
+    rows.sort(key=lambda r: r.get("p90", 0.0), reverse=True)
+    return rows[:max(1, min(limit, 50))]
+
+
+@router.post("/runner/profile")
+async def request_runner_profile(body: dict = {}, admin: User = Depends(require_admin)):
+    """Ask a runner to sample its next cycle. Poll GET /runner/profile/{id} for the result."""
+    import uuid
+    from app.core.profiler import PROFILE_REQUEST_KEY
+    interval = float(body.get("interval", 0.005))
+    if not 0.001 <= interval <= 0.1:
+        raise HTTPException(status_code=400, detail="interval must be between 0.001 and 0.1 seconds")
+    profile_id = uuid.uuid4().hex
+    redis = await get_redis()
+    await redis.set(PROFILE_REQUEST_KEY, json.dumps({"id": profile_id, "interval": interval}), ex=300)
+    return {"id": profile_id}
+
+
+@router.get("/runner/profile/{profile_id}")
+async def get_runner_profile(profile_id: str, format: str = "json", admin: User = Depends(require_admin)):
+    """Captured profile; ``format=folded`` returns the raw folded stacks for flamegraph.pl/speedscope."""
+    from fastapi.responses import PlainTextResponse
+    from app.core.profiler import PROFILE_RESULT_KEY
+    redis = await get_redis()
+    raw = await redis.get(PROFILE_RESULT_KEY.format(id=profile_id))
+    if not raw:
+        raise HTTPException(status_code=404, detail="Profile not captured yet")
+    result = json.loads(raw)
+    if format == "folded":
+        return PlainTextResponse(result["folded"])
+    return result
+
+
+@router.post("/optimizer/jobs")
+async def start_optimizer_job(body: dict, admin: User = Depends(require_admin)):
+    """Queue a parameter sweep for a runner. Poll GET /optimizer/jobs/{id} for progress and results.
+
+    Body: strategy_type, space ({key: [values] or {min, max, step}}), pair, start, end (unix seconds),
+    optional method ("grid" | "random"), samples, seed, folds (walk-forward), rank_by
+    ("return" | "drawdown" | "sharpe"), allocated, fee_pct, resume (an earlier job id).
+    """
+    import time
+    from app.services.optimizer import RANK_KEYS, expand_space, enqueue_job, get_job
+    from app.services.strategies import STRATEGIES
+
+    resume = body.get("resume")
+    if resume:
+        job = await get_job(resume)
+        if not job:
+            raise HTTPException(status_code=404, detail="Optimizer job not found")
+        params = job["params"]
+    else:
+        params = {
+            "strategy_type": body.get("strategy_type"),
+            "space": body.get("space") or {},
+            "pair": body.get("pair", "BTC_USDT"),
+            "start": int(body.get("start") or 0),
+            "end": int(body.get("end") or time.time()),
+            "method": body.get("method", "grid"),
+            "samples": int(body.get("samples", 50)),
+            "seed": int(body.get("seed", 0)),
+            "folds": int(body.get("folds", 0)),
+            "rank_by": body.get("rank_by", "sharpe"),
+            "allocated": float(body.get("allocated", 1000)),
+            "fee_pct": float(body.get("fee_pct", 0.0)),
+        }
+    if params["strategy_type"] not in STRATEGIES:
+        raise HTTPException(status_code=400, detail=f"Unknown strategy type: {params['strategy_type']}")
+    if params["pair"] not in SUPPORTED_PAIRS:
+        raise HTTPException(status_code=400, detail=f"Unsupported pair: {params['pair']}")
+    if not 0 < params["start"] < params["end"]:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    if params["rank_by"] not in RANK_KEYS:
+        raise HTTPException(status_code=400, detail=f"rank_by must be one of {', '.join(RANK_KEYS)}")
+    try:
+        total = len(expand_space(params["space"], params["method"], params["samples"], params["seed"]))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if total > settings.OPTIMIZER_MAX_CONFIGS:
+        raise HTTPException(status_code=400, detail=f"{total} configs exceed the limit of {settings.OPTIMIZER_MAX_CONFIGS}")
+
+    job_id = await enqueue_job(params, job_id=resume)
+    return {"id": job_id, "total": total}
+
+
+@router.get("/optimizer/jobs/{job_id}")
+async def get_optimizer_job(job_id: str, admin: User = Depends(require_admin)):
+    """Status (queued / loading / running / done / failed), progress and, when done, the ranked report."""
+    from app.services.optimizer import get_job
+    job = await get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Optimizer job not found")
+    return job
+
+
+@router.get("/process-metrics")
+async def process_metrics(admin: User = Depends(require_admin)):
+    """Metrics of the API worker serving this request (e.g. event-loop lag)."""
+    from app.core import metrics
+    return metrics.snapshot()
+
+
 @router.post("/toggle-live-trading")
 async def toggle_live_trading(
     body: dict = {},
@@ -34,7 +169,6 @@ async def toggle_live_trading(
     Switching FROM live to simulation requires {"confirm": "SWITCH_TO_SIM"}.
     This is dangerous because simulation trades corrupt real balances.
     """
-    redis = await get_redis()
     current = await is_live_trading()
     new_value = not current
 
@@ -51,7 +185,7 @@ async def toggle_live_trading(
                     f'확인하려면 confirm: "SWITCH_TO_SIM"을 전송하세요.'
                 )
 
-    await redis.set("system:live_trading", "true" if new_value else "false")
+    await control_flags.set_live_trading(new_value)
     return {
         "live_trading": new_value,
         "message": "운영 모드" if new_value else "시뮬레이션 모드",
@@ -364,6 +498,7 @@ async def approve_withdrawal(
         usdt_wallet.balance = float(usdt_wallet.balance) - deduct
 
     await db.commit()
+    await risk_cache.invalidate(w.user_id)
     return {"message": "출금 승인 완료", "tx_hash": tx_hash}
 
 
@@ -397,7 +532,7 @@ async def reset_trading_data(
 ):
     """Reset all trading data for production transition.
 
-    Clears: subscriptions, wallets, orders, trades, withdrawals, payments, Redis positions.
+    Clears: subscriptions, wallets, orders, trades, withdrawals, payments, positions (table + Redis).
     Preserves: users, bots.
     Requires confirmation: {"confirm": "RESET"}
     BLOCKED in live trading mode to protect real user assets.
@@ -422,23 +557,33 @@ async def reset_trading_data(
     await db.execute(PaymentHistory.__table__.delete())
     await db.execute(Wallet.__table__.delete())
 
-    # 2. Reset bot performance
+    # 2. Reset bot performance and positions (table + Redis hashes)
     await db.execute(BotPerformance.__table__.delete())
+    from app.services.position_store import position_store
+    await position_store.clear_all(db)
 
     await db.commit()
+    await risk_cache.invalidate_all()
 
-    # 3. Clear Redis position/cooldown keys
+    # 3. Clear per-bot Redis keys (known key names, no SCAN)
     redis = await get_redis()
-    cursor = 0
-    while True:
-        cursor, keys = await redis.scan(cursor, match="bot:*", count=200)
-        if keys:
-            await redis.delete(*keys)
-        if cursor == 0:
-            break
+    bot_ids = list(await db.scalars(select(Bot.id)))
+    keys = [KILL_SWITCH_KEY.format(bot_id=bot_id) for bot_id in bot_ids] + [
+        f"bot:{bot_id}:{suffix}"
+        for bot_id in bot_ids
+        for suffix in ("last_trade_time", "last_side", "daily_mdd")
+    ]
+    if keys:
+        await redis.delete(*keys)
+    # Kill switches were among the deleted keys
+    await control_flags.invalidate_all()
+    # Cooldown schedule: the hash, then the runners' memory via control:flags
+    from app.services.bot_runner import SCHEDULE_KEY
+    await redis.delete(SCHEDULE_KEY)
+    await control_flags.reset_schedule()
 
     return {
         "message": "모든 거래 데이터가 초기화되었습니다",
         "preserved": ["users", "bots"],
-        "cleared": ["trades", "orders", "subscriptions", "withdrawals", "payments", "wallets", "bot_performance", "redis_positions"],
+        "cleared": ["trades", "orders", "subscriptions", "withdrawals", "payments", "wallets", "bot_performance", "positions", "redis_positions"],
     }
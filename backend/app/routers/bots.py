@@ -12,6 +12,7 @@ from app.models.wallet import Wallet
 from app.models.bot import Bot, BotSubscription, BotStatus, BotPerformance
 from app.models.order import Order, Trade
 from app.services.stats import calc_bot_stats
+from app.services.risk_cache import risk_cache
 
 
 class SubscribeRequest(BaseModel):
@@ -278,6 +279,7 @@ async def subscribe_bot(
         ))
 
     await db.commit()
+    await risk_cache.invalidate(user.id)
     return {"message": "subscribed", "expires_at": expires_at.isoformat()}
 
 
@@ -361,6 +363,7 @@ async def unsubscribe_bot(
     sub.is_active = False
     sub.ended_at = datetime.utcnow()
     await db.commit()
+    await risk_cache.invalidate(user.id)
     return {
         "message": "unsubscribed",
         "allocated_usdt": float(allocated),
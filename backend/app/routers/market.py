@@ -37,4 +37,5 @@ async def get_recent_trades(pair: str):
 
 @router.get("/{pair}/klines")
 async def get_klines(pair: str, interval: str = Query("1m"), limit: int = Query(500)):
-    return await fetch_klines(pair, interval, limit)
+    klines = await fetch_klines(pair, interval, limit)
+    return klines.to_dicts()
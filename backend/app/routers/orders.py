@@ -1,22 +1,70 @@
+from decimal import Decimal
+from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 from app.database import get_db
 from app.core.deps import get_current_user
 from app.models.user import User
-from app.models.order import Order, OrderSide, OrderType, OrderStatus
+from app.models.order import Order, Trade, OrderSide, OrderType, OrderStatus
 from app.schemas.order import PlaceOrderRequest
-from app.services.matching_engine import try_fill_order, try_fill_order_live
-from app.config import is_live_trading
+from app.services.matching_engine import try_fill_order, try_fill_order_live, get_current_price
+from app.services.order_idempotency import (
+    claim_client_order_id, store_order_result, release_client_order_id,
+)
+from app.services.risk_cache import risk_cache
+from app.config import settings, is_live_trading
 
 router = APIRouter(prefix="/api/orders", tags=["orders"])
 
+def _order_response(order: Order, fill_result: dict) -> dict:
+    # A deferred (ledger) order that never reached the DB has no status yet
+    status = OrderStatus(order.status or OrderStatus.open).value
+    response = {"order_id": order.id, "status": status, "fill_result": fill_result}
+    if order.client_order_id:
+        response["client_order_id"] = order.client_order_id
+    return response
+
+
+async def _existing_order_response(db: AsyncSession, user_id: int, client_order_id: str) -> Optional[dict]:
+    """Rebuild the response for an already-stored order (Redis entry lost or expired)."""
+    order = await db.scalar(
+        select(Order).where(Order.user_id == user_id, Order.client_order_id == client_order_id)
+    )
+    if not order:
+        return None
+    trade = await db.scalar(select(Trade).where(Trade.order_id == order.id))
+    fill_price = float(trade.price) if trade else float(order.price or 0)
+    return _order_response(order, {"filled": order.status == OrderStatus.filled, "fill_price": fill_price})
+
+
+def _persisted(order: Order) -> bool:
+    """Whether placing the order committed it: filled, cancelled, or resting on the book.
+    An unfilled market order is never committed."""
+    if order.status in (OrderStatus.filled, OrderStatus.cancelled):
+        return True
+    return order.type == OrderType.limit and order.status == OrderStatus.open
+
+
+async def _duplicate_order_response(db: AsyncSession, user_id: int, client_order_id: Optional[str]) -> dict:
+    """A concurrent request stored this client_order_id first: answer with its order."""
+    await db.rollback()
+    existing = await _existing_order_response(db, user_id, client_order_id) if client_order_id else None
+    if existing is None:
+        raise HTTPException(409, "Duplicate client_order_id")
+    await store_order_result(user_id, client_order_id, existing)
+    return existing
+
+
 @router.post("")
 async def place_order(
     body: PlaceOrderRequest,
     user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
+    # Read once: a rollback below expires the ``user`` row
+    user_id = user.id
     if body.type == "limit" and not body.price:
         raise HTTPException(400, "Price required for limit orders")
 
@@ -25,22 +73,72 @@ async def place_order(
     if live and body.type == "limit":
         raise HTTPException(400, "Limit orders are not supported in live trading mode")
 
-    order = Order(
-        user_id=user.id,
-        pair=body.pair,
-        side=OrderSide(body.side),
-        type=OrderType(body.type),
-        price=body.price,
-        quantity=body.quantity,
-    )
-    db.add(order)
-    await db.flush()
+    client_order_id = body.client_order_id
+    if client_order_id:
+        cached = await claim_client_order_id(user_id, client_order_id)
+        if cached is not None:
+            if cached.get("pending"):
+                raise HTTPException(409, "Order with this client_order_id is still being processed")
+            return cached
+        existing = await _existing_order_response(db, user_id, client_order_id)
+        if existing:
+            await store_order_result(user_id, client_order_id, existing)
+            return existing
+
+    try:
+        # Cheap in-memory rejection before any DB write
+        check_price = body.price if body.type == "limit" else Decimal(str(await get_current_price(body.pair)))
+        reason = await risk_cache.precheck(
+            db, user_id, body.pair, body.side, body.quantity, check_price,
+            opens_order=body.type == "limit",
+        )
+        if reason:
+            raise HTTPException(400, reason)
+
+        order = Order(
+            user_id=user_id,
+            pair=body.pair,
+            side=OrderSide(body.side),
+            type=OrderType(body.type),
+            price=body.price,
+            quantity=body.quantity,
+            client_order_id=client_order_id,
+        )
+        db.add(order)
+        # Ledger mode: a paper market order is inserted with its fill by the ledger's group commit
+        deferred = settings.LEDGER_MODE and not live and order.type == OrderType.market
+        if not deferred:
+            try:
+                await db.flush()
+            except IntegrityError:
+                return await _duplicate_order_response(db, user_id, client_order_id)
+
+        if live:
+            result = await try_fill_order_live(db, order)
+        else:
+            try:
+                result = await try_fill_order(db, order)
+            except IntegrityError:
+                if not deferred:
+                    raise
+                return await _duplicate_order_response(db, user_id, client_order_id)
+            if order.type == OrderType.limit and order.status == OrderStatus.open:
+                # Resting limit order: persist it so it counts against open-order limits
+                await db.commit()
+                await risk_cache.order_opened(user_id, order.quantity * order.price)
+    except Exception:
+        if client_order_id:
+            await release_client_order_id(user_id, client_order_id)
+        raise
 
-    if live:
-        result = await try_fill_order_live(db, order)
-    else:
-        result = await try_fill_order(db, order)
-    return {"order_id": order.id, "status": order.status.value, "fill_result": result}
+    response = _order_response(order, result)
+    if client_order_id:
+        if _persisted(order):
+            await store_order_result(user_id, client_order_id, response)
+        else:
+            # Nothing was stored under this id: a retry must place the order again
+            await release_client_order_id(user_id, client_order_id)
+    return response
 
 @router.delete("/{order_id}")
 async def cancel_order(
@@ -55,6 +153,7 @@ async def cancel_order(
         raise HTTPException(400, "Order cannot be cancelled")
     order.status = OrderStatus.cancelled
     await db.commit()
+    await risk_cache.order_closed(user.id, order.quantity * (order.price or 0))
     return {"message": "cancelled"}
 
 @router.get("/open")
@@ -71,4 +170,5 @@ async def get_order_history(user: User = Depends(get_current_user), db: AsyncSes
         select(Order).where(Order.user_id == user.id).order_by(Order.created_at.desc()).limit(100)
     )
     return [{"id": o.id, "pair": o.pair, "side": o.side, "type": o.type,
-             "price": str(o.price), "quantity": str(o.quantity), "status": o.status} for o in orders]
+             "price": str(o.price), "quantity": str(o.quantity), "status": o.status,
+             "client_order_id": o.client_order_id} for o in orders]
@@ -12,6 +12,7 @@ from app.models.wallet import Wallet
 from app.models.bot import Bot, BotSubscription
 from app.models.withdrawal import Withdrawal, WithdrawalStatus
 from app.models.payment import PaymentHistory
+from app.services.risk_cache import risk_cache
 
 router = APIRouter(prefix="/api/wallet", tags=["wallet"])
 
@@ -70,6 +71,7 @@ async def verify_deposit(
     ))
 
     await db.commit()
+    await risk_cache.credit(user.id, "USDT", Decimal(str(amount)))
     return {
         "message": "입금이 확인되었습니다",
         "amount": amount,
@@ -79,21 +81,30 @@ async def verify_deposit(
 
 @router.get("")
 async def get_wallet(user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    from app.config import settings
+
     wallets = list(await db.scalars(select(Wallet).where(Wallet.user_id == user.id)))
+    balances = {w.asset: (Decimal(str(w.balance or 0)), Decimal(str(w.locked_balance or 0))) for w in wallets}
+    if settings.LEDGER_MODE:
+        # Ledger fills reach the wallet rows only at the next snapshot
+        from app.services.ledger import ledger
+        for asset, delta in ledger.pending_deltas(user.id).items():
+            bal, locked = balances.get(asset, (Decimal("0"), Decimal("0")))
+            balances[asset] = (bal + delta, locked)
     redis = await get_redis()
     result = []
-    for w in wallets:
+    for asset, (bal, locked_bal) in balances.items():
         price_usdt = 1.0
-        if w.asset != "USDT":
-            ticker = await redis.get(f"market:{w.asset}_USDT:ticker")
+        if asset != "USDT":
+            ticker = await redis.get(f"market:{asset}_USDT:ticker")
             if ticker:
                 price_usdt = float(json.loads(ticker)["last_price"])
-        balance = float(w.balance or 0)
-        locked = float(w.locked_balance or 0)
+        balance = float(bal)
+        locked = float(locked_bal)
         result.append({
-            "asset": w.asset,
-            "balance": str(w.balance),
-            "locked": str(w.locked_balance or 0),
+            "asset": asset,
+            "balance": str(bal),
+            "locked": str(locked_bal),
             "price_usdt": price_usdt,
             "value_usdt": (balance + locked) * price_usdt,
         })
@@ -235,4 +246,5 @@ async def deposit(body: dict, user: User = Depends(require_admin), db: AsyncSess
     else:
         db.add(Wallet(user_id=target_user_id, asset=asset, balance=amount))
     await db.commit()
+    await risk_cache.credit(target_user_id, asset, Decimal(str(amount)))
     return {"message": "deposited"}
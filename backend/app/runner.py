@@ -0,0 +1,122 @@
+"""
+runner.py - Standalone bot runner process
+
+    python -m app.runner
+
+Runs bots outside the API workers. Any number of runner instances may be
+started; active bots are split between them by Redis partition leases
+(see ``runner_partition.py``) and rebalanced when a runner joins or leaves.
+BOT_SCHEDULER selects the fixed-cadence loop ("poll") or the market-event
+scheduler ("event"); market data itself is still streamed by the API.
+"""
+import asyncio
+import signal
+
+from app.config import settings, SUPPORTED_PAIRS
+from app.core import metrics, profiler
+from app.core.redis import get_redis
+from app.services.bot_runner import METRICS_KEY, bot_runner_loop, publish_metrics
+from app.services.bot_scheduler import EventScheduler, bot_event_loop
+from app.services import optimizer
+from app.services.control_flags import control_flags
+from app.services.exit_monitor import exit_monitor
+from app.services.indicator_stream import indicator_streams
+from app.services.position_store import position_store
+from app.services.risk_cache import risk_cache
+from app.services.runner_partition import PartitionCoordinator
+from app.services.strategies import STRATEGIES
+from app.services.strategy_pool import shutdown_pool
+from app.services.symbol_registry import refresh_symbol_registry
+
+
+async def _heartbeat_loop(coordinator: PartitionCoordinator) -> None:
+    while True:
+        try:
+            await coordinator.heartbeat()
+        except Exception as e:
+            # Can't prove we still hold our leases: stop running bots until we can
+            print(f"[Runner] heartbeat failed: {e} — pausing owned partitions")
+            coordinator.owned = set()
+        await asyncio.sleep(settings.RUNNER_HEARTBEAT_SEC)
+
+
+async def _metrics_loop(instance_id: str) -> None:
+    # Publishes in both scheduler modes and picks up on-demand profile requests
+    while True:
+        await publish_metrics(instance_id)
+        try:
+            await profiler.poll_request(instance_id)
+        except Exception as e:
+            print(f"[Runner] profile request poll failed: {e}")
+        await asyncio.sleep(settings.RUNNER_HEARTBEAT_SEC)
+
+
+async def _symbol_refresh_loop() -> None:
+    while True:
+        await asyncio.sleep(30 * 60)
+        await refresh_symbol_registry(SUPPORTED_PAIRS)
+
+
+async def run() -> None:
+    if settings.LEDGER_MODE:
+        # The API's ledger holds balances in its own memory; runner fills written
+        # straight to wallets would bypass it and let the API overdraw
+        raise SystemExit("[Runner] LEDGER_MODE is on: bot fills must go through the API's ledger; "
+                         "unset LEDGER_MODE to run bots")
+    await get_redis()
+    await refresh_symbol_registry(SUPPORTED_PAIRS)
+    # Positions come back from the table if Redis lost them
+    await position_store.ensure_hydrated()
+    if settings.INDICATOR_STREAMS:
+        # Indicator state left by the previous run; strategies resume from it
+        intervals = {s.INTERVAL for s in STRATEGIES.values()}
+        try:
+            restored = await indicator_streams.restore(SUPPORTED_PAIRS, intervals)
+            print(f"[Runner] resumed {restored} indicator stream(s)")
+        except Exception as e:
+            print(f"[Runner] indicator stream restore failed: {e}")
+
+    coordinator = PartitionCoordinator()
+    await coordinator.heartbeat()
+    owns = lambda bot: coordinator.owns(bot.id)  # noqa: E731
+    if settings.BOT_SCHEDULER == "event":
+        bots_task = bot_event_loop(EventScheduler(bot_filter=owns))
+    else:
+        bots_task = bot_runner_loop(bot_filter=owns)
+    print(f"[Runner] {coordinator.instance_id[:8]} started ({settings.BOT_SCHEDULER} scheduler, "
+          f"{settings.RUNNER_PARTITIONS} partitions)")
+
+    tasks = [
+        asyncio.create_task(_heartbeat_loop(coordinator)),
+        asyncio.create_task(_metrics_loop(coordinator.instance_id)),
+        asyncio.create_task(_symbol_refresh_loop()),
+        asyncio.create_task(risk_cache.run_invalidation_listener()),
+        asyncio.create_task(control_flags.run_listener()),
+        asyncio.create_task(bots_task),
+        asyncio.create_task(metrics.loop_lag_monitor()),
+        asyncio.create_task(position_store.run()),
+        asyncio.create_task(optimizer.run_worker()),
+    ]
+    if settings.EXIT_MONITOR_ENABLED:
+        tasks.append(asyncio.create_task(exit_monitor.run(bot_filter=owns)))
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await stop.wait()
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    # Hand partitions over immediately instead of waiting for lease expiry
+    await coordinator.leave()
+    await position_store.flush()
+    await indicator_streams.save()
+    redis = await get_redis()
+    await redis.hdel(METRICS_KEY, coordinator.instance_id)
+    shutdown_pool()
+    print("[Runner] stopped")
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from decimal import Decimal
 from typing import Optional
 
@@ -8,3 +8,5 @@ class PlaceOrderRequest(BaseModel):
     type: str
     quantity: Decimal
     price: Optional[Decimal] = None
+    # Caller-chosen idempotency key, forwarded to Binance (scoped by user) as newClientOrderId
+    client_order_id: Optional[str] = Field(default=None, pattern=r"^[.A-Za-z0-9:/_-]{1,36}$")
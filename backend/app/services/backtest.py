@@ -0,0 +1,259 @@
+"""
+backtest.py - Replay historical klines through a STRATEGIES class
+- Bars are replayed in order with the runner's rules: SL/TP/trailing exits
+  first, no new entry while a position is open (except adaptive_grid), the
+  ``BotSchedule`` cooldowns, ``signal_quantity`` sizing capped by the wallet,
+  and ``new_position`` levels when the signal carries ``stop_loss_atr``
+- Each bar calls the strategy's own ``evaluate`` on the trailing
+  ``required_klines()`` window. With ``vectorized=True`` the memoized
+  ``calc_*`` calls are answered by ``SeriesIndicators`` from series computed
+  once over the whole history (``indicator_series``), so a bar costs a few
+  array lookups instead of the indicator math
+- Signals are evaluated on closed bars and fill at that bar's close; exits
+  check the bar's low/high against the stop (first) and take-profit and fill
+  at the level, or at the open when the bar gapped through it. The trailing
+  stop ratchets on the close
+- The report is ``compute_stats`` over the simulated fills, i.e. the same
+  P&L / win rate / MDD / Sharpe ``calc_bot_stats`` shows for a live bot
+"""
+import time
+from collections import Counter
+from contextlib import nullcontext
+from decimal import Decimal
+from typing import Any, Callable, Optional
+
+import numpy as np
+
+from app.services import indicator_series as series
+from app.services.bot_runner import BotSchedule, signal_quantity
+from app.services.indicator_cache import indicator_override
+from app.services.klines import Klines, column_windows, window_of
+from app.services.position_manager import effective_stop, evaluate_exit, new_position
+from app.services.stats import Fill, compute_stats
+from app.services.strategies import STRATEGIES
+
+_QTY_STEP = Decimal("0.00001")
+
+# calc_* name -> (array arguments, minimum window for the series value to apply,
+#                 full-history series builder(arrays, args, window length))
+_SPECS: dict[str, tuple[tuple[str, ...], Callable[[dict], int], Callable[[list, dict, int], Any]]] = {
+    "calc_rsi": (("closes",), lambda a: a["period"] + 1,
+                 lambda c, a, n: series.rsi(c[0], a["period"])),
+    "calc_ma": (("closes",), lambda a: a["period"],
+                lambda c, a, n: series.sma(c[0], a["period"])),
+    "calc_bollinger": (("closes",), lambda a: a["period"],
+                       lambda c, a, n: series.bollinger(c[0], a["period"], a["std_dev"])),
+    "calc_atr": (("highs", "lows", "closes"), lambda a: a["period"] + 1,
+                 lambda c, a, n: series.atr(*c, a["period"])),
+    # Wilder smoothing starts at the window's first bar, so ADX is per window length
+    "calc_adx": (("highs", "lows", "closes"), lambda a: 2 * a["period"] + 1,
+                 lambda c, a, n: series.adx_windowed(*c, a["period"], n)),
+    "calc_donchian": (("highs", "lows"), lambda a: a["period"],
+                      lambda c, a, n: series.donchian(*c, a["period"])),
+    "calc_ma_slope": (("closes",), lambda a: a["ma_period"] + a["lookback"],
+                      lambda c, a, n: series.ma_slope(c[0], a["ma_period"], a["lookback"])),
+    "calc_bandwidth": (("closes",), lambda a: a["period"],
+                       lambda c, a, n: series.bandwidth(c[0], a["period"], a["std_dev"])),
+}
+
+
+class SeriesIndicators:
+    """``indicator_override`` resolver backed by full-history series.
+
+    ``columns`` are the kline columns wrapped by ``column_windows``; the
+    windows a strategy slices from them (``closes[-200:]``, ``highs[:-1]``)
+    carry their position, and the call is answered with the series value at
+    the window's last bar. Anything else (copies, short windows, unknown
+    functions) is computed directly.
+    """
+
+    def __init__(self, klines: Klines):
+        self._columns = [klines.close, klines.high, klines.low, klines.volume]
+        self.columns = column_windows(*self._columns, origin=self)
+        self._series: dict[tuple, Any] = {}
+        self.hits = 0
+        self.fallbacks = 0
+
+    def __len__(self) -> int:
+        return len(self._columns[0])
+
+    def _locate(self, arr) -> Optional[tuple[int, int]]:
+        """(column index, offset) of a window sliced from ``columns``, else None."""
+        return window_of(arr, self)
+
+    def __call__(self, name: str, fn: Callable, args: dict) -> Any:
+        spec = _SPECS.get(name)
+        if spec is not None:
+            arrays, min_len, build = spec
+            located = [self._locate(args[a]) for a in arrays]
+            n = len(args[arrays[0]])
+            if (all(located) and len({off for _, off in located}) == 1
+                    and all(len(args[a]) == n for a in arrays) and n >= min_len(args)):
+                params = tuple(v for k, v in args.items() if k not in arrays)
+                key = (name, tuple(idx for idx, _ in located), params, n if name == "calc_adx" else None)
+                values = self._series.get(key)
+                if values is None:
+                    values = self._series[key] = build([self._columns[idx] for idx, _ in located], args, n)
+                end = located[0][1] + n - 1
+                self.hits += 1
+                if isinstance(values, tuple):
+                    return tuple(float(v[end]) for v in values)
+                return float(values[end])
+        self.fallbacks += 1
+        return fn(**args)
+
+
+def _bar_seconds(klines: Klines) -> int:
+    if len(klines) < 2:
+        return 0
+    return int(np.median(np.diff(klines.time)))
+
+
+def run_backtest(
+    strategy_type: str,
+    config: dict,
+    klines: Klines,
+    allocated: Decimal = Decimal("1000"),
+    fee_pct: float = 0.0,
+    vectorized: bool = True,
+    indicators: Optional[SeriesIndicators] = None,
+    history_offset: int = 0,
+) -> dict:
+    """Replay ``klines`` through one strategy for a single subscription.
+
+    ``fee_pct`` (per side, percent) is applied to every fill price; paper
+    fills have no fee. With ``vectorized=False`` every indicator is computed
+    from its window, as in the live runner (used to check the fast path).
+    ``indicators`` may be built over a longer history ``klines`` is sliced
+    from, so sweeps reuse its series across configs and date ranges;
+    ``history_offset`` is then the row of ``klines[0]`` in that history.
+    """
+    started = time.monotonic()
+    strategy_cls = STRATEGIES.get(strategy_type)
+    if strategy_cls is None:
+        raise ValueError(f"unknown strategy type '{strategy_type}'")
+    strategy = strategy_cls(config)
+    window = strategy.required_klines()
+    is_grid = strategy_type == "adaptive_grid"
+    step = _bar_seconds(klines)
+    fee = Decimal(str(fee_pct)) / Decimal("100")
+
+    t = klines.time.tolist()
+    opens, highs, lows, closes = (col.tolist() for col in (klines.open, klines.high, klines.low, klines.close))
+
+    usdt, base = allocated, Decimal("0")
+    fills: list[Fill] = []
+    exits: Counter = Counter()
+    signals = 0
+    pos: Optional[dict] = None
+    grid_state: Optional[dict] = None
+    last_trade: Optional[int] = None
+    last_side: Optional[str] = None
+
+    def fill(side: str, qty: Decimal, price: float) -> bool:
+        nonlocal usdt, base
+        price = Decimal(str(price))
+        price = price * (1 + fee) if side == "buy" else price * (1 - fee)
+        if side == "buy":
+            if qty * price > usdt:
+                return False
+            usdt -= qty * price
+            base += qty
+        else:
+            if qty > base:
+                return False
+            usdt += qty * price
+            base -= qty
+        fills.append((side, qty, price))
+        return True
+
+    resolver = (indicators or SeriesIndicators(klines)) if vectorized else None
+    if resolver is not None and not 0 <= history_offset <= len(resolver) - len(klines):
+        raise ValueError("klines do not fit the indicators' history at history_offset")
+    columns = resolver.columns if resolver else (klines.close, klines.high, klines.low, klines.volume)
+    offset = history_offset if resolver else 0
+    with indicator_override(resolver) if resolver else nullcontext():
+        for i in range(window - 1, len(t)):
+            now = t[i] + step
+
+            # 1. Exits first: stop (incl. trailing) before take-profit, intrabar
+            if pos is not None:
+                stop, tp = effective_stop(pos), pos["take_profit"]
+                reason, exit_price = None, None
+                if pos["side"] == "buy":
+                    if lows[i] <= stop:
+                        reason, exit_price = "stop_loss", min(stop, opens[i])
+                    elif tp is not None and highs[i] >= tp:
+                        reason, exit_price = "take_profit", max(tp, opens[i])
+                else:
+                    if highs[i] >= stop:
+                        reason, exit_price = "stop_loss", max(stop, opens[i])
+                    elif tp is not None and lows[i] <= tp:
+                        reason, exit_price = "take_profit", min(tp, opens[i])
+                if reason is None:
+                    reason, _ = evaluate_exit(pos, closes[i])
+                    exit_price = closes[i]
+                if reason:
+                    # Like _close_position_order: the whole base balance, opposite side
+                    qty = base.quantize(_QTY_STEP)
+                    if qty > 0:
+                        fill("sell" if pos["side"] == "buy" else "buy", qty, exit_price)
+                    exits[reason] += 1
+                    pos = None
+                    continue
+
+            # 2. Skip if already in position (except adaptive_grid)
+            if pos is not None and not is_grid:
+                continue
+            if now < BotSchedule.due_at(config, last_trade):
+                continue
+
+            # 3. Strategy on the trailing window
+            start = offset + i + 1 - window
+            args = tuple(col[start:offset + i + 1] for col in columns)
+            signal = strategy.evaluate(*args)
+            if is_grid and signal is not None:
+                signal, grid_state = strategy.advance(grid_state, signal)
+            if not signal:
+                continue
+            side = signal["side"]
+            if not BotSchedule.direction_allowed(config, last_trade, last_side, side, now):
+                continue
+            last_trade, last_side = now, side
+            signals += 1
+
+            # 4. Size, cap by the wallet and fill at the close
+            price = Decimal(str(closes[i]))
+            qty = signal_quantity(strategy_type, signal, allocated, price)
+            if side == "buy":
+                qty = min(qty, (usdt / (price * (1 + fee))).quantize(_QTY_STEP) if price > 0 else Decimal("0"))
+            else:
+                qty = min(qty, base.quantize(_QTY_STEP))
+            if qty <= 0 or not fill(side, qty, closes[i]):
+                continue
+            if signal.get("stop_loss_atr"):
+                take_profit_atr = signal.get("take_profit_atr")
+                trailing_atr = signal.get("trailing_atr")
+                pos = new_position(
+                    side,
+                    closes[i],
+                    float(signal.get("atr", 0)),
+                    float(signal["stop_loss_atr"]),
+                    float(take_profit_atr) if take_profit_atr else None,
+                    float(trailing_atr) if trailing_atr else None,
+                )
+
+    last_price = Decimal(str(closes[-1])) if closes else Decimal("0")
+    report = compute_stats(fills, allocated, last_price)
+    report.update({
+        "strategy": strategy_type,
+        "bars": max(len(t) - window + 1, 0),
+        "start": t[0] if t else None,
+        "end": t[-1] if t else None,
+        "signals": signals,
+        "exits": dict(exits),
+        "open_position": pos is not None,
+        "final_equity": float(usdt + base * last_price),
+        "elapsed_sec": round(time.monotonic() - started, 3),
+    })
+    return report
@@ -1,19 +1,26 @@
 import hashlib
 import hmac
-import math
 import time
-from decimal import Decimal, ROUND_DOWN
+from decimal import Decimal
+from typing import Optional
 from urllib.parse import urlencode
 import httpx
 from app.config import settings
+from app.services import symbol_registry
 
 
 def pair_to_binance_symbol(pair: str) -> str:
     return pair.replace("_", "")
 
 
-# Cache exchange info per symbol to avoid repeated API calls
-_symbol_filters_cache: dict[str, dict] = {}
+def exchange_client_order_id(user_id: int, client_order_id: str) -> str:
+    """``newClientOrderId`` for a user's order: every user trades through one
+    Binance account, so the caller's ID is scoped by user id (hashed down to
+    Binance's 36-character limit when the two don't fit)."""
+    prefix = f"{user_id}:"
+    if len(prefix) + len(client_order_id) <= 36:
+        return prefix + client_order_id
+    return prefix + hashlib.sha256(client_order_id.encode()).hexdigest()[:36 - len(prefix)]
 
 
 class BinanceTrader:
@@ -30,9 +37,14 @@ class BinanceTrader:
         ).hexdigest()
 
     async def get_symbol_filters(self, symbol: str) -> dict:
-        """Fetch and cache LOT_SIZE / MIN_NOTIONAL filters for a symbol."""
-        if symbol in _symbol_filters_cache:
-            return _symbol_filters_cache[symbol]
+        """Return LOT_SIZE / MIN_NOTIONAL / PRICE_FILTER filters for a symbol.
+
+        Served from the preloaded symbol registry; only symbols outside
+        SUPPORTED_PAIRS fall back to a per-symbol exchangeInfo request.
+        """
+        filters = await symbol_registry.get_symbol_filters(symbol)
+        if filters is not None:
+            return filters
 
         resp = await self.client.get(
             f"{self.base_url}/api/v3/exchangeInfo",
@@ -46,26 +58,13 @@ class BinanceTrader:
         if not symbols:
             raise Exception(f"Symbol {symbol} not found on Binance")
 
-        filters = {}
-        for f in symbols[0].get("filters", []):
-            if f["filterType"] == "LOT_SIZE":
-                filters["step_size"] = Decimal(f["stepSize"])
-                filters["min_qty"] = Decimal(f["minQty"])
-                filters["max_qty"] = Decimal(f["maxQty"])
-            elif f["filterType"] == "NOTIONAL":
-                filters["min_notional"] = Decimal(f.get("minNotional", "0"))
-            elif f["filterType"] == "MIN_NOTIONAL":
-                filters["min_notional"] = Decimal(f.get("minNotional", "0"))
-
-        _symbol_filters_cache[symbol] = filters
+        filters = symbol_registry.parse_symbol_filters(symbols[0])
+        await symbol_registry.store_symbol_filters(symbol, filters)
         return filters
 
     def round_step_size(self, quantity: Decimal, step_size: Decimal) -> Decimal:
         """Round quantity down to nearest step_size."""
-        if step_size <= 0:
-            return quantity
-        precision = int(round(-math.log10(float(step_size))))
-        return quantity.quantize(Decimal(10) ** -precision, rounding=ROUND_DOWN)
+        return symbol_registry.round_step_size(quantity, step_size)
 
     async def validate_quantity(self, symbol: str, quantity: Decimal, price: Decimal) -> Decimal:
         """Validate and adjust quantity to meet Binance LOT_SIZE and MIN_NOTIONAL."""
@@ -94,7 +93,9 @@ class BinanceTrader:
 
         return adjusted
 
-    async def place_market_order(self, symbol: str, side: str, quantity: Decimal) -> dict:
+    async def place_market_order(
+        self, symbol: str, side: str, quantity: Decimal, client_order_id: Optional[str] = None
+    ) -> dict:
         params = {
             "symbol": symbol,
             "side": side.upper(),
@@ -102,6 +103,10 @@ class BinanceTrader:
             "quantity": str(quantity),
             "timestamp": int(time.time() * 1000),
         }
+        if client_order_id:
+            # Only unique among *open* orders on Binance: a filled MARKET order is not
+            # deduplicated, so retries are stopped by order_idempotency, not here
+            params["newClientOrderId"] = client_order_id
         params["signature"] = self._sign(params)
         resp = await self.client.post(
             f"{self.base_url}/api/v3/order",
@@ -8,6 +8,7 @@ from app.models.bot import Bot, BotSubscription, BotPerformance, BotStatus
 from app.models.order import Order, OrderStatus
 from app.models.notification import Notification
 from app.core.redis import get_redis
+from app.services.control_flags import control_flags
 from app.services.stats import calc_bot_stats
 
 def should_evict_bot(performance, max_drawdown_limit: float) -> bool:
@@ -24,8 +25,7 @@ async def evict_bot(db: AsyncSession, bot_id: int, reason: str = "performance"):
     if not bot or bot.status == BotStatus.evicted:
         return
 
-    redis = await get_redis()
-    await redis.set(f"bot:{bot_id}:kill_switch", "1")
+    await control_flags.kill(bot_id)
 
     open_orders = await db.scalars(
         select(Order).where(Order.bot_id == bot_id, Order.status == OrderStatus.open)
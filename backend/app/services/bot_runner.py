@@ -1,18 +1,26 @@
 import asyncio
+import contextlib
 import json
 import time
+from contextvars import ContextVar
 from datetime import datetime
 from decimal import Decimal
-from typing import Optional
-from sqlalchemy import select
+from typing import Callable, Optional
+from sqlalchemy import select, update
 from app.database import AsyncSessionLocal
 from app.models.bot import Bot, BotSubscription, BotStatus
 from app.models.order import Order, OrderSide, OrderType
 from app.core.redis import get_redis
+from app.core import metrics, profiler
 from app.services.matching_engine import try_fill_order, try_fill_order_live
 from app.config import settings, is_live_trading
-from app.services.strategies import STRATEGIES
-from app.services.position_manager import PositionManager
+from app.services.market_data import fetch_klines
+from app.services.strategies import STRATEGIES, KlineData, data_requirements
+from app.services.position_manager import PositionManager, check_exits
+from app.services.position_store import POS_KEY
+from app.services.control_flags import KILL_SWITCH_KEY, control_flags
+from app.services.exit_monitor import exit_monitor
+from app.services import indicator_cache
 
 
 # ---------------------------------------------------------------------------
@@ -47,30 +55,125 @@ def calc_quantity_from_risk(
     return Decimal("0")
 
 
+def signal_quantity(strategy_type: str, signal: dict, allocated: Decimal, price: Decimal) -> Decimal:
+    """Order size for one subscription before wallet caps (shared with backtests)."""
+    if strategy_type == "adaptive_grid":
+        # Grid: simple percentage of allocation
+        grid_pct = signal.get("risk_pct", 0.4)
+        spend = allocated * Decimal(str(grid_pct)) / Decimal("100")
+        return (spend / price).quantize(Decimal("0.00001")) if price > 0 else Decimal("0")
+    return calc_quantity_from_risk(
+        allocated_usdt=allocated,
+        price=price,
+        risk_pct=signal.get("risk_pct", 1.0),
+        atr=signal.get("atr", 0),
+        stop_loss_atr=signal.get("stop_loss_atr"),
+    )
+
+
+# ---------------------------------------------------------------------------
+# Signal schedule (in-memory cooldown state, persisted to Redis)
+# ---------------------------------------------------------------------------
+
+SCHEDULE_KEY = "runner:next_due"
+
+
+class BotSchedule:
+    """Per-bot last trade time/side and next eligible evaluation time.
+
+    Lives in runner memory so cooling-down bots cost no Redis reads; every
+    change is written to the ``runner:next_due`` hash so a restarted runner
+    resumes the same cooldowns. Legacy ``bot:{id}:last_*`` keys are still
+    written and are read once for bots missing from the hash.
+    """
+
+    def __init__(self):
+        self._state: dict[int, tuple[Optional[int], Optional[str]]] = {}
+        self._loaded = False
+
+    @staticmethod
+    def due_at(config: dict, last_trade: Optional[int]) -> int:
+        """Earliest time a new signal could pass both cooldown checks."""
+        if not last_trade:
+            return 0
+        signal_interval = config.get("signal_interval", 300)
+        cooldown_same = config.get("cooldown_same", signal_interval)
+        cooldown_opposite = config.get("cooldown_opposite", signal_interval // 3 if signal_interval else 0)
+        return last_trade + max(signal_interval, min(cooldown_same, cooldown_opposite))
+
+    @staticmethod
+    def direction_allowed(config: dict, last_trade: Optional[int], last_side: Optional[str],
+                          new_side: str, now: int) -> bool:
+        """Direction-aware cooldown: same side waits cooldown_same, a reversal cooldown_opposite."""
+        if not (last_trade and last_side):
+            return True
+        signal_interval = config.get("signal_interval", 300)
+        cooldown_same = config.get("cooldown_same", signal_interval)
+        cooldown_opposite = config.get("cooldown_opposite", signal_interval // 3 if signal_interval else 0)
+        elapsed = now - int(last_trade)
+        if new_side == last_side:
+            return elapsed >= cooldown_same
+        return elapsed >= cooldown_opposite
+
+    async def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        redis = await get_redis()
+        for bot_id, raw in (await redis.hgetall(SCHEDULE_KEY) or {}).items():
+            data = json.loads(raw)
+            self._state[int(bot_id)] = (data.get("last_trade"), data.get("last_side"))
+        self._loaded = True
+
+    async def get(self, bot_id: int) -> tuple[Optional[int], Optional[str]]:
+        await self._ensure_loaded()
+        state = self._state.get(bot_id)
+        if state is None:
+            redis = await get_redis()
+            last_trade = await redis.get(f"bot:{bot_id}:last_trade_time")
+            last_side = await redis.get(f"bot:{bot_id}:last_side")
+            state = self._state[bot_id] = (int(last_trade) if last_trade else None, last_side)
+        return state
+
+    async def is_due(self, bot: Bot, now: int) -> bool:
+        last_trade, _ = await self.get(bot.id)
+        return now >= self.due_at(bot.strategy_config or {}, last_trade)
+
+    async def record_trade(self, bot: Bot, side: str, now: int) -> None:
+        self._state[bot.id] = (now, side)
+        redis = await get_redis()
+        await redis.hset(SCHEDULE_KEY, str(bot.id), json.dumps({
+            "last_trade": now, "last_side": side,
+            "next_due": self.due_at(bot.strategy_config or {}, now),
+        }))
+        await redis.set(f"bot:{bot.id}:last_trade_time", str(now))
+        await redis.set(f"bot:{bot.id}:last_side", side)
+
+    def clear(self) -> None:
+        self._state.clear()
+        self._loaded = False
+
+
+bot_schedule = BotSchedule()
+
+
 # ---------------------------------------------------------------------------
 # Signal generation (delegates to strategy classes)
 # ---------------------------------------------------------------------------
 
-async def generate_signal(bot: Bot, pair: str) -> Optional[dict]:
+async def generate_signal(bot: Bot, pair: str, data: Optional[KlineData] = None) -> Optional[dict]:
     """Generate a trading signal using the bot's configured strategy class.
 
     Returns a signal dict (with side, risk_pct, atr, etc.) or None.
-    Enforces cooldown via Redis with direction-aware intervals.
+    Enforces direction-aware cooldowns from the in-memory ``bot_schedule``.
+    ``data`` holds the cycle's prefetched klines (see ``prefetch_klines``).
     """
-    redis = await get_redis()
     config = bot.strategy_config or {}
-    signal_interval = config.get("signal_interval", 300)
-
-    # --- Cooldown check ---
-    last_trade_key = f"bot:{bot.id}:last_trade_time"
-    last_side_key = f"bot:{bot.id}:last_side"
-    last_trade = await redis.get(last_trade_key)
     now = int(time.time())
 
-    if last_trade and signal_interval > 0:
-        elapsed = now - int(last_trade)
-        if elapsed < signal_interval:
-            return None
+    # --- Cooldown check (no Redis round trip once the bot is known) ---
+    if not await bot_schedule.is_due(bot, now):
+        return None
+    last_trade, last_side = await bot_schedule.get(bot.id)
 
     # --- Strategy lookup ---
     strategy_type = bot.strategy_type or "rsi_trend"
@@ -82,7 +185,7 @@ async def generate_signal(bot: Bot, pair: str) -> Optional[dict]:
     strategy = strategy_cls(config)
 
     try:
-        signal = await strategy.generate(pair)
+        signal = await strategy.generate(pair, data)
     except Exception as e:
         print(f"Strategy '{strategy_type}' error for bot {bot.id}: {e}")
         return None
@@ -94,218 +197,294 @@ async def generate_signal(bot: Bot, pair: str) -> Optional[dict]:
         return None
 
     # --- Direction-based cooldown ---
-    last_side = await redis.get(last_side_key)
     new_side = signal["side"]
-
-    if last_trade and last_side:
-        cooldown_same = config.get("cooldown_same", signal_interval)
-        cooldown_opposite = config.get("cooldown_opposite", signal_interval // 3 if signal_interval else 0)
-        elapsed = now - int(last_trade)
-
-        if new_side == last_side and elapsed < cooldown_same:
-            return None
-        if new_side != last_side and elapsed < cooldown_opposite:
-            return None
+    if not BotSchedule.direction_allowed(config, last_trade, last_side, new_side, now):
+        return None
 
     # --- Record trade time and side ---
-    await redis.set(last_trade_key, str(now))
-    await redis.set(last_side_key, new_side)
+    with metrics.stage("redis"):
+        await bot_schedule.record_trade(bot, new_side, now)
 
     return signal
 
 
 # ---------------------------------------------------------------------------
-# Bot execution (per-subscription logic)
+# Cycle snapshot (batched loading)
 # ---------------------------------------------------------------------------
 
-async def run_bot(bot: Bot):
-    """Execute one cycle of the bot for all active subscriptions."""
-    config = bot.strategy_config or {}
-    pair = config.get("pair", "BTC_USDT")
+class CycleSnapshot:
+    """Everything a runner cycle reads, loaded in one DB query and one Redis pipeline."""
 
-    async with AsyncSessionLocal() as db:
-        subs = await db.scalars(
-            select(BotSubscription).where(
-                BotSubscription.bot_id == bot.id,
+    def __init__(self):
+        self.subs: dict[int, list[BotSubscription]] = {}
+        self.wallets: dict[tuple[int, str], Decimal] = {}
+        self.positions: dict[tuple[int, int], Optional[str]] = {}
+        self.prices: dict[str, Optional[Decimal]] = {}
+        self.killed: set[int] = set()
+        self.klines: KlineData = {}
+
+    def wallet(self, user_id: int, asset: str) -> Decimal:
+        return self.wallets.get((user_id, asset), Decimal("0"))
+
+    def position_manager(self, bot_id: int, user_id: int) -> PositionManager:
+        return PositionManager(bot_id, user_id, cached=self.positions.get((bot_id, user_id)))
+
+    def apply_fill(self, order: Order, result: dict) -> None:
+        """Keep snapshot balances in step with fills made during the cycle."""
+        if not result.get("filled"):
+            return
+        base, quote = order.pair.split("_")
+        qty = Decimal(str(order.filled_quantity or order.quantity))
+        cost = qty * Decimal(str(result.get("fill_price", 0)))
+        sign = 1 if OrderSide(order.side) == OrderSide.buy else -1
+        self.wallets[(order.user_id, base)] = self.wallet(order.user_id, base) + sign * qty
+        self.wallets[(order.user_id, quote)] = self.wallet(order.user_id, quote) - sign * cost
+
+
+def _bot_pair(bot: Bot) -> str:
+    return (bot.strategy_config or {}).get("pair", "BTC_USDT")
+
+
+async def prefetch_klines(bot_list: list[Bot]) -> KlineData:
+    """Fetch every (pair, interval) series the bots' strategies declare, once.
+
+    Each series is fetched at the deepest lookback any bot on that pair needs;
+    strategies take their own tail of it. Bots still cooling down are skipped.
+    """
+    now = int(time.time())
+    depth: dict[tuple[str, str], int] = {}
+    for bot in bot_list:
+        strategy_cls = STRATEGIES.get(bot.strategy_type or "rsi_trend")
+        if strategy_cls is None or not await bot_schedule.is_due(bot, now):
+            continue
+        pair = _bot_pair(bot)
+        for req in data_requirements(strategy_cls(bot.strategy_config or {})):
+            key = (pair, req.interval)
+            depth[key] = max(depth.get(key, 0), req.lookback)
+    if not depth:
+        return {}
+    with metrics.stage("kline_fetch"):
+        series = await asyncio.gather(*[
+            fetch_klines(pair, interval=interval, limit=limit) for (pair, interval), limit in depth.items()
+        ])
+    metrics.incr("runner.kline_series", len(depth))
+    return dict(zip(depth, series))
+
+
+async def load_cycle_snapshot(db, bot_list: list[Bot]) -> CycleSnapshot:
+    """Load subscriptions + wallets (one joined query) and tickers, positions
+    and any kill switches not already cached (one pipelined MGET + HGETALL per
+    bot) for every bot in the cycle."""
+    from app.models.wallet import Wallet
+
+    snapshot = CycleSnapshot()
+    if not bot_list:
+        return snapshot
+    pairs = {_bot_pair(b) for b in bot_list}
+    assets = {a for p in pairs for a in p.split("_")}
+
+    with metrics.stage("db"):
+        rows = await db.execute(
+            select(BotSubscription, Wallet.asset, Wallet.balance)
+            .outerjoin(Wallet, (Wallet.user_id == BotSubscription.user_id) & Wallet.asset.in_(assets))
+            .where(
+                BotSubscription.bot_id.in_([b.id for b in bot_list]),
                 BotSubscription.is_active == True,
             )
+            .order_by(BotSubscription.id)
         )
-        sub_list = list(subs)
+    seen: set[int] = set()
+    for sub, asset, balance in rows.all():
+        if sub.id not in seen:
+            seen.add(sub.id)
+            snapshot.subs.setdefault(sub.bot_id, []).append(sub)
+        if asset is not None:
+            snapshot.wallets[(sub.user_id, asset)] = Decimal(str(balance or 0))
+
+    kill_ids = control_flags.unknown(b.id for b in bot_list)
+    kill_keys = [KILL_SWITCH_KEY.format(bot_id=bot_id) for bot_id in kill_ids]
+    pair_list = sorted(pairs)
+    ticker_keys = [f"market:{p}:ticker" for p in pair_list]
+    pos_bots = list(snapshot.subs)
+
+    with metrics.stage("redis"):
+        redis = await get_redis()
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.mget(kill_keys + ticker_keys)
+            for bot_id in pos_bots:
+                pipe.hgetall(POS_KEY.format(bot_id=bot_id))
+            values, *pos_hashes = await pipe.execute()
+    kills = values[:len(kill_keys)]
+    tickers = values[len(kill_keys):]
+
+    control_flags.remember_kills(kill_ids, kills)
+    snapshot.killed = {bot_id for bot_id, flag in zip(kill_ids, kills) if flag}
+    snapshot.killed |= {b.id for b in bot_list if control_flags.is_killed(b.id)}
+    for pair, raw in zip(pair_list, tickers):
+        snapshot.prices[pair] = Decimal(json.loads(raw)["last_price"]) if raw else None
+    for bot_id, hash_ in zip(pos_bots, pos_hashes):
+        for sub in snapshot.subs[bot_id]:
+            snapshot.positions[(bot_id, sub.user_id)] = hash_.get(str(sub.user_id))
+    return snapshot
 
-        if not sub_list and _loop_count % 30 == 1:
-            print(f"[Bot {bot.id}] No active subscriptions, skipping")
 
-        for sub in sub_list:
-            # 1. Check expiry -> deactivate if expired (close positions first)
-            if sub.expires_at and sub.expires_at.replace(tzinfo=None) < datetime.utcnow():
-                # Close any open Binance position before deactivating
-                pm = PositionManager(bot.id, sub.user_id)
-                if await pm.has_position():
-                    pos = await pm.get_position()
-                    if pos:
-                        redis = await get_redis()
-                        ticker = await redis.get(f"market:{pair}:ticker")
-                        if ticker:
-                            from app.models.wallet import Wallet
-                            from sqlalchemy import select as sel
-                            base, quote = pair.split("_")
-                            base_wallet = await db.scalar(
-                                sel(Wallet).where(Wallet.user_id == sub.user_id, Wallet.asset == base)
-                            )
-                            if base_wallet and base_wallet.balance > 0:
-                                exit_qty = base_wallet.balance.quantize(Decimal("0.00001"))
-                                if exit_qty > 0:
-                                    exit_side = "sell" if pos["side"] == "buy" else "buy"
-                                    order = Order(
-                                        user_id=sub.user_id, pair=pair,
-                                        side=OrderSide(exit_side), type=OrderType.market,
-                                        quantity=exit_qty, is_bot_order=True, bot_id=bot.id,
-                                    )
-                                    db.add(order)
-                                    await db.flush()
-                                    if await is_live_trading():
-                                        await try_fill_order_live(db, order)
-                                    else:
-                                        await try_fill_order(db, order)
-                                    print(f"Bot {bot.id} user {sub.user_id}: expiry close {exit_side} {exit_qty}")
-                    await pm.close_position()
-                sub.is_active = False
-                await db.commit()
-                continue
-
-            # 2. Get current price from Redis
-            redis = await get_redis()
-            ticker = await redis.get(f"market:{pair}:ticker")
-            if not ticker:
-                continue
-            price = Decimal(json.loads(ticker)["last_price"])
-            price_float = float(price)
-
-            # 3. Create PositionManager
-            pm = PositionManager(bot.id, sub.user_id)
-
-            # 4. Check exit first: SL/TP/trailing
-            exit_reason = await pm.check_exit(price_float)
-            if exit_reason:
-                # Close position via sell order
-                pos = await pm.get_position()
-                if pos:
-                    from app.models.wallet import Wallet
-                    from sqlalchemy import select as sel
-
-                    base, quote = pair.split("_")
-                    base_wallet = await db.scalar(
-                        sel(Wallet).where(Wallet.user_id == sub.user_id, Wallet.asset == base)
-                    )
-                    if base_wallet and base_wallet.balance > 0:
-                        exit_qty = base_wallet.balance.quantize(Decimal("0.00001"))
-                        if exit_qty > 0:
-                            exit_side = "sell" if pos["side"] == "buy" else "buy"
-                            order = Order(
-                                user_id=sub.user_id,
-                                pair=pair,
-                                side=OrderSide(exit_side),
-                                type=OrderType.market,
-                                quantity=exit_qty,
-                                is_bot_order=True,
-                                bot_id=bot.id,
-                            )
-                            db.add(order)
-                            await db.flush()
-                            if await is_live_trading():
-                                await try_fill_order_live(db, order)
-                            else:
-                                await try_fill_order(db, order)
-                            print(f"Bot {bot.id} user {sub.user_id}: exit ({exit_reason}) {exit_side} {exit_qty} @ {price}")
-
-                await pm.close_position()
-                continue
-
-            # 5. Skip if already in position (except adaptive_grid)
-            strategy_type = bot.strategy_type or "rsi_trend"
-            has_pos = await pm.has_position()
-            if has_pos and strategy_type != "adaptive_grid":
-                continue
-
-            # 6. Generate signal
-            signal = await generate_signal(bot, pair)
-            if not signal:
-                continue
-
-            side = signal["side"]
-            risk_pct = signal.get("risk_pct", 1.0)
-            atr = signal.get("atr", 0)
-            stop_loss_atr = signal.get("stop_loss_atr")
-            take_profit_atr = signal.get("take_profit_atr")
-            trailing_atr = signal.get("trailing_atr")
-
-            from app.models.wallet import Wallet
-            from sqlalchemy import select as sel
-
-            base, quote = pair.split("_")
-            allocated = Decimal(str(sub.allocated_usdt or 100))
-
-            # 7. Calculate quantity using ATR-based sizing
-            if strategy_type == "adaptive_grid":
-                # Grid: simple percentage of allocation
-                grid_pct = signal.get("risk_pct", 0.4)
-                spend = allocated * Decimal(str(grid_pct)) / Decimal("100")
-                quantity = (spend / price).quantize(Decimal("0.00001")) if price > 0 else Decimal("0")
-            else:
-                quantity = calc_quantity_from_risk(
-                    allocated_usdt=allocated,
-                    price=price,
-                    risk_pct=risk_pct,
-                    atr=atr,
-                    stop_loss_atr=stop_loss_atr,
-                )
+# ---------------------------------------------------------------------------
+# Bot execution (per-subscription logic)
+# ---------------------------------------------------------------------------
 
-            if quantity <= 0:
-                continue
+class _Deadline:
+    """BOT_RUN_TIMEOUT_SEC state of one ``run_bot`` call.
 
-            # 8. Cap quantity by wallet balance
-            if side == "buy":
-                wallet = await db.scalar(
-                    sel(Wallet).where(Wallet.user_id == sub.user_id, Wallet.asset == quote)
-                )
-                if not wallet or wallet.balance <= 0:
-                    continue
-                max_spend = wallet.balance
-                max_qty = (max_spend / price).quantize(Decimal("0.00001")) if price > 0 else Decimal("0")
-                quantity = min(quantity, max_qty)
-            else:
-                wallet = await db.scalar(
-                    sel(Wallet).where(Wallet.user_id == sub.user_id, Wallet.asset == base)
-                )
-                if not wallet or wallet.balance <= 0:
-                    continue
-                quantity = min(quantity, wallet.balance.quantize(Decimal("0.00001")))
-
-            if quantity <= 0:
-                continue
-
-            # 9. Create and fill order
-            order = Order(
-                user_id=sub.user_id,
-                pair=pair,
-                side=OrderSide(side),
-                type=OrderType.market,
-                quantity=quantity,
-                is_bot_order=True,
-                bot_id=bot.id,
-            )
-            db.add(order)
+    Past the deadline the run is cancelled only outside an order section; a
+    section already under way (exchange order, DB rows, position) is finished
+    and the run stops right after it.
+    """
+    __slots__ = ("expired", "orders_in_flight")
+
+    def __init__(self):
+        self.expired = False
+        self.orders_in_flight = 0
+
+
+_deadline: ContextVar[Optional[_Deadline]] = ContextVar("bot_run_deadline", default=None)
+
+# The runner's ``bot_filter`` (partition ownership), re-checked before each bot run and order
+_bot_fence: ContextVar[Optional[Callable[[Bot], bool]]] = ContextVar("bot_fence", default=None)
+
+
+class BotNotOwned(RuntimeError):
+    """This runner no longer holds the bot's partition lease."""
+
+
+def fence_bots(bot_filter: Optional[Callable[[Bot], bool]]) -> None:
+    """Require ``bot_filter(bot)`` before each bot run and order from the current task
+    (and the tasks it starts); a stalled runner whose lease lapsed stops placing orders."""
+    _bot_fence.set(bot_filter)
+
+
+def _owned(bot: Bot) -> bool:
+    fence = _bot_fence.get()
+    return fence is None or fence(bot)
+
+
+@contextlib.contextmanager
+def _order_section(bot: Bot):
+    """Mark code that places an order and persists its outcome as not cancellable by the deadline.
+
+    Raises ``BotNotOwned`` on entry if the runner lost the bot's partition.
+    """
+    if not _owned(bot):
+        raise BotNotOwned(f"partition lease for bot {bot.id} lapsed")
+    deadline = _deadline.get()
+    if deadline is None:
+        yield
+        return
+    if deadline.expired:
+        raise asyncio.TimeoutError
+    deadline.orders_in_flight += 1
+    try:
+        yield
+    finally:
+        deadline.orders_in_flight -= 1
+    if deadline.expired:
+        raise asyncio.TimeoutError
+
+
+async def _fill(db, order: Order, snapshot: CycleSnapshot) -> dict:
+    with metrics.stage("order_fill"):
+        if await is_live_trading():
+            result = await try_fill_order_live(db, order)
+        else:
+            result = await try_fill_order(db, order)
+    snapshot.apply_fill(order, result)
+    return result
+
+
+async def _close_position_order(db, bot: Bot, sub: BotSubscription, pair: str, pos: dict,
+                                snapshot: CycleSnapshot) -> Optional[tuple[str, Decimal]]:
+    """Market-close the base balance held for a position. Returns (side, qty) if an order was sent."""
+    base, quote = pair.split("_")
+    base_balance = snapshot.wallet(sub.user_id, base)
+    if base_balance <= 0:
+        return None
+    exit_qty = base_balance.quantize(Decimal("0.00001"))
+    if exit_qty <= 0:
+        return None
+    exit_side = "sell" if pos["side"] == "buy" else "buy"
+    order = Order(
+        user_id=sub.user_id,
+        pair=pair,
+        side=OrderSide(exit_side),
+        type=OrderType.market,
+        quantity=exit_qty,
+        is_bot_order=True,
+        bot_id=bot.id,
+    )
+    db.add(order)
+    with metrics.stage("db"):
+        await db.flush()
+    await _fill(db, order, snapshot)
+    return exit_side, exit_qty
+
+
+async def _execute_signal(db, bot: Bot, sub: BotSubscription, pm: PositionManager,
+                          pair: str, price: Decimal, signal: dict, snapshot: CycleSnapshot):
+    """Size, place and track one subscription's order for a bot-level signal."""
+    strategy_type = bot.strategy_type or "rsi_trend"
+    side = signal["side"]
+    atr = signal.get("atr", 0)
+    stop_loss_atr = signal.get("stop_loss_atr")
+    take_profit_atr = signal.get("take_profit_atr")
+    trailing_atr = signal.get("trailing_atr")
+
+    base, quote = pair.split("_")
+    allocated = Decimal(str(sub.allocated_usdt or 100))
+
+    # Calculate quantity using ATR-based sizing (grid: percentage of allocation)
+    quantity = signal_quantity(strategy_type, signal, allocated, price)
+
+    if quantity <= 0:
+        return
+
+    # Cap quantity by the snapshot's wallet balance (no per-user load on the hot path;
+    # the fill still checks the locked wallet row)
+    if side == "buy":
+        max_spend = snapshot.wallet(sub.user_id, quote)
+        if max_spend <= 0:
+            return
+        max_qty = (max_spend / price).quantize(Decimal("0.00001")) if price > 0 else Decimal("0")
+        quantity = min(quantity, max_qty)
+    else:
+        balance = snapshot.wallet(sub.user_id, base)
+        if balance <= 0:
+            return
+        quantity = min(quantity, balance.quantize(Decimal("0.00001")))
+
+    if quantity <= 0 or control_flags.is_killed(bot.id):
+        return
+
+    # Create and fill order; the deadline can't cut it off between the exchange and the DB
+    with _order_section(bot):
+        order = Order(
+            user_id=sub.user_id,
+            pair=pair,
+            side=OrderSide(side),
+            type=OrderType.market,
+            quantity=quantity,
+            is_bot_order=True,
+            bot_id=bot.id,
+        )
+        db.add(order)
+        with metrics.stage("db"):
             await db.flush()
 
-            if await is_live_trading():
-                result = await try_fill_order_live(db, order)
-            else:
-                result = await try_fill_order(db, order)
+        result = await _fill(db, order, snapshot)
 
-            # 10. Open position tracking (for strategies with SL/TP)
-            if result.get("filled") and stop_loss_atr:
-                fill_price = float(result.get("fill_price", price_float))
-                await pm.open_position(
+        # Open position tracking (for strategies with SL/TP)
+        if result.get("filled") and stop_loss_atr:
+            fill_price = float(result.get("fill_price", price))
+            with metrics.stage("redis"):
+                pos = await pm.open_position(
                     side=side,
                     entry_price=fill_price,
                     atr=float(atr),
@@ -313,6 +492,112 @@ async def run_bot(bot: Bot):
                     take_profit_atr=float(take_profit_atr) if take_profit_atr else None,
                     trailing_atr=float(trailing_atr) if trailing_atr else None,
                 )
+            if exit_monitor.running:
+                exit_monitor.track(bot.id, sub.user_id, pair, pos)
+
+
+async def run_bot(bot: Bot, evaluate_signal: bool = True, snapshot: Optional[CycleSnapshot] = None):
+    """Execute one cycle of the bot for all active subscriptions.
+
+    The strategy is evaluated at most once per cycle (lazily, when the first
+    subscription is ready for an entry) and the signal is fanned out to every
+    eligible subscription, so strategy work scales with bots, not subscribers.
+    With ``evaluate_signal=False`` only expiry and SL/TP exits are processed
+    (used for price-tick events). Reads come from ``snapshot`` (loaded for
+    this bot alone when not given); only writes hit the DB/Redis.
+    """
+    pair = _bot_pair(bot)
+    strategy_type = bot.strategy_type or "rsi_trend"
+
+    async with AsyncSessionLocal() as db:
+        if snapshot is None:
+            snapshot = await load_cycle_snapshot(db, [bot])
+        sub_list = snapshot.subs.get(bot.id, [])
+
+        if not sub_list:
+            if _loop_count % 30 == 1:
+                print(f"[Bot {bot.id}] No active subscriptions, skipping")
+            return
+
+        price = snapshot.prices.get(pair)
+
+        signal_evaluated = False
+        signal: Optional[dict] = None
+
+        # SL/TP/trailing for every subscription in one Lua call (the exit monitor does it per tick instead)
+        pms = {sub.user_id: snapshot.position_manager(bot.id, sub.user_id) for sub in sub_list}
+        exit_reasons: dict[int, Optional[str]] = {}
+        if price is not None and not exit_monitor.running:
+            with metrics.stage("redis"):
+                exit_reasons = dict(zip(pms, await check_exits(list(pms.values()), float(price))))
+
+        for sub in sub_list:
+            # A kill pushed mid-cycle stops the bot before its next subscription
+            if control_flags.is_killed(bot.id):
+                print(f"[Bot {bot.id}] kill switch set, stopping mid-cycle")
+                return
+            # Per-subscription time (inclusive of the stages below)
+            with metrics.stage("subscription"):
+                pm = pms[sub.user_id]
+
+                # 1. Check expiry -> deactivate if expired (close positions first)
+                if sub.expires_at and sub.expires_at.replace(tzinfo=None) < datetime.utcnow():
+                    # Close any open Binance position before deactivating
+                    if await pm.has_position():
+                        pos = await pm.get_position()
+                        with _order_section(bot):
+                            if pos and price is not None:
+                                closed = await _close_position_order(db, bot, sub, pair, pos, snapshot)
+                                if closed:
+                                    print(f"Bot {bot.id} user {sub.user_id}: expiry close {closed[0]} {closed[1]}")
+                            with metrics.stage("redis"):
+                                await pm.close_position()
+                        if exit_monitor.running:
+                            exit_monitor.untrack(bot.id, sub.user_id)
+                    # Snapshot rows are detached from this session: update by id
+                    with metrics.stage("db"):
+                        await db.execute(
+                            update(BotSubscription).where(BotSubscription.id == sub.id).values(is_active=False)
+                        )
+                        await db.commit()
+                    sub.is_active = False
+                    continue
+
+                # 2. No price yet -> nothing to do
+                if price is None:
+                    continue
+
+                # 3. Exit first: SL/TP/trailing
+                exit_reason = exit_reasons.get(sub.user_id)
+                if exit_reason:
+                    pos = await pm.get_position()
+                    with _order_section(bot):
+                        if pos:
+                            closed = await _close_position_order(db, bot, sub, pair, pos, snapshot)
+                            if closed:
+                                print(f"Bot {bot.id} user {sub.user_id}: exit ({exit_reason}) {closed[0]} {closed[1]} @ {price}")
+                        with metrics.stage("redis"):
+                            await pm.close_position()
+                    if exit_monitor.running:
+                        exit_monitor.untrack(bot.id, sub.user_id)
+                    continue
+
+                if not evaluate_signal:
+                    continue
+
+                # 4. Skip if already in position (except adaptive_grid)
+                if strategy_type != "adaptive_grid" and await pm.has_position():
+                    continue
+
+                # 5. Generate the bot's signal once, then reuse it for every subscription
+                if not signal_evaluated:
+                    signal = await generate_signal(bot, pair, snapshot.klines)
+                    signal_evaluated = True
+                if not signal:
+                    continue
+
+                # 6. Per-subscription execution
+                await _execute_signal(db, bot, sub, pm, pair, price, signal, snapshot)
 
 
 # ---------------------------------------------------------------------------
@@ -320,30 +605,127 @@ async def run_bot(bot: Bot):
 # ---------------------------------------------------------------------------
 
 _loop_count = 0
+# Hash of instance id -> that runner's metrics snapshot (see ``publish_metrics``)
+METRICS_KEY = "runner:metrics:instances"
 
-async def bot_runner_loop():
-    """Run all active bots every 10 seconds."""
-    global _loop_count
-    print("[BotRunner] Starting bot runner loop")
-    while True:
-        _loop_count += 1
-        async with AsyncSessionLocal() as db:
-            bots = await db.scalars(select(Bot).where(Bot.status == BotStatus.active))
-            bot_list = list(bots)
 
-        # Log summary every 30 cycles (~5 minutes)
-        if _loop_count % 30 == 1:
-            active_ids = [b.id for b in bot_list]
-            print(f"[BotRunner] cycle={_loop_count}, active_bots={active_ids}")
-
-        kill_redis = await get_redis()
-        for bot in bot_list:
-            kill_flag = await kill_redis.get(f"bot:{bot.id}:kill_switch")
-            if kill_flag:
-                continue
+async def _run_with_deadline(coro, timeout: float) -> None:
+    """Like ``asyncio.wait_for``, but never cancels inside an ``_order_section``.
+
+    Raises ``asyncio.TimeoutError`` once the deadline has passed, after any
+    order section in flight has finished.
+    """
+    deadline = _Deadline()
+    token = _deadline.set(deadline)
+    try:
+        task = asyncio.create_task(coro)
+    finally:
+        _deadline.reset(token)
+    try:
+        done, _ = await asyncio.wait({task}, timeout=timeout)
+        if done:
+            return task.result()
+        deadline.expired = True
+        if not deadline.orders_in_flight:
+            task.cancel()
+        # Otherwise the section completes and raises TimeoutError on its way out
+        await asyncio.wait({task})
+        if not task.cancelled():
+            task.result()
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
+    raise asyncio.TimeoutError
+
+
+async def _run_bot_guarded(bot: Bot, sem: asyncio.Semaphore, evaluate_signal: bool = True,
+                           snapshot: Optional[CycleSnapshot] = None) -> None:
+    """Run one bot under the concurrency limit and its deadline."""
+    async with sem:
+        start = time.monotonic()
+        with metrics.trace() as stages:
             try:
-                await run_bot(bot)
+                await _run_with_deadline(run_bot(bot, evaluate_signal, snapshot), settings.BOT_RUN_TIMEOUT_SEC)
+            except asyncio.TimeoutError:
+                metrics.incr("runner.bot_timeouts")
+                print(f"Bot runner timeout for bot {bot.id} after {settings.BOT_RUN_TIMEOUT_SEC}s")
             except Exception as e:
+                metrics.incr("runner.bot_errors")
                 print(f"Bot runner error for bot {bot.id}: {e}")
+            finally:
+                elapsed = time.monotonic() - start
+                metrics.observe("runner.bot_run_sec", elapsed)
+                metrics.timings("bot").record(bot.id, elapsed, stages)
+
+
+async def run_cycle(bot_list: list[Bot], evaluate_signal: bool = True) -> None:
+    """Run every non-killed bot concurrently (bounded by BOT_RUNNER_CONCURRENCY).
+
+    All reads for the cycle come from one batched snapshot, including the
+    klines every due strategy needs (one fetch per pair and interval). A
+    pending on-demand profile request samples this cycle (see ``app.core.profiler``).
+    """
+    async with profiler.capture("signal cycle" if evaluate_signal else "exit cycle"):
+        start = time.monotonic()
+        async with AsyncSessionLocal() as db:
+            snapshot = await load_cycle_snapshot(db, bot_list)
+        runnable = [b for b in bot_list if b.id not in snapshot.killed and _owned(b)]
+        if evaluate_signal:
+            snapshot.klines = await prefetch_klines([b for b in runnable if snapshot.subs.get(b.id)])
+        metrics.observe("runner.snapshot_load_sec", time.monotonic() - start)
+        sem = asyncio.Semaphore(max(1, settings.BOT_RUNNER_CONCURRENCY))
+        await asyncio.gather(*[_run_bot_guarded(b, sem, evaluate_signal, snapshot) for b in runnable])
+
+
+async def publish_metrics(instance_id: str) -> None:
+    """Store this runner's metrics under its instance id in ``METRICS_KEY``."""
+    try:
+        redis = await get_redis()
+        payload = {"updated_at": int(time.time()), **metrics.snapshot(), "indicator_cache": indicator_cache.stats()}
+        await redis.hset(METRICS_KEY, instance_id, json.dumps(payload))
+    except Exception as e:
+        print(f"[BotRunner] metrics publish failed: {e}")
+
+
+async def bot_runner_loop(bot_filter: Optional[Callable[[Bot], bool]] = None):
+    """Run all active bots on a fixed BOT_CYCLE_SEC cadence.
 
-        await asyncio.sleep(10)
+    ``bot_filter`` restricts the cycle to the bots this runner owns.
+    """
+    global _loop_count
+    fence_bots(bot_filter)
+    cadence = settings.BOT_CYCLE_SEC
+    print(f"[BotRunner] Starting bot runner loop (every {cadence}s, concurrency={settings.BOT_RUNNER_CONCURRENCY})")
+    next_start = time.monotonic()
+    while True:
+        _loop_count += 1
+        cycle_start = time.monotonic()
+        metrics.observe("runner.start_lag_sec", cycle_start - next_start)
+        try:
+            async with AsyncSessionLocal() as db:
+                bots = await db.scalars(select(Bot).where(Bot.status == BotStatus.active))
+                bot_list = list(bots)
+            if bot_filter is not None:
+                bot_list = [b for b in bot_list if bot_filter(b)]
+
+            # Log summary every 30 cycles (~5 minutes)
+            if _loop_count % 30 == 1:
+                active_ids = [b.id for b in bot_list]
+                print(f"[BotRunner] cycle={_loop_count}, active_bots={active_ids}")
+
+            await run_cycle(bot_list)
+        except Exception as e:
+            print(f"[BotRunner] cycle error: {e}")
+
+        duration = time.monotonic() - cycle_start
+        metrics.observe("runner.cycle_sec", duration)
+        next_start += cadence
+        now = time.monotonic()
+        if now > next_start:
+            # Overran the cadence: skip the missed slots instead of bunching cycles up
+            missed = int((now - next_start) // cadence) + 1
+            metrics.incr("runner.cycle_overruns")
+            metrics.incr("runner.cycles_skipped", missed)
+            next_start += missed * cadence
+            print(f"[BotRunner] cycle={_loop_count} took {duration:.1f}s (> {cadence}s), skipped {missed} slot(s)")
+        await asyncio.sleep(max(0.0, next_start - time.monotonic()))
@@ -0,0 +1,135 @@
+"""
+bot_scheduler.py - Event-driven bot scheduling (BOT_SCHEDULER="event")
+- Strategy evaluation runs when a candle of the strategy's interval closes
+  (``kline_close`` events from the market stream), after the runner's own
+  kline cache and 1m book for the pair are expired
+- SL/TP/trailing exits run on price ticks for the bot's pair, coalesced so at
+  most one exit pass per pair is in flight and none closer than
+  EXIT_CHECK_MIN_INTERVAL_SEC apart
+Jobs for the same pair are serialized so a tick exit pass never overlaps a
+signal pass on the same positions.
+"""
+import asyncio
+import json
+import time
+from typing import Callable, Optional
+
+from sqlalchemy import select
+
+from app.config import settings
+from app.core import metrics
+from app.core.redis import get_redis
+from app.database import AsyncSessionLocal
+from app.models.bot import Bot, BotStatus
+from app.services.bot_runner import fence_bots, run_cycle
+from app.services.exit_monitor import exit_monitor
+from app.services.market_data import invalidate_klines
+from app.services.strategies import strategy_interval
+
+_BOT_LIST_TTL = 30  # seconds
+
+
+class EventScheduler:
+    def __init__(self, bot_filter: Optional[Callable[[Bot], bool]] = None):
+        # Restricts scheduling to the bots this runner owns
+        self._bot_filter = bot_filter
+        self._bots: list[Bot] = []
+        self._bots_loaded_at = 0.0
+        self._pair_locks: dict[str, asyncio.Lock] = {}
+        self._last_exit_check: dict[str, float] = {}
+        self._tasks: set[asyncio.Task] = set()
+        # Every API worker streams the market, so each candle close may arrive more than once
+        self._last_close: dict[tuple[str, str], int] = {}
+
+    async def active_bots(self) -> list[Bot]:
+        if time.monotonic() - self._bots_loaded_at > _BOT_LIST_TTL:
+            async with AsyncSessionLocal() as db:
+                self._bots = list(await db.scalars(select(Bot).where(Bot.status == BotStatus.active)))
+            self._bots_loaded_at = time.monotonic()
+        if self._bot_filter is not None:
+            return [b for b in self._bots if self._bot_filter(b)]
+        return self._bots
+
+    @staticmethod
+    def _pair(bot: Bot) -> str:
+        return (bot.strategy_config or {}).get("pair", "BTC_USDT")
+
+    def _lock(self, pair: str) -> asyncio.Lock:
+        lock = self._pair_locks.get(pair)
+        if lock is None:
+            lock = self._pair_locks[pair] = asyncio.Lock()
+        return lock
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def dispatch(self, event: dict) -> None:
+        pair = event.get("pair")
+        if not pair:
+            return
+        if event.get("type") == "kline_close":
+            close_key = (pair, event.get("interval"))
+            close_time = int(event.get("close_time") or 0)
+            if close_time and self._last_close.get(close_key, 0) >= close_time:
+                metrics.incr("scheduler.duplicate_kline_events")
+                return
+            self._last_close[close_key] = close_time
+            # The API's stream expires its own kline cache; this process's must
+            # not serve the candle that just closed as still forming
+            invalidate_klines(pair, event.get("interval"))
+            # The in-memory bot list (refreshed every _BOT_LIST_TTL): a kline close
+            # reaches every pair at once, so no DB query per event. Evicted bots
+            # are killed and lose their subscriptions, so a stale entry runs nothing
+            bots = [
+                b for b in await self.active_bots()
+                if self._pair(b) == pair and strategy_interval(b.strategy_type) == event.get("interval")
+            ]
+            if bots:
+                metrics.incr("scheduler.kline_events")
+                self._spawn(self._run(pair, bots, evaluate_signal=True))
+        elif event.get("type") == "tick":
+            if exit_monitor.running:
+                # Exits are handled per trade by the exit monitor
+                return
+            lock = self._lock(pair)
+            now = time.monotonic()
+            if lock.locked() or now - self._last_exit_check.get(pair, 0.0) < settings.EXIT_CHECK_MIN_INTERVAL_SEC:
+                metrics.incr("scheduler.ticks_coalesced")
+                return
+            bots = [b for b in await self.active_bots() if self._pair(b) == pair]
+            if bots:
+                self._last_exit_check[pair] = now
+                self._spawn(self._run(pair, bots, evaluate_signal=False))
+
+    async def _run(self, pair: str, bots: list[Bot], evaluate_signal: bool) -> None:
+        start = time.monotonic()
+        fence_bots(self._bot_filter)
+        async with self._lock(pair):
+            try:
+                await run_cycle(bots, evaluate_signal=evaluate_signal)
+            except Exception as e:
+                print(f"[BotScheduler] {pair} {'signal' if evaluate_signal else 'exit'} pass error: {e}")
+        name = "scheduler.signal_pass_sec" if evaluate_signal else "scheduler.exit_pass_sec"
+        metrics.observe(name, time.monotonic() - start)
+
+
+async def bot_event_loop(scheduler: Optional[EventScheduler] = None):
+    """Drive bots from market events published by the market data stream."""
+    scheduler = scheduler or EventScheduler()
+    print("[BotScheduler] Starting event-driven bot scheduler")
+    while True:
+        try:
+            redis = await get_redis()
+            pubsub = redis.pubsub()
+            await pubsub.psubscribe("market:events:*")
+            async for msg in pubsub.listen():
+                if msg.get("type") != "pmessage":
+                    continue
+                await scheduler.dispatch(json.loads(msg["data"]))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"[BotScheduler] listener error: {e} — resubscribing in 5s")
+            await asyncio.sleep(5)
@@ -0,0 +1,138 @@
+"""
+control_flags.py - In-process cache of bot kill switches and the live-trading flag
+- Writers (``kill``, ``set_live_trading``) update Redis and then publish the new
+  value on ``control:flags``; every process applies it to memory on receipt
+- While the listener is subscribed, reads are served from memory with no Redis
+  round trip; before that (or after a dropped subscription) reads go to Redis
+- ``is_killed`` is memory-only, so a running bot sees a kill as soon as the
+  message arrives and can stop between subscriptions
+- ``reset_schedule`` tells every process (the runners hold it) to drop the
+  in-memory cooldown schedule after ``runner:next_due`` was deleted
+"""
+import asyncio
+import json
+from typing import Iterable, Optional
+
+from app.config import settings
+from app.core.redis import get_redis
+
+CONTROL_CHANNEL = "control:flags"
+LIVE_TRADING_KEY = "system:live_trading"
+KILL_SWITCH_KEY = "bot:{bot_id}:kill_switch"
+
+
+def _clear_schedule() -> None:
+    from app.services.bot_runner import bot_schedule
+    bot_schedule.clear()
+
+
+class ControlFlags:
+    def __init__(self):
+        self._live: Optional[bool] = None
+        self._kills: dict[int, bool] = {}
+        self._subscribed = False
+
+    # -- reads ---------------------------------------------------------------
+
+    async def live_trading(self) -> bool:
+        """Redis override first, then the BINANCE_LIVE_TRADING env default."""
+        if self._subscribed and self._live is not None:
+            return self._live
+        redis = await get_redis()
+        override = await redis.get(LIVE_TRADING_KEY)
+        value = override == "true" if override is not None else settings.BINANCE_LIVE_TRADING
+        if self._subscribed and self._live is None:
+            self._live = value
+        return value
+
+    def is_killed(self, bot_id: int) -> bool:
+        return self._kills.get(bot_id, False)
+
+    def unknown(self, bot_ids: Iterable[int]) -> list[int]:
+        """Bots whose kill switch must be read from Redis."""
+        if not self._subscribed:
+            return list(bot_ids)
+        return [b for b in bot_ids if b not in self._kills]
+
+    def remember_kills(self, bot_ids: list[int], values: list[Optional[str]]) -> None:
+        """Cache kill switch values read from Redis (only while updates are pushed to us)."""
+        if self._subscribed:
+            for bot_id, raw in zip(bot_ids, values):
+                # A pushed value that arrived during the read is newer; keep it
+                self._kills.setdefault(bot_id, bool(raw))
+
+    # -- writes --------------------------------------------------------------
+
+    async def kill(self, bot_id: int) -> None:
+        redis = await get_redis()
+        await redis.set(KILL_SWITCH_KEY.format(bot_id=bot_id), "1")
+        if self._subscribed:
+            self._kills[bot_id] = True
+        await self._publish({"flag": "kill", "bot_id": bot_id, "value": True})
+
+    async def set_live_trading(self, value: bool) -> None:
+        redis = await get_redis()
+        await redis.set(LIVE_TRADING_KEY, "true" if value else "false")
+        if self._subscribed:
+            self._live = value
+        await self._publish({"flag": "live_trading", "value": value})
+
+    async def reset_schedule(self) -> None:
+        """Drop the cooldown schedule cached in every process (after a bulk reset)."""
+        _clear_schedule()
+        await self._publish({"flag": "schedule"})
+
+    async def invalidate_all(self) -> None:
+        """Drop every cached flag everywhere (bulk Redis resets)."""
+        self._clear()
+        await self._publish({"flag": "all"})
+
+    async def _publish(self, message: dict) -> None:
+        try:
+            redis = await get_redis()
+            await redis.publish(CONTROL_CHANNEL, json.dumps(message))
+        except Exception as e:
+            print(f"[ControlFlags] publish failed for {message}: {e}")
+
+    # -- invalidation --------------------------------------------------------
+
+    def _clear(self) -> None:
+        self._live = None
+        self._kills.clear()
+
+    def handle_message(self, message: str) -> None:
+        data = json.loads(message)
+        flag = data.get("flag")
+        if flag == "kill":
+            self._kills[int(data["bot_id"])] = bool(data["value"])
+        elif flag == "live_trading":
+            self._live = bool(data["value"])
+        elif flag == "schedule":
+            _clear_schedule()
+        else:
+            self._clear()
+
+    async def run_listener(self) -> None:
+        """Apply flag changes from any process (auto-resubscribes)."""
+        while True:
+            try:
+                redis = await get_redis()
+                pubsub = redis.pubsub()
+                await pubsub.subscribe(CONTROL_CHANNEL)
+                # Anything may have changed while we were not listening
+                self._clear()
+                self._subscribed = True
+                async for msg in pubsub.listen():
+                    if msg.get("type") == "message":
+                        self.handle_message(msg["data"])
+            except asyncio.CancelledError:
+                self._subscribed = False
+                raise
+            except Exception as e:
+                print(f"[ControlFlags] listener error: {e} — resubscribing in 5s")
+                self._subscribed = False
+                self._clear()
+                await asyncio.sleep(5)
+
+
+control_flags = ControlFlags()
@@ -0,0 +1,300 @@
+"""
+exit_monitor.py - Tick-level SL/TP/trailing exits for open bot positions
+- Keeps the open positions of the runner's bots in memory, per pair, in heaps
+  keyed by stop, take-profit and trailing-ratchet level, so a price update only
+  touches the positions it actually crosses
+- Fed by ``trade`` events (throttled trade prices with the high/low since the
+  previous event) and ``tick`` events from the market stream
+- Fires exit orders as soon as a level is crossed; ratcheted trailing stops are
+  written back in batches, only while the position is still open
+- Resynced from Redis every EXIT_MONITOR_RESYNC_SEC; positions opened or
+  closed by this runner are tracked immediately
+
+Exit rules match ``PositionManager.check_exit``: the fixed stop and the trailing
+stop combine into one effective stop (a long exits at max(stop, trailing)).
+"""
+import asyncio
+import heapq
+import json
+import time
+from typing import Callable, Optional
+
+from app.config import settings
+from app.core import metrics
+from app.core.redis import get_redis
+from app.database import AsyncSessionLocal
+from app.models.bot import Bot, BotStatus
+from app.services.position_manager import effective_stop
+from app.services.position_store import position_store
+
+PosKey = tuple[int, int]  # (bot_id, user_id)
+
+
+class _Entry:
+    __slots__ = ("pos", "version")
+
+    def __init__(self, pos: dict, version: int):
+        self.pos = pos
+        self.version = version
+
+
+class PairBook:
+    """Open positions of one pair, indexed by the price levels that change them.
+
+    Every heap stores ``(key, version, pos_key)`` with ``key`` signed so that a
+    level is crossed when ``key <= probe``; stale items (older version or closed
+    position) are dropped lazily when they reach the top.
+    """
+
+    def __init__(self):
+        self.entries: dict[PosKey, _Entry] = {}
+        self._heaps: dict[str, list] = {name: [] for name in (
+            "long_stop", "long_tp", "long_ratchet", "short_stop", "short_tp", "short_ratchet",
+        )}
+        self._version = 0
+
+    def add(self, key: PosKey, pos: dict) -> None:
+        self._version += 1
+        version = self._version
+        self.entries[key] = _Entry(pos, version)
+        long = pos["side"] == "buy"
+        sign = 1 if long else -1
+        stop = effective_stop(pos)
+        self._push("long_stop" if long else "short_stop", (-sign * stop, version, key))
+        if pos.get("take_profit") is not None:
+            self._push("long_tp" if long else "short_tp", (sign * pos["take_profit"], version, key))
+        if pos.get("trailing_active") and pos.get("trailing_stop") is not None:
+            # The trailing stop moves once price is further than mult * ATR beyond it
+            reach = pos.get("trailing_atr_mult", 1.5) * pos.get("current_atr", 0)
+            self._push("long_ratchet" if long else "short_ratchet",
+                       (sign * (pos["trailing_stop"] + sign * reach), version, key))
+
+    def remove(self, key: PosKey) -> None:
+        self.entries.pop(key, None)
+
+    def _push(self, name: str, item: tuple) -> None:
+        heap = self._heaps[name]
+        heapq.heappush(heap, item)
+        if len(heap) > 4 * len(self.entries) + 64:
+            # Ratchets leave superseded items behind; drop them in one pass
+            heap[:] = [i for i in heap if (e := self.entries.get(i[2])) is not None and e.version == i[1]]
+            heapq.heapify(heap)
+
+    def _crossed(self, name: str, probe: float) -> list[PosKey]:
+        heap = self._heaps[name]
+        crossed = []
+        while heap and heap[0][0] <= probe:
+            _, version, key = heapq.heappop(heap)
+            entry = self.entries.get(key)
+            if entry is not None and entry.version == version:
+                crossed.append(key)
+        # Drop stale tops so dead entries don't pile up under a live one
+        while heap and (heap[0][2] not in self.entries or self.entries[heap[0][2]].version != heap[0][1]):
+            heapq.heappop(heap)
+        return crossed
+
+    def on_price(self, price: float, high: float, low: float) -> tuple[list[tuple[PosKey, str]], list[PosKey]]:
+        """Apply one price update. Returns (exits as (key, reason), positions whose trailing stop moved)."""
+        exits: list[tuple[PosKey, str]] = []
+        for name, probe, reason in (
+            ("long_stop", -low, "stop_loss"), ("short_stop", high, "stop_loss"),
+            ("long_tp", high, "take_profit"), ("short_tp", -low, "take_profit"),
+        ):
+            for key in self._crossed(name, probe):
+                exits.append((key, reason))
+                self.remove(key)
+
+        ratcheted: list[PosKey] = []
+        for name, probe in (("long_ratchet", price), ("short_ratchet", -price)):
+            for key in self._crossed(name, probe):
+                pos = self.entries[key].pos
+                reach = pos.get("trailing_atr_mult", 1.5) * pos.get("current_atr", 0)
+                if pos["side"] == "buy":
+                    pos["trailing_stop"] = max(pos["trailing_stop"], price - reach)
+                else:
+                    pos["trailing_stop"] = min(pos["trailing_stop"], price + reach)
+                self.add(key, pos)
+                ratcheted.append(key)
+        return exits, ratcheted
+
+
+class ExitMonitor:
+    def __init__(self):
+        self._books: dict[str, PairBook] = {}
+        self._pairs: dict[PosKey, str] = {}
+        self._dirty: set[PosKey] = set()
+        self._firing: set[PosKey] = set()
+        self._tasks: set[asyncio.Task] = set()
+        # True while ``run`` is active; run_bot then leaves SL/TP exits to us
+        self.running = False
+
+    # -- book keeping ----------------------------------------------------------
+
+    def track(self, bot_id: int, user_id: int, pair: str, pos: dict) -> None:
+        key = (bot_id, user_id)
+        old_pair = self._pairs.get(key)
+        if old_pair is not None and old_pair != pair:
+            self._books[old_pair].remove(key)
+        self._pairs[key] = pair
+        self._books.setdefault(pair, PairBook()).add(key, dict(pos))
+
+    def untrack(self, bot_id: int, user_id: int) -> None:
+        key = (bot_id, user_id)
+        pair = self._pairs.pop(key, None)
+        if pair is not None:
+            self._books[pair].remove(key)
+        self._dirty.discard(key)
+
+    def tracked(self) -> int:
+        return len(self._pairs)
+
+    def on_price(self, pair: str, price: float, high: Optional[float] = None,
+                 low: Optional[float] = None) -> list[tuple[PosKey, str]]:
+        """Feed one price update; returns the positions that must exit now."""
+        book = self._books.get(pair)
+        if book is None or not book.entries:
+            return []
+        exits, ratcheted = book.on_price(price, high if high is not None else price,
+                                         low if low is not None else price)
+        self._dirty.update(ratcheted)
+        for key, _ in exits:
+            self._pairs.pop(key, None)
+            self._dirty.discard(key)
+        return exits
+
+    # -- exits -----------------------------------------------------------------
+
+    async def _fire(self, key: PosKey, pair: str, reason: str, price: float, seen_at: float) -> None:
+        from app.services.bot_runner import load_cycle_snapshot, _close_position_order, _order_section
+
+        if key in self._firing:
+            return
+        self._firing.add(key)
+        bot_id, user_id = key
+        try:
+            async with AsyncSessionLocal() as db:
+                bot = await db.get(Bot, bot_id)
+                if bot is None:
+                    return
+                snapshot = await load_cycle_snapshot(db, [bot])
+                sub = next((s for s in snapshot.subs.get(bot_id, []) if s.user_id == user_id), None)
+                pm = snapshot.position_manager(bot_id, user_id)
+                pos = await pm.get_position()
+                if sub is None or pos is None:
+                    # Closed or unsubscribed elsewhere since we loaded it
+                    return
+                with _order_section(bot):
+                    closed = await _close_position_order(db, bot, sub, pair, pos, snapshot)
+                    await pm.close_position()
+            metrics.incr(f"exit_monitor.{reason}")
+            metrics.observe("exit_monitor.tick_to_exit_sec", time.monotonic() - seen_at)
+            if closed:
+                print(f"Bot {bot_id} user {user_id}: tick exit ({reason}) {closed[0]} {closed[1]} @ {price}")
+        except Exception as e:
+            metrics.incr("exit_monitor.errors")
+            print(f"[ExitMonitor] exit for bot {bot_id} user {user_id} failed: {e}")
+            # Let the next resync pick the position up again
+        finally:
+            self._firing.discard(key)
+
+    def handle_event(self, event: dict) -> None:
+        pair = event.get("pair")
+        if event.get("type") not in ("trade", "tick") or not pair:
+            return
+        seen_at = time.monotonic()
+        price = float(event["price"])
+        high = float(event["high"]) if event.get("high") is not None else None
+        low = float(event["low"]) if event.get("low") is not None else None
+        for key, reason in self.on_price(pair, price, high, low):
+            task = asyncio.create_task(self._fire(key, pair, reason, price, seen_at))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    # -- Redis sync ------------------------------------------------------------
+
+    async def flush(self) -> None:
+        """Write ratcheted trailing stops back, never re-creating a closed position."""
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, set()
+        for key in dirty:
+            pair = self._pairs.get(key)
+            entry = self._books[pair].entries.get(key) if pair else None
+            if entry is not None:
+                await position_store.update_if_open(key[0], key[1], entry.pos)
+
+    async def resync(self, bot_filter: Optional[Callable[[Bot], bool]] = None) -> None:
+        """Reload the open positions of this runner's active bots from Redis."""
+        from sqlalchemy import select
+        from app.services.bot_runner import _bot_pair, load_cycle_snapshot
+
+        await self.flush()
+        async with AsyncSessionLocal() as db:
+            bots = list(await db.scalars(select(Bot).where(Bot.status == BotStatus.active)))
+            if bot_filter is not None:
+                bots = [b for b in bots if bot_filter(b)]
+            snapshot = await load_cycle_snapshot(db, bots)
+        pairs = {b.id: _bot_pair(b) for b in bots}
+
+        fresh = {key: raw for key, raw in snapshot.positions.items() if raw}
+        for key in list(self._pairs):
+            if key not in fresh and key not in self._firing:
+                self.untrack(*key)
+        for key, raw in fresh.items():
+            if key in self._firing or key in self._dirty:
+                # In-memory state is newer than what we just read
+                continue
+            pos = json.loads(raw)
+            pair = self._pairs.get(key)
+            current = self._books[pair].entries.get(key) if pair else None
+            if current is None or current.pos != pos or pair != pairs[key[0]]:
+                self.track(key[0], key[1], pairs[key[0]], pos)
+        metrics.observe("exit_monitor.tracked_positions", self.tracked())
+
+    async def _resync_loop(self, bot_filter) -> None:
+        while True:
+            await asyncio.sleep(settings.EXIT_MONITOR_RESYNC_SEC)
+            try:
+                await self.resync(bot_filter)
+            except Exception as e:
+                print(f"[ExitMonitor] resync failed: {e}")
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(1.0)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"[ExitMonitor] trailing stop flush failed: {e}")
+
+    async def run(self, bot_filter: Optional[Callable[[Bot], bool]] = None) -> None:
+        """Consume market events and fire exits for the bots ``bot_filter`` selects."""
+        from app.services.bot_runner import fence_bots
+
+        print("[ExitMonitor] Starting tick-level exit monitor")
+        # Exit tasks inherit the fence: no close once the bot's partition lapsed
+        fence_bots(bot_filter)
+        self.running = True
+        helpers = [asyncio.create_task(self._resync_loop(bot_filter)), asyncio.create_task(self._flush_loop())]
+        try:
+            while True:
+                try:
+                    await self.resync(bot_filter)
+                    redis = await get_redis()
+                    pubsub = redis.pubsub()
+                    await pubsub.psubscribe("market:events:*")
+                    async for msg in pubsub.listen():
+                        if msg.get("type") == "pmessage":
+                            self.handle_event(json.loads(msg["data"]))
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    print(f"[ExitMonitor] listener error: {e} — resubscribing in 5s")
+                    await asyncio.sleep(5)
+        finally:
+            self.running = False
+            for task in helpers:
+                task.cancel()
+
+
+exit_monitor = ExitMonitor()
@@ -0,0 +1,155 @@
+"""
+indicator_cache.py - Process-wide LRU memo for indicator calls
+- Bots on the same pair/interval with similar configs compute the same
+  ``calc_atr(highs, lows, closes)`` / ``calc_adx`` every cycle; strategies call
+  the ``memoized`` versions so the first one computes and the rest hit
+- Key: (pair, interval, last candle open time) from ``evaluate_in_scope``, the
+  indicator name, its bound arguments with defaults applied, and a fingerprint
+  (length and a hash of every value) of each input series. The fingerprint
+  keeps sliced inputs (``highs[:-1]``) apart and moves the key when any
+  candle in the window changes, including the forming one
+- Outside a scope (tests) the functions run uncached; a backtest installs an
+  ``indicator_override`` that answers every call from precomputed series, the
+  runner one that answers from its indicator streams (``indicator_stream.py``)
+  and falls back to this cache
+- With STRATEGY_POOL_WORKERS > 0 every worker process holds its own cache;
+  hit/miss counts are returned to the runner, which keeps the
+  ``indicator_cache.hits`` / ``indicator_cache.misses`` counters
+"""
+import functools
+import inspect
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Hashable, Optional
+
+import numpy as np
+
+from app.config import settings
+from app.core import metrics
+
+Scope = tuple[str, str, int]  # (pair, interval, last candle open time)
+
+# (name, fn, bound arguments with defaults) -> value
+Resolver = Callable[[str, Callable, dict], Any]
+
+_scope: ContextVar[Optional[Scope]] = ContextVar("indicator_scope", default=None)
+_override: ContextVar[Optional[Resolver]] = ContextVar("indicator_override", default=None)
+
+
+class IndicatorCache:
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: OrderedDict[Hashable, Any] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        entries = self._entries
+        if key in entries:
+            entries.move_to_end(key)
+            self.hits += 1
+            return entries[key]
+        self.misses += 1
+        value = compute()
+        if self.maxsize > 0:
+            entries[key] = value
+            if len(entries) > self.maxsize:
+                entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+indicator_cache = IndicatorCache(settings.INDICATOR_CACHE_SIZE)
+
+
+def _fingerprint(arg: Any) -> Hashable:
+    if arg is None or isinstance(arg, (bool, int, float, str)):
+        return arg
+    data = np.ascontiguousarray(arg, dtype=np.float64)
+    return len(data), hash(data.tobytes())
+
+
+def memoized(fn: Callable) -> Callable:
+    """Cache ``fn`` per scope; results must be immutable (floats / tuples)."""
+    parameters = inspect.signature(fn).parameters.values()
+    names = [p.name for p in parameters]
+    # Signature order with defaults filled in (what ``bind`` + ``apply_defaults``
+    # gives, at a fraction of the cost: backtests call this on every bar)
+    defaults = {p.name: p.default for p in parameters}
+    required = sum(p.default is inspect.Parameter.empty for p in parameters)
+    name = fn.__name__
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        resolver = _override.get()
+        scope = _scope.get()
+        if (resolver is None and scope is None) or len(args) + len(kwargs) < required:
+            return fn(*args, **kwargs)
+        bound = dict(defaults)
+        bound.update(zip(names, args))
+        bound.update(kwargs)
+        if scope is None:
+            return resolver(name, fn, bound)
+        key = (scope, name, tuple(_fingerprint(v) for v in bound.values()))
+        if resolver is not None:
+            # What the resolver doesn't answer itself is still shared through the cache
+            return resolver(name, lambda **kw: indicator_cache.get_or_compute(key, lambda: fn(**kw)), bound)
+        return indicator_cache.get_or_compute(key, lambda: fn(*args, **kwargs))
+
+    return wrapper
+
+
+@contextmanager
+def indicator_override(resolver: Resolver):
+    """Route every ``memoized`` call in this block to ``resolver``."""
+    token = _override.set(resolver)
+    try:
+        yield
+    finally:
+        _override.reset(token)
+
+
+def evaluate_in_scope(fn: Callable, scope: Scope, *args) -> tuple[Any, int, int]:
+    """Run ``fn(*args)`` with memoized indicators keyed on ``scope``.
+
+    Module-level so it can be sent to a pool worker; returns
+    ``(result, hits, misses)`` for the caller to record.
+    """
+    hits, misses = indicator_cache.hits, indicator_cache.misses
+    token = _scope.set(scope)
+    try:
+        result = fn(*args)
+    finally:
+        _scope.reset(token)
+    return result, indicator_cache.hits - hits, indicator_cache.misses - misses
+
+
+def record(hits: int, misses: int) -> None:
+    if hits:
+        metrics.incr("indicator_cache.hits", hits)
+    if misses:
+        metrics.incr("indicator_cache.misses", misses)
+
+
+def stats() -> dict:
+    """Hit rate over everything recorded in this process (including pool workers)."""
+    hits = metrics.counter("indicator_cache.hits")
+    misses = metrics.counter("indicator_cache.misses")
+    total = hits + misses
+    return {
+        "size": len(indicator_cache),
+        "maxsize": indicator_cache.maxsize,
+        "evictions": indicator_cache.evictions,
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / total, 4) if total else None,
+    }
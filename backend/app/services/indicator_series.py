@@ -0,0 +1,236 @@
+"""
+indicator_series.py - Vectorized indicators over NumPy arrays
+- Every function returns the full series, aligned with its input: element ``i``
+  is the value the indicator has over ``values[:i + 1]``; bars without enough
+  history are NaN
+- ``indicators.py`` keeps the scalar ``calc_*`` API (last value + fallbacks)
+  as thin wrappers over these
+- Windows use ``sliding_window_view`` rather than cumulative sums so the last
+  value matches a direct sum over the window; only the Wilder recursions (ADX)
+  run as a loop, over plain floats
+"""
+from typing import Sequence, Tuple, Union
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+ArrayLike = Union[np.ndarray, Sequence[float]]
+
+
+def as_array(values: ArrayLike) -> np.ndarray:
+    """float64 view of ``values`` (no copy for float64 arrays / ``array('d')``)."""
+    return np.asarray(values, dtype=np.float64)
+
+
+def _nans(n: int) -> np.ndarray:
+    return np.full(n, np.nan)
+
+
+def _windows(x: np.ndarray, period: int) -> np.ndarray:
+    return sliding_window_view(x, period)
+
+
+def sma(closes: ArrayLike, period: int) -> np.ndarray:
+    """Simple moving average; valid from index ``period - 1``."""
+    x = as_array(closes)
+    out = _nans(len(x))
+    if period > 0 and len(x) >= period:
+        out[period - 1:] = _windows(x, period).mean(axis=1)
+    return out
+
+
+def rsi(closes: ArrayLike, period: int = 14) -> np.ndarray:
+    """Cutler RSI (simple mean of the last ``period`` gains/losses); valid from index ``period``."""
+    x = as_array(closes)
+    out = _nans(len(x))
+    if len(x) < period + 1:
+        return out
+    deltas = np.diff(x)
+    avg_gain = _windows(np.maximum(deltas, 0.0), period).sum(axis=1) / period
+    avg_loss = _windows(np.maximum(-deltas, 0.0), period).sum(axis=1) / period
+    with np.errstate(divide="ignore", invalid="ignore"):
+        value = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+    flat = np.where(avg_gain > 0, 100.0, 50.0)
+    out[period:] = np.where(avg_loss == 0, flat, value)
+    return out
+
+
+def bollinger(
+    closes: ArrayLike, period: int = 20, std_dev: float = 2.0
+) -> Tuple[np.ndarray, np.ndarray]:
+    """(lower, upper) bands with population std dev; valid from index ``period - 1``."""
+    x = as_array(closes)
+    lower, upper = _nans(len(x)), _nans(len(x))
+    if period > 0 and len(x) >= period:
+        w = _windows(x, period)
+        ma = w.mean(axis=1)
+        std = w.std(axis=1)
+        lower[period - 1:] = ma - std_dev * std
+        upper[period - 1:] = ma + std_dev * std
+    return lower, upper
+
+
+def bandwidth(closes: ArrayLike, period: int = 20, std_dev: float = 2.0) -> np.ndarray:
+    """Bollinger bandwidth ``(upper - lower) / middle`` (0 where middle is 0)."""
+    lower, upper = bollinger(closes, period, std_dev)
+    middle = sma(closes, period)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = (upper - lower) / middle
+    out[middle == 0] = 0.0
+    return out
+
+
+def true_range(highs: ArrayLike, lows: ArrayLike, closes: ArrayLike) -> np.ndarray:
+    """TR per bar; NaN at index 0 (no previous close)."""
+    h, l, c = as_array(highs), as_array(lows), as_array(closes)
+    out = _nans(len(c))
+    if len(c) > 1:
+        prev = c[:-1]
+        out[1:] = np.maximum.reduce([h[1:] - l[1:], np.abs(h[1:] - prev), np.abs(l[1:] - prev)])
+    return out
+
+
+def atr(highs: ArrayLike, lows: ArrayLike, closes: ArrayLike, period: int = 14) -> np.ndarray:
+    """Simple average of the last ``period`` TRs; valid from index ``period``."""
+    tr = true_range(highs, lows, closes)
+    out = _nans(len(tr))
+    if len(tr) >= period + 1:
+        out[period:] = _windows(tr[1:], period).mean(axis=1)
+    return out
+
+
+def _wilder_sum(x: np.ndarray, period: int) -> np.ndarray:
+    """Wilder running sum: seeded with ``sum(x[:period])``, then ``s - s / period + x``."""
+    out = _nans(len(x))
+    if len(x) < period:
+        return out
+    values = x.tolist()
+    s = sum(values[:period])
+    out[period - 1] = s
+    for i in range(period, len(values)):
+        s = s - (s / period) + values[i]
+        out[i] = s
+    return out
+
+
+def _wilder_mean(x: np.ndarray, start: int, period: int) -> np.ndarray:
+    """Wilder average of ``x[start:]``: seeded with the SMA of its first ``period`` values."""
+    out = _nans(len(x))
+    if len(x) - start < period:
+        return out
+    values = x.tolist()
+    avg = sum(values[start:start + period]) / period
+    out[start + period - 1] = avg
+    for i in range(start + period, len(values)):
+        avg = (avg * (period - 1) + values[i]) / period
+        out[i] = avg
+    return out
+
+
+def adx(highs: ArrayLike, lows: ArrayLike, closes: ArrayLike, period: int = 14) -> np.ndarray:
+    """ADX with Wilder smoothing (+DM/-DM/TR -> DI -> DX -> ADX); valid from index ``2 * period``."""
+    h, l = as_array(highs), as_array(lows)
+    n = len(as_array(closes))
+    out = _nans(n)
+    if n < 2 * period + 1:
+        return out
+
+    # Raw moves per bar transition (index j = bar j + 1)
+    up = h[1:] - h[:-1]
+    down = l[:-1] - l[1:]
+    plus_dm = np.where((up > down) & (up > 0), up, 0.0)
+    minus_dm = np.where((down > up) & (down > 0), down, 0.0)
+    tr = true_range(h, l, closes)[1:]
+
+    s_plus = _wilder_sum(plus_dm, period)
+    s_minus = _wilder_sum(minus_dm, period)
+    s_tr = _wilder_sum(tr, period)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        plus_di = np.where(s_tr != 0, 100.0 * s_plus / s_tr, 0.0)
+        minus_di = np.where(s_tr != 0, 100.0 * s_minus / s_tr, 0.0)
+        di_sum = plus_di + minus_di
+        dx = np.where(di_sum != 0, np.abs(plus_di - minus_di) / di_sum * 100.0, 0.0)
+
+    smoothed = _wilder_mean(dx, period - 1, period)
+    out[2 * period:] = smoothed[2 * period - 1:]
+    return out
+
+
+def adx_windowed(
+    highs: ArrayLike, lows: ArrayLike, closes: ArrayLike, period: int, window: int
+) -> np.ndarray:
+    """ADX of the trailing ``window`` bars at every index, i.e. ``calc_adx`` on
+    ``values[i - window + 1:i + 1]``; valid from index ``window - 1``.
+
+    Wilder smoothing depends on where the window starts, so this differs from
+    ``adx`` (which runs over all history). The recursion runs once along the
+    window, vectorized across every window at the same time.
+    """
+    h, l, c = as_array(highs), as_array(lows), as_array(closes)
+    n = len(c)
+    out = _nans(n)
+    if window < 2 * period + 1 or n < window:
+        return out
+
+    up = h[1:] - h[:-1]
+    down = l[:-1] - l[1:]
+    plus_dm = np.where((up > down) & (up > 0), up, 0.0)
+    minus_dm = np.where((down > up) & (down > 0), down, 0.0)
+    tr = true_range(h, l, c)[1:]
+    moves = window - 1
+    # Row r holds the moves of the window ending at bar r + window - 1
+    P, M, T = (_windows(x, moves) for x in (plus_dm, minus_dm, tr))
+
+    s_plus = np.zeros(len(P))
+    s_minus = np.zeros(len(P))
+    s_tr = np.zeros(len(P))
+    dx_sum = np.zeros(len(P))
+    adx_value = np.zeros(len(P))
+    for k in range(moves):
+        if k < period:
+            # Sequential seed sums, as in calc_adx
+            s_plus += P[:, k]
+            s_minus += M[:, k]
+            s_tr += T[:, k]
+            if k < period - 1:
+                continue
+        else:
+            s_plus = s_plus - (s_plus / period) + P[:, k]
+            s_minus = s_minus - (s_minus / period) + M[:, k]
+            s_tr = s_tr - (s_tr / period) + T[:, k]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            plus_di = np.where(s_tr != 0, 100.0 * s_plus / s_tr, 0.0)
+            minus_di = np.where(s_tr != 0, 100.0 * s_minus / s_tr, 0.0)
+            di_sum = plus_di + minus_di
+            dx = np.where(di_sum != 0, np.abs(plus_di - minus_di) / di_sum * 100.0, 0.0)
+        j = k - (period - 1)  # index of this DX value
+        if j < period:
+            dx_sum += dx
+            if j == period - 1:
+                adx_value = dx_sum / period
+        else:
+            adx_value = (adx_value * (period - 1) + dx) / period
+    out[window - 1:] = adx_value
+    return out
+
+
+def donchian(highs: ArrayLike, lows: ArrayLike, period: int = 20) -> Tuple[np.ndarray, np.ndarray]:
+    """(upper, lower): rolling max of highs / min of lows; valid from index ``period - 1``."""
+    h, l = as_array(highs), as_array(lows)
+    upper, lower = _nans(len(h)), _nans(len(l))
+    if period > 0 and len(h) >= period:
+        upper[period - 1:] = _windows(h, period).max(axis=1)
+    if period > 0 and len(l) >= period:
+        lower[period - 1:] = _windows(l, period).min(axis=1)
+    return upper, lower
+
+
+def ma_slope(closes: ArrayLike, ma_period: int = 200, lookback: int = 10) -> np.ndarray:
+    """SMA now minus SMA ``lookback`` bars ago; valid from index ``ma_period + lookback - 1``."""
+    ma = sma(closes, ma_period)
+    out = _nans(len(ma))
+    if lookback > 0:
+        out[lookback:] = ma[lookback:] - ma[:-lookback]
+    else:
+        out[:] = ma - ma
+    return out
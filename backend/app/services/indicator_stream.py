@@ -0,0 +1,759 @@
+"""
+indicator_stream.py - Incremental indicators with O(1) work per candle
+- Each indicator is seeded from history once, then ``update(kline)`` folds in
+  one candle: a closed candle is committed to the state, a forming one
+  (``closed=False``) only returns the value it would give, leaving state as is
+- Definitions match ``indicator_series.py`` (Cutler RSI, SMA-of-TR ATR, Wilder
+  ADX, population-std Bollinger), so a stream seeded from the same candles
+  returns the same values as the ``calc_*`` functions
+- ``to_dict`` / ``indicator_from_dict`` round-trip the state through JSON;
+  ``IndicatorStream`` groups the indicators of one pair/interval and is saved
+  to ``ind:stream:{pair}:{interval}`` so a runner can resume after a restart
+- In the runner, ``indicator_streams`` keeps one stream per pair/interval and
+  ``evaluate_streamed`` answers the strategies' ``calc_*`` calls from it (an
+  ``indicator_override``); calls it can't answer yet add their indicator to
+  the stream. ``calc_adx`` stays windowed: Wilder smoothing depends on where
+  the window starts, so a longer-running stream would not match it
+"""
+import abc
+import json
+import math
+from collections import deque
+from typing import Any, Callable, Iterable, Optional
+
+from app.core import metrics
+from app.core.redis import get_redis
+from app.services.indicator_cache import evaluate_in_scope, indicator_override
+from app.services.klines import Klines, column_windows, window_of
+
+STREAM_KEY = "ind:stream:{pair}:{interval}"
+STREAM_TTL = 7 * 24 * 3600
+
+_KINDS: dict[str, type] = {}
+
+
+def _register(cls):
+    _KINDS[cls.KIND] = cls
+    return cls
+
+
+class _Window:
+    """Fixed-size window with a running total (re-summed every ``size`` pushes to stop drift)."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.values: deque[float] = deque(maxlen=size)
+        self.total = 0.0
+        self._since_resum = 0
+
+    @property
+    def full(self) -> bool:
+        return len(self.values) == self.size
+
+    def next_total(self, x: float) -> float:
+        return self.total + x - (self.values[0] if self.full else 0.0)
+
+    def push(self, x: float) -> None:
+        self.total = self.next_total(x)
+        self.values.append(x)
+        self._since_resum += 1
+        if self._since_resum >= self.size:
+            self.total = math.fsum(self.values)
+            self._since_resum = 0
+
+    def dump(self) -> list:
+        return list(self.values)
+
+    def load(self, values: list) -> None:
+        self.values = deque(values, maxlen=self.size)
+        self.total = math.fsum(self.values)
+        self._since_resum = 0
+
+
+class StreamingIndicator(abc.ABC):
+    KIND = ""
+
+    def update(self, kline: dict, closed: bool = True):
+        """Fold in one candle; returns the indicator value (None while warming up)."""
+        h, l, c = float(kline["high"]), float(kline["low"]), float(kline["close"])
+        if closed:
+            self._push(h, l, c)
+            return self.value
+        return self._peek(h, l, c)
+
+    def seed(self, klines: Iterable[dict]) -> "StreamingIndicator":
+        for k in klines:
+            self._push(float(k["high"]), float(k["low"]), float(k["close"]))
+        return self
+
+    def fresh(self) -> "StreamingIndicator":
+        return type(self)(**self.params())
+
+    def to_dict(self) -> dict:
+        return {"kind": self.KIND, "params": self.params(), "state": self._dump()}
+
+    # -- per indicator -------------------------------------------------------
+
+    @property
+    @abc.abstractmethod
+    def value(self):
+        """The value after the last closed candle (None while warming up)."""
+
+    @abc.abstractmethod
+    def params(self) -> dict:
+        """Constructor arguments, as ``indicator_from_dict`` passes them back."""
+
+    @abc.abstractmethod
+    def _push(self, h: float, l: float, c: float) -> None:
+        """Fold in a closed candle."""
+
+    @abc.abstractmethod
+    def _peek(self, h: float, l: float, c: float):
+        """The value with a forming candle appended, leaving the state as is."""
+
+    @abc.abstractmethod
+    def _dump(self) -> dict:
+        """JSON-serializable state for ``to_dict``."""
+
+    @abc.abstractmethod
+    def _load(self, state: dict) -> None:
+        """Restore the state ``_dump`` returned."""
+
+
+def indicator_from_dict(data: dict) -> StreamingIndicator:
+    ind = _KINDS[data["kind"]](**data["params"])
+    ind._load(data["state"])
+    return ind
+
+
+@_register
+class StreamingSMA(StreamingIndicator):
+    KIND = "sma"
+
+    def __init__(self, period: int):
+        self.period = period
+        self._w = _Window(period)
+
+    def params(self) -> dict:
+        return {"period": self.period}
+
+    @property
+    def value(self) -> Optional[float]:
+        return self._w.total / self.period if self._w.full else None
+
+    def _push(self, h, l, c):
+        self._w.push(c)
+
+    def _peek(self, h, l, c):
+        if len(self._w.values) + 1 < self.period:
+            return None
+        return self._w.next_total(c) / self.period
+
+    def _dump(self):
+        return {"window": self._w.dump()}
+
+    def _load(self, state):
+        self._w.load(state["window"])
+
+
+@_register
+class StreamingBollinger(StreamingIndicator):
+    """Rolling mean/variance (sliding Welford update, recomputed exactly every
+    ``period`` candles). ``value`` is (lower, upper)."""
+
+    KIND = "bollinger"
+
+    def __init__(self, period: int = 20, std_dev: float = 2.0):
+        self.period = period
+        self.std_dev = std_dev
+        self._window: deque[float] = deque(maxlen=period)
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._since_exact = 0
+
+    def _recompute(self) -> None:
+        n = len(self._window)
+        self._mean = math.fsum(self._window) / n if n else 0.0
+        self._m2 = math.fsum((x - self._mean) ** 2 for x in self._window)
+        self._since_exact = 0
+
+    def params(self) -> dict:
+        return {"period": self.period, "std_dev": self.std_dev}
+
+    def _next(self, x: float) -> tuple[int, float, float]:
+        n = len(self._window)
+        if n < self.period:
+            n += 1
+            delta = x - self._mean
+            mean = self._mean + delta / n
+            return n, mean, self._m2 + delta * (x - mean)
+        old = self._window[0]
+        mean = self._mean + (x - old) / n
+        return n, mean, self._m2 + (x - old) * (x - mean + old - self._mean)
+
+    def _bands(self, n: int, mean: float, m2: float) -> Optional[tuple[float, float]]:
+        if n < self.period:
+            return None
+        std = math.sqrt(max(m2, 0.0) / n)
+        return (mean - self.std_dev * std, mean + self.std_dev * std)
+
+    @property
+    def value(self) -> Optional[tuple[float, float]]:
+        return self._bands(len(self._window), self._mean, self._m2)
+
+    @property
+    def bandwidth(self) -> Optional[float]:
+        bands = self._bands(len(self._window), self._mean, self._m2)
+        if bands is None:
+            return None
+        return (bands[1] - bands[0]) / self._mean if self._mean != 0 else 0.0
+
+    def _push(self, h, l, c):
+        _, self._mean, self._m2 = self._next(c)
+        self._window.append(c)
+        self._since_exact += 1
+        if self._since_exact >= self.period:
+            self._recompute()
+
+    def _peek(self, h, l, c):
+        return self._bands(*self._next(c))
+
+    def _dump(self):
+        return {"window": list(self._window)}
+
+    def _load(self, state):
+        self._window = deque(state["window"], maxlen=self.period)
+        self._recompute()
+
+
+@_register
+class StreamingBandwidth(StreamingBollinger):
+    """``calc_bandwidth``: (upper - lower) / middle, 0 when the middle is 0."""
+
+    KIND = "bandwidth"
+
+    @property
+    def value(self) -> Optional[float]:
+        return self.bandwidth
+
+    def _peek(self, h, l, c):
+        n, mean, m2 = self._next(c)
+        bands = self._bands(n, mean, m2)
+        if bands is None:
+            return None
+        return (bands[1] - bands[0]) / mean if mean != 0 else 0.0
+
+
+@_register
+class StreamingRSI(StreamingIndicator):
+    """Cutler RSI: simple mean of the last ``period`` gains/losses."""
+
+    KIND = "rsi"
+
+    def __init__(self, period: int = 14):
+        self.period = period
+        self._gains = _Window(period)
+        self._losses = _Window(period)
+        self._prev: Optional[float] = None
+
+    def params(self) -> dict:
+        return {"period": self.period}
+
+    @staticmethod
+    def _rsi(gain_total: float, loss_total: float) -> float:
+        if loss_total == 0:
+            return 100.0 if gain_total > 0 else 50.0
+        return 100.0 - (100.0 / (1.0 + gain_total / loss_total))
+
+    @property
+    def value(self) -> Optional[float]:
+        if not self._gains.full:
+            return None
+        return self._rsi(self._gains.total / self.period, self._losses.total / self.period)
+
+    def _push(self, h, l, c):
+        if self._prev is not None:
+            delta = c - self._prev
+            self._gains.push(max(delta, 0.0))
+            self._losses.push(max(-delta, 0.0))
+        self._prev = c
+
+    def _peek(self, h, l, c):
+        if self._prev is None or len(self._gains.values) + 1 < self.period:
+            return None
+        delta = c - self._prev
+        return self._rsi(self._gains.next_total(max(delta, 0.0)) / self.period,
+                         self._losses.next_total(max(-delta, 0.0)) / self.period)
+
+    def _dump(self):
+        return {"gains": self._gains.dump(), "losses": self._losses.dump(), "prev": self._prev}
+
+    def _load(self, state):
+        self._gains.load(state["gains"])
+        self._losses.load(state["losses"])
+        self._prev = state["prev"]
+
+
+def _true_range(h: float, l: float, prev_close: float) -> float:
+    return max(h - l, abs(h - prev_close), abs(l - prev_close))
+
+
+@_register
+class StreamingATR(StreamingIndicator):
+    """Simple mean of the last ``period`` true ranges."""
+
+    KIND = "atr"
+
+    def __init__(self, period: int = 14):
+        self.period = period
+        self._trs = _Window(period)
+        self._prev: Optional[float] = None
+
+    def params(self) -> dict:
+        return {"period": self.period}
+
+    @property
+    def value(self) -> Optional[float]:
+        return self._trs.total / self.period if self._trs.full else None
+
+    def _push(self, h, l, c):
+        if self._prev is not None:
+            self._trs.push(_true_range(h, l, self._prev))
+        self._prev = c
+
+    def _peek(self, h, l, c):
+        if self._prev is None or len(self._trs.values) + 1 < self.period:
+            return None
+        return self._trs.next_total(_true_range(h, l, self._prev)) / self.period
+
+    def _dump(self):
+        return {"trs": self._trs.dump(), "prev": self._prev}
+
+    def _load(self, state):
+        self._trs.load(state["trs"])
+        self._prev = state["prev"]
+
+
+@_register
+class StreamingADX(StreamingIndicator):
+    """Wilder ADX; all state is scalar, so a forming candle is a dry run of ``_step``."""
+
+    KIND = "adx"
+    _FIELDS = ("prev", "moves", "s_plus", "s_minus", "s_tr", "dx_count", "dx_sum", "adx")
+
+    def __init__(self, period: int = 14):
+        self.period = period
+        self._s = {"prev": None, "moves": 0, "s_plus": 0.0, "s_minus": 0.0, "s_tr": 0.0,
+                   "dx_count": 0, "dx_sum": 0.0, "adx": None}
+
+    def params(self) -> dict:
+        return {"period": self.period}
+
+    def _step(self, h: float, l: float, c: float) -> dict:
+        s = dict(self._s)
+        prev, p = s["prev"], self.period
+        s["prev"] = (h, l, c)
+        if prev is None:
+            return s
+        ph, pl, pc = prev
+        up, down = h - ph, pl - l
+        plus_dm = up if (up > down and up > 0) else 0.0
+        minus_dm = down if (down > up and down > 0) else 0.0
+        tr = _true_range(h, l, pc)
+        s["moves"] += 1
+        if s["moves"] <= p:
+            # Seed the smoothed sums with plain sums of the first `period` moves
+            s["s_plus"] += plus_dm
+            s["s_minus"] += minus_dm
+            s["s_tr"] += tr
+            if s["moves"] < p:
+                return s
+        else:
+            s["s_plus"] = s["s_plus"] - (s["s_plus"] / p) + plus_dm
+            s["s_minus"] = s["s_minus"] - (s["s_minus"] / p) + minus_dm
+            s["s_tr"] = s["s_tr"] - (s["s_tr"] / p) + tr
+
+        if s["s_tr"] != 0:
+            plus_di = 100.0 * s["s_plus"] / s["s_tr"]
+            minus_di = 100.0 * s["s_minus"] / s["s_tr"]
+        else:
+            plus_di = minus_di = 0.0
+        di_sum = plus_di + minus_di
+        dx = abs(plus_di - minus_di) / di_sum * 100.0 if di_sum != 0 else 0.0
+
+        s["dx_count"] += 1
+        if s["dx_count"] <= p:
+            s["dx_sum"] += dx
+            if s["dx_count"] == p:
+                s["adx"] = s["dx_sum"] / p
+        else:
+            s["adx"] = (s["adx"] * (p - 1) + dx) / p
+        return s
+
+    def _value(self, s: dict) -> Optional[float]:
+        # Same warm-up as calc_adx: 2 * period + 1 bars
+        return s["adx"] if s["dx_count"] > self.period else None
+
+    @property
+    def value(self) -> Optional[float]:
+        return self._value(self._s)
+
+    def _push(self, h, l, c):
+        self._s = self._step(h, l, c)
+
+    def _peek(self, h, l, c):
+        return self._value(self._step(h, l, c))
+
+    def _dump(self):
+        return dict(self._s)
+
+    def _load(self, state):
+        self._s = {f: state[f] for f in self._FIELDS}
+        if self._s["prev"] is not None:
+            self._s["prev"] = tuple(self._s["prev"])
+
+
+@_register
+class StreamingDonchian(StreamingIndicator):
+    """Rolling max of highs / min of lows with monotonic deques. ``value`` is (upper, lower)."""
+
+    KIND = "donchian"
+
+    def __init__(self, period: int = 20):
+        self.period = period
+        self._count = 0
+        self._max: deque[tuple[int, float]] = deque()
+        self._min: deque[tuple[int, float]] = deque()
+
+    def params(self) -> dict:
+        return {"period": self.period}
+
+    @property
+    def value(self) -> Optional[tuple[float, float]]:
+        if self._count < self.period:
+            return None
+        return (self._max[0][1], self._min[0][1])
+
+    def _push(self, h, l, c):
+        i = self._count
+        while self._max and self._max[-1][1] <= h:
+            self._max.pop()
+        self._max.append((i, h))
+        while self._min and self._min[-1][1] >= l:
+            self._min.pop()
+        self._min.append((i, l))
+        # Only the front can fall out of the window, one index per push
+        if self._max[0][0] <= i - self.period:
+            self._max.popleft()
+        if self._min[0][0] <= i - self.period:
+            self._min.popleft()
+        self._count += 1
+
+    @staticmethod
+    def _survivor(q: deque, oldest: int) -> Optional[float]:
+        """Extreme of the window once index ``oldest - 1`` drops out (only the front can)."""
+        if q and q[0][0] >= oldest:
+            return q[0][1]
+        return q[1][1] if len(q) > 1 else None
+
+    def _peek(self, h, l, c):
+        if self._count + 1 < self.period:
+            return None
+        oldest = self._count + 1 - self.period
+        upper = self._survivor(self._max, oldest)
+        lower = self._survivor(self._min, oldest)
+        return (h if upper is None else max(upper, h), l if lower is None else min(lower, l))
+
+    def _dump(self):
+        return {"count": self._count, "max": list(self._max), "min": list(self._min)}
+
+    def _load(self, state):
+        self._count = state["count"]
+        self._max = deque(tuple(x) for x in state["max"])
+        self._min = deque(tuple(x) for x in state["min"])
+
+
+@_register
+class StreamingMASlope(StreamingIndicator):
+    """SMA now minus SMA ``lookback`` candles ago."""
+
+    KIND = "ma_slope"
+
+    def __init__(self, ma_period: int = 200, lookback: int = 10):
+        self.ma_period = ma_period
+        self.lookback = lookback
+        self._sma = StreamingSMA(ma_period)
+        self._history: deque[float] = deque(maxlen=lookback + 1)
+
+    def params(self) -> dict:
+        return {"ma_period": self.ma_period, "lookback": self.lookback}
+
+    @property
+    def value(self) -> Optional[float]:
+        if len(self._history) <= self.lookback:
+            return None
+        return self._history[-1] - self._history[0]
+
+    def _push(self, h, l, c):
+        self._sma._push(h, l, c)
+        if self._sma.value is not None:
+            self._history.append(self._sma.value)
+
+    def _peek(self, h, l, c):
+        ma = self._sma._peek(h, l, c)
+        if ma is None or len(self._history) < self.lookback:
+            return None
+        return ma - (self._history[-self.lookback] if self.lookback else ma)
+
+    def _dump(self):
+        return {"sma": self._sma._dump(), "history": list(self._history)}
+
+    def _load(self, state):
+        self._sma._load(state["sma"])
+        self._history = deque(state["history"], maxlen=self.lookback + 1)
+
+
+class IndicatorStream:
+    """The streaming indicators of one pair/interval, kept in step with its klines.
+
+    ``sync(klines)`` commits every closed candle newer than the last one seen
+    (re-seeding from ``klines`` if candles were missed) and returns each
+    indicator's value including the forming last candle.
+    """
+
+    def __init__(self, pair: str, interval: str, indicators: dict[str, StreamingIndicator]):
+        self.pair = pair
+        self.interval = interval
+        self.indicators = indicators
+        self.last_time: Optional[int] = None
+
+    @property
+    def key(self) -> str:
+        return STREAM_KEY.format(pair=self.pair, interval=self.interval)
+
+    def spec(self) -> dict:
+        return {name: [ind.KIND, ind.params()] for name, ind in self.indicators.items()}
+
+    def reset(self) -> None:
+        self.indicators = {name: ind.fresh() for name, ind in self.indicators.items()}
+        self.last_time = None
+
+    def sync(self, klines, forming_last: bool = True) -> dict:
+        """``klines``: ``Klines`` or a list of candle dicts, oldest first."""
+        closed = klines[:-1] if forming_last else klines
+        if self.last_time is None or (len(closed) and closed[0]["time"] > self.last_time):
+            # First sync, or candles may have been missed before the fetched window
+            self.reset()
+            new = closed
+        elif isinstance(closed, Klines):
+            new = closed[int(closed.time.searchsorted(self.last_time, side="right")):]
+        else:
+            new = [k for k in closed if k["time"] > self.last_time]
+        for k in new:
+            for ind in self.indicators.values():
+                ind.update(k)
+        if len(new):
+            self.last_time = new[-1]["time"]
+        if forming_last and len(klines):
+            return {name: ind.update(klines[-1], closed=False) for name, ind in self.indicators.items()}
+        return {name: ind.value for name, ind in self.indicators.items()}
+
+    def to_dict(self) -> dict:
+        return {
+            "pair": self.pair,
+            "interval": self.interval,
+            "last_time": self.last_time,
+            "indicators": {name: ind.to_dict() for name, ind in self.indicators.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "IndicatorStream":
+        stream = cls(data["pair"], data["interval"],
+                     {name: indicator_from_dict(d) for name, d in data["indicators"].items()})
+        stream.last_time = data["last_time"]
+        return stream
+
+    async def save(self) -> None:
+        redis = await get_redis()
+        await redis.set(self.key, json.dumps(self.to_dict()), ex=STREAM_TTL)
+
+    @classmethod
+    async def load(cls, pair: str, interval: str,
+                   indicators: dict[str, StreamingIndicator]) -> "IndicatorStream":
+        """Resume the stream saved in Redis, or start a new one if none matches ``indicators``."""
+        stream = cls(pair, interval, indicators)
+        redis = await get_redis()
+        raw = await redis.get(stream.key)
+        if raw:
+            try:
+                saved = cls.from_dict(json.loads(raw))
+                if saved.spec() == stream.spec():
+                    return saved
+            except (KeyError, TypeError, ValueError) as e:
+                print(f"[IndicatorStream] dropping unreadable state {stream.key}: {e}")
+        return stream
+
+
+# ---------------------------------------------------------------------------
+# Runner integration
+# ---------------------------------------------------------------------------
+
+# calc_* name -> (array arguments, minimum window for the stream value to apply,
+#                 streaming indicator for the call's other arguments)
+_CALLS: dict[str, tuple[tuple[str, ...], Callable[[dict], int], Callable[[dict], StreamingIndicator]]] = {
+    "calc_rsi": (("closes",), lambda a: a["period"] + 1, lambda a: StreamingRSI(a["period"])),
+    "calc_ma": (("closes",), lambda a: a["period"], lambda a: StreamingSMA(a["period"])),
+    "calc_bollinger": (("closes",), lambda a: a["period"],
+                       lambda a: StreamingBollinger(a["period"], a["std_dev"])),
+    "calc_bandwidth": (("closes",), lambda a: a["period"],
+                       lambda a: StreamingBandwidth(a["period"], a["std_dev"])),
+    "calc_atr": (("highs", "lows", "closes"), lambda a: a["period"] + 1, lambda a: StreamingATR(a["period"])),
+    "calc_donchian": (("highs", "lows"), lambda a: a["period"], lambda a: StreamingDonchian(a["period"])),
+    "calc_ma_slope": (("closes",), lambda a: a["ma_period"] + a["lookback"],
+                      lambda a: StreamingMASlope(a["ma_period"], a["lookback"])),
+}
+_COLUMNS = {"closes": 0, "highs": 1, "lows": 2}
+
+# call key -> (value on the closed candles, value including the forming one)
+StreamValues = dict[str, tuple[Any, Any]]
+
+
+def call_key(name: str, params: dict) -> str:
+    return f"{name}:{json.dumps(params, sort_keys=True)}"
+
+
+class StreamResolver:
+    """``indicator_override`` resolver answering from one stream's values.
+
+    ``columns`` are the (closes, highs, lows) arrays ``evaluate`` receives,
+    wrapped by ``column_windows`` so the windows sliced from them are located;
+    a call whose windows end at their last candle gets the forming value, one
+    ending a candle earlier (``highs[:-1]``) the closed value. Everything else
+    goes to ``fn`` (the memoized computation); supported calls without a
+    stream value are collected in ``wanted``.
+    """
+
+    def __init__(self, values: StreamValues, columns):
+        self._values = values
+        self._n = len(columns[0])
+        self.columns = column_windows(*columns, origin=self)
+        self.hits = 0
+        self.wanted: dict[str, tuple[str, dict]] = {}
+
+    def _end(self, column: int, arr) -> Optional[int]:
+        located = window_of(arr, self)
+        if located is None or located[0] != column:
+            return None
+        return self._n - (located[1] + len(arr))  # candles after the window's last one
+
+    def __call__(self, name: str, fn: Callable, args: dict) -> Any:
+        spec = _CALLS.get(name)
+        if spec is not None:
+            arrays, min_len, _ = spec
+            n = len(args[arrays[0]])
+            ends = {self._end(_COLUMNS[a], args[a]) for a in arrays}
+            if len(ends) == 1 and ends <= {0, 1} and all(len(args[a]) == n for a in arrays) and n >= min_len(args):
+                params = {k: v for k, v in args.items() if k not in arrays}
+                key = call_key(name, params)
+                values = self._values.get(key)
+                if values is None:
+                    self.wanted[key] = (name, params)
+                else:
+                    value = values[1] if ends == {0} else values[0]
+                    if value is not None:
+                        self.hits += 1
+                        return value
+        return fn(**args)
+
+
+def evaluate_streamed(fn: Callable, scope, values: StreamValues, *args) -> tuple[Any, int, int, int, dict]:
+    """``evaluate_in_scope`` with the calls ``values`` covers answered from it.
+
+    Module-level so it can be sent to a pool worker; returns
+    ``(result, cache hits, cache misses, stream hits, wanted calls)``.
+    """
+    resolver = StreamResolver(values, args[:3])
+    with indicator_override(resolver):
+        result, hits, misses = evaluate_in_scope(fn, scope, *resolver.columns, *args[3:])
+    return result, hits, misses, resolver.hits, resolver.wanted
+
+
+class IndicatorStreams:
+    """The runner's streams, one per pair/interval, grown from the calls strategies make."""
+
+    def __init__(self):
+        self._streams: dict[tuple[str, str], IndicatorStream] = {}
+        # (pair, interval) -> (forming candle it was computed for, values)
+        self._values: dict[tuple[str, str], tuple[tuple, StreamValues]] = {}
+        self._dirty: set[tuple[str, str]] = set()
+
+    def values(self, pair: str, interval: str, klines: Klines) -> StreamValues:
+        """Sync the stream with ``klines`` (last one forming) and return its values."""
+        key = (pair, interval)
+        stream = self._streams.get(key)
+        if stream is None or not stream.indicators or not len(klines):
+            return {}
+        forming = (klines.last_time, float(klines.high[-1]), float(klines.low[-1]), float(klines.close[-1]))
+        cached = self._values.get(key)
+        if cached is not None and cached[0] == forming:
+            return cached[1]
+        last_time = stream.last_time
+        peeked = stream.sync(klines)
+        if stream.last_time != last_time:
+            self._dirty.add(key)
+        values = {name: (ind.value, peeked[name]) for name, ind in stream.indicators.items()}
+        self._values[key] = (forming, values)
+        return values
+
+    def want(self, pair: str, interval: str, wanted: dict[str, tuple[str, dict]]) -> None:
+        """Add indicators for calls the stream could not answer; seeded on the next sync."""
+        stream = self._streams.setdefault((pair, interval), IndicatorStream(pair, interval, {}))
+        added = {key: _CALLS[name][2](params) for key, (name, params) in wanted.items()
+                 if key not in stream.indicators}
+        if added:
+            stream.indicators.update(added)
+            stream.reset()
+            self._values.pop((pair, interval), None)
+
+    def record(self, hits: int) -> None:
+        if hits:
+            metrics.incr("indicator_stream.hits", hits)
+
+    async def save(self) -> None:
+        """Persist streams that committed candles since the last save."""
+        dirty, self._dirty = self._dirty, set()
+        for key in dirty:
+            try:
+                await self._streams[key].save()
+            except Exception as e:
+                print(f"[IndicatorStream] save failed for {key[0]} {key[1]}: {e}")
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self._dirty)
+
+    async def restore(self, pairs: Iterable[str], intervals: Iterable[str]) -> int:
+        """Resume the streams saved under ``ind:stream:*`` (runner start)."""
+        keys = [(pair, interval) for pair in pairs for interval in intervals]
+        if not keys:
+            return 0
+        redis = await get_redis()
+        raws = await redis.mget([STREAM_KEY.format(pair=p, interval=i) for p, i in keys])
+        restored = 0
+        for key, raw in zip(keys, raws):
+            if not raw:
+                continue
+            try:
+                self._streams[key] = IndicatorStream.from_dict(json.loads(raw))
+                restored += 1
+            except (KeyError, TypeError, ValueError) as e:
+                print(f"[IndicatorStream] dropping unreadable state for {key[0]} {key[1]}: {e}")
+        return restored
+
+    def clear(self) -> None:
+        self._streams.clear()
+        self._values.clear()
+        self._dirty.clear()
+
+
+indicator_streams = IndicatorStreams()
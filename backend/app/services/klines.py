@@ -0,0 +1,198 @@
+"""
+klines.py - Columnar candle container
+- ``Klines`` holds one float64 NumPy column per field (time is int64 seconds)
+  instead of a dict per candle; the columns go straight into the indicator
+  functions (``calc_atr(k.high, k.low, k.close)``)
+- Slicing (``k[-200:]``, ``k[:-1]``) returns a ``Klines`` of views, no copy
+- Columns are read-only: fetched klines are cached and shared by every bot
+- ``to_dicts()`` builds the per-candle dicts, only at the HTTP boundary;
+  ``k[i]`` returns one candle as a dict for the odd scalar lookup
+- ``Klines.load`` / ``save`` read and write history files for backtests:
+  ``.npz`` (columns as saved), ``.csv`` (Binance data dumps, or a header row
+  naming the fields) and ``.json`` (candle dicts or Binance rows)
+- ``column_windows`` wraps columns so the windows a strategy slices from them
+  (``closes[-200:]``, ``highs[:-1]``) carry their position; ``window_of``
+  reads it back for the indicator resolvers. Any other operation (copy,
+  arithmetic, reversal, fancy indexing) gives a plain array with no position
+"""
+import json
+from pathlib import Path
+from typing import Any, Iterator, Optional, Union
+
+import numpy as np
+
+FIELDS = ("time", "open", "high", "low", "close", "volume")
+
+
+class Klines:
+    __slots__ = FIELDS
+
+    def __init__(self, time, open, high, low, close, volume):
+        self.time = self._column(time, np.int64)
+        self.open = self._column(open, np.float64)
+        self.high = self._column(high, np.float64)
+        self.low = self._column(low, np.float64)
+        self.close = self._column(close, np.float64)
+        self.volume = self._column(volume, np.float64)
+
+    @staticmethod
+    def _column(values, dtype) -> np.ndarray:
+        # A read-only view; the caller's own array stays writable
+        col = np.asarray(values, dtype=dtype).view()
+        col.flags.writeable = False
+        return col
+
+    # -- construction ----------------------------------------------------------
+
+    @classmethod
+    def empty(cls) -> "Klines":
+        return cls(*([()] * len(FIELDS)))
+
+    @classmethod
+    def from_binance(cls, rows: list) -> "Klines":
+        """Binance ``/klines`` rows: [open_ms, open, high, low, close, volume, ...] (numbers as strings)."""
+        if not rows:
+            return cls.empty()
+        m = np.array([row[:6] for row in rows], dtype=np.float64).T.copy()
+        return cls((m[0] // 1000).astype(np.int64), m[1], m[2], m[3], m[4], m[5])
+
+    @classmethod
+    def from_dicts(cls, candles: list[dict]) -> "Klines":
+        if not candles:
+            return cls.empty()
+        return cls(*(np.fromiter((c[f] for c in candles), dtype=np.float64, count=len(candles))
+                     for f in FIELDS))
+
+    @classmethod
+    def concat(cls, *parts: "Klines") -> "Klines":
+        return cls(*(np.concatenate([getattr(k, f) for k in parts]) for f in FIELDS))
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "Klines":
+        path = Path(path)
+        suffix = path.suffix.lower()
+        if suffix == ".npz":
+            with np.load(path) as data:
+                return cls(*(data[f] for f in FIELDS))
+        if suffix == ".json":
+            rows = json.loads(path.read_text())
+            if rows and isinstance(rows[0], dict):
+                return cls.from_dicts(rows)
+            return cls.from_binance(rows)
+        if suffix == ".csv":
+            return cls._load_csv(path)
+        raise ValueError(f"unsupported klines file {path} (use .npz, .csv or .json)")
+
+    @classmethod
+    def _load_csv(cls, path: Path) -> "Klines":
+        with open(path) as f:
+            first = f.readline().strip().split(",")
+        try:
+            float(first[0])
+            header, columns = 0, range(6)  # Binance dump: open_time, o, h, l, c, v, ...
+        except ValueError:
+            names = [n.strip().lower() for n in first]
+            time_col = next(n for n in ("time", "open_time", "timestamp") if n in names)
+            header, columns = 1, [names.index(time_col)] + [names.index(f) for f in FIELDS[1:]]
+        m = np.loadtxt(path, delimiter=",", skiprows=header, usecols=list(columns), ndmin=2).T.copy()
+        if not m.size:
+            return cls.empty()
+        t = m[0]
+        # Dumps use ms (µs since 2025); normalise to seconds
+        scale = 1_000_000 if t.max() > 1e14 else 1000 if t.max() > 1e11 else 1
+        return cls((t // scale).astype(np.int64), m[1], m[2], m[3], m[4], m[5])
+
+    def save(self, path: Union[str, Path]) -> None:
+        """Write the columns to an ``.npz`` file (the fastest format to load)."""
+        np.savez(path, **{f: getattr(self, f) for f in FIELDS})
+
+    # -- access ----------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self.time)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return Klines(*(getattr(self, f)[index] for f in FIELDS))
+        return {f: getattr(self, f)[index].item() for f in FIELDS}
+
+    def __iter__(self) -> Iterator[dict]:
+        return iter(self.to_dicts())
+
+    @property
+    def last_time(self) -> Optional[int]:
+        return int(self.time[-1]) if len(self.time) else None
+
+    def to_dicts(self) -> list[dict]:
+        columns = [getattr(self, f).tolist() for f in FIELDS]
+        return [dict(zip(FIELDS, row)) for row in zip(*columns)]
+
+
+# ---------------------------------------------------------------------------
+# Located windows
+# ---------------------------------------------------------------------------
+
+def _plain(x: Any) -> Any:
+    if isinstance(x, ColumnWindow):
+        return x.view(np.ndarray)
+    if isinstance(x, (list, tuple)):
+        return type(x)(_plain(v) for v in x)
+    return x
+
+
+class ColumnWindow(np.ndarray):
+    """A contiguous slice of one column that knows where it sits in it.
+
+    ``origin`` identifies the ``column_windows`` call it came from, ``column``
+    the column's index there and ``start`` the window's first row. Only
+    step-1 slicing keeps the position; every computation returns plain
+    NumPy arrays and scalars.
+    """
+
+    origin: Optional[object] = None
+    column = 0
+    start = 0
+
+    def __array_finalize__(self, obj) -> None:
+        self.origin = None
+
+    def __getitem__(self, index):
+        out = super().__getitem__(index)
+        if isinstance(out, ColumnWindow) and self.origin is not None \
+                and isinstance(index, slice) and index.step in (None, 1):
+            start, _, _ = index.indices(len(self))
+            out.origin, out.column, out.start = self.origin, self.column, self.start + start
+        return out
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        if "out" in kwargs:
+            kwargs["out"] = _plain(kwargs["out"])
+        return getattr(ufunc, method)(*_plain(inputs), **kwargs)
+
+    def __array_function__(self, func, types, args, kwargs):
+        return func(*_plain(args), **{k: _plain(v) for k, v in kwargs.items()})
+
+    def __reduce__(self):
+        # Pickles (e.g. to a pool worker) as a plain array: positions are per process
+        return self.view(np.ndarray).__reduce__()
+
+
+def column_windows(*columns: np.ndarray, origin: Optional[object] = None) -> tuple[ColumnWindow, ...]:
+    """Wrap ``columns`` (no copy) so windows sliced from them can be located.
+
+    ``origin`` defaults to a fresh token; pass one to recognise the windows later.
+    """
+    origin = object() if origin is None else origin
+    windows = []
+    for idx, col in enumerate(columns):
+        window = np.asarray(col).view(ColumnWindow)
+        window.origin, window.column, window.start = origin, idx, 0
+        windows.append(window)
+    return tuple(windows)
+
+
+def window_of(arr: Any, origin: object) -> Optional[tuple[int, int]]:
+    """(column index, first row) of a window sliced from ``origin``'s columns, else None."""
+    if isinstance(arr, ColumnWindow) and arr.origin is origin and len(arr):
+        return arr.column, arr.start
+    return None
@@ -0,0 +1,346 @@
+"""
+ledger.py - Event-sourced ledger for paper fills (LEDGER_MODE, experimental)
+- Fills are checked and reserved against in-memory balances, then group
+  committed: the first fill waiting on the commit lock writes every queued
+  fill (order row, journal entry, Trade row) in one transaction, and the fills
+  that queued behind it ride along. A fill returns only once its batch has
+  committed. Wallet rows (the contended ones) are not touched per fill
+- Orders the caller already flushed are journaled in the caller's own
+  transaction instead (their row lock is held there)
+- Balance deltas are folded into ``wallets`` by periodic snapshots; wallet
+  reads add ``pending_deltas`` until then
+- On restart, journal entries not yet covered by a snapshot are replayed
+- Wallet writers outside the ledger (deposits, bot subscriptions, withdrawals)
+  go through ``risk_cache``, which calls ``invalidate`` for the user
+
+Ledger mode is limited to ONE API process: balances held in memory are not
+shared between workers, and ``app.runner`` refuses to start with it.
+"""
+import asyncio
+from decimal import Decimal
+from typing import Callable, Optional
+
+from sqlalchemy import inspect, select, update, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models.ledger import LedgerEntry, LedgerSnapshot
+from app.models.order import Order, Trade, OrderSide, OrderStatus
+from app.models.wallet import Wallet
+
+BalanceKey = tuple[int, str]  # (user_id, asset)
+
+
+class _QueuedFill:
+    __slots__ = ("order", "base", "quote", "qty", "price", "deltas", "done", "prior")
+
+    def __init__(self, order: Order, base: str, quote: str, qty: Decimal, price: Decimal,
+                 deltas: dict[BalanceKey, Decimal]):
+        self.order = order
+        self.base, self.quote = base, quote
+        self.qty, self.price = qty, price
+        self.deltas = deltas
+        self.done: asyncio.Future = asyncio.get_running_loop().create_future()
+        # Order fields to put back if the fill never commits
+        self.prior = (order.status, order.filled_quantity)
+
+    def entry(self) -> LedgerEntry:
+        user_id = self.order.user_id
+        return LedgerEntry(
+            order_id=self.order.id, user_id=user_id, pair=self.order.pair,
+            side=OrderSide(self.order.side), price=self.price, quantity=self.qty,
+            base_asset=self.base, quote_asset=self.quote,
+            base_delta=self.deltas[(user_id, self.base)], quote_delta=self.deltas[(user_id, self.quote)],
+        )
+
+
+class Ledger:
+    def __init__(self, session_factory: Callable[[], AsyncSession] = AsyncSessionLocal):
+        self._session_factory = session_factory
+        # Materialized balances = wallet row + pending + in-flight deltas
+        self._balances: dict[BalanceKey, Decimal] = {}
+        # Committed deltas not yet folded into wallets
+        self._pending: dict[BalanceKey, Decimal] = {}
+        # Reserved deltas whose journal entry is not committed yet
+        self._inflight: dict[BalanceKey, Decimal] = {}
+        # Journal ids committed but not yet covered by a snapshot
+        self._unsnapshotted_ids: list[int] = []
+        # Fills waiting for the next group commit
+        self._queue: list[_QueuedFill] = []
+        self._commit_lock = asyncio.Lock()
+        self._load_lock = asyncio.Lock()
+        # Bumped whenever the whole balance cache / one user's balances are dropped
+        self._generation = 0
+        self._user_generations: dict[int, int] = {}
+
+    # ------------------------------------------------------------------
+    # Fill path
+    # ------------------------------------------------------------------
+
+    async def apply_fill(
+        self, db: AsyncSession, order: Order, base: str, quote: str,
+        qty: Decimal, price: Decimal,
+    ) -> bool:
+        """Apply a paper fill in memory and journal it.
+
+        The order, journal entry and trade are committed (group committed for
+        orders not yet flushed by the caller) before this returns; the wallet
+        write is deferred to the next snapshot. Returns ``False`` on
+        insufficient balance.
+        """
+        user_id = order.user_id
+        cost = qty * price
+        if OrderSide(order.side) == OrderSide.buy:
+            spend_key, need = (user_id, quote), cost
+            deltas = {(user_id, quote): -cost, (user_id, base): qty}
+        else:
+            spend_key, need = (user_id, base), qty
+            deltas = {(user_id, base): -qty, (user_id, quote): cost}
+
+        await self._ensure_loaded(user_id, (base, quote))
+
+        # Check and reserve with no await in between, so concurrent fills can't overdraw
+        if self._balances[spend_key] < need:
+            return False
+        self._adjust_balances(deltas)
+        self._add(self._inflight, deltas)
+
+        fill = _QueuedFill(order, base, quote, qty, price, deltas)
+        order.filled_quantity = qty
+        order.status = OrderStatus.filled
+        in_session = inspect(order).persistent
+        try:
+            if in_session:
+                await self._commit_in_session(db, fill)
+            else:
+                if inspect(order).pending:
+                    db.expunge(order)
+                self._queue.append(fill)
+                await self._group_commit(fill)
+        except BaseException:
+            # Settle fills nobody else will: still queued, or failed in the caller's session.
+            # A batch already being written settles its own fills
+            if fill in self._queue:
+                self._queue.remove(fill)
+                self._release(fill, committed_ids=None)
+            elif in_session and not fill.done.done():
+                self._release(fill, committed_ids=None)
+            raise
+        return True
+
+    async def _commit_in_session(self, db: AsyncSession, fill: _QueuedFill) -> None:
+        entry = fill.entry()
+        db.add(entry)
+        db.add(Trade(order_id=fill.order.id, price=fill.price, quantity=fill.qty))
+        await db.flush()
+        entry_id = entry.id
+        await db.commit()
+        self._release(fill, committed_ids=[entry_id])
+        fill.done.set_result(True)
+
+    async def _group_commit(self, fill: _QueuedFill) -> None:
+        async with self._commit_lock:
+            # Still queued: lead the next batch. Otherwise an earlier leader took it
+            if fill in self._queue:
+                if settings.LEDGER_FLUSH_MS:
+                    # Let concurrent fills pile into the same batch
+                    await asyncio.sleep(settings.LEDGER_FLUSH_MS / 1000)
+                batch, self._queue = self._queue, []
+                # Shielded: a cancelled leader must not strand the fills riding with it
+                await asyncio.shield(self._write_batch(batch))
+        await fill.done
+
+    async def _write_batch(self, batch: list[_QueuedFill]) -> None:
+        try:
+            ids = await self._insert(batch)
+        except Exception as e:
+            if len(batch) == 1:
+                self._release(batch[0], committed_ids=None)
+                batch[0].done.set_exception(e)
+                return
+            # One bad fill (e.g. a duplicate client_order_id) must not sink the rest
+            for fill in batch:
+                await self._write_batch([fill])
+            return
+        # No await from here on: a snapshot sees each delta with its entry id
+        for fill, entry_id in zip(batch, ids):
+            self._release(fill, committed_ids=[entry_id])
+            fill.done.set_result(True)
+
+    async def _insert(self, batch: list[_QueuedFill]) -> list[int]:
+        async with self._session_factory() as s:
+            s.add_all([f.order for f in batch])
+            await s.flush()
+            entries = [f.entry() for f in batch]
+            s.add_all(entries)
+            s.add_all([Trade(order_id=f.order.id, price=f.price, quantity=f.qty) for f in batch])
+            await s.flush()
+            ids = [e.id for e in entries]
+            await s.commit()
+            return ids
+
+    def _release(self, fill: _QueuedFill, committed_ids: Optional[list[int]]) -> None:
+        """Move a fill's deltas out of in-flight: into pending once committed, else undone."""
+        self._add(self._inflight, {k: -d for k, d in fill.deltas.items()})
+        if committed_ids is None:
+            self._adjust_balances({k: -d for k, d in fill.deltas.items()})
+            fill.order.status, fill.order.filled_quantity = fill.prior
+            return
+        self._add(self._pending, fill.deltas)
+        self._unsnapshotted_ids.extend(committed_ids)
+
+    @staticmethod
+    def _add(target: dict[BalanceKey, Decimal], deltas: dict[BalanceKey, Decimal]) -> None:
+        for key, delta in deltas.items():
+            total = target.get(key, Decimal("0")) + delta
+            if total:
+                target[key] = total
+            else:
+                target.pop(key, None)
+
+    def balance(self, user_id: int, asset: str) -> Optional[Decimal]:
+        """Materialized balance if loaded, else ``None``."""
+        return self._balances.get((user_id, asset))
+
+    def pending_delta(self, user_id: int, asset: str) -> Decimal:
+        """Journaled change not yet reflected in the wallet row."""
+        return self._pending.get((user_id, asset), Decimal("0"))
+
+    def pending_deltas(self, user_id: int) -> dict[str, Decimal]:
+        """Every asset's journaled change not yet reflected in the user's wallet rows."""
+        return {asset: delta for (uid, asset), delta in self._pending.items() if uid == user_id}
+
+    def invalidate(self, user_id: Optional[int] = None) -> None:
+        """Reload one user's (or every) balance from wallets on next use.
+
+        For wallet rows changed outside the ledger; pending and in-flight
+        deltas are kept, so the reload is the new row plus what is not yet
+        snapshotted.
+        """
+        if user_id is None:
+            self._balances.clear()
+            self._generation += 1
+            return
+        for key in [k for k in self._balances if k[0] == user_id]:
+            del self._balances[key]
+        self._user_generations[user_id] = self._user_generations.get(user_id, 0) + 1
+
+    def _token(self, user_id: int) -> tuple[int, int]:
+        return self._generation, self._user_generations.get(user_id, 0)
+
+    def _adjust_balances(self, deltas: dict[BalanceKey, Decimal]) -> None:
+        for key, delta in deltas.items():
+            if key in self._balances:
+                self._balances[key] += delta
+
+    async def _ensure_loaded(self, user_id: int, assets: tuple[str, ...]) -> None:
+        if all((user_id, a) in self._balances for a in assets):
+            return
+        async with self._load_lock:
+            while True:
+                missing = [a for a in assets if (user_id, a) not in self._balances]
+                if not missing:
+                    return
+                token = self._token(user_id)
+                async with self._session_factory() as s:
+                    rows = await s.execute(
+                        select(Wallet.asset, Wallet.balance).where(
+                            Wallet.user_id == user_id, Wallet.asset.in_(missing)
+                        )
+                    )
+                    found = {asset: Decimal(str(bal or 0)) for asset, bal in rows.all()}
+                # Invalidated while reading: the rows may predate that wallet write
+                if token == self._token(user_id):
+                    break
+            for asset in missing:
+                key = (user_id, asset)
+                self._balances[key] = (found.get(asset, Decimal("0")) + self._pending.get(key, Decimal("0"))
+                                       + self._inflight.get(key, Decimal("0")))
+
+    # ------------------------------------------------------------------
+    # Snapshots
+    # ------------------------------------------------------------------
+
+    async def snapshot(self) -> Optional[int]:
+        """Fold all journaled deltas into wallet rows. Returns the snapshot id."""
+        async with self._load_lock:
+            # Every pending delta belongs to a committed journal entry (see apply_fill)
+            if not self._pending:
+                return None
+            deltas, self._pending = self._pending, {}
+            ids, self._unsnapshotted_ids = self._unsnapshotted_ids, []
+            try:
+                snapshot_id = await self._write_snapshot(deltas, ids)
+            except Exception:
+                for key, delta in deltas.items():
+                    self._pending[key] = self._pending.get(key, Decimal("0")) + delta
+                self._unsnapshotted_ids[:0] = ids
+                raise
+            # Reload from wallets on next use so external credits (deposits) show up
+            self._balances.clear()
+            self._generation += 1
+            return snapshot_id
+
+    async def _write_snapshot(self, deltas: dict[BalanceKey, Decimal], ids: list[int]) -> int:
+        async with self._session_factory() as s:
+            wallets = await s.scalars(
+                select(Wallet)
+                .where(tuple_(Wallet.user_id, Wallet.asset).in_(list(deltas)))
+                .with_for_update()
+            )
+            existing = {(w.user_id, w.asset): w for w in wallets}
+            for (user_id, asset), delta in deltas.items():
+                wallet = existing.get((user_id, asset))
+                if wallet:
+                    wallet.balance = Decimal(str(wallet.balance or 0)) + delta
+                else:
+                    s.add(Wallet(user_id=user_id, asset=asset, balance=delta))
+            snap = LedgerSnapshot(last_entry_id=max(ids, default=0), entry_count=len(ids))
+            s.add(snap)
+            await s.flush()
+            if ids:
+                await s.execute(
+                    update(LedgerEntry).where(LedgerEntry.id.in_(ids)).values(snapshot_id=snap.id)
+                )
+            await s.commit()
+            return snap.id
+
+    # ------------------------------------------------------------------
+    # Recovery / background loop
+    # ------------------------------------------------------------------
+
+    async def recover(self) -> int:
+        """Replay journal entries not covered by a snapshot, then snapshot them."""
+        async with self._session_factory() as s:
+            rows = (await s.execute(
+                select(
+                    LedgerEntry.id, LedgerEntry.user_id,
+                    LedgerEntry.base_asset, LedgerEntry.base_delta,
+                    LedgerEntry.quote_asset, LedgerEntry.quote_delta,
+                ).where(LedgerEntry.snapshot_id.is_(None)).order_by(LedgerEntry.id)
+            )).all()
+        for entry_id, user_id, base, base_delta, quote, quote_delta in rows:
+            for key, delta in (((user_id, base), base_delta), ((user_id, quote), quote_delta)):
+                self._pending[key] = self._pending.get(key, Decimal("0")) + Decimal(str(delta))
+            self._unsnapshotted_ids.append(entry_id)
+        self._balances.clear()
+        self._generation += 1
+        if rows:
+            await self.snapshot()
+            print(f"[Ledger] recovered {len(rows)} journal entries")
+        return len(rows)
+
+    async def run(self) -> None:
+        """Periodic snapshot loop."""
+        await self.recover()
+        print("[Ledger] running in ledger mode")
+        while True:
+            await asyncio.sleep(settings.LEDGER_SNAPSHOT_SEC)
+            try:
+                await self.snapshot()
+            except Exception as e:
+                print(f"[Ledger] snapshot error: {e}")
+
+
+ledger = Ledger()
@@ -2,17 +2,26 @@
 market_data.py - Binance API Integration
 - REST helpers (fetch_ticker, fetch_klines) via Binance public endpoints
 - WebSocket loop for real-time price streaming
+- Market events (kline close, ticks, throttled trade prices) published on
+  ``market:events:{pair}`` for the event-driven bot scheduler and exit monitor
 """
 import json
 import asyncio
+import time
 import httpx
 from typing import List, Optional, Callable, Awaitable
 from datetime import datetime
+from app.config import settings
 from app.core.redis import get_redis
+from app.services.klines import Klines
+from app.services.resampler import KlineBook, can_resample
 
 BINANCE_REST = "https://api.binance.com/api/v3"
 BINANCE_WS   = "wss://stream.binance.com:9443/ws"
 
+# Redis pub/sub channel for scheduler events (kline_close / tick / trade)
+MARKET_EVENTS_CHANNEL = "market:events:{pair}"
+
 # Broadcast callback type: async (pair, payload_dict) -> None
 BroadcastCb = Callable[[str, dict], Awaitable[None]]
 
@@ -21,6 +30,8 @@ _ticker_cache: dict = {}
 _klines_cache: dict = {}
 _TICKER_TTL  = 10   # seconds
 _KLINES_TTL  = 30   # seconds
+# pair -> 1m base series every resampled interval is derived from
+_kline_books: dict[str, KlineBook] = {}
 
 
 def _pair_to_symbol(pair: str) -> str:
@@ -63,8 +74,28 @@ async def fetch_ticker(pair: str) -> dict:
         return {}
 
 
-async def fetch_klines(pair: str, interval: str = "1h", limit: int = 500) -> list:
-    """Fetch OHLCV candlestick data from Binance. Supports any USDT pair."""
+async def fetch_klines(pair: str, interval: str = "1h", limit: int = 500) -> Klines:
+    """Fetch OHLCV candlestick data from Binance. Supports any USDT pair.
+
+    Returns columnar ``Klines`` (shared with the cache, read-only); call
+    ``to_dicts()`` for the per-candle JSON shape. With KLINES_RESAMPLE, any
+    interval/limit within KLINES_BASE_MAX_MINUTES is derived from the pair's
+    1m series (``resampler.py``) instead of its own Binance request, unless
+    the book has no candles for it.
+    """
+    if settings.KLINES_RESAMPLE and can_resample(interval, limit, settings.KLINES_BASE_MAX_MINUTES):
+        book = _kline_books.get(pair)
+        if book is None:
+            book = _kline_books[pair] = KlineBook(
+                pair, fetch_klines_range, settings.KLINES_BASE_MAX_MINUTES, _KLINES_TTL
+            )
+        try:
+            klines = await book.get(interval, limit)
+            if len(klines):
+                return klines
+        except Exception as e:
+            print(f"[Binance] fetch_klines {pair} {interval} (1m base): {e} — fetching the interval directly")
+
     now = datetime.now().timestamp()
     cache_key = f"{pair}:{interval}:{limit}"
     if cache_key in _klines_cache:
@@ -82,24 +113,36 @@ async def fetch_klines(pair: str, interval: str = "1h", limit: int = 500) -> lis
             r.raise_for_status()
             raw = r.json()
 
-        klines = [
-            {
-                "time":   int(k[0] // 1000),  # ms → seconds
-                "open":   float(k[1]),
-                "high":   float(k[2]),
-                "low":    float(k[3]),
-                "close":  float(k[4]),
-                "volume": float(k[5]),
-            }
-            for k in raw
-        ]
+        klines = Klines.from_binance(raw)  # open time ms → seconds
         _klines_cache[cache_key] = (klines, now)
         return klines
     except Exception as e:
         print(f"[Binance] fetch_klines {pair} {interval}: {e}")
         if cache_key in _klines_cache:
             return _klines_cache[cache_key][0]
-        return []
+        return Klines.empty()
+
+
+async def fetch_klines_range(pair: str, interval: str, start: int, end: Optional[int] = None) -> Klines:
+    """Page through Binance ``/klines`` for [start, end) (seconds) — backtest history, uncached."""
+    symbol = _pair_to_symbol(pair)
+    end_ms = (end if end is not None else int(time.time())) * 1000
+    cursor = start * 1000
+    rows: list = []
+    async with httpx.AsyncClient(timeout=30.0) as client:
+        while cursor < end_ms:
+            r = await client.get(
+                f"{BINANCE_REST}/klines",
+                params={"symbol": symbol, "interval": interval, "startTime": cursor,
+                        "endTime": end_ms - 1, "limit": 1000},
+            )
+            r.raise_for_status()
+            page = r.json()
+            if not page:
+                break
+            rows.extend(page)
+            cursor = int(page[-1][0]) + 1
+    return Klines.from_binance(rows)
 
 
 async def sync_market_to_redis(pair: str):
@@ -110,14 +153,33 @@ async def sync_market_to_redis(pair: str):
         await redis.set(f"market:{pair}:ticker", json.dumps(ticker), ex=30)
 
 
+# ── Market events ─────────────────────────────────────────────────────────────
+
+async def publish_market_event(redis, pair: str, event: dict) -> None:
+    try:
+        await redis.publish(MARKET_EVENTS_CHANNEL.format(pair=pair), json.dumps({"pair": pair, **event}))
+    except Exception as e:
+        print(f"[Binance WS] {pair} event publish failed: {e}")
+
+
+def invalidate_klines(pair: str, interval: str) -> None:
+    """Drop cached klines for a pair/interval so the next fetch sees the closed candle."""
+    prefix = f"{pair}:{interval}:"
+    for key in [k for k in _klines_cache if k.startswith(prefix)]:
+        _klines_cache.pop(key, None)
+    if pair in _kline_books:
+        _kline_books[pair].expire()
+
+
 # ── WebSocket streaming loop ──────────────────────────────────────────────────
 
-async def _ws_pair(pair: str, broadcast_cb: BroadcastCb):
+async def _ws_pair(pair: str, broadcast_cb: BroadcastCb, kline_intervals: tuple[str, ...] = ()):
     """
     Connect to Binance combined stream for one pair:
-      <symbol>@ticker  – 24h stats (price, change, volume …)
-      <symbol>@depth20 – order book top-20
-      <symbol>@trade   – individual trades
+      <symbol>@ticker         – 24h stats (price, change, volume …)
+      <symbol>@depth20        – order book top-20
+      <symbol>@trade          – individual trades
+      <symbol>@kline_<iv>     – candles, one stream per scheduler interval
     Auto-reconnects on disconnect.
     """
     import websockets  # type: ignore
@@ -126,8 +188,14 @@ async def _ws_pair(pair: str, broadcast_cb: BroadcastCb):
     # Combined stream URL: wss://stream.binance.com:9443/stream?streams=s1/s2/s3
     # Each message is wrapped: {"stream": "...", "data": {...}}
     streams = f"{symbol}@ticker/{symbol}@depth20@100ms/{symbol}@trade"
+    for interval in kline_intervals:
+        streams += f"/{symbol}@kline_{interval}"
     url = f"wss://stream.binance.com:9443/stream?streams={streams}"
     redis = await get_redis()
+    # Trade prices since the last published trade event (high/low catch spikes between events)
+    last_trade_event = 0.0
+    window_high: Optional[float] = None
+    window_low: Optional[float] = None
 
     while True:
         try:
@@ -151,6 +219,16 @@ async def _ws_pair(pair: str, broadcast_cb: BroadcastCb):
                         await redis.set(f"market:{pair}:ticker", json.dumps(ticker), ex=30)
                         _ticker_cache[pair] = (ticker, datetime.now().timestamp())
                         await broadcast_cb(pair, {"type": "ticker", "ticker": ticker})
+                        await publish_market_event(redis, pair, {"type": "tick", "price": d["c"]})
+
+                    elif "@kline_" in stream:
+                        k = msg["data"]["k"]
+                        if k.get("x"):  # candle closed
+                            invalidate_klines(pair, k["i"])
+                            await publish_market_event(redis, pair, {
+                                "type": "kline_close", "interval": k["i"],
+                                "close_time": int(k["T"] // 1000), "close": k["c"],
+                            })
 
                     elif "@depth" in stream:
                         d = msg["data"]
@@ -180,6 +258,17 @@ async def _ws_pair(pair: str, broadcast_cb: BroadcastCb):
                         # Push to connected clients
                         await broadcast_cb(pair, {"type": "trade", "trade": trade})
 
+                        price = float(d["p"])
+                        window_high = price if window_high is None else max(window_high, price)
+                        window_low = price if window_low is None else min(window_low, price)
+                        now = time.monotonic()
+                        if now - last_trade_event >= settings.TRADE_EVENT_MIN_INTERVAL_SEC:
+                            await publish_market_event(redis, pair, {
+                                "type": "trade", "price": d["p"], "high": window_high, "low": window_low,
+                            })
+                            last_trade_event = now
+                            window_high = window_low = None
+
         except Exception as e:
             print(f"[Binance WS] {pair} error: {e} — reconnecting in 5s")
             await asyncio.sleep(5)
@@ -189,6 +278,7 @@ async def market_data_loop(
     pairs: List[str],
     broadcast_cb: Optional[BroadcastCb] = None,
     interval_sec: int = 10,  # kept for API compat, unused
+    kline_intervals: tuple[str, ...] = (),
 ):
     """Launch WS streaming for each pair after an initial REST warm-up."""
     if broadcast_cb is None:
@@ -204,4 +294,4 @@ async def market_data_loop(
             print(f"[Warm-up] {pair}: {e}")
 
     # Run all WS loops concurrently (each auto-reconnects)
-    await asyncio.gather(*[_ws_pair(pair, broadcast_cb) for pair in pairs])
+    await asyncio.gather(*[_ws_pair(pair, broadcast_cb, kline_intervals) for pair in pairs])
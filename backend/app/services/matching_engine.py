@@ -3,9 +3,13 @@ from decimal import Decimal
 from typing import Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+from app.config import settings
 from app.core.redis import get_redis
 from app.models.order import Order, Trade, OrderStatus, OrderSide, OrderType
 from app.models.wallet import Wallet
+from app.services.symbol_registry import normalize_order_values
+from app.services.ledger import ledger
+from app.services.risk_cache import risk_cache
 
 async def get_current_price(pair: str) -> float:
     redis = await get_redis()
@@ -25,12 +29,32 @@ def _base_quote(pair: str):
     parts = pair.split("_")
     return parts[0], parts[1]
 
+async def _record_fill(order: Order, base: str, quote: str, qty: Decimal, cost: Decimal) -> None:
+    """Write a committed fill through to the pre-trade risk cache."""
+    if order.side == OrderSide.buy:
+        await risk_cache.apply_fill(order.user_id, base, quote, qty, -cost)
+    else:
+        await risk_cache.apply_fill(order.user_id, base, quote, -qty, cost)
+
 async def try_fill_order(db: AsyncSession, order: Order) -> dict:
     current_price = await get_current_price(order.pair)
     if current_price == 0:
         return {"filled": False, "fill_price": 0}
 
     base, quote = _base_quote(order.pair)
+
+    # Round to LOT_SIZE / PRICE_FILTER so paper fills match what Binance would accept
+    quantity, limit_price = await normalize_order_values(
+        order.pair,
+        OrderSide(order.side).value,
+        Decimal(str(order.quantity)),
+        Decimal(str(order.price)) if order.price is not None else None,
+    )
+    if quantity <= 0:
+        return {"filled": False, "fill_price": 0}
+    order.quantity = quantity
+    order.price = limit_price
+
     should_fill = False
     fill_price = current_price
 
@@ -51,6 +75,13 @@ async def try_fill_order(db: AsyncSession, order: Order) -> dict:
     fill_price_dec = Decimal(str(fill_price))
     cost = qty * fill_price_dec
 
+    if settings.LEDGER_MODE:
+        # Journal + in-memory balances; wallet rows are folded in by snapshots
+        filled = await ledger.apply_fill(db, order, base, quote, qty, fill_price_dec)
+        if filled:
+            await _record_fill(order, base, quote, qty, cost)
+        return {"filled": filled, "fill_price": fill_price}
+
     if order.side == OrderSide.buy:
         quote_wallet = await get_wallet(db, order.user_id, quote, lock=True)
         base_wallet = await get_wallet(db, order.user_id, base, lock=True)
@@ -76,13 +107,14 @@ async def try_fill_order(db: AsyncSession, order: Order) -> dict:
     order.status = OrderStatus.filled
     db.add(Trade(order_id=order.id, price=fill_price_dec, quantity=qty))
     await db.commit()
+    await _record_fill(order, base, quote, qty, cost)
 
     return {"filled": True, "fill_price": fill_price}
 
 
 async def try_fill_order_live(db: AsyncSession, order: Order) -> dict:
     """Fill order via real Binance API."""
-    from app.services.binance_trader import BinanceTrader, pair_to_binance_symbol
+    from app.services.binance_trader import BinanceTrader, exchange_client_order_id, pair_to_binance_symbol
 
     trader = BinanceTrader()
     try:
@@ -94,7 +126,9 @@ async def try_fill_order_live(db: AsyncSession, order: Order) -> dict:
         validated_qty = await trader.validate_quantity(symbol, order.quantity, current_price)
         order.quantity = validated_qty
 
-        result = await trader.place_market_order(symbol, side, validated_qty)
+        client_order_id = (exchange_client_order_id(order.user_id, order.client_order_id)
+                           if order.client_order_id else None)
+        result = await trader.place_market_order(symbol, side, validated_qty, client_order_id=client_order_id)
 
         fills = result.get("fills", [])
         if not fills:
@@ -130,6 +164,7 @@ async def try_fill_order_live(db: AsyncSession, order: Order) -> dict:
         order.price = avg_price
         db.add(Trade(order_id=order.id, price=avg_price, quantity=total_qty))
         await db.commit()
+        await _record_fill(order, base, quote, total_qty, total_cost)
 
         print(f"[LIVE] Order {order.id} filled: {side} {total_qty} {symbol} @ avg {avg_price}")
         return {"filled": True, "fill_price": float(avg_price)}
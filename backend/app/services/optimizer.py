@@ -0,0 +1,388 @@
+"""
+optimizer.py - Parameter sweeps over a strategy's config space
+- ``space`` maps config keys to a list of values or ``{"min", "max", "step"}``;
+  ``grid`` expands every combination, ``random`` draws ``samples`` configs
+  (seeded, so a resumed sweep draws the same ones)
+- Every config is backtested with ``run_backtest`` in a ``spawn`` process
+  pool (``OPTIMIZER_WORKERS``). Each worker gets the klines once and keeps one
+  ``SeriesIndicators`` for all its runs, so indicator series are computed once
+  per worker, not once per config
+- Walk-forward (``folds`` > 0): history is cut into folds + 1 segments; fold k
+  trains on segment k and tests on segment k + 1. Configs are ranked on the
+  out-of-sample (test) metrics, and per fold the best config on train is
+  reported with its test result
+- Finished configs are appended to a JSONL checkpoint; running again with the
+  same checkpoint skips them
+- ``enqueue_job`` queues a sweep for the admin API on ``optimizer:queue``;
+  the runner's ``run_worker`` takes one job at a time, so sweeps never run in
+  the API process. Job status is kept in ``optimizer:job:{id}``
+"""
+import asyncio
+import itertools
+import json
+import multiprocessing
+import random
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from decimal import Decimal
+from pathlib import Path
+from typing import Callable, Optional
+
+from app.config import settings
+from app.core.redis import get_redis
+from app.services.backtest import SeriesIndicators, run_backtest
+from app.services.klines import Klines
+from app.services.strategies import STRATEGIES
+
+JOB_KEY = "optimizer:job:{id}"
+JOB_TTL = 7 * 24 * 3600
+QUEUE_KEY = "optimizer:queue"
+# A job whose status hasn't moved for this long lost its runner and may be resumed
+JOB_STALE_SEC = 300
+
+# rank_by -> (metric, higher is better)
+RANK_KEYS = {
+    "return": ("pnl_pct", True),
+    "drawdown": ("max_drawdown_pct", False),
+    "sharpe": ("sharpe_ratio", True),
+}
+METRICS = ("pnl_pct", "max_drawdown_pct", "sharpe_ratio", "win_rate", "trade_count")
+
+Split = tuple[tuple[int, int], Optional[tuple[int, int]]]  # (train, test) bar ranges
+
+
+# ---------------------------------------------------------------------------
+# Config space
+# ---------------------------------------------------------------------------
+
+def _is_int(*values) -> bool:
+    return all(isinstance(v, int) and not isinstance(v, bool) for v in values)
+
+
+def _values(key: str, spec) -> list:
+    if isinstance(spec, list):
+        if not spec:
+            raise ValueError(f"no values for '{key}'")
+        return spec
+    if not isinstance(spec, dict) or "min" not in spec or "max" not in spec:
+        raise ValueError(f"'{key}' must be a list or {{min, max, step}}")
+    lo, hi, step = spec["min"], spec["max"], spec.get("step")
+    if not step or step <= 0 or hi < lo:
+        raise ValueError(f"'{key}' needs min <= max and a positive step")
+    count = int(round((hi - lo) / step)) + 1
+    if _is_int(lo, step):
+        return [lo + i * step for i in range(count)]
+    return [round(lo + i * step, 10) for i in range(count)]
+
+
+def _draw(key: str, spec, rng: random.Random):
+    if isinstance(spec, dict) and not spec.get("step"):
+        lo, hi = spec["min"], spec["max"]
+        if _is_int(lo, hi):
+            return rng.randint(lo, hi)
+        return round(rng.uniform(lo, hi), 4)
+    return rng.choice(_values(key, spec))
+
+
+def expand_space(space: dict, method: str = "grid", samples: int = 50, seed: int = 0) -> list[dict]:
+    """Configs to run, in a deterministic order."""
+    if not space:
+        raise ValueError("empty config space")
+    if method == "grid":
+        keys = list(space)
+        return [dict(zip(keys, combo)) for combo in itertools.product(*(_values(k, space[k]) for k in keys))]
+    if method != "random":
+        raise ValueError(f"unknown search method '{method}' (grid or random)")
+    rng = random.Random(seed)
+    configs: dict[str, dict] = {}
+    for _ in range(samples * 10):
+        if len(configs) >= samples:
+            break
+        config = {k: _draw(k, spec, rng) for k, spec in space.items()}
+        configs.setdefault(config_key(config), config)
+    return list(configs.values())
+
+
+def config_key(config: dict) -> str:
+    return json.dumps(config, sort_keys=True)
+
+
+def walk_forward_splits(n_bars: int, folds: int) -> list[Split]:
+    """(train, test) bar ranges; ``folds=0`` is one in-sample run over everything."""
+    if folds <= 0:
+        return [((0, n_bars), None)]
+    segment = n_bars // (folds + 1)
+    if segment <= 0:
+        raise ValueError(f"{n_bars} bars are too few for {folds} folds")
+    return [((k * segment, (k + 1) * segment), ((k + 1) * segment, (k + 2) * segment)) for k in range(folds)]
+
+
+# ---------------------------------------------------------------------------
+# Worker side
+# ---------------------------------------------------------------------------
+
+_worker: dict = {}
+
+
+def _init_worker(columns: tuple) -> None:
+    klines = Klines(*columns)
+    _worker["klines"] = klines
+    _worker["indicators"] = SeriesIndicators(klines)
+
+
+def _run_range(strategy_type: str, config: dict, bars: tuple[int, int], window: int,
+               allocated: Decimal, fee_pct: float) -> dict:
+    klines: Klines = _worker["klines"]
+    start, end = bars
+    # Earlier bars are indicator warm-up only: the first evaluated bar is ``start``
+    lo = max(0, start - window + 1)
+    report = run_backtest(strategy_type, config, klines[lo:end], allocated=allocated,
+                          fee_pct=fee_pct, indicators=_worker["indicators"], history_offset=lo)
+    return {m: report[m] for m in METRICS}
+
+
+def _aggregate(rows: list[dict]) -> dict:
+    n = len(rows)
+    return {
+        "pnl_pct": sum(r["pnl_pct"] for r in rows) / n,
+        "max_drawdown_pct": max(r["max_drawdown_pct"] for r in rows),
+        "sharpe_ratio": sum(r["sharpe_ratio"] for r in rows) / n,
+        "win_rate": sum(r["win_rate"] for r in rows) / n,
+        "trade_count": sum(r["trade_count"] for r in rows),
+    }
+
+
+def evaluate_config(strategy_type: str, config: dict, splits: list[Split],
+                    allocated: Decimal, fee_pct: float) -> dict:
+    """Backtest one config on every split (runs in a worker)."""
+    window = STRATEGIES[strategy_type](config).required_klines()
+    folds = []
+    for train, test in splits:
+        row = {"train": _run_range(strategy_type, config, train, window, allocated, fee_pct)}
+        if test is not None:
+            row["test"] = _run_range(strategy_type, config, test, window, allocated, fee_pct)
+        folds.append(row)
+    result = {"config": config, "folds": folds, "in_sample": _aggregate([f["train"] for f in folds])}
+    if "test" in folds[0]:
+        result["out_of_sample"] = _aggregate([f["test"] for f in folds])
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Sweep
+# ---------------------------------------------------------------------------
+
+class Sweep:
+    """One strategy's parameter sweep over a fixed kline history."""
+
+    def __init__(
+        self,
+        strategy_type: str,
+        space: dict,
+        klines: Klines,
+        method: str = "grid",
+        samples: int = 50,
+        seed: int = 0,
+        folds: int = 0,
+        allocated: Decimal = Decimal("1000"),
+        fee_pct: float = 0.0,
+        checkpoint: Optional[Path] = None,
+    ):
+        if strategy_type not in STRATEGIES:
+            raise ValueError(f"unknown strategy type '{strategy_type}'")
+        self.strategy_type = strategy_type
+        self.klines = klines
+        self.allocated = allocated
+        self.fee_pct = fee_pct
+        self.configs = expand_space(space, method, samples, seed)
+        self.splits = walk_forward_splits(len(klines), folds)
+        self.header = {
+            "strategy": strategy_type, "space": space, "method": method, "samples": samples,
+            "seed": seed, "folds": folds, "allocated": str(allocated), "fee_pct": fee_pct,
+            "bars": len(klines), "start": int(klines.time[0]) if len(klines) else None, "end": klines.last_time,
+        }
+        self.results: dict[str, dict] = {}
+        self.checkpoint = Path(checkpoint) if checkpoint else None
+        if self.checkpoint and self.checkpoint.exists():
+            self._resume()
+
+    def _resume(self) -> None:
+        with open(self.checkpoint) as f:
+            lines = [json.loads(line) for line in f if line.strip()]
+        if lines and lines[0] != self.header:
+            raise ValueError(f"{self.checkpoint} belongs to a different sweep")
+        for result in lines[1:]:
+            self.results[config_key(result["config"])] = result
+
+    def _save(self, result: dict) -> None:
+        if self.checkpoint is None:
+            return
+        new = not self.checkpoint.exists()
+        self.checkpoint.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.checkpoint, "a") as f:
+            if new:
+                f.write(json.dumps(self.header) + "\n")
+            f.write(json.dumps(result) + "\n")
+
+    @property
+    def total(self) -> int:
+        return len(self.configs)
+
+    def pending(self) -> list[dict]:
+        return [c for c in self.configs if config_key(c) not in self.results]
+
+    def _done(self, result: dict, progress: Optional[Callable[[int, int], None]]) -> None:
+        self.results[config_key(result["config"])] = result
+        self._save(result)
+        if progress:
+            progress(len(self.results), self.total)
+
+    def run(self, workers: Optional[int] = None, progress: Optional[Callable[[int, int], None]] = None,
+            isolate: bool = False) -> None:
+        """Backtest every pending config; ``workers <= 1`` runs inline unless ``isolate``
+        (always use worker processes, so the caller's event loop keeps the GIL)."""
+        pending = self.pending()
+        if not pending:
+            return
+        workers = workers or settings.OPTIMIZER_WORKERS or 1
+        columns = (self.klines.time, self.klines.open, self.klines.high,
+                   self.klines.low, self.klines.close, self.klines.volume)
+        args = (self.splits, self.allocated, self.fee_pct)
+        if not isolate and (workers <= 1 or len(pending) == 1):
+            _init_worker(columns)
+            for config in pending:
+                self._done(evaluate_config(self.strategy_type, config, *args), progress)
+            return
+        # spawn: a forked child would inherit the parent's event loop, sockets and locks
+        with ProcessPoolExecutor(max_workers=max(1, min(workers, len(pending))),
+                                 mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_init_worker, initargs=(columns,)) as pool:
+            futures = [pool.submit(evaluate_config, self.strategy_type, config, *args) for config in pending]
+            for future in as_completed(futures):
+                self._done(future.result(), progress)
+
+    def ranked(self, rank_by: str = "sharpe") -> list[dict]:
+        metric, higher = RANK_KEYS[rank_by]
+        scope = "out_of_sample" if self.splits[0][1] is not None else "in_sample"
+        return sorted(self.results.values(), key=lambda r: r[scope][metric], reverse=higher)
+
+    def walk_forward(self, rank_by: str = "sharpe") -> list[dict]:
+        """Per fold: the config that did best on train, and how it did on test."""
+        if self.splits[0][1] is None or not self.results:
+            return []
+        metric, higher = RANK_KEYS[rank_by]
+        pick = max if higher else min
+        rows = []
+        for k, (train, test) in enumerate(self.splits):
+            best = pick(self.results.values(), key=lambda r: r["folds"][k]["train"][metric])
+            rows.append({"fold": k, "train": train, "test": test, "config": best["config"],
+                         "train_metrics": best["folds"][k]["train"], "test_metrics": best["folds"][k]["test"]})
+        return rows
+
+    def report(self, rank_by: str = "sharpe", top: int = 20) -> dict:
+        return {
+            **self.header,
+            "rank_by": rank_by,
+            "done": len(self.results),
+            "total": self.total,
+            "top": [{k: v for k, v in r.items() if k != "folds"} for r in self.ranked(rank_by)[:top]],
+            "walk_forward": self.walk_forward(rank_by),
+        }
+
+
+# ---------------------------------------------------------------------------
+# Background jobs (admin API)
+# ---------------------------------------------------------------------------
+
+async def load_history(pair: str, interval: str, start: int, end: int) -> Klines:
+    """Klines for [start, end), cached as .npz under BACKTEST_DATA_DIR."""
+    from app.services.market_data import fetch_klines_range
+
+    path = Path(settings.BACKTEST_DATA_DIR) / f"{pair}-{interval}-{start}-{end}.npz"
+    if path.exists():
+        return Klines.load(path)
+    klines = await fetch_klines_range(pair, interval, start, end)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    klines.save(path)
+    return klines
+
+
+async def _set_job(job_id: str, **fields) -> None:
+    redis = await get_redis()
+    key = JOB_KEY.format(id=job_id)
+    raw = await redis.get(key)
+    job = json.loads(raw) if raw else {"id": job_id}
+    job.update(fields, updated_at=int(time.time()))
+    await redis.set(key, json.dumps(job), ex=JOB_TTL)
+
+
+async def get_job(job_id: str) -> Optional[dict]:
+    redis = await get_redis()
+    raw = await redis.get(JOB_KEY.format(id=job_id))
+    return json.loads(raw) if raw else None
+
+
+async def _run_job(job_id: str, params: dict) -> None:
+    try:
+        strategy_type = params["strategy_type"]
+        await _set_job(job_id, status="loading")
+        klines = await load_history(params["pair"], STRATEGIES[strategy_type].INTERVAL,
+                                    params["start"], params["end"])
+        sweep = Sweep(
+            strategy_type, params["space"], klines,
+            method=params["method"], samples=params["samples"], seed=params["seed"],
+            folds=params["folds"], allocated=Decimal(str(params["allocated"])), fee_pct=params["fee_pct"],
+            checkpoint=Path(settings.BACKTEST_DATA_DIR) / "optimizer" / f"{job_id}.jsonl",
+        )
+        await _set_job(job_id, status="running", done=len(sweep.results), total=sweep.total)
+        task = asyncio.create_task(asyncio.to_thread(sweep.run, settings.OPTIMIZER_WORKERS, None, True))
+        while not task.done():
+            await asyncio.wait({task}, timeout=2.0)
+            await _set_job(job_id, done=len(sweep.results))
+        task.result()
+        await _set_job(job_id, status="done", result=sweep.report(params["rank_by"]))
+        print(f"[Optimizer] job {job_id} done ({sweep.total} configs)")
+    except Exception as e:
+        print(f"[Optimizer] job {job_id} failed: {e}")
+        await _set_job(job_id, status="failed", error=str(e))
+
+
+async def enqueue_job(params: dict, job_id: Optional[str] = None) -> str:
+    """Queue (or, with an earlier ``job_id``, resume) a sweep for a runner to pick up."""
+    job_id = job_id or uuid.uuid4().hex
+    job = await get_job(job_id)
+    if job and job.get("status") in ("queued", "loading", "running") \
+            and time.time() - job.get("updated_at", 0) < JOB_STALE_SEC:
+        return job_id
+    await _set_job(job_id, status="queued", params=params, done=0, total=None, error=None)
+    redis = await get_redis()
+    await redis.rpush(QUEUE_KEY, job_id)
+    return job_id
+
+
+async def run_next_job(timeout: float = 5.0) -> Optional[str]:
+    """Pop one queued job and run it to completion; None if the queue stayed empty."""
+    redis = await get_redis()
+    popped = await redis.blpop([QUEUE_KEY], timeout=timeout)
+    if not popped:
+        return None
+    job_id = popped[1].decode() if isinstance(popped[1], bytes) else popped[1]
+    job = await get_job(job_id)
+    if not job or "params" not in job:
+        return None
+    print(f"[Optimizer] job {job_id} picked up")
+    await _run_job(job_id, job["params"])
+    return job_id
+
+
+async def run_worker() -> None:
+    """Runner task: run queued sweeps one at a time."""
+    while True:
+        try:
+            await run_next_job()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"[Optimizer] worker error: {e}")
+            await asyncio.sleep(5)
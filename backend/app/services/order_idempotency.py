@@ -0,0 +1,49 @@
+"""Redis idempotency cache for client-supplied order IDs.
+
+The first request for ``(user_id, client_order_id)`` claims the key with a
+``pending`` marker; once the order is processed the response is stored under
+the same key so retries get the original result without touching the DB or
+Binance. The unique DB constraint on ``orders`` is the backstop if the Redis
+entry is lost.
+"""
+import json
+from typing import Optional
+
+from app.core.redis import get_redis
+
+IDEMPOTENCY_TTL = 24 * 3600  # seconds
+# A claim left behind by a crashed request must not block retries for a day
+_PENDING_TTL = 60
+_PENDING = "pending"
+
+
+def _key(user_id: int, client_order_id: str) -> str:
+    return f"order:idem:{user_id}:{client_order_id}"
+
+
+async def claim_client_order_id(user_id: int, client_order_id: str) -> Optional[dict]:
+    """Try to claim a client order ID.
+
+    Returns ``None`` if this request now owns the ID, ``{"pending": True}`` if
+    another request is still processing it, or the cached response dict.
+    """
+    redis = await get_redis()
+    key = _key(user_id, client_order_id)
+    if await redis.set(key, _PENDING, nx=True, ex=_PENDING_TTL):
+        return None
+    raw = await redis.get(key)
+    if raw is None or raw == _PENDING:
+        return {"pending": True}
+    return json.loads(raw)
+
+
+async def store_order_result(user_id: int, client_order_id: str, response: dict) -> None:
+    """Cache the final response so duplicates can be answered from Redis."""
+    redis = await get_redis()
+    await redis.set(_key(user_id, client_order_id), json.dumps(response), ex=IDEMPOTENCY_TTL)
+
+
+async def release_client_order_id(user_id: int, client_order_id: str) -> None:
+    """Drop a claim after a failure that created no order, so the client may retry."""
+    redis = await get_redis()
+    await redis.delete(_key(user_id, client_order_id))
@@ -2,18 +2,41 @@ import json
 from typing import Optional
 
 from app.core.redis import get_redis
+from app.services.position_store import POS_KEY, position_store
+
+# Sentinel: no preloaded value, read Redis on demand
+_UNLOADED = object()
 
 
 class PositionManager:
     """Manages open trading positions with stop-loss, take-profit, and trailing-stop logic.
 
-    Position state is stored in Redis with key format ``pos:{bot_id}:{user_id}``.
+    Position state lives in the Redis hash ``pos:{bot_id}`` (field ``user_id``)
+    and is written behind to the ``positions`` table (``position_store``).
+    ``cached`` takes the raw value (or ``None``) already fetched by a batched
+    read, so reads don't go back to Redis; writes still go through.
     """
 
-    def __init__(self, bot_id: int, user_id: int):
+    def __init__(self, bot_id: int, user_id: int, cached=_UNLOADED):
         self.bot_id = bot_id
         self.user_id = user_id
-        self.key = f"pos:{bot_id}:{user_id}"
+        self.key = POS_KEY.format(bot_id=bot_id)
+        self.field = str(user_id)
+        self._cached = cached
+
+    async def _raw(self) -> Optional[str]:
+        if self._cached is not _UNLOADED:
+            return self._cached
+        redis = await get_redis()
+        return await redis.hget(self.key, self.field)
+
+    async def _store(self, pos: dict) -> None:
+        redis = await get_redis()
+        raw = json.dumps(pos)
+        await redis.hset(self.key, self.field, raw)
+        position_store.enqueue(self.bot_id, self.user_id, pos)
+        if self._cached is not _UNLOADED:
+            self._cached = raw
 
     # ------------------------------------------------------------------
     # Open / Close
@@ -27,35 +50,19 @@ class PositionManager:
         stop_loss_atr: float,
         take_profit_atr: Optional[float] = None,
         trailing_atr: Optional[float] = None,
-    ) -> None:
-        """Open a new position, calculating SL/TP levels from ATR multiples."""
-        redis = await get_redis()
-
-        if side == "buy":
-            sl = entry_price - stop_loss_atr * atr
-            tp = (entry_price + take_profit_atr * atr) if take_profit_atr else None
-            trailing = (entry_price - trailing_atr * atr) if trailing_atr else None
-        else:  # sell
-            sl = entry_price + stop_loss_atr * atr
-            tp = (entry_price - take_profit_atr * atr) if take_profit_atr else None
-            trailing = (entry_price + trailing_atr * atr) if trailing_atr else None
-
-        pos = {
-            "side": side,
-            "entry": entry_price,
-            "stop_loss": sl,
-            "take_profit": tp,
-            "trailing_stop": trailing,
-            "trailing_active": trailing is not None,
-            "trailing_atr_mult": trailing_atr,
-            "current_atr": atr,
-        }
-        await redis.set(self.key, json.dumps(pos))
+    ) -> dict:
+        """Open a new position, calculating SL/TP levels from ATR multiples. Returns the stored position."""
+        pos = new_position(side, entry_price, atr, stop_loss_atr, take_profit_atr, trailing_atr)
+        await self._store(pos)
+        return pos
 
     async def close_position(self) -> None:
-        """Delete the position from Redis."""
+        """Delete the position from Redis (and, write-behind, from the table)."""
         redis = await get_redis()
-        await redis.delete(self.key)
+        await redis.hdel(self.key, self.field)
+        position_store.enqueue(self.bot_id, self.user_id, None)
+        if self._cached is not _UNLOADED:
+            self._cached = None
 
     # ------------------------------------------------------------------
     # Query helpers
@@ -63,14 +70,12 @@ class PositionManager:
 
     async def get_position(self) -> Optional[dict]:
         """Return the current position dict, or ``None`` if none exists."""
-        redis = await get_redis()
-        raw = await redis.get(self.key)
+        raw = await self._raw()
         return json.loads(raw) if raw else None
 
     async def has_position(self) -> bool:
         """Return ``True`` if a position is currently open."""
-        redis = await get_redis()
-        return await redis.get(self.key) is not None
+        return await self._raw() is not None
 
     # ------------------------------------------------------------------
     # Exit checks
@@ -79,54 +84,178 @@ class PositionManager:
     async def check_exit(self, current_price: float) -> Optional[str]:
         """Check whether the current price triggers an exit condition.
 
+        Runs server-side (see ``check_exits``), so the read and any trailing
+        ratchet are one atomic round trip.
+
         Returns:
             ``"stop_loss"`` if stop-loss (including trailing) is hit,
             ``"take_profit"`` if take-profit is hit, or ``None``.
         """
+        return (await check_exits([self], current_price))[0]
+
+
+def new_position(
+    side: str,
+    entry_price: float,
+    atr: float,
+    stop_loss_atr: float,
+    take_profit_atr: Optional[float] = None,
+    trailing_atr: Optional[float] = None,
+) -> dict:
+    """Position dict with SL/TP/trailing levels at ATR multiples from the entry."""
+    if side == "buy":
+        sl = entry_price - stop_loss_atr * atr
+        tp = (entry_price + take_profit_atr * atr) if take_profit_atr else None
+        trailing = (entry_price - trailing_atr * atr) if trailing_atr else None
+    else:  # sell
+        sl = entry_price + stop_loss_atr * atr
+        tp = (entry_price - take_profit_atr * atr) if take_profit_atr else None
+        trailing = (entry_price + trailing_atr * atr) if trailing_atr else None
+
+    return {
+        "side": side,
+        "entry": entry_price,
+        "stop_loss": sl,
+        "take_profit": tp,
+        "trailing_stop": trailing,
+        "trailing_active": trailing is not None,
+        "trailing_atr_mult": trailing_atr,
+        "current_atr": atr,
+    }
+
+
+def effective_stop(pos: dict) -> float:
+    """Fixed and trailing stop combined: a long exits at max(stop, trailing), a short at min."""
+    stop = pos["stop_loss"]
+    trailing = pos.get("trailing_stop") if pos.get("trailing_active") else None
+    if trailing is None:
+        return stop
+    return max(stop, trailing) if pos["side"] == "buy" else min(stop, trailing)
+
+
+def evaluate_exit(pos: dict, current_price: float) -> tuple[Optional[str], bool]:
+    """Pure exit rule shared by the Lua script and the exit monitor tests.
+
+    Returns ``(reason, ratcheted)``; when the trailing stop moves, ``pos`` is
+    updated in place and ``ratcheted`` is ``True``.
+    """
+    side = pos["side"]
+    sl = pos["stop_loss"]
+    tp = pos["take_profit"]
+
+    # --- Fixed stop-loss ---
+    if side == "buy" and current_price <= sl:
+        return "stop_loss", False
+    if side == "sell" and current_price >= sl:
+        return "stop_loss", False
+
+    # --- Take-profit ---
+    if tp is not None:
+        if side == "buy" and current_price >= tp:
+            return "take_profit", False
+        if side == "sell" and current_price <= tp:
+            return "take_profit", False
+
+    # --- Trailing stop ---
+    if pos.get("trailing_active") and pos.get("trailing_stop") is not None:
+        trailing = pos["trailing_stop"]
+        atr_mult = pos.get("trailing_atr_mult")
+        atr_mult = 1.5 if atr_mult is None else atr_mult
+        atr = pos.get("current_atr") or 0
+
+        if side == "buy":
+            new_trailing = current_price - atr_mult * atr
+            if new_trailing > trailing:
+                # Price moved favourably -- ratchet trailing stop up
+                pos["trailing_stop"] = new_trailing
+                return None, True
+            if current_price <= trailing:
+                return "stop_loss", False
+        else:  # sell
+            new_trailing = current_price + atr_mult * atr
+            if new_trailing < trailing:
+                # Price moved favourably -- ratchet trailing stop down
+                pos["trailing_stop"] = new_trailing
+                return None, True
+            if current_price >= trailing:
+                return "stop_loss", False
+
+    return None, False
+
+
+# Same rules as ``evaluate_exit``, applied to several positions of one bot atomically.
+# KEYS[1]: the bot's position hash, ARGV[1]: price, ARGV[2..]: user ids.
+# Returns {reason or "", stored JSON or false, 1 if ratcheted else 0} per user id.
+_CHECK_EXIT_LUA = """
+local price = tonumber(ARGV[1])
+local function val(v, default)
+    if v == nil or v == cjson.null then return default end
+    return v
+end
+local out = {}
+for i = 2, #ARGV do
+    local field = ARGV[i]
+    local raw = redis.call('HGET', KEYS[1], field)
+    local reason = ''
+    local ratcheted = 0
+    if raw then
+        local pos = cjson.decode(raw)
+        local long = pos.side == 'buy'
+        local sl = pos.stop_loss
+        local tp = val(pos.take_profit, nil)
+        local trailing = val(pos.trailing_stop, nil)
+        if (long and price <= sl) or (not long and price >= sl) then
+            reason = 'stop_loss'
+        elseif tp and ((long and price >= tp) or (not long and price <= tp)) then
+            reason = 'take_profit'
+        elseif pos.trailing_active == true and trailing then
+            local reach = val(pos.trailing_atr_mult, 1.5) * val(pos.current_atr, 0)
+            if long then
+                if price - reach > trailing then
+                    pos.trailing_stop = price - reach
+                    ratcheted = 1
+                elseif price <= trailing then
+                    reason = 'stop_loss'
+                end
+            else
+                if price + reach < trailing then
+                    pos.trailing_stop = price + reach
+                    ratcheted = 1
+                elseif price >= trailing then
+                    reason = 'stop_loss'
+                end
+            end
+            if ratcheted == 1 then
+                raw = cjson.encode(pos)
+                redis.call('HSET', KEYS[1], field, raw)
+            end
+        end
+    end
+    out[i - 1] = {reason, raw or false, ratcheted}
+end
+return out
+"""
+
+
+async def check_exits(managers: list[PositionManager], current_price: float) -> list[Optional[str]]:
+    """Check (and ratchet) the positions of many managers, one round trip per bot.
+
+    Managers whose preloaded cache says there is no position are skipped
+    without touching Redis. Returns the exit reason per manager, in order.
+    """
+    by_key: dict[str, list[PositionManager]] = {}
+    for pm in managers:
+        if pm._cached is not None:
+            by_key.setdefault(pm.key, []).append(pm)
+    results: dict[tuple[str, str], Optional[str]] = {}
+    if by_key:
         redis = await get_redis()
-        raw = await redis.get(self.key)
-        if not raw:
-            return None
-
-        pos = json.loads(raw)
-        side = pos["side"]
-        sl = pos["stop_loss"]
-        tp = pos["take_profit"]
-
-        # --- Fixed stop-loss ---
-        if side == "buy" and current_price <= sl:
-            return "stop_loss"
-        if side == "sell" and current_price >= sl:
-            return "stop_loss"
-
-        # --- Take-profit ---
-        if tp is not None:
-            if side == "buy" and current_price >= tp:
-                return "take_profit"
-            if side == "sell" and current_price <= tp:
-                return "take_profit"
-
-        # --- Trailing stop ---
-        if pos.get("trailing_active") and pos.get("trailing_stop") is not None:
-            trailing = pos["trailing_stop"]
-            atr_mult = pos.get("trailing_atr_mult", 1.5)
-            atr = pos.get("current_atr", 0)
-
-            if side == "buy":
-                new_trailing = current_price - atr_mult * atr
-                if new_trailing > trailing:
-                    # Price moved favourably -- ratchet trailing stop up
-                    pos["trailing_stop"] = new_trailing
-                    await redis.set(self.key, json.dumps(pos))
-                elif current_price <= trailing:
-                    return "stop_loss"
-            else:  # sell
-                new_trailing = current_price + atr_mult * atr
-                if new_trailing < trailing:
-                    # Price moved favourably -- ratchet trailing stop down
-                    pos["trailing_stop"] = new_trailing
-                    await redis.set(self.key, json.dumps(pos))
-                elif current_price >= trailing:
-                    return "stop_loss"
-
-        return None
+        for key, pms in by_key.items():
+            rows = await redis.eval(_CHECK_EXIT_LUA, 1, key, current_price, *[pm.field for pm in pms])
+            for pm, (reason, raw, ratcheted) in zip(pms, rows):
+                results[(pm.key, pm.field)] = reason or None
+                if ratcheted:
+                    position_store.enqueue(pm.bot_id, pm.user_id, json.loads(raw))
+                if pm._cached is not _UNLOADED:
+                    pm._cached = raw
+    return [results.get((pm.key, pm.field)) for pm in managers]
@@ -0,0 +1,202 @@
+"""
+position_store.py - Durable positions (``positions`` table) with a Redis hot copy
+- Redis hash ``pos:{bot_id}`` (field = user_id, value = position JSON) serves
+  every runner read and the atomic exit checks in ``position_manager.py``
+- Every change is queued write-behind; a batch is upserted/deleted in one
+  transaction every POSITION_FLUSH_SEC, the latest state per position winning
+- ``pos:hydrated`` marks a Redis that holds the positions. When it is missing
+  (new or flushed Redis) the table is loaded back with one SELECT and one
+  pipeline; HSETNX keeps anything written since the flush. The marker is set
+  only once that is done; ``pos:hydrating`` (a short lease) keeps processes
+  from hydrating at the same time, and the others wait for the marker
+"""
+import asyncio
+import json
+import uuid
+from typing import Callable, Optional
+
+from sqlalchemy import delete, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.core.redis import get_redis
+from app.database import AsyncSessionLocal
+from app.models.bot import Bot
+from app.models.order import OrderSide
+from app.models.position import Position
+
+POS_KEY = "pos:{bot_id}"
+HYDRATED_KEY = "pos:hydrated"
+HYDRATE_LOCK_KEY = "pos:hydrating"
+HYDRATE_LOCK_SEC = 30
+
+PosKey = tuple[int, int]  # (bot_id, user_id)
+
+# Position JSON field -> column
+_COLUMNS = {
+    "side": "side", "entry": "entry_price", "stop_loss": "stop_loss", "take_profit": "take_profit",
+    "trailing_stop": "trailing_stop", "trailing_active": "trailing_active",
+    "trailing_atr_mult": "trailing_atr_mult", "current_atr": "current_atr",
+}
+
+# Write a ratcheted position back only if it is still open
+_HSET_IF_EXISTS_LUA = """
+if redis.call('HEXISTS', KEYS[1], ARGV[1]) == 1 then
+    redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+    return 1
+end
+return 0
+"""
+_RELEASE_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def row_to_pos(row: Position) -> dict:
+    pos = {field: getattr(row, column) for field, column in _COLUMNS.items()}
+    pos["side"] = OrderSide(row.side).value
+    pos["trailing_active"] = bool(row.trailing_active)
+    return pos
+
+
+def _apply(row: Position, pos: dict) -> None:
+    for field, column in _COLUMNS.items():
+        setattr(row, column, pos.get(field))
+    row.side = OrderSide(pos["side"])
+    row.trailing_active = bool(pos.get("trailing_active"))
+
+
+class PositionStore:
+    def __init__(self, session_factory: Callable[[], AsyncSession] = AsyncSessionLocal):
+        self._session_factory = session_factory
+        # Latest unflushed state per position; None = closed
+        self._queue: dict[PosKey, Optional[dict]] = {}
+        self._flush_lock = asyncio.Lock()
+
+    def enqueue(self, bot_id: int, user_id: int, pos: Optional[dict]) -> None:
+        self._queue[(bot_id, user_id)] = dict(pos) if pos is not None else None
+
+    async def update_if_open(self, bot_id: int, user_id: int, pos: dict) -> bool:
+        """Store an updated (e.g. ratcheted) position unless it was closed meanwhile."""
+        redis = await get_redis()
+        updated = await redis.eval(
+            _HSET_IF_EXISTS_LUA, 1, POS_KEY.format(bot_id=bot_id), str(user_id), json.dumps(pos)
+        )
+        if updated:
+            self.enqueue(bot_id, user_id, pos)
+        return bool(updated)
+
+    # ------------------------------------------------------------------
+    # Write-behind
+    # ------------------------------------------------------------------
+
+    async def flush(self) -> int:
+        """Upsert/delete every queued position in one transaction."""
+        async with self._flush_lock:
+            if not self._queue:
+                return 0
+            batch, self._queue = self._queue, {}
+            try:
+                async with self._session_factory() as s:
+                    closed = [key for key, pos in batch.items() if pos is None]
+                    if closed:
+                        await s.execute(
+                            delete(Position).where(tuple_(Position.bot_id, Position.user_id).in_(closed))
+                        )
+                    opened = {key: pos for key, pos in batch.items() if pos is not None}
+                    if opened:
+                        rows = await s.scalars(
+                            select(Position).where(tuple_(Position.bot_id, Position.user_id).in_(list(opened)))
+                        )
+                        existing = {(r.bot_id, r.user_id): r for r in rows}
+                        for (bot_id, user_id), pos in opened.items():
+                            row = existing.get((bot_id, user_id))
+                            if row is None:
+                                row = Position(bot_id=bot_id, user_id=user_id)
+                                s.add(row)
+                            _apply(row, pos)
+                    await s.commit()
+            except Exception:
+                # Keep newer states queued since the batch was taken
+                for key, pos in batch.items():
+                    self._queue.setdefault(key, pos)
+                raise
+            return len(batch)
+
+    # ------------------------------------------------------------------
+    # Rehydrate / reset
+    # ------------------------------------------------------------------
+
+    async def _import_legacy_keys(self, redis) -> int:
+        """Move pre-table ``pos:{bot_id}:{user_id}`` strings into the hashes and table (one-time)."""
+        imported = 0
+        async for key in redis.scan_iter(match="pos:*:*", count=500):
+            _, bot_id, user_id = key.split(":")
+            raw = await redis.get(key)
+            if raw:
+                await redis.hset(POS_KEY.format(bot_id=bot_id), user_id, raw)
+                self.enqueue(int(bot_id), int(user_id), json.loads(raw))
+                imported += 1
+            await redis.delete(key)
+        return imported
+
+    async def ensure_hydrated(self) -> int:
+        """Reload Redis from the table if it lost the positions. Returns positions written.
+
+        Returns once Redis is hydrated: by this call, or by another process
+        holding the lock (waited for, up to its lease).
+        """
+        redis = await get_redis()
+        token = uuid.uuid4().hex
+        while not await redis.get(HYDRATED_KEY):
+            if not await redis.set(HYDRATE_LOCK_KEY, token, nx=True, ex=HYDRATE_LOCK_SEC):
+                await asyncio.sleep(0.2)
+                continue
+            try:
+                if await redis.get(HYDRATED_KEY):
+                    return 0
+                written = await self._hydrate(redis)
+                # Only now may readers trust Redis to hold every position
+                await redis.set(HYDRATED_KEY, "1")
+                return written
+            finally:
+                await redis.eval(_RELEASE_LUA, 1, HYDRATE_LOCK_KEY, token)
+        return 0
+
+    async def _hydrate(self, redis) -> int:
+        imported = await self._import_legacy_keys(redis)
+        await self.flush()
+        async with self._session_factory() as s:
+            rows = list(await s.scalars(select(Position)))
+        async with redis.pipeline(transaction=False) as pipe:
+            for row in rows:
+                pipe.hsetnx(POS_KEY.format(bot_id=row.bot_id), str(row.user_id), json.dumps(row_to_pos(row)))
+            await pipe.execute()
+        print(f"[PositionStore] hydrated Redis with {len(rows)} position(s)"
+              + (f", imported {imported} legacy key(s)" if imported else ""))
+        return len(rows)
+
+    async def clear_all(self, db: AsyncSession) -> None:
+        """Drop every position from the table and Redis (caller commits ``db``)."""
+        self._queue.clear()
+        bot_ids = list(await db.scalars(select(Bot.id)))
+        await db.execute(delete(Position))
+        if bot_ids:
+            redis = await get_redis()
+            await redis.delete(*[POS_KEY.format(bot_id=b) for b in bot_ids])
+
+    async def run(self) -> None:
+        """Write-behind flush loop; also re-hydrates if Redis restarts empty."""
+        while True:
+            await asyncio.sleep(settings.POSITION_FLUSH_SEC)
+            try:
+                await self.flush()
+                await self.ensure_hydrated()
+            except Exception as e:
+                print(f"[PositionStore] flush error: {e}")
+
+
+position_store = PositionStore()
@@ -0,0 +1,147 @@
+"""
+resampler.py - Higher intervals derived from one 1m series per pair
+- ``KlineBook`` keeps a pair's 1m klines (at most KLINES_BASE_MAX_MINUTES) and
+  serves any interval in ``INTERVAL_SECONDS`` from them, so one REST call per
+  refresh keeps every interval current instead of one call per interval
+- Buckets are aligned to the UTC epoch like Binance's (1m … 1d): open of the
+  first minute, max high, min low, close of the last minute, summed volume.
+  The newest bucket is the forming candle, as Binance returns it
+- A refresh refetches from the last (forming) minute on and replaces the tail;
+  each derived interval re-aggregates only the buckets from the first changed
+  minute on (``resample`` is vectorized with ``ufunc.reduceat``)
+- Older history is fetched once when a request reaches further back than the
+  book; requests deeper than the cap go straight to Binance (``can_resample``),
+  as do requests the book has no candles for (``fetch_klines``)
+"""
+import asyncio
+import time
+from typing import Awaitable, Callable, Optional
+
+import numpy as np
+
+from app.services.klines import Klines
+
+INTERVAL_SECONDS = {
+    "1m": 60, "3m": 180, "5m": 300, "15m": 900, "30m": 1800,
+    "1h": 3600, "2h": 7200, "4h": 14400, "6h": 21600, "8h": 28800, "12h": 43200, "1d": 86400,
+}
+
+# (pair, interval, start, end) -> klines, i.e. ``market_data.fetch_klines_range``
+FetchRange = Callable[[str, str, int, Optional[int]], Awaitable[Klines]]
+
+_REBUILD = -1  # derived series must be aggregated from scratch
+
+
+def resample(base: Klines, seconds: int) -> Klines:
+    """Aggregate time-sorted klines into epoch-aligned buckets of ``seconds``."""
+    if not len(base):
+        return Klines.empty()
+    bucket = base.time // seconds * seconds
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    ends = np.r_[starts[1:], len(bucket)] - 1
+    return Klines(
+        bucket[starts],
+        base.open[starts],
+        np.maximum.reduceat(base.high, starts),
+        np.minimum.reduceat(base.low, starts),
+        base.close[ends],
+        np.add.reduceat(base.volume, starts),
+    )
+
+
+def can_resample(interval: str, limit: int, max_minutes: int) -> bool:
+    seconds = INTERVAL_SECONDS.get(interval)
+    return seconds is not None and limit * seconds <= max_minutes * 60
+
+
+class KlineBook:
+    """One pair's 1m klines and the intervals derived from them."""
+
+    def __init__(self, pair: str, fetch_range: FetchRange, max_minutes: int, ttl: float):
+        self.pair = pair
+        self.base = Klines.empty()
+        self._fetch_range = fetch_range
+        self._max_minutes = max_minutes
+        self._ttl = ttl
+        self._refreshed_at = 0.0
+        # Earliest time fetched, whether or not the pair traded that far back
+        self._covered_from: Optional[int] = None
+        self._derived: dict[int, Klines] = {}
+        # interval seconds -> earliest base time changed since it was derived
+        self._stale: dict[int, Optional[int]] = {}
+        self._lock = asyncio.Lock()
+
+    def expire(self) -> None:
+        """Refresh on the next read (a candle just closed)."""
+        self._refreshed_at = 0.0
+
+    def _changed(self, since: int) -> None:
+        for seconds, stale in self._stale.items():
+            if stale != _REBUILD:
+                self._stale[seconds] = since if stale is None else min(stale, since)
+
+    async def _backfill(self, start: int) -> None:
+        if not len(self.base):
+            self.base = await self._fetch_range(self.pair, "1m", start, None)
+            self._covered_from = start
+            self._refreshed_at = time.monotonic()
+            self._stale = dict.fromkeys(self._stale, _REBUILD)
+            return
+        older = await self._fetch_range(self.pair, "1m", start, int(self.base.time[0]))
+        self._covered_from = start
+        if len(older):
+            self.base = Klines.concat(older, self.base)
+            self._stale = dict.fromkeys(self._stale, _REBUILD)
+
+    async def _refresh(self) -> None:
+        if not len(self.base):
+            # The backfill came back empty (no trades yet, or Binance returned nothing): retry it whole
+            await self._backfill(self._covered_from if self._covered_from is not None else int(time.time()))
+            return
+        since = int(self.base.time[-1])
+        fresh = await self._fetch_range(self.pair, "1m", since, None)
+        self._refreshed_at = time.monotonic()
+        if not len(fresh):
+            return
+        first = int(fresh.time[0])
+        self.base = Klines.concat(self.base[:int(self.base.time.searchsorted(first))], fresh)
+        if len(self.base) > self._max_minutes:
+            self.base = self.base[-self._max_minutes:]
+            self._covered_from = int(self.base.time[0])
+        self._changed(first)
+
+    def _derive(self, seconds: int) -> Klines:
+        if seconds == 60:
+            return self.base
+        derived = self._derived.get(seconds)
+        stale = self._stale.get(seconds, _REBUILD)
+        if derived is None or stale == _REBUILD:
+            derived = resample(self.base, seconds)
+        elif stale is not None:
+            # Only buckets from the first changed minute on are re-aggregated
+            cut = stale // seconds * seconds
+            kept = derived[:int(derived.time.searchsorted(cut))]
+            tail = resample(self.base[int(self.base.time.searchsorted(cut)):], seconds)
+            derived = Klines.concat(kept, tail)
+        if len(derived) and len(self.base) and derived.time[0] < self.base.time[0] // seconds * seconds:
+            # Buckets trimmed out of the base
+            derived = derived[int(derived.time.searchsorted(self.base.time[0] // seconds * seconds)):]
+        self._derived[seconds] = derived
+        self._stale[seconds] = None
+        return derived
+
+    async def get(self, interval: str, limit: int) -> Klines:
+        """The last ``limit`` candles of ``interval``, the newest one forming."""
+        seconds = INTERVAL_SECONDS[interval]
+        async with self._lock:
+            start = (int(time.time()) // seconds - (limit - 1)) * seconds
+            try:
+                if self._covered_from is None or start < self._covered_from:
+                    await self._backfill(start)
+                if time.monotonic() - self._refreshed_at >= self._ttl:
+                    await self._refresh()
+            except Exception as e:
+                if not len(self.base):
+                    raise
+                print(f"[Resampler] {self.pair} 1m refresh failed, serving cached: {e}")
+            return self._derive(seconds)[-limit:]
@@ -0,0 +1,205 @@
+"""
+risk_cache.py - In-memory pre-trade risk check
+- Per-user balances, open-order count and open notional held in process memory
+- Updated write-through on fills, deposits and order open/cancel; other
+  balance writers invalidate
+- Every change is broadcast over Redis pub/sub, so other workers drop the user
+  and reload balances and open orders from the DB on its next check
+- In LEDGER_MODE the same hooks drop the ledger's cached balances, since these
+  wallet writes bypass it
+- ``precheck`` rejects obviously infeasible orders in O(1) before any DB write;
+  only a user's first check per process (or after invalidation) reads the DB
+
+The authoritative balance check still happens under row locks in
+``try_fill_order``; this cache only filters out orders that cannot succeed.
+"""
+import asyncio
+import json
+import uuid
+from decimal import Decimal
+from typing import Optional
+
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.core.redis import get_redis
+from app.models.order import Order, OrderStatus
+from app.models.wallet import Wallet
+
+INVALIDATE_CHANNEL = "risk:invalidate"
+
+
+class UserRiskState:
+    __slots__ = ("balances", "open_orders", "open_notional")
+
+    def __init__(self, balances: dict[str, Decimal], open_orders: int, open_notional: Decimal):
+        self.balances = balances
+        self.open_orders = open_orders
+        self.open_notional = open_notional
+
+
+def _wallets_changed(user_id: Optional[int]) -> None:
+    """Wallet rows were written outside the ledger; its balances are stale."""
+    if settings.LEDGER_MODE:
+        from app.services.ledger import ledger
+        ledger.invalidate(user_id)
+
+
+class RiskCache:
+    def __init__(self):
+        self._users: dict[int, UserRiskState] = {}
+        # Lets the pub/sub listener skip invalidations this process sent itself
+        self.instance_id = uuid.uuid4().hex
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+
+    async def get_state(self, db: AsyncSession, user_id: int) -> UserRiskState:
+        state = self._users.get(user_id)
+        if state is None:
+            state = await self._load(db, user_id)
+            # Another coroutine may have loaded (and updated) it meanwhile
+            state = self._users.setdefault(user_id, state)
+        return state
+
+    async def _load(self, db: AsyncSession, user_id: int) -> UserRiskState:
+        rows = await db.execute(
+            select(Wallet.asset, Wallet.balance).where(Wallet.user_id == user_id)
+        )
+        balances = {asset: Decimal(str(bal or 0)) for asset, bal in rows.all()}
+        open_count, open_notional = (await db.execute(
+            select(func.count(Order.id), func.coalesce(func.sum(Order.quantity * Order.price), 0))
+            .where(Order.user_id == user_id, Order.status == OrderStatus.open)
+        )).one()
+        if settings.LEDGER_MODE:
+            from app.services.ledger import ledger
+            for asset, delta in ledger.pending_deltas(user_id).items():
+                balances[asset] = balances.get(asset, Decimal("0")) + delta
+        return UserRiskState(balances, int(open_count or 0), Decimal(str(open_notional or 0)))
+
+    async def available(self, db: AsyncSession, user_id: int, asset: str) -> Decimal:
+        """Cached free balance of one asset."""
+        state = await self.get_state(db, user_id)
+        return state.balances.get(asset, Decimal("0"))
+
+    # ------------------------------------------------------------------
+    # Pre-trade check
+    # ------------------------------------------------------------------
+
+    async def precheck(
+        self, db: AsyncSession, user_id: int, pair: str, side: str, quantity: Decimal, price: Decimal,
+        opens_order: bool = False,
+    ) -> Optional[str]:
+        """Return a rejection reason, or ``None`` if the order may proceed.
+
+        ``opens_order`` marks orders that may rest on the book (limit orders),
+        which count against the open-order and open-notional limits.
+        """
+        state = await self.get_state(db, user_id)
+        base, quote = pair.split("_")
+        notional = quantity * price
+
+        if side == "buy":
+            if price > 0 and state.balances.get(quote, Decimal("0")) < notional:
+                return f"Insufficient {quote} balance"
+        elif state.balances.get(base, Decimal("0")) < quantity:
+            return f"Insufficient {base} balance"
+
+        if opens_order:
+            if state.open_orders >= settings.RISK_MAX_OPEN_ORDERS:
+                return f"Open order limit reached ({settings.RISK_MAX_OPEN_ORDERS})"
+            limit = Decimal(str(settings.RISK_MAX_OPEN_NOTIONAL_USDT))
+            if state.open_notional + notional > limit:
+                return f"Open notional limit exceeded ({limit} {quote})"
+        return None
+
+    # ------------------------------------------------------------------
+    # Write-through updates
+    # ------------------------------------------------------------------
+
+    async def apply_fill(
+        self, user_id: int, base: str, quote: str, base_delta: Decimal, quote_delta: Decimal
+    ) -> None:
+        state = self._users.get(user_id)
+        if state is not None:
+            state.balances[base] = state.balances.get(base, Decimal("0")) + base_delta
+            state.balances[quote] = state.balances.get(quote, Decimal("0")) + quote_delta
+        await self._broadcast(user_id)
+
+    async def credit(self, user_id: int, asset: str, amount: Decimal) -> None:
+        """Deposit write-through."""
+        state = self._users.get(user_id)
+        if state is not None:
+            state.balances[asset] = state.balances.get(asset, Decimal("0")) + amount
+        _wallets_changed(user_id)
+        await self._broadcast(user_id)
+
+    async def order_opened(self, user_id: int, notional: Decimal) -> None:
+        """A resting order was committed (call after the commit)."""
+        state = self._users.get(user_id)
+        if state is not None:
+            state.open_orders += 1
+            state.open_notional += notional
+        await self._broadcast(user_id)
+
+    async def order_closed(self, user_id: int, notional: Decimal) -> None:
+        """A resting order was cancelled or filled (call after the commit)."""
+        state = self._users.get(user_id)
+        if state is not None:
+            state.open_orders = max(state.open_orders - 1, 0)
+            state.open_notional = max(state.open_notional - notional, Decimal("0"))
+        await self._broadcast(user_id)
+
+    async def invalidate(self, user_id: int) -> None:
+        """Drop a user everywhere; used by balance writers that don't write through."""
+        self._users.pop(user_id, None)
+        _wallets_changed(user_id)
+        await self._broadcast(user_id)
+
+    async def invalidate_all(self) -> None:
+        """Drop every cached user everywhere (bulk wallet resets)."""
+        self._users.clear()
+        _wallets_changed(None)
+        await self._broadcast(None)
+
+    async def _broadcast(self, user_id: Optional[int]) -> None:
+        try:
+            redis = await get_redis()
+            await redis.publish(INVALIDATE_CHANNEL, json.dumps({"user_id": user_id, "origin": self.instance_id}))
+        except Exception as e:
+            print(f"[RiskCache] invalidation publish failed for user {user_id}: {e}")
+
+    def handle_invalidation(self, message: str) -> None:
+        data = json.loads(message)
+        if data.get("origin") == self.instance_id:
+            return
+        if data.get("user_id") is None:
+            self._users.clear()
+            _wallets_changed(None)
+        else:
+            self._users.pop(int(data["user_id"]), None)
+            _wallets_changed(int(data["user_id"]))
+
+    async def run_invalidation_listener(self) -> None:
+        """Subscribe to invalidations from other workers (auto-resubscribes)."""
+        while True:
+            try:
+                redis = await get_redis()
+                pubsub = redis.pubsub()
+                await pubsub.subscribe(INVALIDATE_CHANNEL)
+                # Anything may have changed while we were not listening
+                self._users.clear()
+                async for msg in pubsub.listen():
+                    if msg.get("type") == "message":
+                        self.handle_invalidation(msg["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[RiskCache] listener error: {e} — resubscribing in 5s")
+                self._users.clear()
+                await asyncio.sleep(5)
+
+
+risk_cache = RiskCache()
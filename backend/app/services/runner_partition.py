@@ -0,0 +1,118 @@
+"""
+runner_partition.py - Redis-coordinated bot partition ownership
+- Bots are hashed into RUNNER_PARTITIONS fixed partitions (bot_id % P)
+- Every runner heartbeats into the ``runner:members`` sorted set; members whose
+  heartbeat is older than RUNNER_LEASE_SEC are dropped
+- Partitions are assigned round-robin over the sorted live members, and each is
+  held through a lease key ``runner:partition:{p}`` (SET NX PX + owner-checked
+  renew/release), so a partition moves only after its old owner lets it go or
+  its lease expires - a bot is never run by two runners at once
+- Leases are fenced by expiry: ``owns`` counts a lease from before the request
+  that took or renewed it, so it lapses here no later than in Redis. A runner
+  stalled past its lease stops starting bot runs and placing orders (the bot
+  runner re-checks its ``bot_filter`` before each) before another runner can
+  take the partition
+- One heartbeat is two round trips: a pipeline for membership and one script
+  that renews, takes and drops every lease
+"""
+import time
+import uuid
+from typing import Optional
+
+from app.config import settings
+from app.core.redis import get_redis
+
+MEMBERS_KEY = "runner:members"
+PARTITION_KEY = "runner:partition:{p}"
+
+# Hold or drop every lease in one call. ARGV: owner, lease ms, then per key
+# "1" to hold it (renew ours or take a free one) or "0" to drop it if ours.
+# Returns the 1-based indexes of the keys now held
+_LEASES_LUA = """
+local held = {}
+for i, key in ipairs(KEYS) do
+    local owner = redis.call('GET', key)
+    if ARGV[2 + i] == '1' then
+        if owner == ARGV[1] then
+            redis.call('PEXPIRE', key, ARGV[2])
+            held[#held + 1] = i
+        elseif not owner then
+            redis.call('SET', key, ARGV[1], 'PX', ARGV[2])
+            held[#held + 1] = i
+        end
+    elseif owner == ARGV[1] then
+        redis.call('DEL', key)
+    end
+end
+return held
+"""
+
+
+def partition_of(bot_id: int, partitions: int) -> int:
+    return bot_id % partitions
+
+
+def assign_partitions(members: list[str], partitions: int) -> dict[str, set[int]]:
+    """Deterministic round-robin assignment of partitions to sorted members."""
+    members = sorted(members)
+    assignment: dict[str, set[int]] = {m: set() for m in members}
+    for p in range(partitions):
+        if members:
+            assignment[members[p % len(members)]].add(p)
+    return assignment
+
+
+class PartitionCoordinator:
+    def __init__(self, instance_id: Optional[str] = None):
+        self.instance_id = instance_id or uuid.uuid4().hex
+        self.partitions = settings.RUNNER_PARTITIONS
+        self.owned: set[int] = set()
+        self.members: list[str] = []
+        # Monotonic time each owned lease is known to hold until
+        self._held_until: dict[int, float] = {}
+
+    def owns(self, bot_id: int) -> bool:
+        p = partition_of(bot_id, self.partitions)
+        return p in self.owned and time.monotonic() < self._held_until.get(p, 0.0)
+
+    async def _leases(self, redis, partitions: list[int], hold: set[int], lease_ms: int) -> set[int]:
+        if not partitions:
+            return set()
+        keys = [PARTITION_KEY.format(p=p) for p in partitions]
+        actions = ["1" if p in hold else "0" for p in partitions]
+        held = await redis.eval(_LEASES_LUA, len(keys), *keys, self.instance_id, lease_ms, *actions)
+        return {partitions[int(i) - 1] for i in held}
+
+    async def heartbeat(self) -> set[int]:
+        """Refresh membership and leases; returns the partitions now owned."""
+        redis = await get_redis()
+        now = time.time()
+        lease_ms = int(settings.RUNNER_LEASE_SEC * 1000)
+
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.zadd(MEMBERS_KEY, {self.instance_id: now})
+            pipe.zremrangebyscore(MEMBERS_KEY, 0, now - settings.RUNNER_LEASE_SEC)
+            pipe.zrange(MEMBERS_KEY, 0, -1)
+            *_, members = await pipe.execute()
+        members = list(members)
+        if members != self.members:
+            print(f"[Runner] members changed: {len(members)} live runner(s)")
+        self.members = members
+
+        wanted = assign_partitions(members, self.partitions).get(self.instance_id, set())
+        # Partitions rebalanced away are handed over right away instead of waiting for expiry
+        sent = time.monotonic()
+        owned = await self._leases(redis, sorted(wanted | self.owned), wanted, lease_ms)
+        if owned != self.owned:
+            print(f"[Runner] {self.instance_id[:8]} owns partitions {sorted(owned)}")
+        self.owned = owned
+        self._held_until = dict.fromkeys(owned, sent + settings.RUNNER_LEASE_SEC)
+        return owned
+
+    async def leave(self) -> None:
+        """Release every lease and deregister (clean shutdown)."""
+        redis = await get_redis()
+        owned, self.owned = sorted(self.owned), set()
+        self._held_until = {}
+        await self._leases(redis, owned, set(), 0)
+        await redis.zrem(MEMBERS_KEY, self.instance_id)
@@ -1,9 +1,9 @@
-"""Shared bot statistics calculation used by both the API and the daily aggregation job."""
+"""Shared bot statistics calculation used by the API, the daily aggregation job and backtests."""
 import json
 from datetime import datetime
 from decimal import Decimal
 from statistics import mean, stdev as _stdev
-from typing import Optional
+from typing import Iterable, Optional
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
@@ -11,35 +11,17 @@ from sqlalchemy import select
 from app.models.order import Order, Trade
 from app.core.redis import get_redis
 
+# (side, quantity, fill price) in execution order
+Fill = tuple[str, Decimal, Decimal]
 
-async def calc_bot_stats(
-    db: AsyncSession,
-    user_id: int,
-    bot_id: int,
-    allocated: Decimal,
-    pair: str,
-    cutoff: Optional[datetime] = None,
-) -> dict:
-    """Calculate P&L, win rate, MDD, Sharpe for one user-bot subscription.
-
-    Args:
-        cutoff: If set, only consider orders created strictly before this datetime.
-                Used by the daily aggregation job to snapshot yesterday's data.
-    """
-    query = (
-        select(Order)
-        .where(
-            Order.user_id == user_id,
-            Order.bot_id == bot_id,
-            Order.status == "filled",
-        )
-        .order_by(Order.created_at)
-    )
-    if cutoff:
-        query = query.where(Order.created_at < cutoff)
 
-    orders = list(await db.scalars(query))
+def compute_stats(fills: Iterable[Fill], allocated: Decimal, current_price: Decimal = Decimal("0")) -> dict:
+    """P&L, win rate, MDD and Sharpe from a subscription's fills.
 
+    Pure: no DB/Redis, so a backtest reports exactly what ``calc_bot_stats``
+    reports for live orders. Fills with a zero price are counted as trades
+    but otherwise skipped; ``current_price`` values the open base quantity.
+    """
     buy_cost = Decimal("0")
     sell_proceeds = Decimal("0")
     buy_qty_total = Decimal("0")
@@ -48,17 +30,16 @@ async def calc_bot_stats(
     running_base = Decimal("0")
     wins = 0
     total_sells = 0
+    trade_count = 0
     trade_returns: list[float] = []
     portfolio_history: list[float] = []
 
-    for o in orders:
-        trade = await db.scalar(select(Trade).where(Trade.order_id == o.id))
-        fill_price = Decimal(str(trade.price)) if trade else Decimal(str(o.price or 0))
+    for side, qty, fill_price in fills:
+        trade_count += 1
         if fill_price == 0:
             continue
-        qty = Decimal(str(o.filled_quantity or 0))
 
-        if o.side == "buy":
+        if side == "buy":
             buy_cost += qty * fill_price
             buy_qty_total += qty
             net_qty += qty
@@ -80,17 +61,6 @@ async def calc_bot_stats(
 
     net_qty = max(net_qty, Decimal("0"))
 
-    # Current price for unrealized P&L (skip if cutoff snapshot)
-    current_price = Decimal("0")
-    if cutoff is None:
-        try:
-            redis = await get_redis()
-            ticker = await redis.get(f"market:{pair}:ticker")
-            if ticker:
-                current_price = Decimal(json.loads(ticker)["last_price"])
-        except Exception:
-            pass
-
     unrealized = net_qty * current_price
     pnl = sell_proceeds + unrealized - buy_cost
     pnl_pct = float(pnl / allocated * 100) if allocated > 0 else 0.0
@@ -119,5 +89,58 @@ async def calc_bot_stats(
         "win_rate": win_rate,
         "max_drawdown_pct": max_dd,
         "sharpe_ratio": sharpe,
-        "trade_count": len(orders),
+        "trade_count": trade_count,
     }
+
+
+async def calc_bot_stats(
+    db: AsyncSession,
+    user_id: int,
+    bot_id: int,
+    allocated: Decimal,
+    pair: str,
+    cutoff: Optional[datetime] = None,
+) -> dict:
+    """Calculate P&L, win rate, MDD, Sharpe for one user-bot subscription.
+
+    Args:
+        cutoff: If set, only consider orders created strictly before this datetime.
+                Used by the daily aggregation job to snapshot yesterday's data.
+    """
+    query = (
+        select(Order)
+        .where(
+            Order.user_id == user_id,
+            Order.bot_id == bot_id,
+            Order.status == "filled",
+        )
+        .order_by(Order.created_at)
+    )
+    if cutoff:
+        query = query.where(Order.created_at < cutoff)
+
+    orders = list(await db.scalars(query))
+    trades: dict[int, Trade] = {}
+    if orders:
+        rows = await db.scalars(select(Trade).where(Trade.order_id.in_([o.id for o in orders])))
+        for t in rows:
+            trades.setdefault(t.order_id, t)
+
+    fills: list[Fill] = []
+    for o in orders:
+        trade = trades.get(o.id)
+        fill_price = Decimal(str(trade.price)) if trade else Decimal(str(o.price or 0))
+        fills.append((o.side, Decimal(str(o.filled_quantity or 0)), fill_price))
+
+    # Current price for unrealized P&L (skip if cutoff snapshot)
+    current_price = Decimal("0")
+    if cutoff is None:
+        try:
+            redis = await get_redis()
+            ticker = await redis.get(f"market:{pair}:ticker")
+            if ticker:
+                current_price = Decimal(json.loads(ticker)["last_price"])
+        except Exception:
+            pass
+
+    return compute_stats(fills, allocated, current_price)
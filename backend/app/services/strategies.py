@@ -1,23 +1,87 @@
 """
 strategies.py - 5 Advanced Trading Strategy Classes
 Each strategy generates optional buy/sell signals with ATR-based risk management.
+Strategies declare the klines they read (``data_requirements``); the runner
+prefetches the union once per pair and interval and passes it to ``generate``.
 """
 
 import json
-from typing import Optional
+from typing import NamedTuple, Optional
 
+import numpy as np
+
+from app.services.klines import Klines
 from app.services.market_data import fetch_klines
-from app.services.indicators import (
-    calc_rsi,
-    calc_ma,
-    calc_bollinger,
-    calc_atr,
-    calc_adx,
-    calc_donchian,
-    calc_ma_slope,
-    calc_bandwidth,
-)
+from app.services import indicators, indicator_cache
+from app.services.indicator_cache import memoized
+from app.services.indicator_stream import evaluate_streamed, indicator_streams
+from app.config import settings
+from app.core import metrics
 from app.core.redis import get_redis
+from app.services.strategy_pool import run_compute
+
+# Shared per process across strategy instances, see indicator_cache.py
+calc_rsi = memoized(indicators.calc_rsi)
+calc_ma = memoized(indicators.calc_ma)
+calc_bollinger = memoized(indicators.calc_bollinger)
+calc_atr = memoized(indicators.calc_atr)
+calc_adx = memoized(indicators.calc_adx)
+calc_donchian = memoized(indicators.calc_donchian)
+calc_ma_slope = memoized(indicators.calc_ma_slope)
+calc_bandwidth = memoized(indicators.calc_bandwidth)
+
+
+class DataRequirement(NamedTuple):
+    """One kline series a strategy reads: interval, candles needed, indicators computed on it."""
+    interval: str
+    lookback: int
+    indicators: tuple[str, ...] = ()
+
+
+# (pair, interval) -> klines prefetched for a runner cycle
+KlineData = dict[tuple[str, str], Klines]
+
+
+def data_requirements(strategy) -> list[DataRequirement]:
+    """What ``strategy`` reads each evaluation; the runner prefetches the union per pair."""
+    return [DataRequirement(strategy.INTERVAL, strategy.required_klines(), strategy.INDICATORS)]
+
+
+async def _generate(strategy, pair: str, data: Optional[KlineData] = None) -> Optional[dict]:
+    """Run the strategy's pure ``evaluate`` step on its klines.
+
+    The klines come from ``data`` (prefetched once per pair and interval by
+    the runner, possibly longer than needed) or are fetched here. ``evaluate``
+    gets the float64 columns of the shared ``Klines`` as they are (read-only,
+    no per-candle objects); only those arrays cross the boundary when the math
+    runs in a worker process (STRATEGY_POOL_WORKERS). With INDICATOR_STREAMS
+    the indicators are answered from the pair's stream, synced with the full
+    series; calls the stream lacks are added to it for the next evaluation.
+    """
+    limit = strategy.required_klines()
+    klines = data.get((pair, strategy.INTERVAL)) if data else None
+    if klines is None:
+        with metrics.stage("kline_fetch"):
+            klines = await fetch_klines(pair, interval=strategy.INTERVAL, limit=limit)
+    if len(klines) < limit:
+        return None
+    with metrics.stage("indicator_compute"):
+        streamed = indicator_streams.values(pair, strategy.INTERVAL, klines) if settings.INDICATOR_STREAMS else {}
+        klines = klines[-limit:]
+        scope = (pair, strategy.INTERVAL, klines.last_time)
+        signal, hits, misses, stream_hits, wanted = await run_compute(
+            evaluate_streamed, strategy.evaluate, scope, streamed,
+            klines.close, klines.high, klines.low, klines.volume,
+        )
+    indicator_cache.record(hits, misses)
+    indicator_streams.record(stream_hits)
+    if settings.INDICATOR_STREAMS:
+        if wanted:
+            indicator_streams.want(pair, strategy.INTERVAL, wanted)
+        if indicator_streams.dirty:
+            with metrics.stage("redis"):
+                await indicator_streams.save()
+    return signal
 
 
 # ---------------------------------------------------------------------------
@@ -33,6 +97,8 @@ class TrendMA200Strategy:
     """
 
     TYPE = "trend_ma200"
+    INTERVAL = "1h"
+    INDICATORS = ("ma", "ma_slope", "atr")
 
     def __init__(self, config: dict):
         self.ma_period = config.get("ma_period", 200)
@@ -42,16 +108,13 @@ class TrendMA200Strategy:
         self.risk_per_trade = config.get("risk_per_trade", 0.7)
         self.trailing_atr = config.get("trailing_atr", 2.0)
 
-    async def generate(self, pair: str) -> Optional[dict]:
-        limit = self.ma_period + self.ma_slope_lookback + 5
-        klines = await fetch_klines(pair, interval="1h", limit=limit)
-        if len(klines) < limit:
-            return None
+    def required_klines(self) -> int:
+        return self.ma_period + self.ma_slope_lookback + 5
 
-        closes = [k["close"] for k in klines]
-        highs = [k["high"] for k in klines]
-        lows = [k["low"] for k in klines]
+    async def generate(self, pair: str, data: Optional[KlineData] = None) -> Optional[dict]:
+        return await _generate(self, pair, data)
 
+    def evaluate(self, closes, highs, lows, volumes) -> Optional[dict]:
         ma = calc_ma(closes, self.ma_period)
         slope = calc_ma_slope(closes, self.ma_period, self.ma_slope_lookback)
         atr = calc_atr(highs, lows, closes)
@@ -102,6 +165,8 @@ class RSITrendStrategy:
     """
 
     TYPE = "rsi_trend"
+    INTERVAL = "1h"
+    INDICATORS = ("rsi", "ma", "ma_slope", "atr")
 
     def __init__(self, config: dict):
         self.rsi_period = config.get("rsi_period", 14)
@@ -114,16 +179,13 @@ class RSITrendStrategy:
         self.take_profit_atr = config.get("take_profit_atr", 2.0)
         self.risk_per_trade = config.get("risk_per_trade", 1.0)
 
-    async def generate(self, pair: str) -> Optional[dict]:
-        limit = self.ma_long + self.ma_slope_lookback + 5
-        klines = await fetch_klines(pair, interval="1h", limit=limit)
-        if len(klines) < limit:
-            return None
+    def required_klines(self) -> int:
+        return self.ma_long + self.ma_slope_lookback + 5
 
-        closes = [k["close"] for k in klines]
-        highs = [k["high"] for k in klines]
-        lows = [k["low"] for k in klines]
+    async def generate(self, pair: str, data: Optional[KlineData] = None) -> Optional[dict]:
+        return await _generate(self, pair, data)
 
+    def evaluate(self, closes, highs, lows, volumes) -> Optional[dict]:
         rsi = calc_rsi(closes, self.rsi_period)
         ma = calc_ma(closes, self.ma_long)
         slope = calc_ma_slope(closes, self.ma_long, self.ma_slope_lookback)
@@ -178,6 +240,8 @@ class BollingerADXStrategy:
     """
 
     TYPE = "boll_adx"
+    INTERVAL = "1h"
+    INDICATORS = ("adx", "bandwidth", "bollinger", "atr")
 
     def __init__(self, config: dict):
         self.bb_period = config.get("bb_period", 20)
@@ -190,17 +254,14 @@ class BollingerADXStrategy:
         self.take_profit_atr = config.get("take_profit_atr", 1.5)
         self.risk_per_trade = config.get("risk_per_trade", 0.7)
 
-    async def generate(self, pair: str) -> Optional[dict]:
+    def required_klines(self) -> int:
         # Need enough data for ADX (2*period+1) and Bollinger
-        limit = max(self.bb_period, 2 * self.adx_period + 1) + 20
-        klines = await fetch_klines(pair, interval="1h", limit=limit)
-        if len(klines) < limit:
-            return None
+        return max(self.bb_period, 2 * self.adx_period + 1) + 20
 
-        closes = [k["close"] for k in klines]
-        highs = [k["high"] for k in klines]
-        lows = [k["low"] for k in klines]
+    async def generate(self, pair: str, data: Optional[KlineData] = None) -> Optional[dict]:
+        return await _generate(self, pair, data)
 
+    def evaluate(self, closes, highs, lows, volumes) -> Optional[dict]:
         adx = calc_adx(highs, lows, closes, self.adx_period)
         if adx > self.adx_threshold:
             return None  # Skip trending market
@@ -263,6 +324,8 @@ class AdaptiveGridStrategy:
     """
 
     TYPE = "adaptive_grid"
+    INTERVAL = "1h"
+    INDICATORS = ("ma", "adx", "atr")
 
     def __init__(self, config: dict):
         self.grid_gap = config.get("grid_gap", 1.2)  # percent
@@ -273,17 +336,11 @@ class AdaptiveGridStrategy:
         self.trend_filter_slow = config.get("trend_filter_slow", 200)
         self.trend_stop_adx = config.get("trend_stop_adx", 30)
 
-    async def generate(self, pair: str) -> Optional[dict]:
-        limit = self.trend_filter_slow + 10
-        klines = await fetch_klines(pair, interval="1h", limit=limit)
-        if len(klines) < limit:
-            return None
-
-        closes = [k["close"] for k in klines]
-        highs = [k["high"] for k in klines]
-        lows = [k["low"] for k in klines]
-        price = closes[-1]
+    def required_klines(self) -> int:
+        return self.trend_filter_slow + 10
 
+    def evaluate(self, closes, highs, lows, volumes) -> Optional[dict]:
+        """Indicator part only; grid state lives in Redis and is handled in ``generate``."""
         ma_fast = calc_ma(closes, self.trend_filter_fast)
         ma_slow = calc_ma(closes, self.trend_filter_slow)
         adx = calc_adx(highs, lows, closes)
@@ -295,14 +352,16 @@ class AdaptiveGridStrategy:
         # PAUSE in confirmed downtrend
         if ma_fast < ma_slow and adx > self.trend_stop_adx:
             return None
+        return {"price": closes[-1], "atr": atr}
 
-        # Load grid state from Redis
-        redis = await get_redis()
-        state_key = f"grid:{pair}:state"
-        raw_state = await redis.get(state_key)
+    def advance(self, state: Optional[dict], ind: dict) -> tuple[Optional[dict], dict]:
+        """One grid step from ``evaluate``'s output: returns (signal, new state).
 
-        if raw_state:
-            state = json.loads(raw_state)
+        Pure, so the Redis-backed ``generate`` and backtests share it; ``state``
+        is ``None`` before the grid is initialised.
+        """
+        price, atr = ind["price"], ind["atr"]
+        if state:
             base_price = state["base_price"]
             filled_levels = state["filled_levels"]
         else:
@@ -317,10 +376,6 @@ class AdaptiveGridStrategy:
             recovery_target = base_price * (1 + gap_mult)
             if filled_levels >= self.max_levels or price >= recovery_target:
                 # Reset grid state
-                await redis.set(state_key, json.dumps({
-                    "base_price": price,
-                    "filled_levels": 0,
-                }))
                 return {
                     "side": "sell",
                     "risk_pct": self.risk_total,
@@ -330,16 +385,12 @@ class AdaptiveGridStrategy:
                     "atr": atr,
                     "grid_level": filled_levels,
                     "action": "close_all",
-                }
+                }, {"base_price": price, "filled_levels": 0}
 
         # BUY at next grid level
         next_level_price = base_price * (1 - gap_mult * (filled_levels + 1))
         if price <= next_level_price:
             new_filled = filled_levels + 1
-            await redis.set(state_key, json.dumps({
-                "base_price": base_price,
-                "filled_levels": new_filled,
-            }))
             return {
                 "side": "buy",
                 "risk_pct": self.risk_total / self.max_levels,
@@ -348,16 +399,26 @@ class AdaptiveGridStrategy:
                 "trailing_atr": None,
                 "atr": atr,
                 "grid_level": new_filled,
-            }
+            }, {"base_price": base_price, "filled_levels": new_filled}
 
-        # Save initial state if first time
-        if not raw_state:
-            await redis.set(state_key, json.dumps({
-                "base_price": base_price,
-                "filled_levels": filled_levels,
-            }))
+        return None, {"base_price": base_price, "filled_levels": filled_levels}
 
-        return None
+    async def generate(self, pair: str, data: Optional[KlineData] = None) -> Optional[dict]:
+        ind = await _generate(self, pair, data)
+        if ind is None:
+            return None
+
+        # Load grid state from Redis
+        redis = await get_redis()
+        state_key = f"grid:{pair}:state"
+        raw_state = await redis.get(state_key)
+        state = json.loads(raw_state) if raw_state else None
+
+        signal, new_state = self.advance(state, ind)
+        # Save on every change, and the initial state the first time
+        if new_state != state:
+            await redis.set(state_key, json.dumps(new_state))
+        return signal
 
 
 # ---------------------------------------------------------------------------
@@ -374,6 +435,8 @@ class BreakoutLiteStrategy:
     """
 
     TYPE = "breakout_lite"
+    INTERVAL = "1h"
+    INDICATORS = ("adx", "donchian", "atr", "rsi")
 
     def __init__(self, config: dict):
         self.donchian_period = config.get("donchian_period", 20)
@@ -385,17 +448,13 @@ class BreakoutLiteStrategy:
         self.risk_per_trade = config.get("risk_per_trade", 0.5)
         self.atr_period = config.get("atr_period", 14)
 
-    async def generate(self, pair: str) -> Optional[dict]:
-        limit = max(self.donchian_period, 2 * self.atr_period + 1) + 20
-        klines = await fetch_klines(pair, interval="1h", limit=limit)
-        if len(klines) < limit:
-            return None
+    def required_klines(self) -> int:
+        return max(self.donchian_period, 2 * self.atr_period + 1) + 20
 
-        closes = [k["close"] for k in klines]
-        highs = [k["high"] for k in klines]
-        lows = [k["low"] for k in klines]
-        volumes = [k["volume"] for k in klines]
+    async def generate(self, pair: str, data: Optional[KlineData] = None) -> Optional[dict]:
+        return await _generate(self, pair, data)
 
+    def evaluate(self, closes, highs, lows, volumes) -> Optional[dict]:
         adx = calc_adx(highs, lows, closes, self.atr_period)
         if adx < self.adx_min:
             return None  # No trend
@@ -416,7 +475,7 @@ class BreakoutLiteStrategy:
             return None
 
         # Average volume (exclude current bar)
-        avg_vol = sum(volumes[:-1]) / len(volumes[:-1]) if len(volumes) > 1 else 0
+        avg_vol = float(np.mean(volumes[:-1])) if len(volumes) > 1 else 0
         if avg_vol == 0:
             return None
 
@@ -466,3 +525,9 @@ STRATEGIES = {
     "adaptive_grid": AdaptiveGridStrategy,
     "breakout_lite": BreakoutLiteStrategy,
 }
+
+
+def strategy_interval(strategy_type: Optional[str]) -> str:
+    """Candle interval a strategy evaluates on (drives kline-close scheduling)."""
+    cls = STRATEGIES.get(strategy_type or "rsi_trend")
+    return getattr(cls, "INTERVAL", "1h")
@@ -0,0 +1,50 @@
+"""
+strategy_pool.py - Optional process pool for CPU-bound strategy math
+- STRATEGY_POOL_WORKERS=0 (default) runs ``evaluate`` inline on the event loop
+- STRATEGY_POOL_WORKERS>0 runs it in a ProcessPoolExecutor so indicator loops
+  don't stall HTTP/websocket traffic or other bots
+Callables must be picklable (strategy instances only hold their config).
+"""
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+
+from app.config import settings
+from app.core import metrics
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_pool() -> Optional[ProcessPoolExecutor]:
+    global _pool
+    if settings.STRATEGY_POOL_WORKERS <= 0:
+        return None
+    if _pool is None:
+        # spawn: a forked child would inherit the parent's event loop, sockets and locks
+        _pool = ProcessPoolExecutor(max_workers=settings.STRATEGY_POOL_WORKERS,
+                                    mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+async def run_compute(fn: Callable[..., Any], *args) -> Any:
+    pool = _get_pool()
+    if pool is None:
+        return fn(*args)
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(pool, fn, *args)
+    except BrokenProcessPool as e:
+        # A broken pool (worker killed) must not stop signal generation
+        metrics.incr("strategy_pool.errors")
+        print(f"[StrategyPool] {e} — evaluating inline")
+        shutdown_pool()
+        return fn(*args)
+
+
+def shutdown_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
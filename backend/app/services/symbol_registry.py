@@ -0,0 +1,155 @@
+"""
+symbol_registry.py - Binance exchange metadata registry
+- Bulk-loads LOT_SIZE / NOTIONAL / PRICE_FILTER for all supported pairs in one
+  exchangeInfo call at startup and on a schedule
+- Publishes the filters to a Redis hash so every worker shares one copy
+- Quantity / price rounding helpers used by both paper and live fills
+"""
+import json
+from decimal import Decimal, ROUND_DOWN, ROUND_UP
+from typing import Iterable, Optional
+import httpx
+from app.config import settings
+from app.core.redis import get_redis
+
+REGISTRY_KEY = "exchange:symbol_filters"
+_REGISTRY_TTL = 24 * 3600  # seconds; refreshed well before expiry
+
+# symbol -> {"step_size": Decimal, "min_qty": ..., "tick_size": ..., ...}
+_filters: dict[str, dict] = {}
+
+_DECIMAL_FIELDS = (
+    "step_size", "min_qty", "max_qty", "min_notional",
+    "tick_size", "min_price", "max_price",
+)
+
+
+def _pair_to_symbol(pair: str) -> str:
+    """BTC_USDT -> BTCUSDT"""
+    return pair.replace("_", "")
+
+
+def parse_symbol_filters(symbol_info: dict) -> dict:
+    """Extract the filters we care about from one exchangeInfo symbol entry."""
+    filters = {}
+    for f in symbol_info.get("filters", []):
+        if f["filterType"] == "LOT_SIZE":
+            filters["step_size"] = Decimal(f["stepSize"])
+            filters["min_qty"] = Decimal(f["minQty"])
+            filters["max_qty"] = Decimal(f["maxQty"])
+        elif f["filterType"] in ("NOTIONAL", "MIN_NOTIONAL"):
+            filters["min_notional"] = Decimal(f.get("minNotional", "0"))
+        elif f["filterType"] == "PRICE_FILTER":
+            filters["tick_size"] = Decimal(f["tickSize"])
+            filters["min_price"] = Decimal(f["minPrice"])
+            filters["max_price"] = Decimal(f["maxPrice"])
+    return filters
+
+
+def _dump(filters: dict) -> str:
+    return json.dumps({k: str(v) for k, v in filters.items()})
+
+
+def _load(raw: str) -> dict:
+    return {k: Decimal(v) for k, v in json.loads(raw).items() if k in _DECIMAL_FIELDS}
+
+
+# ── Loading ──────────────────────────────────────────────────────────────────
+
+async def load_symbol_registry(pairs: Iterable[str]) -> int:
+    """Fetch filters for every pair with a single exchangeInfo request.
+
+    Stores the result in process memory and in Redis. Returns the number of
+    symbols loaded. Raises on HTTP failure.
+    """
+    symbols = [_pair_to_symbol(p) for p in pairs]
+    async with httpx.AsyncClient(timeout=15.0) as client:
+        r = await client.get(
+            f"{settings.BINANCE_BASE_URL}/api/v3/exchangeInfo",
+            params={"symbols": json.dumps(symbols, separators=(",", ":"))},
+        )
+    if r.status_code != 200:
+        raise Exception(f"Binance exchangeInfo failed: {r.text}")
+
+    loaded = {s["symbol"]: parse_symbol_filters(s) for s in r.json().get("symbols", [])}
+    if not loaded:
+        return 0
+
+    redis = await get_redis()
+    await redis.hset(REGISTRY_KEY, mapping={sym: _dump(f) for sym, f in loaded.items()})
+    await redis.expire(REGISTRY_KEY, _REGISTRY_TTL)
+    _filters.update(loaded)
+    return len(loaded)
+
+
+async def refresh_symbol_registry(pairs: Iterable[str]) -> None:
+    """Scheduled refresh. Falls back to the shared Redis copy if Binance is unreachable."""
+    pairs = list(pairs)
+    try:
+        count = await load_symbol_registry(pairs)
+        print(f"[SymbolRegistry] loaded filters for {count} symbols")
+    except Exception as e:
+        print(f"[SymbolRegistry] exchangeInfo refresh failed: {e} — using Redis copy")
+        try:
+            redis = await get_redis()
+            cached = await redis.hgetall(REGISTRY_KEY)
+            _filters.update({sym: _load(raw) for sym, raw in cached.items()})
+        except Exception as e2:
+            print(f"[SymbolRegistry] Redis fallback failed: {e2}")
+
+
+async def store_symbol_filters(symbol: str, filters: dict) -> None:
+    """Add a single symbol's filters (e.g. a pair outside SUPPORTED_PAIRS)."""
+    _filters[symbol] = filters
+    redis = await get_redis()
+    await redis.hset(REGISTRY_KEY, symbol, _dump(filters))
+
+
+async def get_symbol_filters(symbol: str) -> Optional[dict]:
+    """Return filters for a symbol from memory, then Redis. ``None`` if unknown."""
+    if symbol in _filters:
+        return _filters[symbol]
+    redis = await get_redis()
+    raw = await redis.hget(REGISTRY_KEY, symbol)
+    if not raw:
+        return None
+    filters = _load(raw)
+    _filters[symbol] = filters
+    return filters
+
+
+# ── Rounding ─────────────────────────────────────────────────────────────────
+
+def round_step_size(quantity: Decimal, step_size: Decimal) -> Decimal:
+    """Round quantity down to a multiple of step_size."""
+    if step_size <= 0:
+        return quantity
+    return (quantity / step_size).to_integral_value(rounding=ROUND_DOWN) * step_size
+
+
+def round_tick_size(price: Decimal, tick_size: Decimal, side: str) -> Decimal:
+    """Round a limit price to tick_size in the order owner's favour.
+
+    Buys round down (never pay more than asked), sells round up.
+    """
+    if tick_size <= 0:
+        return price
+    rounding = ROUND_DOWN if side == "buy" else ROUND_UP
+    return (price / tick_size).to_integral_value(rounding=rounding) * tick_size
+
+
+async def normalize_order_values(
+    pair: str, side: str, quantity: Decimal, price: Optional[Decimal]
+) -> tuple[Decimal, Optional[Decimal]]:
+    """Round quantity to LOT_SIZE and price to PRICE_FILTER for a pair.
+
+    Values pass through unchanged when the registry has no entry for the pair.
+    """
+    filters = await get_symbol_filters(_pair_to_symbol(pair))
+    if not filters:
+        return quantity, price
+    if "step_size" in filters:
+        quantity = round_step_size(quantity, filters["step_size"])
+    if price is not None and "tick_size" in filters:
+        price = round_tick_size(price, filters["tick_size"], side)
+    return quantity, price
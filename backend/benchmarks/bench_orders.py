@@ -0,0 +1,270 @@
+"""
+bench_orders.py - Order / fill throughput benchmarks
+
+Usage (from backend/):
+    python -m benchmarks.bench_orders [--db-url URL] [--fills N] [--concurrency C]
+                                      [--ledger] [--output benchmarks/results.json]
+
+Runs against a throwaway SQLite file by default, or any DATABASE_URL such as a
+local Postgres, with an in-process fake Redis. Scenarios:
+  paper_fills      sequential market fills through try_fill_order
+  contended_fills  C concurrent fills on one user's wallets (row-lock contention)
+  live_fills       try_fill_order_live against a local stub Binance server
+  api_place_order  end-to-end POST /api/orders latency through the ASGI app
+Results are written as JSON so runs can be compared for regressions.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+
+PAIR = "BTC_USDT"
+PRICE = "50000"
+QTY = Decimal("0.001")
+
+
+def _percentiles(samples: list[float]) -> dict:
+    if not samples:
+        return {}
+    ms = sorted(s * 1000 for s in samples)
+
+    def pct(p: float) -> float:
+        return round(ms[min(len(ms) - 1, int(p / 100 * len(ms)))], 3)
+
+    return {
+        "mean": round(statistics.fmean(ms), 3),
+        "p50": pct(50), "p90": pct(90), "p99": pct(99),
+        "max": round(ms[-1], 3),
+    }
+
+
+def _summary(scenario: str, latencies: list[float], elapsed: float, errors: int = 0, **extra) -> dict:
+    ops = len(latencies)
+    return {
+        "scenario": scenario,
+        "ops": ops,
+        "errors": errors,
+        "seconds": round(elapsed, 4),
+        "ops_per_sec": round(ops / elapsed, 2) if elapsed > 0 else 0.0,
+        "latency_ms": _percentiles(latencies),
+        **extra,
+    }
+
+
+# ── Environment ──────────────────────────────────────────────────────────────
+
+async def _setup() -> int:
+    """Recreate the schema, seed one well-funded user and install the fake Redis."""
+    import app.models  # noqa: F401 - register all models
+    from app.core import redis as redis_module
+    from app.database import Base, engine, AsyncSessionLocal
+    from app.models.user import User
+    from app.models.wallet import Wallet
+    from benchmarks.fake_redis import FakeRedis
+
+    fake = FakeRedis()
+    await fake.set(f"market:{PAIR}:ticker", json.dumps({"pair": PAIR, "last_price": PRICE}))
+    redis_module._redis = fake
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+    async with AsyncSessionLocal() as db:
+        user = User(wallet_address="0xbench")
+        db.add(user)
+        await db.flush()
+        db.add(Wallet(user_id=user.id, asset="USDT", balance=Decimal("1000000000")))
+        db.add(Wallet(user_id=user.id, asset="BTC", balance=Decimal("1000000")))
+        await db.commit()
+        return user.id
+
+
+async def _fill_once(user_id: int, side: str, live: bool = False) -> tuple[float, bool]:
+    from app.config import settings
+    from app.database import AsyncSessionLocal
+    from app.models.order import Order, OrderSide, OrderType
+    from app.services.matching_engine import try_fill_order, try_fill_order_live
+
+    start = time.perf_counter()
+    async with AsyncSessionLocal() as db:
+        order = Order(user_id=user_id, pair=PAIR, side=OrderSide(side),
+                      type=OrderType.market, quantity=QTY)
+        db.add(order)
+        # Like POST /api/orders: in ledger mode the group commit inserts the order
+        if live or not settings.LEDGER_MODE:
+            await db.flush()
+        fill = try_fill_order_live if live else try_fill_order
+        result = await fill(db, order)
+    return time.perf_counter() - start, bool(result.get("filled"))
+
+
+async def _drain_ledger() -> None:
+    from app.config import settings
+    from app.services.ledger import ledger
+    if settings.LEDGER_MODE:
+        await ledger.snapshot()
+
+
+# ── Scenarios ────────────────────────────────────────────────────────────────
+
+async def bench_paper_fills(user_id: int, n: int) -> dict:
+    latencies, errors = [], 0
+    start = time.perf_counter()
+    for i in range(n):
+        latency, filled = await _fill_once(user_id, "buy" if i % 2 == 0 else "sell")
+        latencies.append(latency)
+        errors += not filled
+    await _drain_ledger()
+    return _summary("paper_fills", latencies, time.perf_counter() - start, errors)
+
+
+async def bench_contended_fills(user_id: int, n: int, concurrency: int) -> dict:
+    latencies, errors = [], 0
+
+    async def worker(worker_id: int, count: int):
+        nonlocal errors
+        for i in range(count):
+            try:
+                latency, filled = await _fill_once(user_id, "buy" if (worker_id + i) % 2 == 0 else "sell")
+                latencies.append(latency)
+                errors += not filled
+            except Exception:
+                errors += 1
+
+    per_worker = max(1, n // concurrency)
+    start = time.perf_counter()
+    await asyncio.gather(*[worker(w, per_worker) for w in range(concurrency)])
+    await _drain_ledger()
+    return _summary("contended_fills", latencies, time.perf_counter() - start, errors,
+                    concurrency=concurrency)
+
+
+async def bench_live_fills(user_id: int, n: int) -> dict:
+    from app.config import settings
+    from app.services import symbol_registry
+    from benchmarks.stub_binance import StubBinanceServer
+
+    latencies, errors = [], 0
+    original_url = settings.BINANCE_BASE_URL
+    async with StubBinanceServer() as url:
+        settings.BINANCE_BASE_URL = url
+        symbol_registry._filters.clear()
+        await symbol_registry.load_symbol_registry([PAIR])
+        try:
+            start = time.perf_counter()
+            # try_fill_order_live logs every fill; keep benchmark output readable
+            with contextlib.redirect_stdout(io.StringIO()):
+                for i in range(n):
+                    latency, filled = await _fill_once(user_id, "buy" if i % 2 == 0 else "sell", live=True)
+                    latencies.append(latency)
+                    errors += not filled
+            elapsed = time.perf_counter() - start
+        finally:
+            settings.BINANCE_BASE_URL = original_url
+    return _summary("live_fills", latencies, elapsed, errors)
+
+
+async def bench_api_place_order(user_id: int, n: int) -> dict:
+    from httpx import AsyncClient, ASGITransport
+    from app.core.security import create_access_token
+    from app.main import app
+
+    headers = {"Authorization": f"Bearer {create_access_token(user_id)}"}
+    latencies, errors = [], 0
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as client:
+        start = time.perf_counter()
+        for i in range(n):
+            body = {"pair": PAIR, "side": "buy" if i % 2 == 0 else "sell",
+                    "type": "market", "quantity": str(QTY)}
+            t0 = time.perf_counter()
+            r = await client.post("/api/orders", json=body, headers=headers)
+            latencies.append(time.perf_counter() - t0)
+            errors += r.status_code != 200 or not r.json()["fill_result"]["filled"]
+        await _drain_ledger()
+        elapsed = time.perf_counter() - start
+    return _summary("api_place_order", latencies, elapsed, errors)
+
+
+# ── Entry point ──────────────────────────────────────────────────────────────
+
+def _git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+async def run(args) -> dict:
+    from app.config import settings
+    settings.LEDGER_MODE = args.ledger
+
+    scenarios = set(args.scenarios)
+    user_id = await _setup()
+    results = []
+    if "paper_fills" in scenarios:
+        results.append(await bench_paper_fills(user_id, args.fills))
+    if "contended_fills" in scenarios:
+        results.append(await bench_contended_fills(user_id, args.fills, args.concurrency))
+    if "live_fills" in scenarios:
+        results.append(await bench_live_fills(user_id, args.fills))
+    if "api_place_order" in scenarios:
+        results.append(await bench_api_place_order(user_id, args.fills))
+
+    from app.database import engine
+    await engine.dispose()
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "database": engine.url.get_backend_name(),
+            "ledger_mode": args.ledger,
+            "fills": args.fills,
+        },
+        "results": results,
+    }
+
+
+ALL_SCENARIOS = ["paper_fills", "contended_fills", "live_fills", "api_place_order"]
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db-url", help="SQLAlchemy async URL (default: temporary SQLite file)")
+    parser.add_argument("--fills", type=int, default=500, help="operations per scenario")
+    parser.add_argument("--concurrency", type=int, default=8, help="workers for contended_fills")
+    parser.add_argument("--ledger", action="store_true", help="run paper fills in LEDGER_MODE")
+    parser.add_argument("--scenarios", nargs="+", choices=ALL_SCENARIOS, default=ALL_SCENARIOS)
+    parser.add_argument("--output", default="benchmarks/results.json")
+    args = parser.parse_args(argv)
+
+    # Settings are read at import time, so the environment must be ready first
+    db_url = args.db_url or f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/bench.db"
+    os.environ["DATABASE_URL"] = db_url
+    os.environ.setdefault("REDIS_URL", "redis://unused")
+    os.environ.setdefault("SECRET_KEY", "bench")
+
+    report = asyncio.run(run(args))
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    for r in report["results"]:
+        lat = r["latency_ms"]
+        print(f"{r['scenario']:<16} {r['ops_per_sec']:>10.1f} ops/s  "
+              f"p50={lat.get('p50')}ms p99={lat.get('p99')}ms errors={r['errors']}")
+    print(f"wrote {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""In-process stand-in for the subset of redis.asyncio used by the order path.
+
+Installed by assigning to ``app.core.redis._redis`` so every ``get_redis()``
+caller receives it without patching individual modules.
+"""
+import time
+from typing import Optional
+
+
+class FakeRedis:
+    def __init__(self):
+        self._data: dict = {}
+        self._expiry: dict = {}
+
+    def _alive(self, key) -> bool:
+        exp = self._expiry.get(key)
+        if exp is not None and exp < time.monotonic():
+            self._data.pop(key, None)
+            self._expiry.pop(key, None)
+            return False
+        return key in self._data
+
+    async def get(self, key) -> Optional[str]:
+        return self._data.get(key) if self._alive(key) else None
+
+    async def mget(self, *keys):
+        if len(keys) == 1 and isinstance(keys[0], (list, tuple)):
+            keys = keys[0]
+        return [await self.get(k) for k in keys]
+
+    async def set(self, key, value, nx: bool = False, ex: Optional[int] = None, px: Optional[int] = None):
+        if nx and self._alive(key):
+            return None
+        self._data[key] = value
+        if ex is not None or px is not None:
+            self._expiry[key] = time.monotonic() + (ex if ex is not None else px / 1000)
+        else:
+            self._expiry.pop(key, None)
+        return True
+
+    async def delete(self, *keys) -> int:
+        removed = 0
+        for k in keys:
+            removed += self._data.pop(k, None) is not None
+            self._expiry.pop(k, None)
+        return removed
+
+    async def expire(self, key, seconds) -> bool:
+        if not self._alive(key):
+            return False
+        self._expiry[key] = time.monotonic() + seconds
+        return True
+
+    async def hget(self, key, field):
+        return self._data.get(key, {}).get(field) if self._alive(key) else None
+
+    async def hgetall(self, key) -> dict:
+        return dict(self._data.get(key, {})) if self._alive(key) else {}
+
+    async def hset(self, key, field=None, value=None, mapping: Optional[dict] = None) -> int:
+        h = self._data.setdefault(key, {})
+        items = dict(mapping or {})
+        if field is not None:
+            items[field] = value
+        h.update(items)
+        return len(items)
+
+    async def hdel(self, key, *fields) -> int:
+        h = self._data.get(key, {})
+        return sum(h.pop(f, None) is not None for f in fields)
+
+    async def publish(self, channel, message) -> int:
+        return 0
@@ -0,0 +1,78 @@
+"""Minimal Binance REST stub for benchmarking the live fill path.
+
+Serves exchangeInfo, market orders (filled instantly at a fixed price) and
+account balances on localhost via uvicorn.
+"""
+import asyncio
+import socket
+from typing import Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+
+STUB_PRICE = "50000.00"
+
+stub_app = FastAPI()
+_order_seq = 0
+
+
+@stub_app.get("/api/v3/exchangeInfo")
+async def exchange_info(symbol: Optional[str] = None, symbols: Optional[str] = None):
+    import json
+    names = [symbol] if symbol else json.loads(symbols or '["BTCUSDT"]')
+    return {"symbols": [
+        {
+            "symbol": name,
+            "filters": [
+                {"filterType": "PRICE_FILTER", "minPrice": "0.01", "maxPrice": "1000000.00", "tickSize": "0.01"},
+                {"filterType": "LOT_SIZE", "minQty": "0.00001", "maxQty": "9000.0", "stepSize": "0.00001"},
+                {"filterType": "NOTIONAL", "minNotional": "5.0"},
+            ],
+        }
+        for name in names
+    ]}
+
+
+@stub_app.post("/api/v3/order")
+async def place_order(request: Request):
+    global _order_seq
+    _order_seq += 1
+    params = request.query_params
+    return {
+        "orderId": _order_seq,
+        "clientOrderId": params.get("newClientOrderId", f"stub-{_order_seq}"),
+        "status": "FILLED",
+        "fills": [{"price": STUB_PRICE, "qty": params["quantity"], "commission": "0", "commissionAsset": "BNB"}],
+    }
+
+
+@stub_app.get("/api/v3/account")
+async def account():
+    return {"balances": [{"asset": "USDT", "free": "1000000", "locked": "0"}]}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class StubBinanceServer:
+    """Run the stub in the current event loop: ``async with StubBinanceServer() as url``."""
+
+    def __init__(self):
+        self.port = _free_port()
+        self._server = uvicorn.Server(
+            uvicorn.Config(stub_app, host="127.0.0.1", port=self.port, log_level="warning")
+        )
+        self._task: Optional[asyncio.Task] = None
+
+    async def __aenter__(self) -> str:
+        self._task = asyncio.create_task(self._server.serve())
+        while not self._server.started:
+            await asyncio.sleep(0.01)
+        return f"http://127.0.0.1:{self.port}"
+
+    async def __aexit__(self, *exc):
+        self._server.should_exit = True
+        await self._task
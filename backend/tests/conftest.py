@@ -6,4 +6,62 @@ from contextlib import asynccontextmanager
 def mock_background_tasks(monkeypatch):
     """Prevent real Redis/market/bot connections during tests."""
     monkeypatch.setattr("app.main.market_data_loop", AsyncMock(return_value=None))
-    monkeypatch.setattr("app.main.bot_runner_loop", AsyncMock(return_value=None))
+    monkeypatch.setattr("app.main.refresh_symbol_registry", AsyncMock(return_value=None))
+    monkeypatch.setattr("app.main.risk_cache.run_invalidation_listener", AsyncMock(return_value=None))
+    monkeypatch.setattr("app.main.control_flags.run_listener", AsyncMock(return_value=None))
+
+
+@pytest.fixture(autouse=True)
+def reset_risk_cache():
+    """The risk cache is a process singleton; don't leak users between test DBs."""
+    from app.services.risk_cache import risk_cache
+    risk_cache._users.clear()
+    yield
+    risk_cache._users.clear()
+
+
+@pytest.fixture(autouse=True)
+def reset_bot_schedule():
+    """Cooldown state is held in runner memory; start each test fresh."""
+    from app.services.bot_runner import bot_schedule
+    bot_schedule.clear()
+    yield
+    bot_schedule.clear()
+
+
+@pytest.fixture(autouse=True)
+def reset_control_flags():
+    """Kill switch / live-trading cache is a process singleton."""
+    from app.services.control_flags import control_flags
+    control_flags._clear()
+    control_flags._subscribed = False
+    yield
+    control_flags._clear()
+    control_flags._subscribed = False
+
+
+@pytest.fixture(autouse=True)
+def reset_position_store():
+    """Write-behind queue is a process singleton."""
+    from app.services.position_store import position_store
+    position_store._queue.clear()
+    yield
+    position_store._queue.clear()
+
+
+@pytest.fixture(autouse=True)
+def reset_indicator_cache():
+    """Indicator memo is a process singleton."""
+    from app.services.indicator_cache import indicator_cache
+    indicator_cache.clear()
+    yield
+    indicator_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def reset_indicator_streams():
+    """Indicator streams are a process singleton."""
+    from app.services.indicator_stream import indicator_streams
+    indicator_streams.clear()
+    yield
+    indicator_streams.clear()
@@ -0,0 +1,79 @@
+from decimal import Decimal
+
+import numpy as np
+import pytest
+
+from app.services.backtest import SeriesIndicators, run_backtest
+from app.services.indicator_cache import indicator_override
+from app.services.bot_runner import calc_quantity_from_risk
+from app.services.indicators import calc_adx, calc_atr, calc_donchian
+from app.services.klines import Klines
+from app.services.stats import compute_stats
+from app.services.strategies import STRATEGIES, BreakoutLiteStrategy, calc_adx as memo_adx, calc_donchian as memo_donchian
+
+
+def _history(n=1500, seed=7):
+    rng = np.random.default_rng(seed)
+    closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    opens = np.r_[closes[0], closes[:-1]]
+    highs = np.maximum(opens, closes) * (1 + np.abs(rng.normal(0, 0.004, n)))
+    lows = np.minimum(opens, closes) * (1 - np.abs(rng.normal(0, 0.004, n)))
+    return Klines(np.arange(n) * 3600, opens, highs, lows, closes, rng.lognormal(5, 0.6, n))
+
+
+@pytest.mark.parametrize("strategy_type", list(STRATEGIES))
+def test_vectorized_run_matches_per_window_indicators(strategy_type):
+    klines = _history()
+    fast = run_backtest(strategy_type, {}, klines, fee_pct=0.1)
+    slow = run_backtest(strategy_type, {}, klines, fee_pct=0.1, vectorized=False)
+    fast.pop("elapsed_sec"), slow.pop("elapsed_sec")
+    assert fast == slow
+    assert fast["trade_count"] > 0
+
+
+def test_series_resolver_answers_window_views_and_falls_back_on_copies():
+    klines = _history(300)
+    resolver = SeriesIndicators(klines)
+    c, h, l = (col[50:250] for col in resolver.columns[:3])
+    with indicator_override(resolver):
+        assert memo_adx(h, l, c) == calc_adx(h, l, c)
+        assert memo_donchian(h[:-1], l[:-1], 20) == calc_donchian(h[:-1], l[:-1], 20)
+        assert resolver.hits == 2
+        assert memo_adx(h.copy(), l.copy(), c.copy()) == calc_adx(h, l, c)
+        # Same buffer, no position: the plain column is not a located window
+        assert memo_donchian(klines.high[50:249], klines.low[50:249], 20) == calc_donchian(h[:-1], l[:-1], 20)
+    assert resolver.fallbacks == 2
+
+
+def test_history_offset_matches_a_standalone_run():
+    klines = _history(300)
+    indicators = SeriesIndicators(klines)
+    alone = run_backtest("breakout_lite", {}, klines[100:], indicators=SeriesIndicators(klines[100:]))
+    shared = run_backtest("breakout_lite", {}, klines[100:], indicators=indicators, history_offset=100)
+    alone.pop("elapsed_sec"), shared.pop("elapsed_sec")
+    assert alone == shared
+    with pytest.raises(ValueError):
+        run_backtest("breakout_lite", {}, klines[100:], indicators=indicators, history_offset=250)
+
+
+def test_stop_fills_at_gap_open_and_stats_match_fills():
+    # Volume breakout closes bar 59 at 110, bar 60 opens gapped down at 90
+    n = 70
+    closes = 100.0 + np.sin(np.arange(n)) * 0.5
+    closes[59], closes[60:] = 110.0, 90.0
+    opens = np.r_[closes[0], closes[:-1]]
+    opens[60] = 90.0
+    highs, lows = np.maximum(opens, closes) + 0.5, np.minimum(opens, closes) - 0.5
+    volumes = np.full(n, 100.0)
+    volumes[59] = 1000.0
+    klines = Klines(np.arange(n) * 3600, opens, highs, lows, closes, volumes)
+    config = {"adx_min": 0, "rsi_max": 101}
+    assert BreakoutLiteStrategy(config).required_klines() <= 60
+
+    report = run_backtest("breakout_lite", config, klines)
+    assert report["exits"] == {"stop_loss": 1} and report["signals"] == 1
+
+    atr = calc_atr(highs[:60], lows[:60], closes[:60])
+    qty = calc_quantity_from_risk(Decimal("1000"), Decimal("110"), 0.5, atr, 2.0)
+    stats = compute_stats([("buy", qty, Decimal("110")), ("sell", qty, Decimal("90"))], Decimal("1000"))
+    assert report == {**report, **stats}
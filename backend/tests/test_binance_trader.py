@@ -53,3 +53,14 @@ async def test_place_market_order_error():
 
     with pytest.raises(Exception, match="Binance order failed"):
         await trader.place_market_order("BTCUSDT", "BUY", Decimal("0.001"))
+
+
+def test_exchange_client_order_id_is_scoped_per_user():
+    from app.services.binance_trader import exchange_client_order_id
+
+    assert exchange_client_order_id(7, "retry-1") == "7:retry-1"
+    assert exchange_client_order_id(7, "retry-1") != exchange_client_order_id(8, "retry-1")
+    long_id = "x" * 36
+    scoped = exchange_client_order_id(12345, long_id)
+    assert len(scoped) == 36 and scoped.startswith("12345:")
+    assert scoped != exchange_client_order_id(12345, "y" * 36)
@@ -19,6 +19,7 @@ async def test_generate_signal_uses_strategy_class():
     mock_redis = AsyncMock()
     mock_redis.get = AsyncMock(return_value=None)
     mock_redis.set = AsyncMock()
+    mock_redis.hgetall = AsyncMock(return_value={})
 
     with patch("app.services.bot_runner.get_redis", return_value=mock_redis):
         with patch("app.services.bot_runner.STRATEGIES", {"rsi_trend": lambda cfg: mock_strategy}):
@@ -38,6 +39,7 @@ async def test_generate_signal_respects_cooldown():
     import time
     mock_redis.get = AsyncMock(return_value=str(int(time.time())))  # just traded
     mock_redis.set = AsyncMock()
+    mock_redis.hgetall = AsyncMock(return_value={})
 
     with patch("app.services.bot_runner.get_redis", return_value=mock_redis):
         signal = await generate_signal(bot, "BTC_USDT")
@@ -54,6 +56,7 @@ async def test_generate_signal_unknown_strategy():
     mock_redis = AsyncMock()
     mock_redis.get = AsyncMock(return_value=None)
     mock_redis.set = AsyncMock()
+    mock_redis.hgetall = AsyncMock(return_value={})
 
     with patch("app.services.bot_runner.get_redis", return_value=mock_redis):
         signal = await generate_signal(bot, "BTC_USDT")
@@ -84,3 +87,319 @@ def test_calc_quantity_from_risk_no_sl():
         risk_pct=1.0, atr=500.0, stop_loss_atr=None,
     )
     assert qty > 0  # fallback
+
+
+@pytest.mark.asyncio
+async def test_run_bot_evaluates_signal_once_for_all_subscriptions():
+    from app.services import bot_runner
+
+    bot = MagicMock()
+    bot.id = 1
+    bot.strategy_type = "rsi_trend"
+    bot.strategy_config = {"pair": "BTC_USDT"}
+    subs = [MagicMock(user_id=uid, expires_at=None) for uid in (1, 2, 3)]
+
+    snapshot = bot_runner.CycleSnapshot()
+    snapshot.subs[1] = subs
+    snapshot.prices["BTC_USDT"] = Decimal("50000")
+    session_cm = MagicMock()
+    session_cm.__aenter__ = AsyncMock(return_value=AsyncMock())
+    session_cm.__aexit__ = AsyncMock(return_value=False)
+    signal = {"side": "buy", "risk_pct": 1.0, "atr": 500.0, "stop_loss_atr": 1.2}
+
+    with patch.object(bot_runner, "AsyncSessionLocal", MagicMock(return_value=session_cm)), \
+         patch.object(bot_runner, "generate_signal", AsyncMock(return_value=signal)) as gen, \
+         patch.object(bot_runner, "_execute_signal", AsyncMock()) as execute:
+        await bot_runner.run_bot(bot, snapshot=snapshot)
+
+    gen.assert_awaited_once()
+    assert [c.args[2] for c in execute.await_args_list] == subs
+
+
+@pytest.mark.asyncio
+async def test_run_cycle_runs_bots_concurrently_with_timeout(monkeypatch):
+    import asyncio
+    from app.core import metrics
+    from app.services import bot_runner
+
+    monkeypatch.setattr(bot_runner.settings, "BOT_RUNNER_CONCURRENCY", 2)
+    monkeypatch.setattr(bot_runner.settings, "BOT_RUN_TIMEOUT_SEC", 0.2)
+    metrics.reset()
+
+    running, peak, finished = 0, 0, []
+
+    async def fake_run_bot(bot, evaluate_signal=True, snapshot=None):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        try:
+            await asyncio.sleep(1.0 if bot.id == 3 else 0.05)
+            finished.append(bot.id)
+        finally:
+            running -= 1
+
+    bots = [MagicMock(id=i) for i in (1, 2, 3, 4)]
+    snapshot = bot_runner.CycleSnapshot()
+    snapshot.killed = {4}
+    session_cm = MagicMock()
+    session_cm.__aenter__ = AsyncMock(return_value=AsyncMock())
+    session_cm.__aexit__ = AsyncMock(return_value=False)
+
+    with patch.object(bot_runner, "run_bot", fake_run_bot), \
+         patch.object(bot_runner, "AsyncSessionLocal", MagicMock(return_value=session_cm)), \
+         patch.object(bot_runner, "load_cycle_snapshot", AsyncMock(return_value=snapshot)):
+        await bot_runner.run_cycle(bots)
+
+    assert sorted(finished) == [1, 2]      # 3 timed out, 4 is killed
+    assert peak == 2
+    assert metrics.snapshot()["counters"]["runner.bot_timeouts"] == 1
+
+
+@pytest.mark.asyncio
+async def test_run_cycle_records_per_bot_stage_timings():
+    import asyncio
+    from app.core import metrics
+    from app.services import bot_runner
+
+    metrics.reset()
+
+    async def fake_run_bot(bot, evaluate_signal=True, snapshot=None):
+        with metrics.stage("kline_fetch"):
+            await asyncio.sleep(0.05 if bot.id == 2 else 0.0)
+        with metrics.stage("order_fill"):
+            await asyncio.sleep(0)
+
+    bots = [MagicMock(id=i) for i in (1, 2)]
+    session_cm = MagicMock()
+    session_cm.__aenter__ = AsyncMock(return_value=AsyncMock())
+    session_cm.__aexit__ = AsyncMock(return_value=False)
+
+    with patch.object(bot_runner, "run_bot", fake_run_bot), \
+         patch.object(bot_runner, "AsyncSessionLocal", MagicMock(return_value=session_cm)), \
+         patch.object(bot_runner, "load_cycle_snapshot", AsyncMock(return_value=bot_runner.CycleSnapshot())):
+        await bot_runner.run_cycle(bots)
+
+    snap = metrics.snapshot()
+    slowest = snap["slowest"]["bot"]
+    assert [row["key"] for row in slowest] == ["2", "1"]
+    assert slowest[0]["last_stages"]["kline_fetch"] >= 0.04
+    assert set(slowest[1]["last_stages"]) == {"kline_fetch", "order_fill"}
+    assert snap["histograms"]["stage.kline_fetch_sec"]["count"] == 2
+
+
+@pytest.mark.asyncio
+async def test_bot_schedule_skips_redis_while_cooling_down():
+    import time
+    from app.services.bot_runner import BotSchedule
+
+    bot = MagicMock()
+    bot.id = 7
+    bot.strategy_config = {"signal_interval": 300}
+    mock_redis = AsyncMock()
+    mock_redis.hgetall = AsyncMock(return_value={})
+
+    schedule = BotSchedule()
+    now = int(time.time())
+    with patch("app.services.bot_runner.get_redis", AsyncMock(return_value=mock_redis)):
+        await schedule.record_trade(bot, "buy", now)
+        mock_redis.get.reset_mock()
+        assert await schedule.is_due(bot, now + 10) is False
+        assert await schedule.is_due(bot, now + 300) is True
+    mock_redis.get.assert_not_awaited()
+    persisted = mock_redis.hset.await_args.args
+    assert persisted[:2] == ("runner:next_due", "7")
+    assert '"next_due": %d' % (now + 300) in persisted[2]
+
+
+@pytest.mark.asyncio
+async def test_bot_schedule_restores_from_redis_hash():
+    import json
+    from app.services.bot_runner import BotSchedule
+
+    bot = MagicMock()
+    bot.id = 7
+    bot.strategy_config = {"signal_interval": 300}
+    mock_redis = AsyncMock()
+    mock_redis.hgetall = AsyncMock(return_value={"7": json.dumps({"last_trade": 1000, "last_side": "sell"})})
+
+    with patch("app.services.bot_runner.get_redis", AsyncMock(return_value=mock_redis)):
+        schedule = BotSchedule()
+        assert await schedule.get(7) == (1000, "sell")
+        assert await schedule.is_due(bot, 1200) is False
+    mock_redis.get.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_prefetch_klines_fetches_each_pair_interval_once_at_deepest_lookback():
+    import json
+    from app.services import bot_runner
+
+    def _bot(bot_id, strategy_type, pair, **config):
+        bot = MagicMock()
+        bot.id = bot_id
+        bot.strategy_type = strategy_type
+        bot.strategy_config = {"pair": pair, **config}
+        return bot
+
+    bots = [
+        _bot(1, "rsi_trend", "BTC_USDT"),                      # 215 candles
+        _bot(2, "boll_adx", "BTC_USDT"),                       # 49
+        _bot(3, "trend_ma200", "BTC_USDT", ma_period=300),     # 315
+        _bot(4, "boll_adx", "ETH_USDT"),
+        _bot(5, "rsi_trend", "SOL_USDT", signal_interval=300),  # cooling down
+    ]
+    mock_redis = AsyncMock()
+    mock_redis.hgetall = AsyncMock(return_value={"5": json.dumps({"last_trade": 2_000_000_000, "last_side": "buy"})})
+    mock_redis.get = AsyncMock(return_value=None)
+    fetch = AsyncMock(side_effect=lambda pair, interval, limit: (pair, interval, limit))
+
+    with patch("app.services.bot_runner.get_redis", AsyncMock(return_value=mock_redis)), \
+            patch("app.services.bot_runner.fetch_klines", fetch):
+        data = await bot_runner.prefetch_klines(bots)
+
+    assert fetch.await_count == 2
+    assert data == {("BTC_USDT", "1h"): ("BTC_USDT", "1h", 315), ("ETH_USDT", "1h"): ("ETH_USDT", "1h", 49)}
+
+
+@pytest.mark.asyncio
+async def test_load_cycle_snapshot_batches_reads():
+    import json
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+    from app.database import Base
+    from app.models.bot import Bot as BotModel, BotSubscription
+    from app.models.user import User
+    from app.models.wallet import Wallet
+    from app.services.bot_runner import load_cycle_snapshot
+
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    SessionLocal = async_sessionmaker(engine, expire_on_commit=False)
+    async with SessionLocal() as db:
+        db.add_all([User(id=1, wallet_address="0x1"), User(id=2, wallet_address="0x2")])
+        bots = [BotModel(id=1, name="a", strategy_config={"pair": "BTC_USDT"}),
+                BotModel(id=2, name="b", strategy_config={"pair": "ETH_USDT"})]
+        db.add_all(bots)
+        db.add_all([
+            BotSubscription(user_id=1, bot_id=1), BotSubscription(user_id=2, bot_id=1),
+            BotSubscription(user_id=1, bot_id=2), BotSubscription(user_id=2, bot_id=2, is_active=False),
+            Wallet(user_id=1, asset="USDT", balance=Decimal("100")),
+            Wallet(user_id=1, asset="BTC", balance=Decimal("0.5")),
+            Wallet(user_id=1, asset="SOL", balance=Decimal("9")),
+        ])
+        await db.commit()
+
+        store = {"bot:2:kill_switch": "1",
+                 "market:BTC_USDT:ticker": json.dumps({"last_price": "50000"}),
+                 "pos:1": {"2": json.dumps({"side": "buy"})}}
+
+        class _Pipeline:
+            executed = 0
+
+            def __init__(self):
+                self.calls = []
+
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            def mget(self, keys):
+                self.calls.append([store.get(k) for k in keys])
+
+            def hgetall(self, key):
+                self.calls.append(store.get(key, {}))
+
+            async def execute(self):
+                _Pipeline.executed += 1
+                return self.calls
+
+        mock_redis = AsyncMock()
+        mock_redis.pipeline = MagicMock(side_effect=lambda transaction=True: _Pipeline())
+        with patch("app.services.bot_runner.get_redis", AsyncMock(return_value=mock_redis)):
+            snapshot = await load_cycle_snapshot(db, bots)
+    await engine.dispose()
+
+    assert _Pipeline.executed == 1  # one Redis round trip for the whole cycle
+    mock_redis.get.assert_not_awaited()
+    assert [s.user_id for s in snapshot.subs[1]] == [1, 2]
+    assert [s.user_id for s in snapshot.subs[2]] == [1]
+    assert snapshot.wallet(1, "BTC") == Decimal("0.5")
+    assert (1, "SOL") not in snapshot.wallets  # only assets of the cycle's pairs
+    assert snapshot.killed == {2}
+    assert snapshot.prices == {"BTC_USDT": Decimal("50000"), "ETH_USDT": None}
+    assert await snapshot.position_manager(1, 2).has_position()
+    assert not await snapshot.position_manager(1, 1).has_position()
+
+
+@pytest.mark.asyncio
+async def test_execute_signal_caps_quantity_by_snapshot_wallet():
+    from app.services import bot_runner
+
+    bot = MagicMock(id=1, strategy_type="rsi_trend")
+    sub = MagicMock(user_id=7, allocated_usdt=Decimal("100000"))
+    snapshot = bot_runner.CycleSnapshot()
+    snapshot.wallets[(7, "USDT")] = Decimal("500")
+    db = MagicMock()
+    db.flush = AsyncMock()
+    signal = {"side": "buy", "risk_pct": 1.0, "atr": 500.0}
+
+    with patch.object(bot_runner, "_fill", AsyncMock(return_value={"filled": False})) as fill:
+        await bot_runner._execute_signal(db, bot, sub, MagicMock(), "BTC_USDT", Decimal("50000"), signal, snapshot)
+        # Nothing left to spend: no order at all
+        snapshot.wallets[(7, "USDT")] = Decimal("0")
+        await bot_runner._execute_signal(db, bot, sub, MagicMock(), "BTC_USDT", Decimal("50000"), signal, snapshot)
+
+    fill.assert_awaited_once()
+    assert fill.await_args.args[1].quantity == Decimal("0.01000")
+    db.execute.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_deadline_lets_an_order_section_finish_then_stops():
+    import asyncio
+    from app.services import bot_runner
+
+    steps = []
+
+    async def placing_bot():
+        with bot_runner._order_section(MagicMock(id=1)):
+            await asyncio.sleep(0.2)  # exchange order + commit outlive the deadline
+            steps.append("persisted")
+        steps.append("next subscription")
+
+    async def idle_bot():
+        await asyncio.sleep(10)
+        steps.append("never")
+
+    with pytest.raises(asyncio.TimeoutError):
+        await bot_runner._run_with_deadline(placing_bot(), timeout=0.05)
+    assert steps == ["persisted"]
+
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(bot_runner._run_with_deadline(idle_bot(), timeout=0.05), timeout=1)
+    assert steps == ["persisted"]
+
+
+@pytest.mark.asyncio
+async def test_lapsed_partition_blocks_runs_and_orders():
+    import asyncio
+    from app.services import bot_runner
+
+    owned = {1}
+    bots = [MagicMock(id=1), MagicMock(id=2)]
+
+    async def fenced():
+        bot_runner.fence_bots(lambda b: b.id in owned)
+        assert [b for b in bots if bot_runner._owned(b)] == bots[:1]
+        with bot_runner._order_section(bots[0]):
+            owned.clear()  # lease lapses while this order is in flight: it completes
+        with pytest.raises(bot_runner.BotNotOwned):
+            with bot_runner._order_section(bots[0]):
+                pass
+
+    await asyncio.create_task(fenced())
+    # The fence is per task: other tasks are not affected
+    with bot_runner._order_section(bots[1]):
+        pass
@@ -0,0 +1,84 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from app.services.bot_scheduler import EventScheduler
+
+
+def _bot(bot_id, pair, strategy_type="rsi_trend"):
+    bot = MagicMock()
+    bot.id = bot_id
+    bot.strategy_type = strategy_type
+    bot.strategy_config = {"pair": pair}
+    return bot
+
+
+@pytest.mark.asyncio
+async def test_kline_close_runs_signal_pass_for_matching_bots():
+    btc, eth = _bot(1, "BTC_USDT"), _bot(2, "ETH_USDT")
+    scheduler = EventScheduler()
+    scheduler.active_bots = AsyncMock(return_value=[btc, eth])
+
+    with patch("app.services.bot_scheduler.run_cycle", AsyncMock()) as run_cycle:
+        await scheduler.dispatch({"type": "kline_close", "pair": "BTC_USDT", "interval": "1h"})
+        await scheduler.dispatch({"type": "kline_close", "pair": "BTC_USDT", "interval": "4h"})
+        await asyncio.gather(*scheduler._tasks)
+
+    run_cycle.assert_awaited_once_with([btc], evaluate_signal=True)
+
+
+@pytest.mark.asyncio
+async def test_kline_close_uses_the_in_memory_bot_list():
+    import time
+    btc = _bot(1, "BTC_USDT")
+    scheduler = EventScheduler()
+    scheduler._bots, scheduler._bots_loaded_at = [btc], time.monotonic()
+
+    with patch("app.services.bot_scheduler.AsyncSessionLocal", side_effect=AssertionError("DB queried")), \
+            patch("app.services.bot_scheduler.run_cycle", AsyncMock()) as run_cycle:
+        await scheduler.dispatch({"type": "kline_close", "pair": "BTC_USDT", "interval": "1h", "close_time": 1})
+        await scheduler.dispatch({"type": "kline_close", "pair": "BTC_USDT", "interval": "1h", "close_time": 2})
+        await asyncio.gather(*scheduler._tasks)
+
+    assert run_cycle.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_kline_close_expires_the_runners_kline_cache_first():
+    from app.services import market_data
+    market_data._klines_cache["BTC_USDT:1h:250"] = ("stale", 0.0)
+    book = market_data._kline_books["BTC_USDT"] = MagicMock()
+    scheduler = EventScheduler()
+    scheduler.active_bots = AsyncMock(return_value=[_bot(1, "BTC_USDT")])
+
+    async def run_cycle(bots, evaluate_signal):
+        assert "BTC_USDT:1h:250" not in market_data._klines_cache
+        book.expire.assert_called_once()
+
+    try:
+        with patch("app.services.bot_scheduler.run_cycle", AsyncMock(side_effect=run_cycle)) as mock:
+            await scheduler.dispatch({"type": "kline_close", "pair": "BTC_USDT", "interval": "1h"})
+            await asyncio.gather(*scheduler._tasks)
+        mock.assert_awaited_once()
+    finally:
+        market_data._kline_books.pop("BTC_USDT", None)
+
+
+@pytest.mark.asyncio
+async def test_ticks_are_coalesced_per_pair():
+    btc = _bot(1, "BTC_USDT")
+    scheduler = EventScheduler()
+    scheduler.active_bots = AsyncMock(return_value=[btc])
+    release = asyncio.Event()
+
+    async def slow_cycle(bots, evaluate_signal):
+        await release.wait()
+
+    with patch("app.services.bot_scheduler.run_cycle", AsyncMock(side_effect=slow_cycle)) as run_cycle:
+        await scheduler.dispatch({"type": "tick", "pair": "BTC_USDT", "price": "50000"})
+        await asyncio.sleep(0)
+        # Still running, and within EXIT_CHECK_MIN_INTERVAL_SEC: dropped
+        await scheduler.dispatch({"type": "tick", "pair": "BTC_USDT", "price": "50010"})
+        release.set()
+        await asyncio.gather(*scheduler._tasks)
+
+    run_cycle.assert_awaited_once_with([btc], evaluate_signal=False)
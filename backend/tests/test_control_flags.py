@@ -0,0 +1,82 @@
+import json
+
+import pytest
+from decimal import Decimal
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.services.control_flags import ControlFlags, control_flags
+
+
+@pytest.mark.asyncio
+async def test_live_trading_served_from_memory_once_subscribed():
+    flags = ControlFlags()
+    flags._subscribed = True
+    mock_redis = AsyncMock()
+    mock_redis.get = AsyncMock(return_value="true")
+
+    with patch("app.services.control_flags.get_redis", AsyncMock(return_value=mock_redis)):
+        assert await flags.live_trading() is True
+        assert await flags.live_trading() is True
+        assert mock_redis.get.await_count == 1
+
+        flags.handle_message(json.dumps({"flag": "live_trading", "value": False}))
+        assert await flags.live_trading() is False
+        assert mock_redis.get.await_count == 1
+
+
+def test_kill_switch_cache_only_trusted_while_subscribed():
+    flags = ControlFlags()
+    flags.remember_kills([1, 2], [None, "1"])
+    assert flags.unknown([1, 2]) == [1, 2]
+
+    flags._subscribed = True
+    flags.handle_message(json.dumps({"flag": "kill", "bot_id": 2, "value": True}))
+    flags.remember_kills([1, 2], [None, None])  # stale read must not undo the pushed kill
+    assert flags.unknown([1, 2, 3]) == [3]
+    assert flags.is_killed(2) and not flags.is_killed(1)
+
+    flags.handle_message(json.dumps({"flag": "all"}))
+    assert flags.unknown([1, 2]) == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_schedule_reset_reaches_the_runner_process():
+    from app.services.bot_runner import bot_schedule
+    bot_schedule._state[5] = (1_700_000_000, "buy")
+    bot_schedule._loaded = True
+    redis = AsyncMock()
+    with patch("app.services.control_flags.get_redis", AsyncMock(return_value=redis)):
+        await ControlFlags().reset_schedule()
+    message = redis.publish.await_args.args[1]
+    assert not bot_schedule._state and not bot_schedule._loaded
+
+    # The runner receives it on its own listener
+    bot_schedule._state[5] = (1_700_000_000, "buy")
+    ControlFlags().handle_message(message)
+    assert not bot_schedule._state
+
+
+@pytest.mark.asyncio
+async def test_run_bot_stops_when_killed_mid_cycle():
+    from app.services import bot_runner
+
+    bot = MagicMock(id=7, strategy_type="rsi_trend", strategy_config={"pair": "BTC_USDT"})
+    subs = [MagicMock(user_id=uid, expires_at=None) for uid in (1, 2, 3)]
+    snapshot = bot_runner.CycleSnapshot()
+    snapshot.subs[7] = subs
+    snapshot.prices["BTC_USDT"] = Decimal("50000")
+    session_cm = MagicMock()
+    session_cm.__aenter__ = AsyncMock(return_value=AsyncMock())
+    session_cm.__aexit__ = AsyncMock(return_value=False)
+
+    async def execute(db, bot, sub, *args):
+        if sub.user_id == 1:
+            control_flags.handle_message(json.dumps({"flag": "kill", "bot_id": 7, "value": True}))
+
+    signal = {"side": "buy", "risk_pct": 1.0, "atr": 500.0, "stop_loss_atr": 1.2}
+    with patch.object(bot_runner, "AsyncSessionLocal", MagicMock(return_value=session_cm)), \
+         patch.object(bot_runner, "generate_signal", AsyncMock(return_value=signal)), \
+         patch.object(bot_runner, "_execute_signal", AsyncMock(side_effect=execute)) as executed:
+        await bot_runner.run_bot(bot, snapshot=snapshot)
+
+    assert [c.args[2].user_id for c in executed.await_args_list] == [1]
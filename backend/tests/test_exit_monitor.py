@@ -0,0 +1,117 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.services.exit_monitor import ExitMonitor
+from app.services.position_manager import evaluate_exit
+
+
+def _pos(side="buy", entry=50000.0, sl=49400.0, tp=51000.0, trailing=None, mult=1.5, atr=500.0):
+    return {"side": side, "entry": entry, "stop_loss": sl, "take_profit": tp,
+            "trailing_stop": trailing, "trailing_active": trailing is not None,
+            "trailing_atr_mult": mult, "current_atr": atr}
+
+
+@pytest.mark.asyncio
+async def test_exit_monitor_matches_check_exit():
+    """Same exit reason as the shared evaluate_exit rule for every price path."""
+    cases = [
+        (_pos(), [50500.0, 49300.0]),
+        (_pos(), [50500.0, 51100.0]),
+        (_pos(side="sell", sl=50600.0, tp=49000.0), [49900.0, 50700.0]),
+        (_pos(side="sell", sl=50600.0, tp=49000.0), [49900.0, 48900.0]),
+        (_pos(tp=None, trailing=49500.0), [50500.0, 51000.0, 50200.0]),
+        (_pos(side="sell", sl=51000.0, tp=None, trailing=50500.0), [49500.0, 49000.0, 49800.0]),
+    ]
+    for pos, prices in cases:
+        monitor = ExitMonitor()
+        monitor.track(1, 10, "BTC_USDT", pos)
+        reference = dict(pos)
+        for price in prices:
+            expected, _ = evaluate_exit(reference, price)
+            exits = monitor.on_price("BTC_USDT", price)
+            assert exits == ([((1, 10), expected)] if expected else []), (pos, price)
+            if expected:
+                break
+        assert expected is not None
+
+
+def test_exit_monitor_ratchets_trailing_and_catches_intrawindow_low():
+    monitor = ExitMonitor()
+    monitor.track(1, 10, "BTC_USDT", _pos(tp=None, trailing=49500.0))
+    monitor.track(2, 10, "BTC_USDT", _pos(sl=48000.0, tp=None))
+
+    assert monitor.on_price("BTC_USDT", 51000.0) == []
+    assert monitor._dirty == {(1, 10)}
+    entry = monitor._books["BTC_USDT"].entries[(1, 10)]
+    assert entry.pos["trailing_stop"] == 50250.0
+
+    # Last price is above the ratcheted stop but the window's low crossed it
+    assert monitor.on_price("BTC_USDT", 50400.0, high=50400.0, low=50200.0) == [((1, 10), "stop_loss")]
+    assert monitor.tracked() == 1 and (1, 10) not in monitor._dirty
+
+
+@pytest.mark.asyncio
+async def test_exit_monitor_skips_position_closed_elsewhere():
+    from app.services import bot_runner
+
+    monitor = ExitMonitor()
+    snapshot = bot_runner.CycleSnapshot()
+    snapshot.subs[1] = [MagicMock(user_id=10)]
+    snapshot.positions[(1, 10)] = None  # closed since the monitor loaded it
+    db = AsyncMock()
+    db.get = AsyncMock(return_value=MagicMock(id=1))
+    session_cm = MagicMock()
+    session_cm.__aenter__ = AsyncMock(return_value=db)
+    session_cm.__aexit__ = AsyncMock(return_value=False)
+
+    with patch("app.services.exit_monitor.AsyncSessionLocal", MagicMock(return_value=session_cm)), \
+         patch.object(bot_runner, "load_cycle_snapshot", AsyncMock(return_value=snapshot)), \
+         patch.object(bot_runner, "_close_position_order", AsyncMock()) as close:
+        await monitor._fire((1, 10), "BTC_USDT", "stop_loss", 49000.0, 0.0)
+
+    close.assert_not_awaited()
+    assert not monitor._firing
+
+
+@pytest.mark.asyncio
+async def test_bot_runner_tracks_positions_only_while_monitor_runs():
+    from datetime import datetime, timedelta
+    from decimal import Decimal
+    from app.services import bot_runner
+
+    monitor = ExitMonitor()
+    bot = MagicMock(id=1, strategy_type="rsi_trend", strategy_config={"pair": "BTC_USDT"})
+    sub = MagicMock(user_id=10, allocated_usdt=Decimal("1000"), expires_at=None)
+    snapshot = bot_runner.CycleSnapshot()
+    snapshot.wallets[(10, "USDT")] = Decimal("1000")
+    pm = MagicMock()
+    pm.open_position = AsyncMock(return_value=_pos())
+    db = MagicMock()
+    db.flush = AsyncMock()
+    signal = {"side": "buy", "risk_pct": 1.0, "atr": 500.0, "stop_loss_atr": 1.2}
+
+    async def execute():
+        await bot_runner._execute_signal(db, bot, sub, pm, "BTC_USDT", Decimal("50000"), signal, snapshot)
+
+    with patch.object(bot_runner, "exit_monitor", monitor), \
+         patch.object(bot_runner, "_fill", AsyncMock(return_value={"filled": True, "fill_price": 50000.0})):
+        await execute()
+        assert monitor.tracked() == 0  # nobody would ever evict it
+        monitor.running = True
+        await execute()
+        assert monitor.tracked() == 1
+
+        # Expiry closes the position: the monitor drops it too
+        sub.expires_at = datetime.utcnow() - timedelta(minutes=1)
+        snapshot.subs[1] = [sub]
+        snapshot.prices["BTC_USDT"] = Decimal("50000")
+        expiring_pm = MagicMock(has_position=AsyncMock(return_value=True), get_position=AsyncMock(return_value=None),
+                                close_position=AsyncMock())
+        session_cm = MagicMock()
+        session_cm.__aenter__ = AsyncMock(return_value=AsyncMock())
+        session_cm.__aexit__ = AsyncMock(return_value=False)
+        with patch.object(bot_runner, "AsyncSessionLocal", MagicMock(return_value=session_cm)), \
+             patch.object(snapshot, "position_manager", MagicMock(return_value=expiring_pm)):
+            await bot_runner.run_bot(bot, snapshot=snapshot)
+    expiring_pm.close_position.assert_awaited_once()
+    assert monitor.tracked() == 0
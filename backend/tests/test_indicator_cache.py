@@ -0,0 +1,89 @@
+import pytest
+from unittest.mock import patch
+
+import numpy as np
+
+from app.config import settings
+from app.core import metrics
+from app.services import indicator_cache as cache_module
+from app.services.indicator_cache import IndicatorCache, evaluate_in_scope, indicator_cache, memoized
+from app.services.indicators import calc_atr, calc_rsi
+from app.services.klines import Klines
+from app.services.strategies import BollingerADXStrategy, RSITrendStrategy, TrendMA200Strategy
+
+
+def _klines(n=230):
+    closes = [100.0 + 5 * np.sin(i / 7) + i * 0.01 for i in range(n)]
+    return Klines.from_dicts([{"open": c, "high": c + 1.5, "low": c - 1.5, "close": c, "volume": 1000.0,
+                               "time": i * 3600} for i, c in enumerate(closes)])
+
+
+@pytest.mark.asyncio
+async def test_strategies_on_one_pair_share_indicator_results(monkeypatch):
+    monkeypatch.setattr(settings, "INDICATOR_STREAMS", False)  # streams would answer the repeats
+    metrics.reset()
+    klines = _klines()
+    a = RSITrendStrategy({"rsi_buy": 30})
+    b = RSITrendStrategy({"rsi_buy": 40})  # same indicators, different thresholds
+    with patch("app.services.strategies.fetch_klines", return_value=klines):
+        await a.generate("BTC_USDT")
+        misses = metrics.counter("indicator_cache.misses")
+        await b.generate("BTC_USDT")
+        assert metrics.counter("indicator_cache.misses") == misses
+        assert metrics.counter("indicator_cache.hits") == 4  # rsi, ma, slope, atr
+
+        # Same window: TrendMA200's MA200, slope and calc_atr(highs, lows, closes) are RSITrend's entries
+        await TrendMA200Strategy({}).generate("BTC_USDT")
+        assert metrics.counter("indicator_cache.hits") == 7
+        # BollingerADX reads a shorter tail of the same klines: its ATR is a separate entry
+        await BollingerADXStrategy({"adx_threshold": 100, "bandwidth_min": 0, "bandwidth_max": 1}).generate("BTC_USDT")
+        assert metrics.counter("indicator_cache.hits") == 7
+        # Another pair never shares entries
+        await a.generate("ETH_USDT")
+        assert metrics.counter("indicator_cache.hits") == 7
+
+    assert cache_module.stats()["hit_rate"] == pytest.approx(7 / (7 + metrics.counter("indicator_cache.misses")), abs=1e-4)
+
+
+def test_forming_candle_change_and_slices_get_their_own_entries():
+    closes = [float(100 + (i % 9)) for i in range(60)]
+    highs = [c + 1 for c in closes]
+    lows = [c - 1 for c in closes]
+    rsi, atr = memoized(calc_rsi), memoized(calc_atr)
+    scope = ("BTC_USDT", "1h", 59)
+
+    def evaluate(closes, highs, lows):
+        return rsi(closes), rsi(closes[:-1]), atr(highs, lows, closes, 14)
+
+    first, _, misses = evaluate_in_scope(evaluate, scope, closes, highs, lows)
+    assert misses == 3
+    assert first == (calc_rsi(closes), calc_rsi(closes[:-1]), calc_atr(highs, lows, closes))
+
+    # Same open time, but the forming candle's close moved: closes-based entries recompute
+    moved = closes[:-1] + [closes[-1] + 3]
+    second, hits, misses = evaluate_in_scope(evaluate, scope, moved, highs, lows)
+    assert (hits, misses) == (1, 2)  # rsi(closes[:-1]) unchanged
+    assert second[0] == calc_rsi(moved)
+
+    # Same length and ends, different candle inside the window (e.g. a corrected backfill)
+    patched = list(moved)
+    patched[30] += 5
+    third, hits, misses = evaluate_in_scope(evaluate, scope, patched, highs, lows)
+    assert (hits, misses) == (0, 3)
+    assert third[:2] == (calc_rsi(patched), calc_rsi(patched[:-1]))
+
+    # Outside a scope nothing is cached
+    before = indicator_cache.hits + indicator_cache.misses
+    assert rsi(closes) == calc_rsi(closes)
+    assert indicator_cache.hits + indicator_cache.misses == before
+
+
+def test_lru_evicts_least_recently_used():
+    cache = IndicatorCache(maxsize=2)
+    cache.get_or_compute("a", lambda: 1)
+    cache.get_or_compute("b", lambda: 2)
+    cache.get_or_compute("a", lambda: 0)  # hit, "b" is now oldest
+    cache.get_or_compute("c", lambda: 3)
+    assert cache.get_or_compute("a", lambda: -1) == 1
+    assert cache.get_or_compute("b", lambda: 20) == 20
+    assert (cache.hits, cache.misses, cache.evictions) == (2, 4, 2)
@@ -0,0 +1,180 @@
+import json
+import math
+import random
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.core import metrics
+from app.services import indicator_series as series
+from app.services.indicator_stream import (
+    IndicatorStream, IndicatorStreams, StreamingADX, StreamingATR, StreamingBollinger, StreamingDonchian,
+    StreamingMASlope, StreamingRSI, StreamingSMA, evaluate_streamed, indicator_from_dict, indicator_streams,
+)
+from app.services.klines import Klines
+from app.services.strategies import (
+    RSITrendStrategy, calc_adx, calc_atr, calc_bandwidth, calc_bollinger, calc_donchian, calc_ma, calc_ma_slope,
+    calc_rsi,
+)
+
+
+def _klines(n: int, seed: int = 3, start: int = 0):
+    rng = random.Random(seed)
+    price, out = 100.0, []
+    for i in range(n):
+        price *= 1 + rng.gauss(0, 0.01)
+        out.append({
+            "time": start + i * 3600, "open": price, "close": price, "volume": 1.0,
+            "high": price * (1 + abs(rng.gauss(0, 0.005))),
+            "low": price * (1 - abs(rng.gauss(0, 0.005))),
+        })
+    return out
+
+
+def _expected(klines):
+    c = [k["close"] for k in klines]
+    h = [k["high"] for k in klines]
+    l = [k["low"] for k in klines]
+    lower, upper = series.bollinger(c, 20, 2.0)
+    d_upper, d_lower = series.donchian(h, l, 20)
+    return {
+        "sma": series.sma(c, 20),
+        "rsi": series.rsi(c, 14),
+        "atr": series.atr(h, l, c, 14),
+        "adx": series.adx(h, l, c, 14),
+        "slope": series.ma_slope(c, 20, 5),
+        "bb_lower": lower, "bb_upper": upper,
+        "don_upper": d_upper, "don_lower": d_lower,
+    }
+
+
+def _make():
+    return {
+        "sma": StreamingSMA(20), "rsi": StreamingRSI(14), "atr": StreamingATR(14),
+        "adx": StreamingADX(14), "slope": StreamingMASlope(20, 5),
+        "bb": StreamingBollinger(20, 2.0), "don": StreamingDonchian(20),
+    }
+
+
+def _flatten(values: dict) -> dict:
+    out = {k: v for k, v in values.items() if k not in ("bb", "don")}
+    bb, don = values["bb"], values["don"]
+    out["bb_lower"], out["bb_upper"] = bb if bb is not None else (None, None)
+    out["don_upper"], out["don_lower"] = don if don is not None else (None, None)
+    return out
+
+
+def _check(values: dict, expected: dict, i: int):
+    for name, value in _flatten(values).items():
+        want = expected[name][i]
+        if math.isnan(want):
+            assert value is None, (name, i)
+        else:
+            assert value == pytest.approx(want, rel=1e-9, abs=1e-9), (name, i)
+
+
+def test_streaming_matches_series_for_closed_and_forming_candles():
+    klines = _klines(400)
+    expected = _expected(klines)
+    inds = _make()
+    for i, k in enumerate(klines):
+        # Forming candle: value as if it closed now, state untouched
+        before = json.dumps({n: ind.to_dict() for n, ind in inds.items()})
+        _check({n: ind.update(k, closed=False) for n, ind in inds.items()}, expected, i)
+        assert json.dumps({n: ind.to_dict() for n, ind in inds.items()}) == before
+        _check({n: ind.update(k) for n, ind in inds.items()}, expected, i)
+
+
+def test_state_round_trips_through_json():
+    klines = _klines(300)
+    expected = _expected(klines)
+    inds = {n: ind.seed(klines[:150]) for n, ind in _make().items()}
+    resumed = {n: indicator_from_dict(json.loads(json.dumps(ind.to_dict()))) for n, ind in inds.items()}
+    for i in range(150, 300):
+        _check({n: ind.update(klines[i]) for n, ind in resumed.items()}, expected, i)
+
+
+@pytest.mark.asyncio
+async def test_indicator_stream_syncs_incrementally_and_resumes_from_redis():
+    klines = _klines(260)
+    store = {}
+    redis = AsyncMock()
+    redis.get = AsyncMock(side_effect=lambda key: store.get(key))
+    redis.set = AsyncMock(side_effect=lambda key, value, ex=None: store.__setitem__(key, value))
+
+    with patch("app.services.indicator_stream.get_redis", AsyncMock(return_value=redis)):
+        stream = await IndicatorStream.load("BTC_USDT", "1h", {"rsi": StreamingRSI(14), "adx": StreamingADX(14)})
+        values = stream.sync(klines[:201])  # last one is forming
+        assert stream.last_time == klines[199]["time"]
+        await stream.save()
+
+        resumed = await IndicatorStream.load("BTC_USDT", "1h", {"rsi": StreamingRSI(14), "adx": StreamingADX(14)})
+        assert resumed.last_time == stream.last_time
+        assert resumed.sync(klines[:201]) == values
+        # Next fetch window slid forward by 60 candles
+        values = resumed.sync(klines[60:260])
+
+        # A different indicator set does not pick up the saved state
+        other = await IndicatorStream.load("BTC_USDT", "1h", {"rsi": StreamingRSI(7)})
+        assert other.last_time is None
+
+    assert values["rsi"] == pytest.approx(series.rsi([k["close"] for k in klines], 14)[-1])
+    c = [k["close"] for k in klines]
+    h = [k["high"] for k in klines]
+    l = [k["low"] for k in klines]
+    assert values["adx"] == pytest.approx(series.adx(h, l, c, 14)[-1])
+
+    # Candles missed before the fetched window: re-seeded from that window
+    fresh = IndicatorStream("BTC_USDT", "1h", {"atr": StreamingATR(14)})
+    fresh.sync(klines[:50])
+    assert fresh.sync(klines[100:200])["atr"] == pytest.approx(
+        series.atr(h[100:200], l[100:200], c[100:200], 14)[-1])
+
+
+def _all_calcs(closes, highs, lows, volumes):
+    return (
+        calc_rsi(closes, 14), calc_ma(closes, 50), *calc_bollinger(closes, 20, 2.0),
+        calc_bandwidth(closes, 20, 2.0), calc_atr(highs, lows, closes, 14),
+        *calc_donchian(highs[:-1], lows[:-1], 20), calc_ma_slope(closes, 50, 5),
+        calc_adx(highs, lows, closes, 14),
+    )
+
+
+def test_runner_calls_are_answered_from_the_stream():
+    klines = Klines.from_dicts(_klines(320))
+    for end in range(250, 320):
+        window = klines[end - 250:end]  # last candle forming
+        values = indicator_streams.values("BTC_USDT", "1h", window)
+        result, _, _, stream_hits, wanted = evaluate_streamed(
+            _all_calcs, ("BTC_USDT", "1h", window.last_time), values,
+            window.close, window.high, window.low, window.volume,
+        )
+        indicator_streams.want("BTC_USDT", "1h", wanted)
+        # The forming candle's values and the closed-candle Donchian match the windowed calc_*
+        assert result == pytest.approx(_all_calcs(window.close, window.high, window.low, window.volume), rel=1e-9)
+        if end == 250:
+            assert (stream_hits, len(wanted)) == (0, 7)  # everything but ADX is streamable
+        else:
+            assert (stream_hits, wanted) == (7, {})
+
+
+@pytest.mark.asyncio
+async def test_strategy_streams_are_saved_and_restored():
+    metrics.reset()
+    klines = Klines.from_dicts(_klines(300))
+    store = {}
+    redis = AsyncMock()
+    redis.set = AsyncMock(side_effect=lambda key, value, ex=None: store.__setitem__(key, value))
+    redis.mget = AsyncMock(side_effect=lambda keys: [store.get(k) for k in keys])
+    strategy = RSITrendStrategy({})
+    with patch("app.services.indicator_stream.get_redis", AsyncMock(return_value=redis)):
+        plain = strategy.evaluate(klines.close[-250:], klines.high[-250:], klines.low[-250:], klines.volume[-250:])
+        for end in (299, 300):
+            await strategy.generate("BTC_USDT", {("BTC_USDT", "1h"): klines[:end]})
+        assert metrics.counter("indicator_stream.hits") == 4  # rsi, ma, slope, atr on the second run
+        assert await strategy.generate("BTC_USDT", {("BTC_USDT", "1h"): klines}) == plain
+
+        resumed = IndicatorStreams()
+        assert await resumed.restore(["BTC_USDT", "ETH_USDT"], ["1h"]) == 1
+    stream = indicator_streams._streams[("BTC_USDT", "1h")]
+    assert resumed._streams[("BTC_USDT", "1h")].to_dict() == json.loads(json.dumps(stream.to_dict()))
@@ -0,0 +1,66 @@
+import pickle
+
+import numpy as np
+import pytest
+from unittest.mock import AsyncMock, patch
+from httpx import AsyncClient, ASGITransport
+
+from app.main import app
+from app.services.indicators import calc_atr
+from app.services.klines import Klines, column_windows, window_of
+
+ROWS = [
+    [1700000000000 + i * 60_000, f"{100 + i}.5", f"{101 + i}", f"{99 + i}", f"{100 + i}.25", "3.5", 0, "0", 0, "0", "0", "0"]
+    for i in range(30)
+]
+
+
+def test_from_binance_columns_slices_and_dicts():
+    k = Klines.from_binance(ROWS)
+    assert len(k) == 30 and k.time.dtype == np.int64
+    assert k[0] == {"time": 1700000000, "open": 100.5, "high": 101.0, "low": 99.0, "close": 100.25, "volume": 3.5}
+    assert k.last_time == 1700000000 + 29 * 60
+
+    tail = k[-20:]
+    assert len(tail) == 20 and np.shares_memory(tail.close, k.close)
+    with pytest.raises(ValueError):
+        k.close[0] = 1.0  # shared through the klines cache
+
+    assert Klines.from_dicts(k.to_dicts()).to_dicts() == k.to_dicts()
+    assert calc_atr(k.high, k.low, k.close) == calc_atr(*([c[f] for c in k.to_dicts()] for f in ("high", "low", "close")))
+    assert len(Klines.from_binance([])) == 0 and Klines.empty().last_time is None
+
+
+@pytest.mark.asyncio
+async def test_klines_endpoint_returns_candle_dicts():
+    klines = Klines.from_binance(ROWS[:3])
+    with patch("app.routers.market.fetch_klines", AsyncMock(return_value=klines)):
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+            r = await ac.get("/api/market/BTC_USDT/klines", params={"interval": "1m", "limit": 3})
+    assert r.status_code == 200
+    assert r.json() == klines.to_dicts() and r.json()[1]["time"] == 1700000060
+
+
+def test_load_csv_dump_and_headed_csv_and_npz_round_trip(tmp_path):
+    dump = tmp_path / "BTCUSDT-1m.csv"
+    dump.write_text("\n".join(",".join(str(v) for v in row) for row in ROWS))
+    k = Klines.load(dump)
+    assert k.to_dicts() == Klines.from_binance(ROWS).to_dicts()
+
+    headed = tmp_path / "headed.csv"
+    headed.write_text("timestamp,open,high,low,close,volume\n1700000000,1,2,0.5,1.5,10\n")
+    assert Klines.load(headed)[0] == {"time": 1700000000, "open": 1.0, "high": 2.0, "low": 0.5, "close": 1.5, "volume": 10.0}
+
+    k.save(tmp_path / "k.npz")
+    assert Klines.load(tmp_path / "k.npz").to_dicts() == k.to_dicts()
+
+
+def test_column_windows_locate_slices_only():
+    token = object()
+    closes, highs = column_windows(np.arange(10.0), np.arange(10.0) * 2, origin=token)
+    assert window_of(closes[-5:][:-1], token) == (0, 5) and window_of(highs[2:], token) == (1, 2)
+    for plain in (closes[::-1], closes[2:].copy(), closes + 1, closes[[1, 2]], np.arange(10.0)):
+        assert window_of(plain, token) is None
+    assert window_of(closes[2:], object()) is None
+    assert type(np.mean(closes[2:])) is np.float64 and type(np.diff(closes)) is np.ndarray
+    assert type(pickle.loads(pickle.dumps(closes[2:]))) is np.ndarray
@@ -0,0 +1,154 @@
+import pytest
+import pytest_asyncio
+from decimal import Decimal
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from app.database import Base
+from app.models.user import User
+from app.models.wallet import Wallet
+from app.models.order import Order, Trade, OrderSide, OrderType, OrderStatus
+from app.models.ledger import LedgerEntry, LedgerSnapshot
+from app.services.ledger import Ledger
+
+
+@pytest_asyncio.fixture
+async def session_factory(tmp_path):
+    # File-backed so the ledger's own sessions get separate connections
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/ledger.db")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    SessionLocal = async_sessionmaker(engine, expire_on_commit=False)
+    async with SessionLocal() as db:
+        db.add(User(id=1, wallet_address="0xabc"))
+        db.add(Wallet(user_id=1, asset="USDT", balance=Decimal("1000")))
+        await db.commit()
+    yield SessionLocal
+    await engine.dispose()
+
+
+async def _buy(SessionLocal, ledger, qty="0.01", price="50000"):
+    async with SessionLocal() as db:
+        order = Order(user_id=1, pair="BTC_USDT", side=OrderSide.buy,
+                      type=OrderType.market, quantity=Decimal(qty))
+        db.add(order)
+        await db.flush()
+        filled = await ledger.apply_fill(db, order, "BTC", "USDT", Decimal(qty), Decimal(price))
+        return filled, order
+
+
+async def _wallets(SessionLocal):
+    async with SessionLocal() as db:
+        return {w.asset: Decimal(str(w.balance)) for w in await db.scalars(select(Wallet))}
+
+
+@pytest.mark.asyncio
+async def test_fill_updates_memory_and_defers_wallet_write(session_factory):
+    ledger = Ledger(session_factory)
+    filled, order = await _buy(session_factory, ledger)
+    assert filled and order.status == OrderStatus.filled
+    assert ledger.balance(1, "USDT") == Decimal("500")
+    assert ledger.balance(1, "BTC") == Decimal("0.01")
+    assert (await _wallets(session_factory))["USDT"] == Decimal("1000")  # not yet snapshotted
+
+
+@pytest.mark.asyncio
+async def test_insufficient_balance_rejected_in_memory(session_factory):
+    ledger = Ledger(session_factory)
+    assert (await _buy(session_factory, ledger, qty="0.015"))[0]
+    filled, _ = await _buy(session_factory, ledger, qty="0.015")  # needs 750, only 250 left
+    assert filled is False
+
+
+@pytest.mark.asyncio
+async def test_journal_and_trade_commit_with_the_order(session_factory):
+    ledger = Ledger(session_factory)
+    for _ in range(3):
+        await _buy(session_factory, ledger, qty="0.002")
+    # A crash right after the fills loses nothing: each entry committed with its order
+    async with session_factory() as db:
+        assert await db.scalar(select(func.count(Trade.id))) == 3
+        assert await db.scalar(select(func.count(LedgerEntry.id))) == 3
+        assert await db.scalar(select(func.count(Order.id)).where(Order.status == OrderStatus.filled)) == 3
+
+    await ledger.snapshot()
+    wallets = await _wallets(session_factory)
+    assert wallets["USDT"] == Decimal("700") and wallets["BTC"] == Decimal("0.006")
+    async with session_factory() as db:
+        assert await db.scalar(select(func.count(LedgerEntry.id)).where(LedgerEntry.snapshot_id.is_(None))) == 0
+
+
+@pytest.mark.asyncio
+async def test_invalidate_reloads_wallet_written_outside_the_ledger(session_factory):
+    ledger = Ledger(session_factory)
+    await _buy(session_factory, ledger, qty="0.01")  # 500 USDT left, not yet snapshotted
+    async with session_factory() as db:
+        # e.g. a bot subscription locking 400 USDT straight on the wallet row
+        wallet = await db.scalar(select(Wallet).where(Wallet.asset == "USDT"))
+        wallet.balance = Decimal("600")
+        await db.commit()
+    ledger.invalidate(1)
+    assert (await _buy(session_factory, ledger, qty="0.003"))[0] is False  # 150 > 100
+    assert ledger.balance(1, "USDT") == Decimal("100")
+
+
+@pytest.mark.asyncio
+async def test_recover_replays_journal_tail(session_factory):
+    crashed = Ledger(session_factory)
+    await _buy(session_factory, crashed, qty="0.004")  # journaled but never snapshotted
+
+    restarted = Ledger(session_factory)
+    assert await restarted.recover() == 1
+    wallets = await _wallets(session_factory)
+    assert wallets["USDT"] == Decimal("800") and wallets["BTC"] == Decimal("0.004")
+    assert await restarted.recover() == 0  # idempotent
+
+
+def _market_buy(qty="0.001", client_order_id=None):
+    return Order(user_id=1, pair="BTC_USDT", side=OrderSide.buy, type=OrderType.market,
+                 quantity=Decimal(qty), client_order_id=client_order_id)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_fills_share_a_group_commit(session_factory):
+    import asyncio
+
+    ledger = Ledger(session_factory)
+    batches = []
+    insert = ledger._insert
+
+    async def recording_insert(batch):
+        batches.append(len(batch))
+        return await insert(batch)
+
+    ledger._insert = recording_insert
+    orders = [_market_buy() for _ in range(10)]
+    filled = await asyncio.gather(*[
+        ledger.apply_fill(None, o, "BTC", "USDT", Decimal("0.001"), Decimal("50000")) for o in orders
+    ])
+
+    assert all(filled) and sum(batches) == 10 and len(batches) < 10
+    # Durable on return: every order, entry and trade is committed
+    assert all(o.id is not None for o in orders)
+    async with session_factory() as db:
+        assert await db.scalar(select(func.count(Order.id)).where(Order.status == OrderStatus.filled)) == 10
+        assert await db.scalar(select(func.count(LedgerEntry.id))) == 10
+        assert await db.scalar(select(func.count(Trade.id))) == 10
+    assert ledger.pending_deltas(1) == {"USDT": Decimal("-500"), "BTC": Decimal("0.010")}
+
+
+@pytest.mark.asyncio
+async def test_bad_fill_fails_alone_and_returns_its_reservation(session_factory):
+    import asyncio
+    from sqlalchemy.exc import IntegrityError
+
+    ledger = Ledger(session_factory)
+    orders = [_market_buy(client_order_id="dup"), _market_buy(client_order_id="dup"), _market_buy()]
+    results = await asyncio.gather(*[
+        ledger.apply_fill(None, o, "BTC", "USDT", Decimal("0.001"), Decimal("50000")) for o in orders
+    ], return_exceptions=True)
+
+    assert sorted(type(r).__name__ for r in results) == ["IntegrityError", "bool", "bool"]
+    assert isinstance(results[1], IntegrityError) and orders[1].status != OrderStatus.filled
+    assert ledger.balance(1, "USDT") == Decimal("900")
+    async with session_factory() as db:
+        assert await db.scalar(select(func.count(LedgerEntry.id))) == 2
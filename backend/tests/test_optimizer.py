@@ -0,0 +1,88 @@
+import asyncio
+import json
+
+import pytest
+from unittest.mock import AsyncMock, patch
+from httpx import AsyncClient, ASGITransport
+
+from app.core.deps import require_admin
+from app.main import app
+from app.models.user import User
+from app.services import optimizer
+from app.services.optimizer import Sweep, expand_space, walk_forward_splits
+from tests.test_backtest import _history
+
+SPACE = {"rsi_buy": [30, 40], "stop_loss_atr": {"min": 1.0, "max": 2.0, "step": 0.5}}
+
+
+def test_config_space_and_walk_forward_splits():
+    grid = expand_space(SPACE)
+    assert len(grid) == 6 and grid[1] == {"rsi_buy": 30, "stop_loss_atr": 1.5}
+    drawn = expand_space({"rsi_buy": {"min": 20, "max": 40}, "take_profit_atr": {"min": 1.0, "max": 3.0}},
+                         "random", samples=5, seed=3)
+    assert drawn == expand_space({"rsi_buy": {"min": 20, "max": 40}, "take_profit_atr": {"min": 1.0, "max": 3.0}},
+                                 "random", samples=5, seed=3)
+    assert len(drawn) == 5 and all(isinstance(c["rsi_buy"], int) and 1.0 <= c["take_profit_atr"] <= 3.0 for c in drawn)
+    with pytest.raises(ValueError):
+        expand_space({"rsi_buy": {"min": 20, "max": 40}})  # grid needs a step
+
+    assert walk_forward_splits(100, 0) == [((0, 100), None)]
+    assert walk_forward_splits(100, 3) == [((0, 25), (25, 50)), ((25, 50), (50, 75)), ((50, 75), (75, 100))]
+
+
+def test_sweep_ranks_out_of_sample_and_resumes_from_checkpoint(tmp_path):
+    klines = _history(1200)
+    checkpoint = tmp_path / "sweep.jsonl"
+    sweep = Sweep("rsi_trend", SPACE, klines, folds=2, checkpoint=checkpoint)
+    sweep.configs = sweep.configs[:4]  # interrupted part-way
+    sweep.run(workers=1)
+    assert len(checkpoint.read_text().splitlines()) == 5  # header + 4 results
+
+    resumed = Sweep("rsi_trend", SPACE, klines, folds=2, checkpoint=checkpoint)
+    assert len(resumed.pending()) == 2
+    resumed.run(workers=1)
+    report = resumed.report("return", top=3)
+    assert report["done"] == report["total"] == 6
+    returns = [r["out_of_sample"]["pnl_pct"] for r in resumed.ranked("return")]
+    assert returns == sorted(returns, reverse=True)
+    assert [row["test"] for row in report["walk_forward"]] == [(400, 800), (800, 1200)]
+
+    with pytest.raises(ValueError):
+        Sweep("rsi_trend", {"rsi_buy": [35]}, klines, folds=2, checkpoint=checkpoint)
+
+
+@pytest.mark.asyncio
+async def test_admin_job_runs_in_background(monkeypatch, tmp_path):
+    store = {}
+    redis = AsyncMock()
+    redis.get = AsyncMock(side_effect=lambda k: store.get(k))
+    redis.set = AsyncMock(side_effect=lambda k, v, ex=None: store.__setitem__(k, v))
+    queue = []
+    redis.rpush = AsyncMock(side_effect=lambda k, v: queue.append(v))
+    redis.blpop = AsyncMock(side_effect=lambda keys, timeout=0: (keys[0], queue.pop(0)) if queue else None)
+    monkeypatch.setattr(optimizer.settings, "OPTIMIZER_WORKERS", 1)
+    monkeypatch.setattr(optimizer.settings, "BACKTEST_DATA_DIR", str(tmp_path))
+    app.dependency_overrides[require_admin] = lambda: User(id=1, wallet_address="0xadmin")
+    body = {"strategy_type": "rsi_trend", "space": {"rsi_buy": [30, 40]}, "pair": "BTC_USDT",
+            "start": 1_600_000_000, "end": 1_700_000_000}
+    try:
+        with patch("app.services.optimizer.get_redis", AsyncMock(return_value=redis)), \
+                patch("app.services.optimizer.load_history", AsyncMock(return_value=_history(600))):
+            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+                r = await ac.post("/api/admin/optimizer/jobs", json={**body, "rank_by": "luck"})
+                assert r.status_code == 400
+                r = await ac.post("/api/admin/optimizer/jobs", json=body)
+                assert r.status_code == 200 and r.json()["total"] == 2
+                job_id = r.json()["id"]
+                # Queued only: the API process never runs the sweep
+                assert queue == [job_id] and json.loads(store[f"optimizer:job:{job_id}"])["status"] == "queued"
+                r = await ac.post("/api/admin/optimizer/jobs", json={**body, "resume": job_id})
+                assert r.json()["id"] == job_id and queue == [job_id]
+                assert await asyncio.wait_for(optimizer.run_next_job(timeout=0), timeout=60) == job_id
+                assert await optimizer.run_next_job(timeout=0) is None
+                job = (await ac.get(f"/api/admin/optimizer/jobs/{job_id}")).json()
+                assert (await ac.get("/api/admin/optimizer/jobs/missing")).status_code == 404
+    finally:
+        app.dependency_overrides.pop(require_admin, None)
+    assert job["status"] == "done" and job["done"] == 2
+    assert {json.dumps(r["config"]) for r in job["result"]["top"]} == {'{"rsi_buy": 30}', '{"rsi_buy": 40}'}
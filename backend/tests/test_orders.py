@@ -0,0 +1,150 @@
+import json
+import pytest
+import pytest_asyncio
+from decimal import Decimal
+from unittest.mock import AsyncMock, patch
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from app.database import Base, get_db
+from app.main import app
+from app.models.user import User
+from app.models.wallet import Wallet
+from app.core.security import create_access_token
+
+TEST_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
+
+
+class _DictRedis:
+    """Just enough of the Redis API for the order path."""
+
+    def __init__(self, ticker_price: str = "50000"):
+        self.store = {f"market:BTC_USDT:ticker": json.dumps({"last_price": ticker_price})}
+
+    async def get(self, key):
+        return self.store.get(key)
+
+    async def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.store:
+            return None
+        self.store[key] = value
+        return True
+
+    async def delete(self, *keys):
+        for k in keys:
+            self.store.pop(k, None)
+
+    async def hget(self, key, field):
+        return None
+
+    async def publish(self, channel, message):
+        return 0
+
+
+@pytest_asyncio.fixture
+async def client_and_token():
+    engine = create_async_engine(TEST_DATABASE_URL, connect_args={"check_same_thread": False})
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    SessionLocal = async_sessionmaker(engine, expire_on_commit=False)
+    async with SessionLocal() as db:
+        user = User(wallet_address="0xabc")
+        db.add(user)
+        await db.flush()
+        db.add(Wallet(user_id=user.id, asset="USDT", balance=Decimal("10000")))
+        await db.commit()
+        token = create_access_token(user.id)
+
+    async def override_get_db():
+        async with SessionLocal() as session:
+            yield session
+    app.dependency_overrides[get_db] = override_get_db
+
+    redis = _DictRedis()
+    with patch("app.core.redis.get_redis", AsyncMock(return_value=redis)), \
+         patch("app.services.matching_engine.get_redis", AsyncMock(return_value=redis)), \
+         patch("app.services.symbol_registry.get_redis", AsyncMock(return_value=redis)), \
+         patch("app.services.order_idempotency.get_redis", AsyncMock(return_value=redis)), \
+         patch("app.services.risk_cache.get_redis", AsyncMock(return_value=redis)), \
+         patch("app.services.control_flags.get_redis", AsyncMock(return_value=redis)):
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            yield client, {"Authorization": f"Bearer {token}"}, redis
+
+    app.dependency_overrides.clear()
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_duplicate_client_order_id_returns_original(client_and_token):
+    client, headers, _ = client_and_token
+    body = {"pair": "BTC_USDT", "side": "buy", "type": "market",
+            "quantity": "0.01", "client_order_id": "retry-1"}
+    r1 = await client.post("/api/orders", json=body, headers=headers)
+    r2 = await client.post("/api/orders", json=body, headers=headers)
+    assert r1.status_code == 200 and r2.status_code == 200
+    assert r1.json() == r2.json()
+    assert r1.json()["fill_result"]["filled"] is True
+
+    history = await client.get("/api/orders/history", headers=headers)
+    assert len(history.json()) == 1  # only one order was created
+
+
+@pytest.mark.asyncio
+async def test_duplicate_while_in_flight_is_rejected(client_and_token):
+    client, headers, redis = client_and_token
+    redis.store["order:idem:1:in-flight"] = "pending"
+    body = {"pair": "BTC_USDT", "side": "buy", "type": "market",
+            "quantity": "0.01", "client_order_id": "in-flight"}
+    r = await client.post("/api/orders", json=body, headers=headers)
+    assert r.status_code == 409
+
+
+@pytest.mark.asyncio
+async def test_lost_redis_entry_falls_back_to_db(client_and_token):
+    client, headers, redis = client_and_token
+    body = {"pair": "BTC_USDT", "side": "buy", "type": "market",
+            "quantity": "0.01", "client_order_id": "retry-2"}
+    r1 = await client.post("/api/orders", json=body, headers=headers)
+    redis.store.pop("order:idem:1:retry-2")
+    r2 = await client.post("/api/orders", json=body, headers=headers)
+    assert r2.json()["order_id"] == r1.json()["order_id"]
+    assert r2.json()["status"] == "filled"
+
+
+@pytest.mark.asyncio
+async def test_concurrent_duplicate_insert_returns_original(client_and_token):
+    from app.routers import orders
+    client, headers, redis = client_and_token
+    body = {"pair": "BTC_USDT", "side": "buy", "type": "market",
+            "quantity": "0.01", "client_order_id": "race-1"}
+    r1 = await client.post("/api/orders", json=body, headers=headers)
+    redis.store.pop("order:idem:1:race-1")
+
+    # The second request's lookup runs before the first one's row is visible,
+    # so its insert hits the unique constraint instead
+    real, calls = orders._existing_order_response, []
+
+    async def existing(db, user_id, client_order_id):
+        calls.append(client_order_id)
+        return None if len(calls) == 1 else await real(db, user_id, client_order_id)
+
+    with patch.object(orders, "_existing_order_response", existing):
+        r2 = await client.post("/api/orders", json=body, headers=headers)
+    assert r2.status_code == 200 and r2.json() == r1.json()
+    assert json.loads(redis.store["order:idem:1:race-1"]) == r1.json()
+
+
+@pytest.mark.asyncio
+async def test_unfilled_market_order_releases_client_order_id(client_and_token):
+    client, headers, redis = client_and_token
+    body = {"pair": "BTC_USDT", "side": "buy", "type": "market",
+            "quantity": "5", "client_order_id": "too-big"}  # 250k USDT > 10k balance
+    with patch("app.services.risk_cache.RiskCache.precheck", AsyncMock(return_value=None)):
+        r1 = await client.post("/api/orders", json=body, headers=headers)
+    assert r1.json()["fill_result"]["filled"] is False
+    # The order was rolled back, so no result may be replayed for it
+    assert "order:idem:1:too-big" not in redis.store
+
+    r2 = await client.post("/api/orders", json={**body, "quantity": "0.01"}, headers=headers)
+    assert r2.json()["fill_result"]["filled"] is True
+    history = await client.get("/api/orders/history", headers=headers)
+    assert [o["id"] for o in history.json()] == [r2.json()["order_id"]]
@@ -1,15 +1,40 @@
 import pytest
+import pytest_asyncio
 import json
+import os
+import uuid
 from unittest.mock import AsyncMock, patch
-from app.services.position_manager import PositionManager
+from app.config import settings
+from app.services.position_manager import _CHECK_EXIT_LUA, PositionManager, check_exits, evaluate_exit
+from app.services.position_store import position_store
+
+
+def _emulate_check_exit_lua(store: dict):
+    """Stand-in for the Lua script (no Redis here): same contract, same rules."""
+    async def eval_(script, numkeys, key, price, *fields):
+        hash_ = store.setdefault(key, {})
+        rows = []
+        for field in fields:
+            raw = hash_.get(field)
+            reason, ratcheted = None, False
+            if raw:
+                pos = json.loads(raw)
+                reason, ratcheted = evaluate_exit(pos, float(price))
+                if ratcheted:
+                    raw = hash_[field] = json.dumps(pos)
+            rows.append([reason or "", raw or None, int(ratcheted)])
+        return rows
+    return eval_
 
 
 @pytest.fixture
 def mock_redis():
     r = AsyncMock()
-    r.get = AsyncMock(return_value=None)
-    r.set = AsyncMock()
-    r.delete = AsyncMock()
+    r.store = {}
+    r.hget = AsyncMock(return_value=None)
+    r.hset = AsyncMock()
+    r.hdel = AsyncMock()
+    r.eval = AsyncMock(side_effect=_emulate_check_exit_lua(r.store))
     return r
 
 
@@ -18,16 +43,16 @@ async def test_open_position(mock_redis):
     with patch("app.services.position_manager.get_redis", return_value=mock_redis):
         pm = PositionManager(bot_id=1, user_id=10)
         await pm.open_position(side="buy", entry_price=50000.0, atr=500.0, stop_loss_atr=1.2, take_profit_atr=2.0)
-        mock_redis.set.assert_called_once()
-        key = mock_redis.set.call_args[0][0]
-        assert key == "pos:1:10"
+        mock_redis.hset.assert_called_once()
+        assert mock_redis.hset.call_args[0][:2] == ("pos:1", "10")
+        assert position_store._queue[(1, 10)]["side"] == "buy"  # queued for the positions table
 
 
 @pytest.mark.asyncio
 async def test_check_stop_loss_buy(mock_redis):
     pos = json.dumps({"side": "buy", "entry": 50000.0, "stop_loss": 49400.0,
                        "take_profit": 51000.0, "trailing_stop": None, "trailing_active": False})
-    mock_redis.get = AsyncMock(return_value=pos)
+    mock_redis.store["pos:1"] = {"10": pos}
     with patch("app.services.position_manager.get_redis", return_value=mock_redis):
         pm = PositionManager(bot_id=1, user_id=10)
         assert await pm.check_exit(current_price=49300.0) == "stop_loss"
@@ -37,7 +62,7 @@ async def test_check_stop_loss_buy(mock_redis):
 async def test_check_take_profit_buy(mock_redis):
     pos = json.dumps({"side": "buy", "entry": 50000.0, "stop_loss": 49400.0,
                        "take_profit": 51000.0, "trailing_stop": None, "trailing_active": False})
-    mock_redis.get = AsyncMock(return_value=pos)
+    mock_redis.store["pos:1"] = {"10": pos}
     with patch("app.services.position_manager.get_redis", return_value=mock_redis):
         pm = PositionManager(bot_id=1, user_id=10)
         assert await pm.check_exit(current_price=51100.0) == "take_profit"
@@ -47,7 +72,7 @@ async def test_check_take_profit_buy(mock_redis):
 async def test_no_exit_in_range(mock_redis):
     pos = json.dumps({"side": "buy", "entry": 50000.0, "stop_loss": 49400.0,
                        "take_profit": 51000.0, "trailing_stop": None, "trailing_active": False})
-    mock_redis.get = AsyncMock(return_value=pos)
+    mock_redis.store["pos:1"] = {"10": pos}
     with patch("app.services.position_manager.get_redis", return_value=mock_redis):
         pm = PositionManager(bot_id=1, user_id=10)
         assert await pm.check_exit(current_price=50500.0) is None
@@ -58,20 +83,22 @@ async def test_trailing_stop_updates(mock_redis):
     pos = json.dumps({"side": "buy", "entry": 50000.0, "stop_loss": 49400.0,
                        "take_profit": None, "trailing_stop": 49500.0, "trailing_active": True,
                        "trailing_atr_mult": 1.5, "current_atr": 500.0})
-    mock_redis.get = AsyncMock(return_value=pos)
+    mock_redis.store["pos:1"] = {"10": pos}
     with patch("app.services.position_manager.get_redis", return_value=mock_redis):
         pm = PositionManager(bot_id=1, user_id=10)
         result = await pm.check_exit(current_price=51500.0)
         assert result is None
-        saved_data = json.loads(mock_redis.set.call_args[0][1])
+        saved_data = json.loads(mock_redis.store["pos:1"]["10"])
         assert saved_data["trailing_stop"] == pytest.approx(50750.0)  # 51500 - 1.5*500
+        mock_redis.eval.assert_awaited_once()  # read + ratchet in one round trip
+        assert position_store._queue[(1, 10)]["trailing_stop"] == pytest.approx(50750.0)
 
 
 @pytest.mark.asyncio
 async def test_sell_position_stop_loss(mock_redis):
     pos = json.dumps({"side": "sell", "entry": 50000.0, "stop_loss": 50600.0,
                        "take_profit": 49000.0, "trailing_stop": None, "trailing_active": False})
-    mock_redis.get = AsyncMock(return_value=pos)
+    mock_redis.store["pos:1"] = {"10": pos}
     with patch("app.services.position_manager.get_redis", return_value=mock_redis):
         pm = PositionManager(bot_id=1, user_id=10)
         assert await pm.check_exit(current_price=50700.0) == "stop_loss"
@@ -89,4 +116,87 @@ async def test_close_position(mock_redis):
     with patch("app.services.position_manager.get_redis", return_value=mock_redis):
         pm = PositionManager(bot_id=1, user_id=10)
         await pm.close_position()
-        mock_redis.delete.assert_called_once_with("pos:1:10")
+        mock_redis.hdel.assert_called_once_with("pos:1", "10")
+        assert position_store._queue[(1, 10)] is None
+
+
+@pytest.mark.asyncio
+async def test_check_exits_batches_one_round_trip_and_skips_known_empty(mock_redis):
+    mock_redis.store["pos:1"] = {
+        "10": json.dumps({"side": "buy", "entry": 50000.0, "stop_loss": 49400.0,
+                          "take_profit": 51000.0, "trailing_stop": None, "trailing_active": False}),
+        "11": json.dumps({"side": "sell", "entry": 50000.0, "stop_loss": 50600.0,
+                          "take_profit": 52000.0, "trailing_stop": None, "trailing_active": False}),
+    }
+    managers = [
+        PositionManager(1, 10, cached=mock_redis.store["pos:1"]["10"]),
+        PositionManager(1, 11),
+        PositionManager(1, 12, cached=None),  # snapshot says: no position
+    ]
+    with patch("app.services.position_manager.get_redis", return_value=mock_redis):
+        assert await check_exits(managers, 51200.0) == ["take_profit", "stop_loss", None]
+    mock_redis.eval.assert_awaited_once()
+    assert mock_redis.eval.await_args.args[1:] == (1, "pos:1", 51200.0, "10", "11")
+
+
+def test_evaluate_exit_ratchets_sell_trailing_in_place():
+    pos = {"side": "sell", "entry": 50000.0, "stop_loss": 51000.0, "take_profit": None,
+           "trailing_stop": 50500.0, "trailing_active": True, "trailing_atr_mult": 1.0, "current_atr": 200.0}
+    assert evaluate_exit(pos, 49800.0) == (None, True)
+    assert pos["trailing_stop"] == 50000.0
+    assert evaluate_exit(pos, 50050.0) == ("stop_loss", False)
+
+
+@pytest_asyncio.fixture
+async def lua_redis():
+    """A real Redis for running the Lua script (TEST_REDIS_URL, else REDIS_URL); skipped without one."""
+    import redis.asyncio as aioredis
+    client = aioredis.from_url(os.environ.get("TEST_REDIS_URL", settings.REDIS_URL),
+                               decode_responses=True, socket_connect_timeout=1)
+    try:
+        await client.ping()
+    except Exception as e:
+        await client.aclose()
+        pytest.skip(f"no Redis with Lua available: {e}")
+    yield client
+    await client.aclose()
+
+
+def _pos(side, stop_loss, take_profit=None, trailing_stop=None, trailing_active=False, **extra):
+    return {"side": side, "entry": 100.0, "stop_loss": stop_loss, "take_profit": take_profit,
+            "trailing_stop": trailing_stop, "trailing_active": trailing_active, **extra}
+
+
+_EXIT_CASES = [
+    (_pos("buy", 95.0, 110.0), 94.0),                     # stop loss
+    (_pos("buy", 95.0, 110.0), 111.0),                    # take profit
+    (_pos("buy", 95.0, 110.0), 100.0),                    # in range
+    (_pos("buy", 95.0), 200.0),                           # no take profit
+    (_pos("buy", 95.0, None, 98.0, True, trailing_atr_mult=1.0, current_atr=2.0), 105.0),  # ratchet to 103
+    (_pos("buy", 95.0, None, 98.0, True, trailing_atr_mult=1.0, current_atr=2.0), 97.5),   # trailing hit
+    (_pos("buy", 95.0, None, 98.0, True, trailing_atr_mult=None, current_atr=2.0), 102.0),  # default mult 1.5
+    (_pos("buy", 95.0, None, 98.0, True, trailing_atr_mult=2.0, current_atr=None), 98.5),   # no ATR yet
+    (_pos("buy", 95.0, None, 98.0, False, trailing_atr_mult=1.0, current_atr=2.0), 97.0),  # inactive
+    (_pos("sell", 105.0, 90.0), 106.0),
+    (_pos("sell", 105.0, 90.0), 89.0),
+    (_pos("sell", 105.0, None, 102.0, True, trailing_atr_mult=1.5, current_atr=2.0), 95.0),  # ratchet to 98
+    (_pos("sell", 105.0, None, 102.0, True, trailing_atr_mult=1.5, current_atr=2.0), 102.5),
+]
+
+
+@pytest.mark.asyncio
+async def test_check_exit_lua_matches_evaluate_exit(lua_redis):
+    """The script itself, not the Python stand-in, against ``evaluate_exit``."""
+    key = f"test:pos:{uuid.uuid4().hex}"
+    try:
+        for i, (pos, price) in enumerate(_EXIT_CASES):
+            await lua_redis.hset(key, str(i), json.dumps(pos))
+            reason, raw, ratcheted = (await lua_redis.eval(_CHECK_EXIT_LUA, 1, key, price, str(i)))[0]
+            expected = dict(pos)
+            assert (reason or None, bool(ratcheted)) == evaluate_exit(expected, price), (i, price)
+            stored = json.loads(await lua_redis.hget(key, str(i)))
+            assert json.loads(raw) == stored
+            assert stored["trailing_stop"] == pytest.approx(expected["trailing_stop"]), (i, price)
+        assert (await lua_redis.eval(_CHECK_EXIT_LUA, 1, key, 100.0, "missing")) == [["", None, 0]]
+    finally:
+        await lua_redis.delete(key)
@@ -0,0 +1,160 @@
+import json
+
+import pytest
+import pytest_asyncio
+from unittest.mock import AsyncMock, patch
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from app.database import Base
+from app.models.bot import Bot
+from app.models.position import Position
+from app.models.user import User
+from app.services.position_store import PositionStore, HYDRATED_KEY, HYDRATE_LOCK_KEY
+
+
+class _HashRedis:
+    """Strings + hashes, enough for hydration and legacy import."""
+
+    def __init__(self):
+        self.strings: dict[str, str] = {}
+        self.hashes: dict[str, dict[str, str]] = {}
+
+    async def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.strings:
+            return None
+        self.strings[key] = value
+        return True
+
+    async def eval(self, script, numkeys, key, token):
+        # Only the lock release (compare-and-delete) is evaluated here
+        if self.strings.get(key) == token:
+            del self.strings[key]
+            return 1
+        return 0
+
+    async def get(self, key):
+        return self.strings.get(key)
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.strings.pop(key, None)
+            self.hashes.pop(key, None)
+
+    async def hset(self, key, field, value):
+        self.hashes.setdefault(key, {})[field] = value
+
+    async def scan_iter(self, match, count=None):
+        assert match == "pos:*:*"
+        for key in [k for k in self.strings if k.startswith("pos:") and k.count(":") == 2]:
+            yield key
+
+    def pipeline(self, transaction=True):
+        redis = self
+
+        class _Pipe:
+            def __init__(self):
+                self.ops = []
+
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            def hsetnx(self, key, field, value):
+                self.ops.append((key, field, value))
+
+            async def execute(self):
+                for key, field, value in self.ops:
+                    redis.hashes.setdefault(key, {}).setdefault(field, value)
+        return _Pipe()
+
+
+def _pos(side="buy", sl=49000.0, trailing=None):
+    return {"side": side, "entry": 50000.0, "stop_loss": sl, "take_profit": 52000.0,
+            "trailing_stop": trailing, "trailing_active": trailing is not None,
+            "trailing_atr_mult": 1.5, "current_atr": 500.0}
+
+
+@pytest_asyncio.fixture
+async def session_factory(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/positions.db")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    SessionLocal = async_sessionmaker(engine, expire_on_commit=False)
+    async with SessionLocal() as db:
+        db.add_all([User(id=1, wallet_address="0x1"), User(id=2, wallet_address="0x2"),
+                    Bot(id=1, name="a"), Bot(id=2, name="b")])
+        await db.commit()
+    yield SessionLocal
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_write_behind_keeps_latest_state_per_position(session_factory):
+    store = PositionStore(session_factory)
+    store.enqueue(1, 1, _pos())
+    store.enqueue(1, 2, _pos(side="sell", sl=51000.0))
+    assert await store.flush() == 2
+
+    store.enqueue(1, 1, _pos(trailing=49500.0))
+    store.enqueue(1, 1, _pos(trailing=49800.0))  # coalesced into one write
+    store.enqueue(1, 2, None)
+    assert await store.flush() == 2
+
+    async with session_factory() as db:
+        rows = list(await db.scalars(select(Position)))
+    assert [(r.bot_id, r.user_id, r.trailing_stop) for r in rows] == [(1, 1, 49800.0)]
+
+
+@pytest.mark.asyncio
+async def test_hydrate_restores_table_once_and_imports_legacy_keys(session_factory):
+    store = PositionStore(session_factory)
+    store.enqueue(1, 1, _pos())
+    store.enqueue(2, 1, _pos(sl=48000.0))
+    await store.flush()
+
+    redis = _HashRedis()
+    redis.strings["pos:2:2"] = json.dumps(_pos(side="sell", sl=51000.0))  # pre-table layout
+    redis.hashes["pos:2"] = {"1": json.dumps(_pos(sl=48500.0))}          # written after the flush
+
+    with patch("app.services.position_store.get_redis", AsyncMock(return_value=redis)):
+        assert await store.ensure_hydrated() == 3
+        assert await store.ensure_hydrated() == 0  # marker present: nothing to do
+
+    assert HYDRATED_KEY in redis.strings and "pos:2:2" not in redis.strings
+    assert json.loads(redis.hashes["pos:1"]["1"])["stop_loss"] == 49000.0
+    assert json.loads(redis.hashes["pos:2"]["1"])["stop_loss"] == 48500.0  # newer Redis value kept
+    assert json.loads(redis.hashes["pos:2"]["2"])["side"] == "sell"
+    assert HYDRATE_LOCK_KEY not in redis.strings
+
+
+@pytest.mark.asyncio
+async def test_hydrated_marker_set_only_after_hydration(session_factory):
+    import asyncio
+
+    store = PositionStore(session_factory)
+    store.enqueue(1, 1, _pos())
+    await store.flush()
+    redis = _HashRedis()
+    seen_marker = []
+    real_import = store._import_legacy_keys
+
+    async def slow_import(r):
+        seen_marker.append(HYDRATED_KEY in r.strings)
+        await asyncio.sleep(0.3)
+        return await real_import(r)
+
+    with patch("app.services.position_store.get_redis", AsyncMock(return_value=redis)):
+        with patch.object(store, "_hydrate", AsyncMock(side_effect=RuntimeError("db down"))):
+            with pytest.raises(RuntimeError):
+                await store.ensure_hydrated()
+        # A failed hydration leaves no marker behind and frees the lock
+        assert HYDRATED_KEY not in redis.strings and HYDRATE_LOCK_KEY not in redis.strings
+
+        with patch.object(store, "_import_legacy_keys", slow_import):
+            # The second caller waits for the first instead of trusting a half-filled Redis
+            written = await asyncio.gather(store.ensure_hydrated(), PositionStore(session_factory).ensure_hydrated())
+            assert "1" in redis.hashes["pos:1"]
+
+    assert sorted(written) == [0, 1] and seen_marker == [False]
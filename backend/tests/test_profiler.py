@@ -0,0 +1,54 @@
+import json
+import threading
+import time
+
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from app.core import profiler
+
+
+def _busy(stop: threading.Event) -> None:
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_sampling_profiler_folds_target_thread_stacks():
+    stop = threading.Event()
+    worker = threading.Thread(target=_busy, args=(stop,))
+    worker.start()
+    try:
+        prof = profiler.SamplingProfiler(thread_id=worker.ident, interval=0.001)
+        prof.start()
+        time.sleep(0.1)
+        prof.stop()
+    finally:
+        stop.set()
+        worker.join()
+
+    assert prof.samples
+    for line in prof.folded().splitlines():
+        stack, count = line.rsplit(" ", 1)
+        assert int(count) > 0
+        assert "_busy (test_profiler.py:" in stack
+
+
+@pytest.mark.asyncio
+async def test_profile_request_captures_next_cycle_only():
+    store = {profiler.PROFILE_REQUEST_KEY: json.dumps({"id": "abc", "interval": 0.001})}
+    mock_redis = AsyncMock()
+    mock_redis.getdel = AsyncMock(side_effect=lambda k: store.pop(k, None))
+    mock_redis.set = AsyncMock(side_effect=lambda k, v, ex=None: store.__setitem__(k, v))
+
+    with patch("app.core.profiler.get_redis", AsyncMock(return_value=mock_redis)):
+        await profiler.poll_request("runner-1")
+        async with profiler.capture("signal cycle"):
+            time.sleep(0.05)
+        async with profiler.capture("signal cycle"):
+            pass
+
+    result = json.loads(store[profiler.PROFILE_RESULT_KEY.format(id="abc")])
+    assert result["instance"] == "runner-1"
+    assert result["samples"] > 0
+    assert "test_profile_request_captures_next_cycle_only" in result["folded"]
+    assert mock_redis.set.await_count == 1
@@ -0,0 +1,132 @@
+import numpy as np
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.services import market_data
+from app.services.klines import Klines
+from app.services.resampler import KlineBook, resample
+
+T0 = 1_700_000_000 // 86400 * 86400  # UTC midnight
+
+
+def _minutes(n, start=T0, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 0.1, n))
+    open_ = np.r_[100.0, close[:-1]]
+    return Klines(start + 60 * np.arange(n), open_, np.maximum(open_, close) + rng.random(n),
+                  np.minimum(open_, close) - rng.random(n), close, rng.random(n) * 10)
+
+
+class _Exchange:
+    """1m klines up to a movable clock; the minute at the clock is still forming."""
+
+    def __init__(self, minutes: Klines):
+        self.minutes = minutes
+        self.now = int(minutes.time[0])
+        self.calls = []
+
+    async def fetch_range(self, pair, interval, start, end=None):
+        assert interval == "1m"
+        self.calls.append((start, end))
+        t = self.minutes.time
+        hi = int(t.searchsorted(min(end if end is not None else self.now + 1, self.now + 1)))
+        return self.minutes[int(t.searchsorted(start)):hi]
+
+
+def test_resample_aggregates_epoch_aligned_buckets_with_gaps():
+    base = _minutes(600)
+    keep = np.ones(len(base), dtype=bool)
+    keep[[0, 61, 62, 300]] = False  # missing minutes
+    k = Klines(*(getattr(base, f)[keep] for f in ("time", "open", "high", "low", "close", "volume")))
+
+    hourly = resample(k, 3600)
+    assert hourly.time.tolist() == [T0 + h * 3600 for h in range(10)]
+    for h, row in enumerate(hourly):
+        m = k[int(k.time.searchsorted(T0 + h * 3600)):int(k.time.searchsorted(T0 + (h + 1) * 3600))]
+        assert row == {"time": T0 + h * 3600, "open": m.open[0], "high": m.high.max(), "low": m.low.min(),
+                       "close": m.close[-1], "volume": pytest.approx(m.volume.sum())}
+
+
+@pytest.mark.asyncio
+async def test_book_serves_every_interval_from_one_1m_series_and_updates_incrementally():
+    exchange = _Exchange(_minutes(3 * 1440))
+    exchange.now = T0 + 2 * 86400 + 17 * 60 + 30
+    book = KlineBook("BTC_USDT", exchange.fetch_range, max_minutes=2000, ttl=30)
+
+    with patch("app.services.resampler.time.time", lambda: exchange.now):
+        hourly = await book.get("1h", 24)
+        assert len(exchange.calls) == 1
+        five = await book.get("5m", 100)
+        quarter = await book.get("15m", 50)
+        assert len(exchange.calls) == 1
+
+        def truth(seconds, limit):
+            return resample(exchange.minutes[:int(exchange.minutes.time.searchsorted(exchange.now + 1))], seconds)[-limit:]
+
+        for got, seconds, limit in ((hourly, 3600, 24), (five, 300, 100), (quarter, 900, 50)):
+            assert got.to_dicts() == truth(seconds, limit).to_dicts()
+        assert hourly.time[-1] == T0 + 2 * 86400  # forming hour
+
+        # Time moves on; the forming minute is re-fetched and replaced
+        exchange.now += 45 * 60
+        book.expire()
+        hourly = await book.get("1h", 24)
+        five = await book.get("5m", 100)
+        assert len(exchange.calls) == 2 and exchange.calls[1][0] == T0 + 2 * 86400 + 17 * 60
+        assert hourly.to_dicts() == truth(3600, 24).to_dicts()
+        assert five.to_dicts() == truth(300, 100).to_dicts()
+        assert len(book.base) <= 2000
+
+
+@pytest.mark.asyncio
+async def test_fetch_klines_derives_intervals_from_the_1m_book(monkeypatch):
+    exchange = _Exchange(_minutes(1440))
+    exchange.now = T0 + 1439 * 60
+    monkeypatch.setattr(market_data, "_kline_books", {})
+    with patch("app.services.market_data.fetch_klines_range", exchange.fetch_range), \
+            patch("app.services.resampler.time.time", lambda: exchange.now):
+        intervals = ("1m", "5m", "15m", "1h", "4h", "1d")
+        for interval in intervals:
+            await market_data.fetch_klines("ETH_USDT", interval, 6)
+        warmup = len(exchange.calls)  # the 1m series, then older history once per deeper request
+        # The 1d request reaches before the pair's first candle: not refetched every time
+        for interval in intervals:
+            await market_data.fetch_klines("ETH_USDT", interval, 6)
+        assert len(exchange.calls) == warmup
+
+        # A candle close expires the book: one call brings every interval up to date
+        exchange.now += 60
+        market_data.invalidate_klines("ETH_USDT", "1h")
+        for interval in intervals:
+            k = await market_data.fetch_klines("ETH_USDT", interval, 6)
+            assert k.close[-1] == exchange.minutes.close[-1]
+        assert len(exchange.calls) == warmup + 1
+        assert len(await market_data.fetch_klines("ETH_USDT", "4h", 6)) == 6
+
+
+@pytest.mark.asyncio
+async def test_empty_backfill_is_retried_on_refresh_and_fetch_klines_falls_back(monkeypatch):
+    exchange = _Exchange(_minutes(600))
+    exchange.now = T0 - 3600  # before the pair's first candle: the backfill is empty
+    book = KlineBook("BTC_USDT", exchange.fetch_range, max_minutes=2000, ttl=30)
+
+    with patch("app.services.resampler.time.time", lambda: exchange.now):
+        assert not len(await book.get("5m", 10))
+        exchange.now = T0 + 300 * 60
+        book.expire()
+        five = await book.get("5m", 10)
+        assert five.to_dicts() == resample(exchange.minutes[:301], 300)[-10:].to_dicts()
+
+    # Nothing to resample: fetch_klines asks Binance for the interval itself
+    listing = _Exchange(_minutes(10))
+    listing.now = T0 - 3600
+    monkeypatch.setattr(market_data, "_kline_books", {})
+    monkeypatch.setattr(market_data, "_klines_cache", {})
+    row = [T0 * 1000, "1", "2", "0.5", "1.5", "10"]
+    response = MagicMock(json=lambda: [row])
+    with patch("app.services.market_data.fetch_klines_range", listing.fetch_range), \
+            patch("app.services.resampler.time.time", lambda: listing.now), \
+            patch("app.services.market_data.httpx.AsyncClient") as client:
+        client.return_value.__aenter__.return_value.get = AsyncMock(return_value=response)
+        got = await market_data.fetch_klines("ETH_USDT", "5m", 10)
+    assert got.to_dicts() == Klines.from_binance([row]).to_dicts()
@@ -0,0 +1,120 @@
+import json
+import pytest
+import pytest_asyncio
+from decimal import Decimal
+from unittest.mock import AsyncMock, patch
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from app.config import settings
+from app.database import Base
+from app.models.user import User
+from app.models.wallet import Wallet
+from app.models.order import Order, OrderSide, OrderType, OrderStatus
+from app.services.risk_cache import RiskCache
+
+
+@pytest_asyncio.fixture
+async def db():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    SessionLocal = async_sessionmaker(engine, expire_on_commit=False)
+    async with SessionLocal() as session:
+        session.add(User(id=1, wallet_address="0xabc"))
+        session.add(Wallet(user_id=1, asset="USDT", balance=Decimal("1000")))
+        session.add(Order(user_id=1, pair="BTC_USDT", side=OrderSide.buy, type=OrderType.limit,
+                          price=Decimal("40000"), quantity=Decimal("0.01"), status=OrderStatus.open))
+        await session.commit()
+        yield session
+    await engine.dispose()
+
+
+@pytest.fixture
+def redis():
+    r = AsyncMock()
+    with patch("app.services.risk_cache.get_redis", AsyncMock(return_value=r)):
+        yield r
+
+
+@pytest.mark.asyncio
+async def test_precheck_rejects_insufficient_balance(db, redis):
+    cache = RiskCache()
+    assert await cache.precheck(db, 1, "BTC_USDT", "buy", Decimal("0.01"), Decimal("50000")) is None
+    reason = await cache.precheck(db, 1, "BTC_USDT", "buy", Decimal("0.1"), Decimal("50000"))
+    assert reason == "Insufficient USDT balance"
+    assert await cache.precheck(db, 1, "BTC_USDT", "sell", Decimal("0.01"), Decimal("50000")) == "Insufficient BTC balance"
+
+
+@pytest.mark.asyncio
+async def test_precheck_enforces_open_order_limits(db, redis, monkeypatch):
+    cache = RiskCache()
+    monkeypatch.setattr(settings, "RISK_MAX_OPEN_ORDERS", 1)
+    reason = await cache.precheck(db, 1, "BTC_USDT", "buy", Decimal("0.001"), Decimal("40000"), opens_order=True)
+    assert reason.startswith("Open order limit")
+    # Market orders never rest on the book
+    assert await cache.precheck(db, 1, "BTC_USDT", "buy", Decimal("0.001"), Decimal("40000")) is None
+
+    monkeypatch.setattr(settings, "RISK_MAX_OPEN_ORDERS", 50)
+    monkeypatch.setattr(settings, "RISK_MAX_OPEN_NOTIONAL_USDT", 500.0)
+    # 400 already open + 200 new > 500
+    reason = await cache.precheck(db, 1, "BTC_USDT", "buy", Decimal("0.005"), Decimal("40000"), opens_order=True)
+    assert reason.startswith("Open notional limit")
+
+
+@pytest.mark.asyncio
+async def test_fill_and_deposit_write_through(db, redis):
+    cache = RiskCache()
+    assert await cache.available(db, 1, "USDT") == Decimal("1000")
+    await cache.apply_fill(1, "BTC", "USDT", Decimal("0.01"), Decimal("-500"))
+    await cache.credit(1, "USDT", Decimal("50"))
+    # Served from memory: the DB still says 1000 USDT / no BTC
+    assert await cache.available(db, 1, "USDT") == Decimal("550")
+    assert await cache.available(db, 1, "BTC") == Decimal("0.01")
+    assert redis.publish.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_invalidation_from_other_workers_only(db, redis):
+    cache = RiskCache()
+    await cache.get_state(db, 1)
+    cache.handle_invalidation(json.dumps({"user_id": 1, "origin": cache.instance_id}))
+    assert 1 in cache._users  # our own broadcast is ignored
+    cache.handle_invalidation(json.dumps({"user_id": 1, "origin": "other"}))
+    assert 1 not in cache._users
+
+    await cache.get_state(db, 1)
+    cache.handle_invalidation(json.dumps({"user_id": None, "origin": "other"}))
+    assert not cache._users
+
+
+@pytest.mark.asyncio
+async def test_wallet_writes_drop_ledger_balances(db, redis, monkeypatch):
+    from app.services.ledger import ledger
+    monkeypatch.setattr(settings, "LEDGER_MODE", True)
+    monkeypatch.setattr(ledger, "_balances", {(1, "USDT"): Decimal("1000"), (2, "USDT"): Decimal("5")})
+    await RiskCache().invalidate(1)  # e.g. a bot subscription moved USDT to locked_balance
+    assert ledger.balance(1, "USDT") is None and ledger.balance(2, "USDT") == Decimal("5")
+    await RiskCache().invalidate_all()
+    assert ledger.balance(2, "USDT") is None
+
+
+@pytest.mark.asyncio
+async def test_open_order_changes_reach_other_workers(db, redis):
+    this, other = RiskCache(), RiskCache()
+    await this.get_state(db, 1)
+    await other.get_state(db, 1)
+    redis.publish.reset_mock()
+
+    # Another worker commits a second resting order and tells everyone
+    db.add(Order(user_id=1, pair="BTC_USDT", side=OrderSide.buy, type=OrderType.limit,
+                 price=Decimal("40000"), quantity=Decimal("0.005"), status=OrderStatus.open))
+    await db.commit()
+    await other.order_opened(1, Decimal("200"))
+    assert (await other.get_state(db, 1)).open_orders == 2
+    channel, message = redis.publish.await_args.args
+    this.handle_invalidation(message)
+    state = await this.get_state(db, 1)
+    assert (state.open_orders, state.open_notional) == (2, Decimal("600"))
+
+    await this.order_closed(1, Decimal("200"))
+    other.handle_invalidation(redis.publish.await_args.args[1])
+    assert 1 not in other._users
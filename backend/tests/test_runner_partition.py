@@ -0,0 +1,108 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+from unittest.mock import AsyncMock, patch
+from app.services import runner_partition
+from app.services.runner_partition import PartitionCoordinator, assign_partitions
+
+
+class _LeaseRedis:
+    """Sorted set, pipelines and the lease script, in memory."""
+
+    def __init__(self):
+        self.kv, self.zset = {}, {}
+        self.evals = 0
+
+    async def zadd(self, key, mapping):
+        self.zset.update(mapping)
+
+    async def zremrangebyscore(self, key, lo, hi):
+        for m in [m for m, score in self.zset.items() if lo <= score <= hi]:
+            del self.zset[m]
+
+    async def zrange(self, key, start, end):
+        return sorted(self.zset, key=self.zset.get)
+
+    async def zrem(self, key, member):
+        self.zset.pop(member, None)
+
+    def pipeline(self, transaction=True):
+        return _Pipeline(self)
+
+    async def eval(self, script, numkeys, *args):
+        assert script == runner_partition._LEASES_LUA
+        self.evals += 1
+        keys, (owner, _, *actions) = args[:numkeys], args[numkeys:]
+        held = []
+        for i, (key, action) in enumerate(zip(keys, actions), 1):
+            if action == "1" and self.kv.get(key, owner) == owner:
+                self.kv[key] = owner
+                held.append(i)
+            elif action == "0" and self.kv.get(key) == owner:
+                del self.kv[key]
+        return held
+
+
+class _Pipeline:
+    def __init__(self, redis):
+        self.redis, self.calls = redis, []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.calls.append(getattr(self.redis, name)(*args, **kwargs))
+
+    async def execute(self):
+        return [await call for call in self.calls]
+
+
+def test_assign_partitions_round_robin():
+    assert assign_partitions(["b", "a"], 4) == {"a": {0, 2}, "b": {1, 3}}
+    assert assign_partitions([], 4) == {}
+
+
+@pytest.mark.asyncio
+async def test_rebalance_on_join_and_leave_never_double_owns(monkeypatch):
+    monkeypatch.setattr(runner_partition.settings, "RUNNER_PARTITIONS", 4)
+    redis = _LeaseRedis()
+    a, b = PartitionCoordinator("a"), PartitionCoordinator("b")
+
+    with patch("app.services.runner_partition.get_redis", AsyncMock(return_value=redis)):
+        assert await a.heartbeat() == {0, 1, 2, 3}
+
+        # b joins: its partitions are still leased by a
+        assert await b.heartbeat() == set()
+        assert await a.heartbeat() == {0, 2}      # a hands over 1 and 3
+        assert not (a.owned & b.owned)
+        assert await b.heartbeat() == {1, 3}
+        assert a.owns(4) and b.owns(5)
+
+        # b leaves cleanly: a picks everything back up
+        await b.leave()
+        assert await a.heartbeat() == {0, 1, 2, 3}
+
+
+
+@pytest.mark.asyncio
+async def test_one_lease_call_per_heartbeat_and_ownership_lapses_with_the_lease(monkeypatch):
+    monkeypatch.setattr(runner_partition.settings, "RUNNER_PARTITIONS", 64)
+    redis = _LeaseRedis()
+    a = PartitionCoordinator("a")
+    clock = [100.0]
+    monkeypatch.setattr(runner_partition, "time", SimpleNamespace(time=time.time, monotonic=lambda: clock[0]))
+
+    with patch("app.services.runner_partition.get_redis", AsyncMock(return_value=redis)):
+        assert len(await a.heartbeat()) == 64
+        assert redis.evals == 1
+        # Stalled: no renewal within the lease, so the runner stops acting on its bots
+        clock[0] += runner_partition.settings.RUNNER_LEASE_SEC - 0.1
+        assert a.owns(7)
+        clock[0] += 0.2
+        assert not a.owns(7)
+        await a.heartbeat()
+        assert a.owns(7) and redis.evals == 2
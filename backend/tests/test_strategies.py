@@ -2,16 +2,17 @@ import pytest
 from unittest.mock import AsyncMock, patch
 from app.services.strategies import (
     TrendMA200Strategy, RSITrendStrategy, BollingerADXStrategy,
-    AdaptiveGridStrategy, BreakoutLiteStrategy, STRATEGIES,
+    AdaptiveGridStrategy, BreakoutLiteStrategy, STRATEGIES, DataRequirement, data_requirements,
 )
+from app.services.klines import Klines
 
 def _make_klines(closes, highs=None, lows=None, volumes=None):
     n = len(closes)
     if highs is None: highs = [c + 1 for c in closes]
     if lows is None: lows = [c - 1 for c in closes]
     if volumes is None: volumes = [1000.0] * n
-    return [{"open": c, "high": h, "low": l, "close": c, "volume": v, "time": i}
-            for i, (c, h, l, v) in enumerate(zip(closes, highs, lows, volumes))]
+    return Klines.from_dicts([{"open": c, "high": h, "low": l, "close": c, "volume": v, "time": i}
+                              for i, (c, h, l, v) in enumerate(zip(closes, highs, lows, volumes))])
 
 @pytest.mark.asyncio
 async def test_trend_ma200_buy_on_uptrend():
@@ -90,3 +91,32 @@ async def test_breakout_no_crash():
 
 def test_strategies_registry():
     assert set(STRATEGIES.keys()) == {"trend_ma200", "rsi_trend", "boll_adx", "adaptive_grid", "breakout_lite"}
+
+@pytest.mark.asyncio
+async def test_process_pool_matches_inline(monkeypatch):
+    from app.services import strategy_pool
+    closes = [100.0 + i * 0.5 for i in range(215)]
+    klines = _make_klines(closes, [c + 2 for c in closes], [c - 2 for c in closes])
+    strategy = TrendMA200Strategy({})
+    with patch("app.services.strategies.fetch_klines", return_value=klines):
+        inline = await strategy.generate("BTC_USDT")
+        monkeypatch.setattr(strategy_pool.settings, "STRATEGY_POOL_WORKERS", 1)
+        try:
+            pooled = await strategy.generate("BTC_USDT")
+            assert strategy_pool._pool is not None
+        finally:
+            strategy_pool.shutdown_pool()
+    assert pooled == inline and inline["side"] == "buy"
+
+@pytest.mark.asyncio
+async def test_generate_uses_prefetched_tail_without_fetching():
+    closes = [100.0 + i * 0.5 for i in range(300)]
+    klines = _make_klines(closes, [c + 2 for c in closes], [c - 2 for c in closes])
+    strategy = TrendMA200Strategy({})
+    assert data_requirements(strategy) == [DataRequirement("1h", 215, ("ma", "ma_slope", "atr"))]
+    fetch = AsyncMock(return_value=klines[-215:])
+    with patch("app.services.strategies.fetch_klines", fetch):
+        fetched = await strategy.generate("BTC_USDT")
+        prefetched = await strategy.generate("BTC_USDT", {("BTC_USDT", "1h"): klines})
+    assert fetch.await_count == 1
+    assert prefetched == fetched and fetched["side"] == "buy"
@@ -0,0 +1,83 @@
+import json
+import pytest
+from decimal import Decimal
+from unittest.mock import AsyncMock, MagicMock, patch
+from app.services import symbol_registry
+from app.services.symbol_registry import (
+    parse_symbol_filters, round_step_size, round_tick_size,
+    load_symbol_registry, get_symbol_filters, normalize_order_values,
+)
+
+BTC_INFO = {
+    "symbol": "BTCUSDT",
+    "filters": [
+        {"filterType": "PRICE_FILTER", "minPrice": "0.01", "maxPrice": "1000000.00", "tickSize": "0.01"},
+        {"filterType": "LOT_SIZE", "minQty": "0.00001", "maxQty": "9000.0", "stepSize": "0.00001"},
+        {"filterType": "NOTIONAL", "minNotional": "5.0"},
+    ],
+}
+
+
+@pytest.fixture(autouse=True)
+def clear_registry():
+    symbol_registry._filters.clear()
+    yield
+    symbol_registry._filters.clear()
+
+
+def test_parse_symbol_filters():
+    f = parse_symbol_filters(BTC_INFO)
+    assert f["step_size"] == Decimal("0.00001")
+    assert f["tick_size"] == Decimal("0.01")
+    assert f["min_notional"] == Decimal("5.0")
+
+
+def test_round_step_size_non_power_of_ten():
+    assert round_step_size(Decimal("7.9"), Decimal("0.5")) == Decimal("7.5")
+    assert round_step_size(Decimal("0.123456"), Decimal("0.001")) == Decimal("0.123")
+
+
+def test_round_tick_size_favours_order_owner():
+    assert round_tick_size(Decimal("100.019"), Decimal("0.01"), "buy") == Decimal("100.01")
+    assert round_tick_size(Decimal("100.011"), Decimal("0.01"), "sell") == Decimal("100.02")
+
+
+@pytest.mark.asyncio
+async def test_load_registry_single_bulk_call():
+    resp = MagicMock()
+    resp.status_code = 200
+    resp.json.return_value = {"symbols": [BTC_INFO, dict(BTC_INFO, symbol="ETHUSDT")]}
+    client = AsyncMock()
+    client.get = AsyncMock(return_value=resp)
+    client.__aenter__.return_value = client
+    mock_redis = AsyncMock()
+
+    with patch("app.services.symbol_registry.httpx.AsyncClient", return_value=client), \
+         patch("app.services.symbol_registry.get_redis", return_value=mock_redis):
+        count = await load_symbol_registry(["BTC_USDT", "ETH_USDT"])
+
+    assert count == 2
+    client.get.assert_called_once()
+    assert json.loads(client.get.call_args.kwargs["params"]["symbols"]) == ["BTCUSDT", "ETHUSDT"]
+    mapping = mock_redis.hset.call_args.kwargs["mapping"]
+    assert set(mapping) == {"BTCUSDT", "ETHUSDT"}
+
+
+@pytest.mark.asyncio
+async def test_get_filters_falls_back_to_redis():
+    mock_redis = AsyncMock()
+    mock_redis.hget = AsyncMock(return_value=json.dumps({"step_size": "0.001", "tick_size": "0.1"}))
+    with patch("app.services.symbol_registry.get_redis", return_value=mock_redis):
+        f = await get_symbol_filters("SOLUSDT")
+        assert f["step_size"] == Decimal("0.001")
+        await get_symbol_filters("SOLUSDT")
+    mock_redis.hget.assert_called_once()  # second lookup served from memory
+
+
+@pytest.mark.asyncio
+async def test_normalize_order_values_unknown_symbol_passthrough():
+    mock_redis = AsyncMock()
+    mock_redis.hget = AsyncMock(return_value=None)
+    with patch("app.services.symbol_registry.get_redis", return_value=mock_redis):
+        qty, price = await normalize_order_values("XYZ_USDT", "buy", Decimal("1.23456789"), None)
+    assert qty == Decimal("1.23456789") and price is None